@@ -20,7 +20,9 @@ if config.config_file_name is not None:
 # for 'autogenerate' support
 from app.core.database import Base
 from app.models.user import User
-from app.models.book import Book, Page
+from app.models.book import Book, Page, BookGenerationCheckpoint
+from app.models.storage import StorageBlob
+from app.models.stats import BookStats
 target_metadata = Base.metadata
 
 # other values from the config, defined by the needs of env.py,
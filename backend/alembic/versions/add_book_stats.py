@@ -0,0 +1,121 @@
+"""add book stats counters
+
+Revision ID: add_book_stats
+Revises: add_search_indexes
+Create Date: 2026-10-16 21:00:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+# revision identifiers, used by Alembic.
+revision = 'add_book_stats'
+down_revision = 'add_search_indexes'
+branch_labels = None
+depends_on = None
+
+# Aplica as variações de um comando em books (linhas em {changes}: user_id,
+# status, style, delta) com um único INSERT ... ON CONFLICT. As chaves saem
+# ordenadas, então comandos concorrentes travam as linhas na mesma ordem e
+# não entram em deadlock entre si; variações que se anulam (ex.: total numa mudança de
+# status) não gravam nada
+APPLY_CHANGES = """
+        INSERT INTO book_stats AS s (user_id, dimension, value, count)
+        SELECT c.user_id, d.dimension, d.value, sum(c.delta)
+        FROM ({changes}) AS c
+        CROSS JOIN LATERAL (
+            VALUES ('total', ''), ('status', c.status), ('style', c.style)
+        ) AS d(dimension, value)
+        WHERE d.value IS NOT NULL
+        GROUP BY c.user_id, d.dimension, d.value
+        HAVING sum(c.delta) <> 0
+        ORDER BY c.user_id, d.dimension, d.value
+        ON CONFLICT (user_id, dimension, value) DO UPDATE SET count = s.count + EXCLUDED.count;
+"""
+
+OLD_ROWS = "SELECT user_id, status, style, -1 AS delta FROM old_rows"
+NEW_ROWS = "SELECT user_id, status, style, 1 AS delta FROM new_rows"
+
+# Trigger por comando (não por linha): um comando que insere, muda ou remove
+# muitos livros (executemany, COPY, cleanup) faz uma escrita por contador
+MAINTAIN_FUNCTION = f"""
+CREATE OR REPLACE FUNCTION book_stats_maintain() RETURNS trigger AS $$
+BEGIN
+    IF TG_OP = 'INSERT' THEN
+{APPLY_CHANGES.format(changes=NEW_ROWS)}
+    ELSIF TG_OP = 'DELETE' THEN
+{APPLY_CHANGES.format(changes=OLD_ROWS)}
+    ELSE
+{APPLY_CHANGES.format(changes=f"{OLD_ROWS} UNION ALL {NEW_ROWS}")}
+    END IF;
+    RETURN NULL;
+END;
+$$ LANGUAGE plpgsql
+"""
+
+# Tabelas de transição só valem para um evento por trigger
+TRIGGERS = [
+    ('book_stats_insert', 'INSERT', 'NEW TABLE AS new_rows'),
+    ('book_stats_update', 'UPDATE', 'OLD TABLE AS old_rows NEW TABLE AS new_rows'),
+    ('book_stats_delete', 'DELETE', 'OLD TABLE AS old_rows'),
+]
+
+# Contagem inicial em uma varredura de books: grouping(col) = 1 quando a
+# coluna foi agregada no conjunto. Status e estilo NULL ficam só no total,
+# como nos triggers
+BACKFILL = """
+INSERT INTO book_stats (user_id, dimension, value, count)
+SELECT
+    user_id,
+    CASE WHEN grouping(status, style) = 3 THEN 'total'
+         WHEN grouping(status) = 0 THEN 'status'
+         ELSE 'style' END,
+    coalesce(status, style, ''),
+    count(*)
+FROM books
+GROUP BY GROUPING SETS ((user_id), (user_id, status), (user_id, style))
+HAVING (grouping(status) = 1 OR status IS NOT NULL)
+   AND (grouping(style) = 1 OR style IS NOT NULL)
+"""
+
+# Contadores globais (user_id 0), que os triggers não tocam: o primeiro
+# rollup; os seguintes são da task rollup_book_stats
+ROLLUP_GLOBAL = """
+INSERT INTO book_stats (user_id, dimension, value, count)
+SELECT 0, dimension, value, sum(count)
+FROM book_stats
+WHERE user_id <> 0
+GROUP BY dimension, value
+"""
+
+
+def upgrade():
+    """Cria book_stats, os triggers que a mantêm e preenche os contadores atuais."""
+    op.create_table(
+        'book_stats',
+        sa.Column('user_id', sa.Integer(), nullable=False),
+        sa.Column('dimension', sa.String(10), nullable=False),
+        sa.Column('value', sa.String(20), nullable=False),
+        sa.Column('count', sa.Integer(), nullable=False, server_default='0'),
+        sa.PrimaryKeyConstraint('user_id', 'dimension', 'value'),
+    )
+
+    op.execute(MAINTAIN_FUNCTION)
+    # Escritas em books esperam o preenchimento: nenhuma fica fora da contagem
+    op.execute("LOCK TABLE books IN SHARE ROW EXCLUSIVE MODE")
+    for name, event, transition_tables in TRIGGERS:
+        op.execute(
+            f"CREATE TRIGGER {name} AFTER {event} ON books "
+            f"REFERENCING {transition_tables} "
+            "FOR EACH STATEMENT EXECUTE FUNCTION book_stats_maintain()"
+        )
+    op.execute(BACKFILL)
+    op.execute(ROLLUP_GLOBAL)
+
+
+def downgrade():
+    """Remove os triggers, a função e a tabela book_stats."""
+    for name, _, _ in reversed(TRIGGERS):
+        op.execute(f"DROP TRIGGER IF EXISTS {name} ON books")
+    op.execute("DROP FUNCTION IF EXISTS book_stats_maintain()")
+    op.drop_table('book_stats')
@@ -0,0 +1,58 @@
+"""add generation checkpoints
+
+Revision ID: add_generation_checkpoints
+Revises: add_business_validations
+Create Date: 2026-10-16 09:00:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+# revision identifiers, used by Alembic.
+revision = 'add_generation_checkpoints'
+down_revision = 'add_business_validations'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    """Cria tabela de checkpoints da geração de livros."""
+    
+    op.create_table(
+        'book_generation_checkpoints',
+        sa.Column('id', sa.Integer(), nullable=False),
+        sa.Column('book_id', sa.Integer(), nullable=False),
+        sa.Column('attempt', sa.Integer(), nullable=False),
+        sa.Column('stage', sa.String(20), nullable=False),
+        sa.Column('page_number', sa.Integer(), nullable=False, server_default='0'),
+        sa.Column('payload', sa.JSON(), nullable=False),
+        sa.Column('created_at', sa.DateTime(timezone=True), server_default=sa.func.now(), nullable=True),
+        sa.Column('updated_at', sa.DateTime(timezone=True), nullable=True),
+        sa.ForeignKeyConstraint(['book_id'], ['books.id'], ondelete='CASCADE'),
+        sa.PrimaryKeyConstraint('id'),
+        sa.CheckConstraint(
+            "stage IN ('story', 'pages', 'page_image')",
+            name='valid_checkpoint_stage'
+        ),
+        sa.CheckConstraint('attempt > 0', name='checkpoint_attempt_positive'),
+    )
+    op.create_index(
+        op.f('ix_book_generation_checkpoints_id'),
+        'book_generation_checkpoints',
+        ['id'],
+        unique=False
+    )
+    op.create_index(
+        'idx_checkpoint_unique',
+        'book_generation_checkpoints',
+        ['book_id', 'attempt', 'stage', 'page_number'],
+        unique=True
+    )
+
+
+def downgrade():
+    """Remove tabela de checkpoints da geração de livros."""
+    
+    op.drop_index('idx_checkpoint_unique', 'book_generation_checkpoints')
+    op.drop_index(op.f('ix_book_generation_checkpoints_id'), table_name='book_generation_checkpoints')
+    op.drop_table('book_generation_checkpoints')
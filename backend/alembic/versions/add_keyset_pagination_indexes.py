@@ -0,0 +1,38 @@
+"""add keyset pagination indexes
+
+Revision ID: add_keyset_pagination_indexes
+Revises: add_storage_blobs
+Create Date: 2026-10-16 18:00:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+# revision identifiers, used by Alembic.
+revision = 'add_keyset_pagination_indexes'
+down_revision = 'add_storage_blobs'
+branch_labels = None
+depends_on = None
+
+# (nome, tabela, colunas): filtros seguidos de (created_at, id)
+INDEXES = [
+    ('idx_book_user_created', 'books', ['user_id', 'created_at', 'id']),
+    ('idx_book_user_status_created', 'books', ['user_id', 'status', 'created_at', 'id']),
+    ('idx_book_status_created', 'books', ['status', 'created_at', 'id']),
+    ('idx_book_style_created', 'books', ['style', 'created_at', 'id']),
+    ('idx_user_created', 'users', ['created_at', 'id']),
+]
+
+
+def upgrade():
+    """Cria os índices da paginação por cursor sem bloquear escritas (CONCURRENTLY)."""
+    with op.get_context().autocommit_block():
+        for name, table, columns in INDEXES:
+            op.create_index(name, table, columns, postgresql_concurrently=True, if_not_exists=True)
+
+
+def downgrade():
+    """Remove os índices da paginação por cursor."""
+    with op.get_context().autocommit_block():
+        for name, table, _ in reversed(INDEXES):
+            op.drop_index(name, table_name=table, postgresql_concurrently=True, if_exists=True)
@@ -0,0 +1,25 @@
+"""add pdf preview file
+
+Revision ID: add_pdf_preview_file
+Revises: add_generation_checkpoints
+Create Date: 2026-10-16 12:00:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+# revision identifiers, used by Alembic.
+revision = 'add_pdf_preview_file'
+down_revision = 'add_generation_checkpoints'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    """Adiciona o PDF de pré-visualização ao lado do PDF de impressão."""
+    op.add_column('books', sa.Column('pdf_preview_file', sa.String(), nullable=True))
+
+
+def downgrade():
+    """Remove o PDF de pré-visualização."""
+    op.drop_column('books', 'pdf_preview_file')
@@ -0,0 +1,55 @@
+"""add full-text and trigram search indexes
+
+Revision ID: add_search_indexes
+Revises: add_keyset_pagination_indexes
+Create Date: 2026-10-16 20:00:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+# revision identifiers, used by Alembic.
+revision = 'add_search_indexes'
+down_revision = 'add_keyset_pagination_indexes'
+branch_labels = None
+depends_on = None
+
+# Título com peso A e descrição com peso B no ranking (ts_rank_cd). Índice de
+# expressão, sem coluna gerada: ADD COLUMN ... STORED reescreveria books com
+# ACCESS EXCLUSIVE. As consultas usam a mesma expressão (BOOK_SEARCH_VECTOR)
+SEARCH_VECTOR = (
+    "(setweight(to_tsvector('portuguese'::regconfig, coalesce(title, '')), 'A') || "
+    "setweight(to_tsvector('portuguese'::regconfig, coalesce(description, '')), 'B'))"
+)
+
+# (nome, tabela, coluna) dos índices de trigramas
+TRGM_INDEXES = [
+    ('idx_book_title_trgm', 'books', 'title'),
+    ('idx_user_full_name_trgm', 'users', 'full_name'),
+    ('idx_user_email_trgm', 'users', 'email'),
+]
+
+
+def upgrade():
+    """Cria os índices GIN da busca sem bloquear escritas (CONCURRENTLY)."""
+    op.execute("CREATE EXTENSION IF NOT EXISTS pg_trgm")
+
+    with op.get_context().autocommit_block():
+        op.create_index(
+            'idx_book_search_vector', 'books', [sa.text(SEARCH_VECTOR)],
+            postgresql_using='gin', postgresql_concurrently=True, if_not_exists=True
+        )
+        for name, table, column in TRGM_INDEXES:
+            op.create_index(
+                name, table, [column],
+                postgresql_using='gin', postgresql_ops={column: 'gin_trgm_ops'},
+                postgresql_concurrently=True, if_not_exists=True
+            )
+
+
+def downgrade():
+    """Remove os índices da busca (a extensão pg_trgm permanece)."""
+    with op.get_context().autocommit_block():
+        for name, table, _ in reversed(TRGM_INDEXES):
+            op.drop_index(name, table_name=table, postgresql_concurrently=True, if_exists=True)
+        op.drop_index('idx_book_search_vector', table_name='books', postgresql_concurrently=True, if_exists=True)
@@ -0,0 +1,44 @@
+"""add storage blobs
+
+Revision ID: add_storage_blobs
+Revises: add_pdf_preview_file
+Create Date: 2026-10-16 15:00:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+# revision identifiers, used by Alembic.
+revision = 'add_storage_blobs'
+down_revision = 'add_pdf_preview_file'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    """Cria a tabela de blobs endereçados por conteúdo e seus contadores de referência."""
+    
+    op.create_table(
+        'storage_blobs',
+        sa.Column('id', sa.Integer(), nullable=False),
+        sa.Column('digest', sa.String(64), nullable=False),
+        sa.Column('url', sa.String(), nullable=False),
+        sa.Column('size', sa.BigInteger(), nullable=True),
+        sa.Column('content_type', sa.String(100), nullable=True),
+        sa.Column('refcount', sa.Integer(), nullable=False, server_default='0'),
+        sa.Column('created_at', sa.DateTime(timezone=True), server_default=sa.func.now(), nullable=True),
+        sa.Column('updated_at', sa.DateTime(timezone=True), server_default=sa.func.now(), nullable=True),
+        sa.PrimaryKeyConstraint('id'),
+        sa.CheckConstraint('refcount >= 0', name='blob_refcount_non_negative'),
+    )
+    op.create_index(op.f('ix_storage_blobs_id'), 'storage_blobs', ['id'], unique=False)
+    op.create_index('idx_storage_blob_url', 'storage_blobs', ['url'], unique=True)
+    op.create_index('idx_storage_blob_gc', 'storage_blobs', ['refcount', 'updated_at'], unique=False)
+
+
+def downgrade():
+    """Remove a tabela de blobs."""
+    op.drop_index('idx_storage_blob_gc', table_name='storage_blobs')
+    op.drop_index('idx_storage_blob_url', table_name='storage_blobs')
+    op.drop_index(op.f('ix_storage_blobs_id'), table_name='storage_blobs')
+    op.drop_table('storage_blobs')
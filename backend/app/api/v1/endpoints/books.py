@@ -1,6 +1,8 @@
 from typing import Any, List, Dict, Optional
 from fastapi import APIRouter, Depends, Request, Query, BackgroundTasks
-from fastapi.responses import StreamingResponse
+from fastapi.responses import FileResponse, Response, StreamingResponse
+from datetime import date
+from urllib.parse import quote
 from sqlalchemy.ext.asyncio import AsyncSession
 
 from app.api import deps
@@ -8,6 +10,7 @@ from app.services.book_service import BookService
 from app.models.user import User
 from app.schemas.book import BookResponse, BookCreate, BookUpdate
 from app.middleware.exception_middleware import log_user_action
+from app.core.config import settings
 
 router = APIRouter()
 
@@ -17,11 +20,17 @@ def get_book_service(db: AsyncSession = Depends(deps.get_db)) -> BookService:
     return BookService(db)
 
 
+# Header com o token da próxima página da listagem por cursor
+NEXT_CURSOR_HEADER = "X-Next-Cursor"
+
+
 @router.get("/", response_model=List[BookResponse])
 async def list_user_books(
     request: Request,
-    skip: int = Query(0, ge=0, description="Número de registros para pular"),
+    response: Response,
+    skip: int = Query(0, ge=0, description="Número de registros para pular (legado; prefira cursor)"),
     limit: int = Query(100, ge=1, le=1000, description="Limite de registros por página"),
+    cursor: Optional[str] = Query(None, description="Token X-Next-Cursor da página anterior"),
     status_filter: Optional[str] = Query(None, description="Filtrar por status específico"),
     current_user: User = Depends(deps.get_current_active_user),
     book_service: BookService = Depends(get_book_service)
@@ -29,16 +38,35 @@ async def list_user_books(
     """
     Lista livros do usuário atual com paginação.
     
-    Aplica filtros de status e paginação segura.
+    Sem skip, a listagem é por cursor (keyset em created_at, id): o header
+    X-Next-Cursor traz o token opaco da próxima página (ausente na última),
+    que é repassado no parâmetro cursor. skip > 0 mantém a paginação por
+    OFFSET para compatibilidade.
     """
+    if skip and cursor:
+        from app.exceptions.base_exceptions import ValidationError
+        raise ValidationError(message="Use skip ou cursor, não ambos", field="cursor")
+    
     # BookService já valida parâmetros e permissões
-    books = await book_service.get_user_books(
-        user_id=current_user.id,
-        skip=skip,
-        limit=limit,
-        status_filter=status_filter,
-        current_user=current_user
-    )
+    if skip:
+        books = await book_service.get_user_books(
+            user_id=current_user.id,
+            skip=skip,
+            limit=limit,
+            status_filter=status_filter,
+            current_user=current_user
+        )
+    else:
+        page = await book_service.get_user_books_page(
+            user_id=current_user.id,
+            limit=limit,
+            cursor=cursor,
+            status_filter=status_filter,
+            current_user=current_user
+        )
+        books = page.items
+        if page.next_cursor:
+            response.headers[NEXT_CURSOR_HEADER] = page.next_cursor
     
     # Log da ação
     log_user_action(
@@ -51,6 +79,40 @@ async def list_user_books(
     return books
 
 
+@router.get("/export")
+async def export_user_library(
+    request: Request,
+    include_images: bool = Query(False, description="Inclui as imagens das páginas de cada livro"),
+    current_user: User = Depends(deps.get_current_active_user)
+) -> StreamingResponse:
+    """
+    Exporta a biblioteca do usuário (PDFs dos livros completos) em um ZIP.
+    
+    O arquivo é montado enquanto é enviado, lendo cada entrada do storage em
+    chunks: sem arquivo temporário e com memória constante, qualquer que seja
+    o tamanho da biblioteca.
+    """
+    from app.services.export_service import LibraryExportService
+    
+    # Log da ação
+    log_user_action(
+        request=request,
+        user_id=current_user.id,
+        action="export_library",
+        details={"include_images": include_images}
+    )
+    
+    export_service = LibraryExportService()
+    return StreamingResponse(
+        export_service.stream_zip(current_user.id, include_images=include_images),
+        media_type="application/zip",
+        headers={
+            "Content-Disposition": _attachment_header(f"biblioteca_{date.today().isoformat()}.zip"),
+            "Cache-Control": "no-store"
+        }
+    )
+
+
 @router.post("/", response_model=BookResponse)
 async def create_book(
     request: Request,
@@ -120,6 +182,37 @@ async def start_book_generation(
     return result
 
 
+@router.post("/{book_id}/resume")
+async def resume_book_generation(
+    book_id: int,
+    request: Request,
+    current_user: User = Depends(deps.get_current_active_user),
+    book_service: BookService = Depends(get_book_service)
+) -> Dict[str, Any]:
+    """
+    Retoma a geração de um livro com falha a partir dos checkpoints.
+    
+    Etapas já concluídas (história, páginas, imagens) não são refeitas.
+    """
+    # BookService já valida permissões e status do livro
+    result = await book_service.resume_book_generation(
+        book_id=book_id,
+        current_user=current_user
+    )
+    
+    # Log da ação
+    log_user_action(
+        request=request,
+        user_id=current_user.id,
+        action="resume_book_generation",
+        resource="book",
+        resource_id=str(book_id),
+        details={"attempt": result["attempt"]}
+    )
+    
+    return result
+
+
 @router.get("/{book_id}/generation-status/{task_id}")
 async def get_generation_status(
     book_id: int,
@@ -263,15 +356,40 @@ async def generate_book_pdf(
     return result
 
 
+def _etag_matches(if_none_match: Optional[str], etag: str) -> bool:
+    """Comparação fraca do If-None-Match (RFC 9110), aceitando lista e "*"."""
+    if not if_none_match:
+        return False
+    if if_none_match.strip() == "*":
+        return True
+    candidates = [candidate.strip() for candidate in if_none_match.split(",")]
+    return any(candidate.removeprefix("W/") == etag for candidate in candidates)
+
+
+def _attachment_header(filename: str) -> str:
+    """Content-Disposition de download, com RFC 5987 para nomes não ASCII."""
+    quoted = quote(filename)
+    if quoted != filename:
+        return f"attachment; filename*=utf-8''{quoted}"
+    return f'attachment; filename="{filename}"'
+
+
 @router.get("/{book_id}/pdf")
 async def download_book_pdf(
     book_id: int,
     request: Request,
+    variant: str = Query("print", pattern="^(print|preview)$", description="print (alta resolução) ou preview"),
     current_user: User = Depends(deps.get_current_active_user),
     book_service: BookService = Depends(get_book_service)
-) -> StreamingResponse:
+) -> Response:
     """
     Download do PDF do livro (se disponível).
+    
+    Serve o arquivo já gerado sem passar seu conteúdo pela aplicação: com
+    PDF_DOWNLOAD_ACCEL_REDIRECT_PREFIX o envio é delegado ao proxy reverso;
+    caso contrário usa FileResponse (sendfile quando o servidor suporta).
+    Suporta requisições Range e ETag forte (If-None-Match -> 304). Com
+    storage remoto (S3) o PDF é repassado em streaming.
     """
     # BookService já verifica permissões e se PDF existe
     book = await book_service.get_book_details(
@@ -279,18 +397,24 @@ async def download_book_pdf(
         current_user=current_user
     )
     
+    from app.services.pdf_service import PDFService
+    pdf = await PDFService.get_book_pdf(book, variant)
+    
     # Verificar se tem PDF gerado
-    if not book.pdf_file:
+    if pdf is None:
         from app.exceptions.base_exceptions import ValidationError
         raise ValidationError(
             message="PDF ainda não foi gerado para este livro",
-            field="pdf_file"
+            field="pdf_preview_file" if variant == "preview" else "pdf_file"
         )
     
-    # Gerar/retornar PDF
-    from app.services.pdf_service import PDFService
-    pdf_service = PDFService()
-    pdf_buffer = await pdf_service.get_book_pdf(book)
+    headers = {
+        "ETag": pdf.etag,
+        "Cache-Control": "private, no-cache",
+        "Content-Disposition": _attachment_header(f"{book.title.replace(' ', '_')}.pdf")
+    }
+    if _etag_matches(request.headers.get("if-none-match"), pdf.etag):
+        return Response(status_code=304, headers={"ETag": pdf.etag, "Cache-Control": headers["Cache-Control"]})
     
     # Log da ação
     log_user_action(
@@ -301,13 +425,24 @@ async def download_book_pdf(
         resource_id=str(book_id)
     )
     
-    return StreamingResponse(
-        pdf_buffer,
-        media_type="application/pdf",
-        headers={
-            "Content-Disposition": f"attachment; filename={book.title.replace(' ', '_')}.pdf"
-        }
-    )
+    if pdf.path is None:
+        # Storage remoto (S3): o conteúdo é repassado em streaming, sem Range
+        headers["Content-Length"] = str(pdf.size)
+        return StreamingResponse(
+            PDFService.stream_book_pdf(pdf),
+            media_type="application/pdf",
+            headers=headers
+        )
+    
+    if settings.PDF_DOWNLOAD_ACCEL_REDIRECT_PREFIX:
+        # O proxy envia o arquivo (inclusive Range) a partir da location interna
+        relative_path = pdf.url.removeprefix("/uploads/")
+        headers[settings.PDF_DOWNLOAD_ACCEL_HEADER] = (
+            settings.PDF_DOWNLOAD_ACCEL_REDIRECT_PREFIX.rstrip("/") + "/" + relative_path
+        )
+        return Response(media_type="application/pdf", headers=headers)
+    
+    return FileResponse(pdf.path, media_type="application/pdf", headers=headers)
 
 
 @router.get("/search/{search_term}", response_model=List[BookResponse])
@@ -15,6 +15,7 @@ from app.api import deps
 from app.core.database import get_db
 from app.core.config import settings
 from app.core.logging import get_logger, metrics_logger
+from app.services.ai.cache import get_cache_stats
 from app.models.user import User
 from app.repositories.user_repository import UserRepository
 from app.repositories.book_repository import BookRepository
@@ -332,6 +333,9 @@ async def application_metrics(
                 }
             },
             
+            # Cache de respostas de IA (economia de chamadas aos providers)
+            "ai_cache": await get_cache_stats(),
+            
             # Métricas de aplicação
             "application_metrics": {
                 "version": settings.VERSION,
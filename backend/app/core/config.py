@@ -24,6 +24,10 @@ class Settings(BaseSettings):
     
     # Database
     DATABASE_URL: str
+    DB_BULK_COPY_MIN_ROWS: int = 1000  # bulk_create usa COPY (asyncpg) a partir deste número de linhas
+    DB_BULK_CHUNK_SIZE: int = 5000  # IDs por comando em bulk_delete_by_ids
+    BOOK_STATS_COUNTERS: bool = True  # Estatísticas de livros lidas da tabela book_stats (False: agrega books)
+    BOOK_STATS_ROLLUP_SECONDS: int = 60  # Intervalo do rollup dos contadores globais de book_stats
     
     # Redis
     REDIS_URL: str
@@ -59,6 +63,59 @@ class Settings(BaseSettings):
     GEMINI_API_KEY: Optional[str] = None
     OPENAI_API_KEY: Optional[str] = None
     OPENROUTER_API_KEY: Optional[str] = None
+    AI_PROVIDER: str = "gemini"  # gemini, fake (offline) ou router
+    
+    # AI Router (AI_PROVIDER=router)
+    AI_ROUTER_BACKENDS: str = "gemini"  # Backends em ordem de preferência (separados por vírgula)
+    AI_ROUTER_WINDOW_SIZE: int = 100  # Chamadas na janela de latência/erros por backend
+    AI_ROUTER_MIN_SAMPLES: int = 10  # Amostras mínimas para usar percentis e abrir o circuito
+    AI_ROUTER_HEDGE_PERCENTILE: float = 0.95  # Percentil de latência que dispara a requisição hedge
+    AI_ROUTER_HEDGE_MIN_DELAY_MS: int = 200
+    AI_ROUTER_HEDGE_MAX_DELAY_MS: int = 30000
+    AI_ROUTER_FAILURE_THRESHOLD: float = 0.5  # Taxa de erro que abre o circuito
+    AI_ROUTER_OPEN_SECONDS: int = 30  # Tempo com circuito aberto antes de testar novamente
+    
+    # AI Response Cache
+    AI_CACHE_ENABLED: bool = True
+    AI_CACHE_REDIS_ENABLED: bool = True  # Camada L2 compartilhada entre processos
+    AI_CACHE_TTL_SECONDS: int = 86400  # Respostas de texto (1 dia)
+    AI_CACHE_IMAGE_TTL_SECONDS: int = 604800  # Imagens (7 dias)
+    AI_CACHE_L1_MAX_ENTRIES: int = 256  # Itens no LRU em memória por processo
+    AI_CACHE_L1_MAX_MB: int = 64  # Tamanho máximo do LRU em memória por processo
+    AI_CACHE_METRICS_FLUSH_SECONDS: float = 10.0  # Intervalo de envio dos contadores ao Redis (em lote)
+    
+    # Book Generation
+    BOOK_GENERATION_MODE: str = "canvas"  # canvas (história -> imagens por página -> finalização) ou single (task única)
+    IMAGE_GENERATION_CONCURRENCY_PER_BOOK: int = 4  # Imagens simultâneas por livro
+    IMAGE_GENERATION_CONCURRENCY_PER_WORKER: int = 8  # Imagens simultâneas por processo worker
+    IMAGE_PROMPT_REFINEMENT: bool = True  # Cena de cada página descrita pela IA (prompts em lote)
+    IMAGE_PROMPT_BATCH_SIZE: int = 16  # Páginas por chamada de generate_text_batch
+    IMAGE_PROMPT_BATCH_DELAY_MS: int = 50  # Espera para agrupar páginas que chegam em streaming
+    
+    # Media Process Pool (renderização CPU-bound fora do loop de eventos)
+    MEDIA_PROCESS_POOL_ENABLED: bool = True  # False: usa o executor de threads padrão
+    MEDIA_PROCESS_POOL_SIZE: int = 0  # 0 = os.cpu_count()
+    MEDIA_PROCESS_POOL_START_METHOD: str = "spawn"  # spawn/forkserver (fork é inseguro com threads)
+    
+    # PDF
+    PDF_STREAM_CHUNK_SIZE: int = 1024 * 1024  # Bytes por chunk no envio do PDF ao storage
+    PDF_IMAGE_PROFILE: str = "print"  # screen (~110 dpi, JPEG mais comprimido) ou print (300 dpi)
+    PDF_PREVIEW_ENABLED: bool = True  # Gera um PDF de pré-visualização antes do de impressão
+    PDF_PREVIEW_PROFILE: str = "screen"  # Perfil de imagem do PDF de pré-visualização
+    PDF_PREVIEW_PRIORITY: int = 0  # Prioridade Celery do preview (Redis: 0 = mais alta, 9 = mais baixa)
+    PDF_PRINT_PRIORITY: int = 9  # Prioridade Celery do PDF de impressão
+    PDF_IMAGE_PREFETCH_CONCURRENCY: int = 8  # Downloads simultâneos de imagens por PDF
+    PDF_IMAGE_CACHE_DIR: str = ""  # Cache de imagens remotas em disco (vazio = diretório temporário do sistema)
+    PDF_IMAGE_CACHE_MAX_MB: int = 512  # Tamanho máximo do cache de imagens remotas por worker
+    PDF_DECODED_IMAGE_CACHE_MAX_MB: int = 128  # Imagens decodificadas mantidas por processo renderizador
+    PDF_FRAGMENT_CACHE_DIR: str = ""  # Páginas renderizadas (fragmentos) em disco (vazio = diretório temporário do sistema)
+    PDF_FRAGMENT_CACHE_MAX_MB: int = 1024  # Tamanho máximo do cache de fragmentos
+    PDF_DOWNLOAD_ACCEL_REDIRECT_PREFIX: str = ""  # Ex.: "/protected-uploads/" (location interna do proxy apontando para uploads); vazio = a API envia o arquivo
+    PDF_DOWNLOAD_ACCEL_HEADER: str = "X-Accel-Redirect"  # X-Accel-Redirect (Nginx) ou X-Sendfile (Apache/lighttpd)
+    
+    # Exportação da biblioteca (ZIP)
+    LIBRARY_EXPORT_BATCH_SIZE: int = 50  # Livros lidos do banco por consulta durante a exportação
+    LIBRARY_EXPORT_CHUNK_SIZE: int = 256 * 1024  # Bytes lidos do storage por vez ao montar o ZIP
     
     # Logging
     LOG_LEVEL: str = "INFO"
@@ -67,6 +124,30 @@ class Settings(BaseSettings):
     # File Upload
     MAX_FILE_SIZE_MB: int = 10
     ALLOWED_UPLOAD_EXTENSIONS: str = "jpg,jpeg,png,pdf"
+    STORAGE_IO_THREADS: int = 8  # Threads do pool de I/O do storage local
+    STORAGE_IO_CHUNK_SIZE: int = 1024 * 1024  # Bytes por escrita ao copiar uploads para o disco
+    STORAGE_FSYNC_POLICY: str = "file"  # none (só rename), file (fsync do arquivo) ou dir (também do diretório, rename durável)
+    STORAGE_LOCAL_LAYOUT: str = "sharded"  # sharded (ab/cd/<arquivo>, ver scripts/migrate_storage_layout.py) ou flat
+    STORAGE_SHARD_DEPTH: int = 2  # Níveis de diretório do layout sharded (256 subdiretórios por nível)
+    STORAGE_CONTENT_ADDRESSED: bool = True  # Salva arquivos pelo hash do conteúdo (deduplicação + contagem de referências)
+    STORAGE_GC_GRACE_HOURS: int = 24  # Blobs sem referências são removidos após este período
+    STORAGE_GC_BATCH_SIZE: int = 500  # Blobs verificados por execução do GC
+    STORAGE_BACKEND: str = "local"  # local (disco compartilhado) ou s3 (S3/MinIO/R2, sem disco compartilhado entre API e workers)
+    
+    # Storage S3 (STORAGE_BACKEND=s3)
+    S3_BUCKET: str = ""
+    S3_ENDPOINT_URL: str = "https://s3.amazonaws.com"  # Ex.: http://minio:9000
+    S3_REGION: str = "us-east-1"
+    S3_ACCESS_KEY_ID: Optional[str] = None
+    S3_SECRET_ACCESS_KEY: Optional[str] = None
+    S3_ADDRESSING_STYLE: str = "path"  # path (endpoint/bucket/chave, MinIO) ou virtual (bucket.endpoint/chave)
+    S3_KEY_PREFIX: str = "uploads"  # Prefixo das chaves dentro do bucket
+    S3_PUBLIC_URL: str = ""  # Base das URLs gravadas no banco (CDN ou bucket público); vazio = URL do objeto no endpoint
+    S3_MAX_CONNECTIONS: int = 64  # Conexões keep-alive do pool por loop de eventos
+    S3_MULTIPART_THRESHOLD_MB: int = 16  # Uploads a partir deste tamanho usam multipart
+    S3_MULTIPART_PART_SIZE_MB: int = 8  # Tamanho de cada parte (mínimo 5MB no S3)
+    S3_MULTIPART_CONCURRENCY: int = 4  # Partes enviadas em paralelo por upload
+    S3_MAX_RETRIES: int = 3  # Tentativas por requisição em erros 5xx/de conexão
     
     # Email (for notifications)
     EMAIL_ENABLED: bool = False
@@ -0,0 +1,153 @@
+"""
+Executores compartilhados para trabalho que não pode rodar no loop de eventos.
+
+Renderização e encode de imagens (Pillow) e de PDFs seguram o GIL e bloqueiam o
+loop de eventos. Esse trabalho é enviado a um ProcessPoolExecutor único por
+processo, criado sob demanda, dimensionado por MEDIA_PROCESS_POOL_SIZE e
+recriado automaticamente após um fork.
+
+I/O bloqueante de arquivos (storage local) vai para um ThreadPoolExecutor
+próprio, dimensionado por STORAGE_IO_THREADS, para não disputar o executor
+padrão do loop nem atrasar as demais tarefas.
+"""
+
+import asyncio
+import functools
+import logging
+import multiprocessing
+import os
+import threading
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+from typing import Callable, Optional, TypeVar
+
+from app.core.config import settings
+
+logger = logging.getLogger(__name__)
+
+T = TypeVar("T")
+
+_lock = threading.Lock()
+_executor: Optional[ProcessPoolExecutor] = None
+_executor_pid: Optional[int] = None
+_io_executor: Optional[ThreadPoolExecutor] = None
+_io_executor_pid: Optional[int] = None
+
+
+def get_process_pool() -> Optional[ProcessPoolExecutor]:
+    """
+    Retorna o pool de processos de mídia do processo atual.
+
+    Returns:
+        ProcessPoolExecutor ou None quando MEDIA_PROCESS_POOL_ENABLED é False
+    """
+    global _executor, _executor_pid
+
+    if not settings.MEDIA_PROCESS_POOL_ENABLED:
+        return None
+
+    with _lock:
+        if _executor is not None and _executor_pid != os.getpid():
+            # Herdado do pai num fork: os processos filhos pertencem ao pai
+            _executor = None
+
+        if _executor is None:
+            max_workers = settings.MEDIA_PROCESS_POOL_SIZE or os.cpu_count() or 1
+            # spawn: o processo pai tem threads (loop do runtime, pool do banco)
+            context = multiprocessing.get_context(settings.MEDIA_PROCESS_POOL_START_METHOD)
+            _executor = ProcessPoolExecutor(max_workers=max_workers, mp_context=context)
+            _executor_pid = os.getpid()
+            logger.info(f"Media process pool started ({max_workers} workers, pid={_executor_pid})")
+
+        return _executor
+
+
+async def run_cpu_bound(func: Callable[..., T], *args, **kwargs) -> T:
+    """
+    Executa uma função CPU-bound fora do loop de eventos.
+
+    A função e seus argumentos precisam ser serializáveis (funções de módulo).
+    Com o pool desabilitado a função roda no executor de threads padrão.
+
+    Args:
+        func: Função síncrona a executar
+        *args: Argumentos posicionais
+        **kwargs: Argumentos nomeados
+
+    Returns:
+        Resultado da função
+    """
+    loop = asyncio.get_running_loop()
+    return await loop.run_in_executor(get_process_pool(), functools.partial(func, *args, **kwargs))
+
+
+def shutdown_process_pool(wait: bool = True) -> None:
+    """
+    Encerra o pool de processos de mídia (idempotente).
+
+    Args:
+        wait: Aguarda os trabalhos em andamento terminarem
+    """
+    global _executor, _executor_pid
+
+    with _lock:
+        executor, pid = _executor, _executor_pid
+        _executor = None
+        _executor_pid = None
+
+    if executor is not None and pid == os.getpid():
+        executor.shutdown(wait=wait, cancel_futures=not wait)
+        logger.info("Media process pool stopped")
+
+
+def get_io_thread_pool() -> ThreadPoolExecutor:
+    """
+    Retorna o pool de threads de I/O de arquivos do processo atual.
+
+    Returns:
+        ThreadPoolExecutor com STORAGE_IO_THREADS threads
+    """
+    global _io_executor, _io_executor_pid
+
+    with _lock:
+        if _io_executor is None or _io_executor_pid != os.getpid():
+            # Threads não sobrevivem a um fork: o pool herdado não executaria nada
+            _io_executor = ThreadPoolExecutor(
+                max_workers=max(1, settings.STORAGE_IO_THREADS),
+                thread_name_prefix="storage-io"
+            )
+            _io_executor_pid = os.getpid()
+        return _io_executor
+
+
+async def run_blocking_io(func: Callable[..., T], *args, **kwargs) -> T:
+    """
+    Executa uma função de I/O bloqueante no pool de threads de I/O.
+
+    Args:
+        func: Função síncrona a executar
+        *args: Argumentos posicionais
+        **kwargs: Argumentos nomeados
+
+    Returns:
+        Resultado da função
+    """
+    loop = asyncio.get_running_loop()
+    return await loop.run_in_executor(get_io_thread_pool(), functools.partial(func, *args, **kwargs))
+
+
+def shutdown_io_thread_pool(wait: bool = True) -> None:
+    """
+    Encerra o pool de threads de I/O (idempotente).
+
+    Args:
+        wait: Aguarda as escritas em andamento terminarem
+    """
+    global _io_executor, _io_executor_pid
+
+    with _lock:
+        executor, pid = _io_executor, _io_executor_pid
+        _io_executor = None
+        _io_executor_pid = None
+
+    if executor is not None and pid == os.getpid():
+        executor.shutdown(wait=wait)
@@ -1,12 +1,12 @@
 from fastapi import FastAPI, HTTPException
 from fastapi.middleware.cors import CORSMiddleware
-from fastapi.middleware.gzip import GZipMiddleware # Import GZipMiddleware
 from sqlalchemy.exc import SQLAlchemyError
 from pydantic import ValidationError
 
 from app.middleware.exception_middleware import ExceptionMiddleware, RequestMiddleware
 from app.middleware.logging_middleware import LoggingMiddleware, AuditMiddleware
 from app.middleware.security_middleware import SecurityMiddleware
+from app.middleware.compression_middleware import SelectiveGZipMiddleware
 from app.exceptions.base_exceptions import AppException
 from app.exceptions.http_exceptions import (
     HTTPExceptionHandler,
@@ -16,6 +16,7 @@ from app.exceptions.http_exceptions import (
 )
 from app.core.logging import setup_logging, get_logger
 from app.core.config import settings
+from app.core.executors import shutdown_io_thread_pool, shutdown_process_pool
 
 # Configurar logging antes de criar a aplicação
 setup_logging()
@@ -46,8 +47,8 @@ app.add_middleware(SecurityMiddleware)
 # 5. Request middleware (headers padrão)
 app.add_middleware(RequestMiddleware)
 
-# 6. GZip Compression (Otimização)
-app.add_middleware(GZipMiddleware, minimum_size=1000)
+# 6. GZip Compression (Otimização), exceto downloads de PDF (já comprimidos)
+app.add_middleware(SelectiveGZipMiddleware, minimum_size=1000)
 
 # CORS Configuration - Dinâmico baseado em configurações
 app.add_middleware(
@@ -57,6 +58,7 @@ app.add_middleware(
     allow_methods=settings.get_cors_methods(),
     allow_headers=settings.get_cors_headers(),
     max_age=settings.CORS_MAX_AGE,
+    expose_headers=["X-Next-Cursor"],
 )
 
 # Registrar handlers de exceção específicos
@@ -105,3 +107,7 @@ async def shutdown_event():
         "Shutting down application",
         extra={"event_type": "application_shutdown"}
     )
+    from app.services.storage.s3 import close_s3_session
+    await close_s3_session()
+    shutdown_process_pool()
+    shutdown_io_thread_pool()
@@ -7,6 +7,7 @@ tratamento de exceções, segurança e outras funcionalidades.
 
 from .exception_middleware import ExceptionMiddleware, RequestMiddleware
 from .security_middleware import SecurityMiddleware, CORSSecurityMiddleware, RateLimiter
+from .compression_middleware import SelectiveGZipMiddleware
 
 __all__ = [
     "ExceptionMiddleware",
@@ -14,4 +15,5 @@ __all__ = [
     "SecurityMiddleware",
     "CORSSecurityMiddleware",
     "RateLimiter",
+    "SelectiveGZipMiddleware",
 ]
\ No newline at end of file
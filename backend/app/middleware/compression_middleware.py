@@ -0,0 +1,33 @@
+"""
+Middleware de compressão GZip que não recomprime downloads de PDF.
+"""
+
+from typing import Tuple
+from starlette.middleware.gzip import GZipMiddleware
+from starlette.types import ASGIApp, Receive, Scope, Send
+
+
+class SelectiveGZipMiddleware:
+    """
+    GZip para as respostas da API, exceto rotas de download de PDF.
+
+    PDFs já são comprimidos: recomprimir gasta CPU e impede sendfile/Range nos
+    downloads. A exclusão é por caminho, sem depender do ``exclude_content_types``
+    do GZipMiddleware (só existe em versões recentes do Starlette).
+    """
+
+    def __init__(
+        self,
+        app: ASGIApp,
+        minimum_size: int = 500,
+        excluded_path_suffixes: Tuple[str, ...] = ("/pdf",)
+    ):
+        self.app = app
+        self.gzip = GZipMiddleware(app, minimum_size=minimum_size)
+        self.excluded_path_suffixes = excluded_path_suffixes
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        if scope["type"] == "http" and scope["path"].rstrip("/").endswith(self.excluded_path_suffixes):
+            await self.app(scope, receive, send)
+            return
+        await self.gzip(scope, receive, send)
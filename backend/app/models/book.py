@@ -1,4 +1,4 @@
-from sqlalchemy import Column, Integer, String, ForeignKey, Text, DateTime, CheckConstraint, Index
+from sqlalchemy import Column, Integer, String, ForeignKey, Text, DateTime, CheckConstraint, Index, JSON
 from sqlalchemy.orm import relationship, validates
 from sqlalchemy.sql import func
 from sqlalchemy.ext.hybrid import hybrid_property
@@ -9,7 +9,7 @@ from app.exceptions.base_exceptions import (
     ErrorCode
 )
 import enum
-from typing import List, Optional
+from typing import Dict, List, Optional
 import re
 
 class BookStatus(str, enum.Enum):
@@ -20,6 +20,15 @@ class BookStatus(str, enum.Enum):
     FAILED = "failed"
 
 
+# Transições de status válidas (origem -> destinos)
+VALID_STATUS_TRANSITIONS = {
+    BookStatus.DRAFT: [BookStatus.PROCESSING, BookStatus.FAILED],
+    BookStatus.PROCESSING: [BookStatus.COMPLETED, BookStatus.FAILED, BookStatus.DRAFT],
+    BookStatus.COMPLETED: [BookStatus.PROCESSING],  # Reprocessar se necessário
+    BookStatus.FAILED: [BookStatus.DRAFT, BookStatus.PROCESSING]
+}
+
+
 class BookStyle(str, enum.Enum):
     """Estilos disponíveis para livros de colorir."""
     CARTOON = "cartoon"
@@ -28,6 +37,13 @@ class BookStyle(str, enum.Enum):
     CLASSIC = "classic"
 
 
+class CheckpointStage(str, enum.Enum):
+    """Etapas da geração do livro que podem ser retomadas."""
+    STORY = "story"
+    PAGES = "pages"
+    PAGE_IMAGE = "page_image"
+
+
 class Book(Base):
     """
     Modelo de livro com validações de negócio baseadas no PRD.
@@ -48,7 +64,8 @@ class Book(Base):
     style = Column(String(20), nullable=False)
     status = Column(String(20), default=BookStatus.DRAFT)
     cover_image = Column(String)
-    pdf_file = Column(String)
+    pdf_file = Column(String)  # PDF de impressão
+    pdf_preview_file = Column(String)  # PDF de pré-visualização (baixa resolução)
     user_id = Column(Integer, ForeignKey("users.id"), nullable=False)
     created_at = Column(DateTime(timezone=True), server_default=func.now())
     updated_at = Column(DateTime(timezone=True), onupdate=func.now())
@@ -77,6 +94,14 @@ class Book(Base):
         ),
         Index('idx_user_status', 'user_id', 'status'),
         Index('idx_created_status', 'created_at', 'status'),
+        # Paginação por cursor: filtros seguidos de (created_at, id)
+        Index('idx_book_user_created', 'user_id', 'created_at', 'id'),
+        Index('idx_book_user_status_created', 'user_id', 'status', 'created_at', 'id'),
+        Index('idx_book_status_created', 'status', 'created_at', 'id'),
+        Index('idx_book_style_created', 'style', 'created_at', 'id'),
+        # Busca por trigramas (pg_trgm); o GIN da busca textual (expressão) fica na migration
+        Index('idx_book_title_trgm', 'title', postgresql_using='gin',
+              postgresql_ops={'title': 'gin_trgm_ops'}),
     )
 
     @validates('title')
@@ -257,15 +282,7 @@ class Book(Base):
         Returns:
             True se transição for válida
         """
-        # Definir transições válidas
-        valid_transitions = {
-            BookStatus.DRAFT: [BookStatus.PROCESSING, BookStatus.FAILED],
-            BookStatus.PROCESSING: [BookStatus.COMPLETED, BookStatus.FAILED, BookStatus.DRAFT],
-            BookStatus.COMPLETED: [BookStatus.PROCESSING],  # Reprocessar se necessário
-            BookStatus.FAILED: [BookStatus.DRAFT, BookStatus.PROCESSING]
-        }
-        
-        return new in valid_transitions.get(current, [])
+        return new in VALID_STATUS_TRANSITIONS.get(current, [])
 
     def _get_allowed_transitions(self, current_status: str) -> List[str]:
         """
@@ -277,14 +294,26 @@ class Book(Base):
         Returns:
             Lista de status permitidos
         """
-        valid_transitions = {
-            BookStatus.DRAFT: [BookStatus.PROCESSING, BookStatus.FAILED],
-            BookStatus.PROCESSING: [BookStatus.COMPLETED, BookStatus.FAILED, BookStatus.DRAFT],
-            BookStatus.COMPLETED: [BookStatus.PROCESSING],
-            BookStatus.FAILED: [BookStatus.DRAFT, BookStatus.PROCESSING]
-        }
+        return VALID_STATUS_TRANSITIONS.get(current_status, [])
+
+    @classmethod
+    def statuses_allowing(cls, new_status: str) -> List[str]:
+        """
+        Status a partir dos quais a transição para ``new_status`` é válida.
+        
+        Usado para validar a transição na própria cláusula WHERE de um
+        UPDATE, sem carregar o livro antes.
         
-        return valid_transitions.get(current_status, [])
+        Args:
+            new_status: Status desejado
+            
+        Returns:
+            Lista de status de origem permitidos
+        """
+        return [
+            current.value for current, allowed in VALID_STATUS_TRANSITIONS.items()
+            if new_status in allowed
+        ]
 
     @hybrid_property
     def is_editable(self) -> bool:
@@ -326,6 +355,16 @@ class Book(Base):
         """
         return self.status == BookStatus.COMPLETED and len(self.pages) == self.pages_count
 
+    @property
+    def pdf_variants(self) -> Dict[str, Optional[str]]:
+        """
+        PDFs gerados do livro por variante.
+        
+        Returns:
+            Dict com os caminhos de "preview" e "print" (None se ainda não gerado)
+        """
+        return {"preview": self.pdf_preview_file, "print": self.pdf_file}
+
     def validate_business_rules(self) -> None:
         """
         Valida todas as regras de negócio do livro.
@@ -539,10 +578,10 @@ class Page(Base):
         if not image_url:
             return None
         
-        # Validação básica de URL
-        if not re.match(r'^https?://.+', image_url):
+        # Validação básica de URL (absoluta ou caminho servido pelo storage local, ex: /uploads/...)
+        if not re.match(r'^(https?://.+|/[^/].*)', image_url):
             raise ValidationError(
-                message="URL da imagem deve começar com http:// ou https://",
+                message="URL da imagem deve começar com http://, https:// ou /",
                 field="image_url",
                 value=image_url
             )
@@ -589,3 +628,44 @@ class Page(Base):
 
     def __repr__(self) -> str:
         return f"<Page(id={self.id}, book_id={self.book_id}, page_number={self.page_number})>"
+
+
+class BookGenerationCheckpoint(Base):
+    """
+    Checkpoint de uma etapa da geração do livro.
+    
+    Cada tentativa de geração (``attempt``) grava a saída das etapas já
+    concluídas: o texto da história, as páginas parseadas e a URL de cada
+    imagem enviada ao storage. Retries e o endpoint de retomada leem esses
+    registros para pular etapas e páginas já pagas ao provider de IA.
+    
+    Etapas do livro inteiro usam ``page_number = 0``.
+    """
+    __tablename__ = "book_generation_checkpoints"
+
+    id = Column(Integer, primary_key=True, index=True)
+    book_id = Column(Integer, ForeignKey("books.id", ondelete="CASCADE"), nullable=False)
+    attempt = Column(Integer, nullable=False)
+    stage = Column(String(20), nullable=False)
+    page_number = Column(Integer, nullable=False, default=0)
+    payload = Column(JSON, nullable=False)
+    created_at = Column(DateTime(timezone=True), server_default=func.now())
+    updated_at = Column(DateTime(timezone=True), onupdate=func.now())
+
+    __table_args__ = (
+        CheckConstraint(
+            "stage IN ('story', 'pages', 'page_image')",
+            name='valid_checkpoint_stage'
+        ),
+        CheckConstraint(
+            'attempt > 0',
+            name='checkpoint_attempt_positive'
+        ),
+        Index('idx_checkpoint_unique', 'book_id', 'attempt', 'stage', 'page_number', unique=True),
+    )
+
+    def __repr__(self) -> str:
+        return (
+            f"<BookGenerationCheckpoint(book_id={self.book_id}, attempt={self.attempt}, "
+            f"stage='{self.stage}', page_number={self.page_number})>"
+        )
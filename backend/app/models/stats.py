@@ -0,0 +1,41 @@
+from sqlalchemy import Column, Integer, String
+from app.core.database import Base
+
+# Linhas dos totais de todos os usuários (nenhum usuário tem ID 0)
+GLOBAL_STATS_USER_ID = 0
+
+
+class StatsDimension:
+    """Dimensões contadas em book_stats."""
+    TOTAL = "total"
+    STATUS = "status"
+    STYLE = "style"
+
+
+class BookStats(Base):
+    """
+    Contadores de livros por usuário.
+
+    Uma linha por (usuário, dimensão, valor): ``('total', '')``,
+    ``('status', <status>)`` e ``('style', <estilo>)``. Triggers por comando
+    criados pela migration add_book_stats aplicam as variações de cada
+    INSERT, UPDATE ou DELETE em ``books`` na mesma transação, inclusive nos
+    caminhos em lote (executemany e COPY), em ordem de chave. Ler as
+    estatísticas de um usuário é uma busca pela chave primária.
+
+    Os totais globais ficam nas linhas de ``GLOBAL_STATS_USER_ID``, que os
+    triggers não tocam (receberiam todas as escritas em books e enfileirariam
+    os escritores): a task rollup_book_stats as recalcula a partir das linhas
+    dos usuários a cada BOOK_STATS_ROLLUP_SECONDS. Ler os totais globais
+    também é uma busca pela chave primária. Livros sem status entram só no
+    total.
+    """
+    __tablename__ = "book_stats"
+
+    user_id = Column(Integer, primary_key=True)
+    dimension = Column(String(10), primary_key=True)
+    value = Column(String(20), primary_key=True)
+    count = Column(Integer, nullable=False, default=0, server_default="0")
+
+    def __repr__(self) -> str:
+        return f"<BookStats(user_id={self.user_id}, {self.dimension}={self.value!r}, count={self.count})>"
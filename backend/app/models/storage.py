@@ -0,0 +1,34 @@
+from sqlalchemy import Column, Integer, BigInteger, String, DateTime, CheckConstraint, Index
+from sqlalchemy.sql import func
+from app.core.database import Base
+
+
+class StorageBlob(Base):
+    """
+    Arquivo do storage endereçado por conteúdo (nome = hash SHA-256).
+    
+    ``refcount`` conta quantas colunas apontam para a URL do blob
+    (``Page.image_url``, ``Book.pdf_file``, ``Book.pdf_preview_file``,
+    ``Book.cover_image``). Conteúdos idênticos compartilham o mesmo blob; o
+    GC remove blobs sem referências há mais de STORAGE_GC_GRACE_HOURS.
+    """
+    __tablename__ = "storage_blobs"
+
+    id = Column(Integer, primary_key=True, index=True)
+    digest = Column(String(64), nullable=False)
+    url = Column(String, nullable=False)
+    size = Column(BigInteger, nullable=True)
+    content_type = Column(String(100), nullable=True)
+    refcount = Column(Integer, nullable=False, default=0, server_default="0")
+    created_at = Column(DateTime(timezone=True), server_default=func.now())
+    # Último upload/acquire/release: o período de carência do GC conta a partir daqui
+    updated_at = Column(DateTime(timezone=True), server_default=func.now(), onupdate=func.now())
+
+    __table_args__ = (
+        CheckConstraint('refcount >= 0', name='blob_refcount_non_negative'),
+        Index('idx_storage_blob_url', 'url', unique=True),
+        Index('idx_storage_blob_gc', 'refcount', 'updated_at'),
+    )
+
+    def __repr__(self) -> str:
+        return f"<StorageBlob(id={self.id}, digest={self.digest[:12]}, refcount={self.refcount})>"
@@ -73,6 +73,12 @@ class User(Base):
         Index('idx_email_status', 'email', 'status'),
         Index('idx_role_active', 'role', 'is_active'),
         Index('idx_created_at', 'created_at'),
+        Index('idx_user_created', 'created_at', 'id'),  # Paginação por cursor
+        # Busca por trigramas (pg_trgm)
+        Index('idx_user_full_name_trgm', 'full_name', postgresql_using='gin',
+              postgresql_ops={'full_name': 'gin_trgm_ops'}),
+        Index('idx_user_email_trgm', 'email', postgresql_using='gin',
+              postgresql_ops={'email': 'gin_trgm_ops'}),
     )
 
     @validates('email')
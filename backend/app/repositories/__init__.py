@@ -8,9 +8,15 @@ o acesso aos dados e facilitar testes unitários.
 from .base_repository import BaseRepository
 from .user_repository import UserRepository
 from .book_repository import BookRepository
+from .page_repository import PageRepository
+from .checkpoint_repository import GenerationCheckpointRepository
+from .stats_repository import BookStatsRepository
 
 __all__ = [
     "BaseRepository",
     "UserRepository", 
     "BookRepository",
+    "PageRepository",
+    "GenerationCheckpointRepository",
+    "BookStatsRepository",
 ]
\ No newline at end of file
@@ -2,15 +2,86 @@
 Repository base genérico com operações CRUD usando SQLAlchemy async.
 """
 
-from typing import TypeVar, Generic, Type, Optional, List, Any, Dict
-from sqlalchemy import select, update, delete, func
+import base64
+import binascii
+import json
+from datetime import datetime
+from typing import TypeVar, Generic, Type, Optional, List, Any, Dict, NamedTuple, Tuple, Iterable, Sequence, Union
+from sqlalchemy import select, insert, update, delete, func, tuple_, inspect as sa_inspect
+from sqlalchemy.dialects.postgresql import insert as pg_insert
 from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy.orm import selectinload
+from app.core.config import settings
 from app.core.database import Base
 
 ModelType = TypeVar("ModelType", bound=Base)
 
 
+class InvalidCursorError(ValueError):
+    """Cursor de paginação malformado ou adulterado."""
+
+
+class CursorPage(NamedTuple):
+    """Página de uma listagem por cursor."""
+    items: List[Any]
+    next_cursor: Optional[str]
+
+
+def encode_cursor(created_at: datetime, id: int) -> str:
+    """
+    Codifica a posição (created_at, id) do último item em um token opaco.
+    
+    Args:
+        created_at: Data de criação do último item da página
+        id: ID do último item da página
+        
+    Returns:
+        Token base64 url-safe
+    """
+    raw = json.dumps([created_at.isoformat(), id], separators=(",", ":")).encode("utf-8")
+    return base64.urlsafe_b64encode(raw).decode("ascii").rstrip("=")
+
+
+def decode_cursor(cursor: str) -> Tuple[datetime, int]:
+    """
+    Decodifica um token gerado por encode_cursor.
+    
+    Args:
+        cursor: Token recebido do cliente
+        
+    Returns:
+        Tupla (created_at, id)
+        
+    Raises:
+        InvalidCursorError: Se o token não for válido
+    """
+    try:
+        raw = base64.urlsafe_b64decode(cursor + "=" * (-len(cursor) % 4))
+        created_at, id = json.loads(raw)
+        if not isinstance(id, int) or isinstance(id, bool):
+            raise TypeError(id)
+        return datetime.fromisoformat(created_at), id
+    except (binascii.Error, UnicodeDecodeError, TypeError, ValueError) as e:
+        raise InvalidCursorError("Cursor de paginação inválido") from e
+
+
+def uses_postgres(db) -> bool:
+    """
+    Verifica se a sessão está ligada a um PostgreSQL.
+    
+    Recursos próprios do PostgreSQL (busca textual, GROUPING SETS, contadores
+    mantidos por trigger) têm um fallback para os demais bancos (SQLite nos testes).
+    
+    Args:
+        db: Sessão do banco
+        
+    Returns:
+        True para PostgreSQL
+    """
+    bind = getattr(db, "bind", None)
+    return bind is not None and bind.dialect.name == "postgresql"
+
+
 class BaseRepository(Generic[ModelType]):
     """Repository base com operações CRUD genéricas."""
     
@@ -68,6 +139,45 @@ class BaseRepository(Generic[ModelType]):
         result = await self.db.execute(query)
         return list(result.scalars().all())
     
+    async def get_page(
+        self,
+        *conditions,
+        limit: int = 100,
+        cursor: Optional[str] = None
+    ) -> CursorPage:
+        """
+        Busca uma página por keyset (cursor), mais recentes primeiro.
+        
+        A posição é buscada em (created_at, id), sem OFFSET: o custo de uma
+        página não cresce com a profundidade quando existe um índice
+        terminando em (created_at, id) após as colunas filtradas.
+        
+        Args:
+            *conditions: Filtros SQLAlchemy aplicados à consulta
+            limit: Limite de registros por página
+            cursor: next_cursor da página anterior (None = primeira página)
+            
+        Returns:
+            CursorPage com os itens e o cursor da próxima página (None no fim)
+            
+        Raises:
+            InvalidCursorError: Se o cursor não for válido
+        """
+        created_at_column, id_column = self.model.created_at, self.model.id
+        query = select(self.model).where(*conditions)
+        if cursor:
+            created_at, last_id = decode_cursor(cursor)
+            query = query.where(tuple_(created_at_column, id_column) < tuple_(created_at, last_id))
+        # Um registro a mais indica se existe próxima página
+        query = query.order_by(created_at_column.desc(), id_column.desc()).limit(limit + 1)
+        
+        result = await self.db.execute(query)
+        items = list(result.scalars().all())
+        if len(items) <= limit:
+            return CursorPage(items, None)
+        last = items[limit - 1]
+        return CursorPage(items[:limit], encode_cursor(last.created_at, last.id))
+    
     async def create(self, **kwargs) -> ModelType:
         """
         Cria um novo registro.
@@ -80,14 +190,77 @@ class BaseRepository(Generic[ModelType]):
         """
         instance = self.model(**kwargs)
         self.db.add(instance)
+        # O flush já emite INSERT ... RETURNING com a PK e os defaults do
+        # servidor (eager_defaults do mapper): não há refresh depois
         await self.db.flush()
-        await self.db.refresh(instance)
         return instance
     
+    def _validated_values(self, values: Dict[str, Any]) -> Optional[Dict[str, Any]]:
+        """
+        Valores de colunas após as validações do modelo (@validates).
+        
+        As validações rodam ao atribuir atributos, então uma instância
+        transitória (fora da sessão) aplica validações e normalizações sem
+        carregar o registro. Validações que dependem do estado atual (ex.:
+        transições de status) ficam em _update_conditions.
+        
+        Returns:
+            Dict com os valores validados, ou None se algum campo não for uma
+            coluna (relacionamentos/propriedades usam o caminho com SELECT)
+        """
+        known = {key: value for key, value in values.items() if hasattr(self.model, key)}
+        columns = {attr.key for attr in sa_inspect(self.model).column_attrs}
+        if not known.keys() <= columns:
+            return None
+        probe = self.model(**known)
+        return {key: getattr(probe, key) for key in known}
+    
+    def _update_conditions(self, values: Dict[str, Any]) -> List[Any]:
+        """
+        Condições extras do UPDATE direto, para validações que dependem do
+        valor atual da linha (sobrescrito pelos repositories específicos).
+        """
+        return []
+    
     async def update(self, id: int, **kwargs) -> Optional[ModelType]:
         """
         Atualiza um registro por ID.
         
+        Caminho rápido: um único UPDATE ... RETURNING hidrata a instância (a
+        do identity map, se já carregada). Quando o UPDATE não afeta linhas
+        por causa de uma condição de _update_conditions, o caminho com
+        SELECT é usado para reportar o erro de validação do modelo.
+        
+        Args:
+            id: ID do registro
+            **kwargs: Dados para atualização
+            
+        Returns:
+            Instância atualizada ou None se não encontrado
+        """
+        values = self._validated_values(kwargs)
+        if values is None:
+            return await self._update_loaded(id, **kwargs)
+        if not values:
+            return await self.get(id)
+        
+        conditions = self._update_conditions(values)
+        result = await self.db.execute(
+            update(self.model)
+            .where(self.model.id == id, *conditions)
+            .values(**values)
+            .returning(self.model),
+            execution_options={"populate_existing": True, "synchronize_session": False}
+        )
+        instance = result.scalar_one_or_none()
+        if instance is None and conditions:
+            return await self._update_loaded(id, **kwargs)
+        return instance
+    
+    async def _update_loaded(self, id: int, **kwargs) -> Optional[ModelType]:
+        """
+        Atualiza carregando o registro antes (SELECT, atribuição e flush).
+        
         Args:
             id: ID do registro
             **kwargs: Dados para atualização
@@ -109,6 +282,168 @@ class BaseRepository(Generic[ModelType]):
         await self.db.refresh(instance)
         return instance
     
+    def _validated_rows(self, rows: Iterable[Dict[str, Any]]) -> List[Dict[str, Any]]:
+        """
+        Linhas de uma operação em lote após as validações de coluna do modelo.
+        
+        Raises:
+            ValueError: Se alguma linha tiver campos que não são colunas
+        """
+        validated = []
+        for row in rows:
+            values = self._validated_values(row)
+            if values is None:
+                raise ValueError(f"Operações em lote aceitam apenas colunas de {self.model.__name__}")
+            validated.append(values)
+        return validated
+    
+    async def bulk_create(
+        self,
+        rows: Sequence[Dict[str, Any]],
+        returning: bool = False
+    ) -> Union[int, List[ModelType]]:
+        """
+        Insere vários registros de uma vez.
+        
+        Usa executemany com VALUES de múltiplas linhas (insertmanyvalues do
+        SQLAlchemy). Lotes a partir de DB_BULK_COPY_MIN_ROWS, sem returning,
+        vão por COPY no asyncpg. As validações de coluna do modelo são
+        aplicadas a cada linha.
+        
+        Args:
+            rows: Dicts com os valores de cada registro
+            returning: Retorna as instâncias criadas (INSERT ... RETURNING)
+            
+        Returns:
+            Instâncias criadas se returning, senão o número de linhas inseridas
+        """
+        values = self._validated_rows(rows)
+        if not values:
+            return [] if returning else 0
+        
+        if returning:
+            result = await self.db.execute(insert(self.model).returning(self.model), values)
+            return list(result.scalars().all())
+        
+        if len(values) >= settings.DB_BULK_COPY_MIN_ROWS and await self._copy_rows(values):
+            return len(values)
+        await self.db.execute(insert(self.model), values)
+        return len(values)
+    
+    async def _copy_rows(self, rows: List[Dict[str, Any]]) -> bool:
+        """
+        Insere as linhas com COPY ... FROM STDIN (asyncpg), na transação da sessão.
+        
+        Returns:
+            False se o COPY não se aplica (outro driver, linhas com colunas
+            diferentes ou defaults calculados em Python); nada foi inserido
+        """
+        keys = rows[0].keys()
+        if any(row.keys() != keys for row in rows):
+            return False
+        
+        mapper = sa_inspect(self.model)
+        table = self.model.__table__
+        columns = [mapper.column_attrs[key].columns[0].name for key in keys]
+        # COPY não aplica defaults do lado do Python; os do servidor valem
+        defaults = {}
+        for column in table.columns:
+            if column.name in columns or column.default is None:
+                continue
+            if not column.default.is_scalar:
+                return False
+            defaults[column.name] = column.default.arg
+        
+        connection = await self.db.connection()
+        if connection.dialect.driver != "asyncpg":
+            return False
+        # Pendências do ORM vão antes, como em qualquer execute da sessão
+        await self.db.flush()
+        raw_connection = await connection.get_raw_connection()
+        await raw_connection.driver_connection.copy_records_to_table(
+            table.name,
+            records=[tuple(row[key] for key in keys) + tuple(defaults.values()) for row in rows],
+            columns=columns + list(defaults),
+            schema_name=table.schema
+        )
+        return True
+    
+    async def bulk_update(self, rows: Sequence[Dict[str, Any]]) -> int:
+        """
+        Atualiza vários registros pela chave primária (executemany).
+        
+        Cada dict traz o "id" e as colunas a atualizar; linhas com as mesmas
+        colunas são agrupadas em um único executemany. Só as validações de
+        coluna são aplicadas: regras que dependem do valor atual (ex.:
+        transições de status) não são verificadas.
+        
+        Args:
+            rows: Dicts com "id" e os novos valores
+            
+        Returns:
+            Número de linhas enviadas
+            
+        Raises:
+            ValueError: Se alguma linha não tiver "id"
+        """
+        if any(row.get("id") is None for row in rows):
+            raise ValueError("bulk_update exige o id de cada linha")
+        values = self._validated_rows(rows)
+        if not values:
+            return 0
+        await self.db.execute(update(self.model), values)
+        return len(values)
+    
+    async def bulk_delete_by_ids(self, ids: Iterable[int]) -> int:
+        """
+        Remove vários registros por ID, em comandos de até DB_BULK_CHUNK_SIZE IDs.
+        
+        Args:
+            ids: IDs dos registros
+            
+        Returns:
+            Número de registros removidos
+        """
+        ids = list(dict.fromkeys(ids))
+        deleted = 0
+        for start in range(0, len(ids), settings.DB_BULK_CHUNK_SIZE):
+            result = await self.db.execute(
+                delete(self.model)
+                .where(self.model.id.in_(ids[start:start + settings.DB_BULK_CHUNK_SIZE]))
+                .execution_options(synchronize_session=False)
+            )
+            deleted += result.rowcount
+        return deleted
+    
+    async def bulk_upsert(
+        self,
+        rows: Sequence[Dict[str, Any]],
+        index_elements: Sequence[Any],
+        update_columns: Sequence[str]
+    ) -> None:
+        """
+        INSERT ... ON CONFLICT DO UPDATE de várias linhas em um único comando.
+        
+        Args:
+            rows: Dicts com os valores (todas com as mesmas colunas)
+            index_elements: Colunas do índice único que identifica o conflito
+            update_columns: Colunas sobrescritas quando a linha já existe
+            
+        Raises:
+            ValueError: Se as linhas tiverem colunas diferentes
+        """
+        values = self._validated_rows(rows)
+        if not values:
+            return
+        if any(row.keys() != values[0].keys() for row in values):
+            raise ValueError("bulk_upsert exige as mesmas colunas em todas as linhas")
+        
+        stmt = pg_insert(self.model).values(values)
+        set_ = {key: stmt.excluded[key] for key in update_columns}
+        if hasattr(self.model, "updated_at") and "updated_at" not in set_:
+            set_["updated_at"] = func.now()
+        await self.db.execute(stmt.on_conflict_do_update(index_elements=index_elements, set_=set_))
+    
     async def delete(self, id: int) -> bool:
         """
         Remove um registro por ID.
@@ -0,0 +1,186 @@
+"""
+Repository para os blobs endereçados por conteúdo e seus contadores de referência.
+"""
+
+from collections import Counter
+from datetime import datetime
+from typing import Iterable, List, Optional
+from sqlalchemy import select, update, delete, func, exists, and_, literal_column
+from sqlalchemy.dialects.postgresql import insert
+from sqlalchemy.ext.asyncio import AsyncSession
+from app.models.book import Book, Page, BookGenerationCheckpoint, CheckpointStage
+from app.models.storage import StorageBlob
+from app.repositories.base_repository import BaseRepository
+
+
+def _blob_digest(url: Optional[str]) -> Optional[str]:
+    # Import tardio: app.services importa os repositories
+    from app.services.storage.content_addressed import blob_digest
+    return blob_digest(url)
+
+
+def _blob_refs(urls: Iterable[Optional[str]]) -> Counter:
+    """Conta apenas URLs endereçadas por conteúdo (URLs antigas não têm blob)."""
+    return Counter(url for url in urls if _blob_digest(url))
+
+
+class BlobRepository(BaseRepository[StorageBlob]):
+    """
+    Repository dos blobs do storage.
+
+    acquire/release devem rodar na mesma transação que grava ou remove as
+    colunas com as URLs, para o contador nunca divergir das referências.
+    """
+
+    def __init__(self, db: AsyncSession):
+        super().__init__(StorageBlob, db)
+
+    async def register(
+        self,
+        url: str,
+        digest: str,
+        size: Optional[int] = None,
+        content_type: Optional[str] = None
+    ) -> bool:
+        """
+        Registra um blob recém-enviado (refcount 0) ou renova o existente.
+
+        Renovar ``updated_at`` protege o blob do GC enquanto a referência
+        que vai usá-lo ainda não foi gravada.
+
+        Args:
+            url: URL do blob
+            digest: SHA-256 do conteúdo
+            size: Tamanho em bytes
+            content_type: Tipo MIME
+
+        Returns:
+            True se o registro foi criado agora (inclusive recriado depois de
+            coletado pelo GC): o arquivo precisa ser enviado de novo
+        """
+        stmt = insert(StorageBlob).values(
+            url=url,
+            digest=digest,
+            size=size,
+            content_type=content_type,
+            refcount=0
+        )
+        # xmax = 0 só na linha inserida (a atualizada pelo ON CONFLICT tem xmax)
+        result = await self.db.execute(
+            stmt.on_conflict_do_update(
+                index_elements=[StorageBlob.url],
+                set_={"updated_at": func.now()}
+            ).returning(literal_column("xmax = 0"))
+        )
+        return bool(result.scalar_one())
+
+    async def acquire(self, urls: Iterable[Optional[str]]) -> None:
+        """
+        Incrementa o contador de cada URL (uma vez por ocorrência).
+
+        Args:
+            urls: URLs que passaram a ser referenciadas
+        """
+        for url, count in _blob_refs(urls).items():
+            stmt = insert(StorageBlob).values(url=url, digest=_blob_digest(url), refcount=count)
+            await self.db.execute(
+                stmt.on_conflict_do_update(
+                    index_elements=[StorageBlob.url],
+                    set_={"refcount": StorageBlob.refcount + count, "updated_at": func.now()}
+                )
+            )
+
+    async def release(self, urls: Iterable[Optional[str]]) -> None:
+        """
+        Decrementa o contador de cada URL; blobs em zero ficam para o GC.
+
+        Args:
+            urls: URLs que deixaram de ser referenciadas
+        """
+        for url, count in _blob_refs(urls).items():
+            await self.db.execute(
+                update(StorageBlob)
+                .where(StorageBlob.url == url)
+                .values(
+                    refcount=func.greatest(StorageBlob.refcount - count, 0),
+                    updated_at=func.now()
+                )
+            )
+
+    async def replace(self, old_urls: Iterable[Optional[str]], new_urls: Iterable[Optional[str]]) -> None:
+        """
+        Ajusta os contadores quando um conjunto de referências é substituído.
+
+        Só a diferença é gravada: URLs presentes nos dois lados não mudam.
+
+        Args:
+            old_urls: URLs referenciadas antes
+            new_urls: URLs referenciadas depois
+        """
+        old_refs, new_refs = _blob_refs(old_urls), _blob_refs(new_urls)
+        await self.acquire((new_refs - old_refs).elements())
+        await self.release((old_refs - new_refs).elements())
+
+    async def release_book(self, book: Book) -> None:
+        """
+        Libera todas as referências de um livro (antes de removê-lo).
+
+        Args:
+            book: Livro a ser removido
+        """
+        result = await self.db.execute(select(Page.image_url).where(Page.book_id == book.id))
+        await self.release(
+            list(result.scalars().all()) + [book.pdf_file, book.pdf_preview_file, book.cover_image]
+        )
+
+    async def get_collectable(self, older_than: datetime, limit: int = 500) -> List[StorageBlob]:
+        """
+        Blobs sem referências desde antes de ``older_than``.
+
+        Imagens ainda citadas por checkpoints de geração (retomada pendente)
+        não são coletadas.
+
+        Args:
+            older_than: Fim do período de carência
+            limit: Máximo de blobs retornados
+
+        Returns:
+            Lista de blobs coletáveis, mais antigos primeiro
+        """
+        in_checkpoint = exists().where(
+            and_(
+                BookGenerationCheckpoint.stage == CheckpointStage.PAGE_IMAGE.value,
+                BookGenerationCheckpoint.payload["image_url"].as_string() == StorageBlob.url
+            )
+        )
+        result = await self.db.execute(
+            select(StorageBlob)
+            .where(
+                StorageBlob.refcount == 0,
+                StorageBlob.updated_at < older_than,
+                ~in_checkpoint
+            )
+            .order_by(StorageBlob.updated_at)
+            .limit(limit)
+        )
+        return list(result.scalars().all())
+
+    async def claim_unreferenced(self, blob_id: int, older_than: datetime) -> bool:
+        """
+        Remove o registro do blob se ele continua sem referências.
+
+        Args:
+            blob_id: ID do blob
+            older_than: Fim do período de carência
+
+        Returns:
+            True se o registro foi removido (o arquivo pode ser apagado)
+        """
+        result = await self.db.execute(
+            delete(StorageBlob).where(
+                StorageBlob.id == blob_id,
+                StorageBlob.refcount == 0,
+                StorageBlob.updated_at < older_than
+            )
+        )
+        return result.rowcount == 1
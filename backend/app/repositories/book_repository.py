@@ -3,12 +3,17 @@ Repository específico para operações com livros.
 """
 
 from typing import Optional, List, Dict, Any
-from sqlalchemy import select, and_, or_, func, desc, asc
+from sqlalchemy import select, and_, or_, func, desc, asc, tuple_
 from sqlalchemy.orm import selectinload
 from sqlalchemy.ext.asyncio import AsyncSession
+from app.core.config import settings
 from app.models.book import Book
 from app.models.user import User
-from app.repositories.base_repository import BaseRepository
+from app.repositories.base_repository import BaseRepository, CursorPage, uses_postgres
+from app.repositories.search import (
+    BOOK_SEARCH_VECTOR, contains, fallback_rank, fuzzy_match, text_query
+)
+from app.repositories.stats_repository import BookStatsRepository
 
 
 class BookRepository(BaseRepository[Book]):
@@ -17,6 +22,12 @@ class BookRepository(BaseRepository[Book]):
     def __init__(self, db: AsyncSession):
         super().__init__(Book, db)
     
+    def _update_conditions(self, values: Dict[str, Any]) -> List[Any]:
+        """Transição de status validada no WHERE do UPDATE (sem SELECT antes)."""
+        if "status" not in values:
+            return []
+        return [or_(Book.status.is_(None), Book.status.in_(Book.statuses_allowing(values["status"])))]
+    
     async def get_by_user(self, user_id: int, skip: int = 0, limit: int = 100) -> List[Book]:
         """
         Busca livros de um usuário específico.
@@ -34,10 +45,63 @@ class BookRepository(BaseRepository[Book]):
             .where(Book.user_id == user_id)
             .offset(skip)
             .limit(limit)
-            .order_by(Book.created_at.desc())
+            # Mesma ordem da paginação por cursor (get_page_by_user)
+            .order_by(Book.created_at.desc(), Book.id.desc())
         )
         return list(result.scalars().all())
     
+    async def get_page_by_user(
+        self,
+        user_id: int,
+        limit: int = 100,
+        cursor: Optional[str] = None,
+        status: Optional[str] = None
+    ) -> CursorPage:
+        """
+        Página de livros de um usuário por cursor (idx_book_user_created).
+        
+        Args:
+            user_id: ID do usuário
+            limit: Limite de registros por página
+            cursor: Cursor da página anterior
+            status: Filtro por status (usa idx_book_user_status_created)
+            
+        Returns:
+            CursorPage com os livros e o próximo cursor
+        """
+        conditions = [Book.user_id == user_id]
+        if status:
+            conditions.append(Book.status == status)
+        return await self.get_page(*conditions, limit=limit, cursor=cursor)
+    
+    async def get_page_by_status(self, status: str, limit: int = 100, cursor: Optional[str] = None) -> CursorPage:
+        """
+        Página de livros por status, por cursor (idx_book_status_created).
+        
+        Args:
+            status: Status do livro
+            limit: Limite de registros por página
+            cursor: Cursor da página anterior
+            
+        Returns:
+            CursorPage com os livros e o próximo cursor
+        """
+        return await self.get_page(Book.status == status, limit=limit, cursor=cursor)
+    
+    async def get_page_by_style(self, style: str, limit: int = 100, cursor: Optional[str] = None) -> CursorPage:
+        """
+        Página de livros por estilo, por cursor (idx_book_style_created).
+        
+        Args:
+            style: Estilo do livro
+            limit: Limite de registros por página
+            cursor: Cursor da página anterior
+            
+        Returns:
+            CursorPage com os livros e o próximo cursor
+        """
+        return await self.get_page(Book.style == style, limit=limit, cursor=cursor)
+    
     async def get_by_status(self, status: str, skip: int = 0, limit: int = 100) -> List[Book]:
         """
         Busca livros por status.
@@ -87,7 +151,11 @@ class BookRepository(BaseRepository[Book]):
         limit: int = 50
     ) -> List[Book]:
         """
-        Busca livros por título ou descrição.
+        Busca livros por título ou descrição, ordenados por relevância.
+        
+        No PostgreSQL usa a busca textual (índice GIN da expressão, título com
+        peso maior que a descrição) e trigramas no título para termos
+        parciais ou com erros de digitação; nos demais bancos, LIKE.
         
         Args:
             search_term: Termo de busca
@@ -95,16 +163,21 @@ class BookRepository(BaseRepository[Book]):
             limit: Limite de resultados
             
         Returns:
-            Lista de livros que correspondem ao termo
+            Lista de livros que correspondem ao termo, mais relevantes primeiro
         """
-        search_pattern = f"%{search_term.lower()}%"
-        
-        conditions = [
-            or_(
-                Book.title.ilike(search_pattern),
-                Book.description.ilike(search_pattern)
+        if uses_postgres(self.db):
+            query = text_query(search_term)
+            match = or_(
+                BOOK_SEARCH_VECTOR.op("@@")(query),
+                fuzzy_match(Book.title, search_term),
+                contains(Book.title, search_term)
             )
-        ]
+            rank = func.ts_rank_cd(BOOK_SEARCH_VECTOR, query) + func.word_similarity(search_term, Book.title)
+        else:
+            match = or_(contains(Book.title, search_term), contains(Book.description, search_term))
+            rank = fallback_rank(search_term, [(Book.title, 2), (Book.description, 1)])
+        
+        conditions = [match]
         
         if user_id:
             conditions.append(Book.user_id == user_id)
@@ -112,8 +185,8 @@ class BookRepository(BaseRepository[Book]):
         result = await self.db.execute(
             select(Book)
             .where(and_(*conditions))
+            .order_by(rank.desc(), Book.id.desc())
             .limit(limit)
-            .order_by(Book.title)
         )
         return list(result.scalars().all())
     
@@ -134,11 +207,29 @@ class BookRepository(BaseRepository[Book]):
         )
         return result.scalar_one_or_none()
     
+    async def get_with_pages(self, book_id: int) -> Optional[Book]:
+        """
+        Busca livro com as páginas carregadas.
+        
+        Args:
+            book_id: ID do livro
+            
+        Returns:
+            Livro com páginas ou None
+        """
+        result = await self.db.execute(
+            select(Book)
+            .options(selectinload(Book.pages))
+            .where(Book.id == book_id)
+        )
+        return result.scalar_one_or_none()
+    
     async def get_completed_books(
         self, 
         user_id: Optional[int] = None,
         skip: int = 0, 
-        limit: int = 100
+        limit: int = 100,
+        with_pages: bool = False
     ) -> List[Book]:
         """
         Busca livros completos (com PDF gerado).
@@ -147,6 +238,7 @@ class BookRepository(BaseRepository[Book]):
             user_id: ID do usuário (opcional)
             skip: Número de registros para pular
             limit: Limite de registros por página
+            with_pages: Carrega também as páginas (uma consulta extra por lote)
             
         Returns:
             Lista de livros completos
@@ -159,19 +251,26 @@ class BookRepository(BaseRepository[Book]):
         if user_id:
             conditions.append(Book.user_id == user_id)
         
-        result = await self.db.execute(
+        query = (
             select(Book)
             .where(and_(*conditions))
             .offset(skip)
             .limit(limit)
-            .order_by(Book.updated_at.desc())
+            # id desempata updated_at para a paginação ser estável
+            .order_by(Book.updated_at.desc(), Book.id.desc())
         )
+        if with_pages:
+            query = query.options(selectinload(Book.pages))
+        
+        result = await self.db.execute(query)
         return list(result.scalars().all())
     
     async def update_status(self, book_id: int, status: str) -> Optional[Book]:
         """
         Atualiza apenas o status do livro.
         
+        Um único UPDATE ... RETURNING, com a transição validada no WHERE.
+        
         Args:
             book_id: ID do livro
             status: Novo status
@@ -185,53 +284,69 @@ class BookRepository(BaseRepository[Book]):
         """
         Retorna estatísticas dos livros.
         
+        No PostgreSQL lê os contadores de book_stats (mantidos por trigger),
+        sem varrer books; com BOOK_STATS_COUNTERS desligado ou em outros
+        bancos, agrega books com compute_books_stats.
+        
         Args:
             user_id: ID do usuário (opcional, para stats específicas)
             
         Returns:
             Dict com estatísticas: total, por status, por estilo, etc
         """
-        from sqlalchemy import case
-        
-        conditions = []
-        if user_id:
-            conditions.append(Book.user_id == user_id)
-        
-        base_query = select(Book.id)
-        if conditions:
-            base_query = base_query.where(and_(*conditions))
-        
-        # Estatísticas por status
-        status_query = select(
-            Book.status,
-            func.count(Book.id).label('count')
-        ).group_by(Book.status)
-        
-        if conditions:
-            status_query = status_query.where(and_(*conditions))
-        
-        # Estatísticas por estilo  
-        style_query = select(
-            Book.style,
-            func.count(Book.id).label('count')
-        ).group_by(Book.style)
+        if settings.BOOK_STATS_COUNTERS and uses_postgres(self.db):
+            return await BookStatsRepository(self.db).get_stats(user_id)
+        return await self.compute_books_stats(user_id)
+    
+    async def compute_books_stats(self, user_id: Optional[int] = None) -> Dict[str, Any]:
+        """
+        Calcula as estatísticas agregando books em uma única consulta.
         
-        if conditions:
-            style_query = style_query.where(and_(*conditions))
+        No PostgreSQL usa GROUPING SETS ((), (status), (style)): total, por
+        status e por estilo saem da mesma varredura. Nos demais bancos agrupa
+        por (status, style) e soma os grupos em Python.
         
-        # Executar queries
-        total_result = await self.db.execute(
-            select(func.count()).select_from(base_query.subquery())
-        )
+        Args:
+            user_id: ID do usuário (opcional, para stats específicas)
+            
+        Returns:
+            Dict com estatísticas: total, por status, por estilo
+        """
+        grouping_sets = uses_postgres(self.db)
+        if grouping_sets:
+            # grouping(): bit 2 = status agregado, bit 1 = estilo agregado
+            query = select(
+                func.grouping(Book.status, Book.style).label('grouping'),
+                Book.status,
+                Book.style,
+                func.count(Book.id).label('count')
+            ).group_by(func.grouping_sets(tuple_(), Book.status, Book.style))
+        else:
+            query = select(
+                Book.status,
+                Book.style,
+                func.count(Book.id).label('count')
+            ).group_by(Book.status, Book.style)
         
-        status_result = await self.db.execute(status_query)
-        style_result = await self.db.execute(style_query)
+        if user_id:
+            query = query.where(Book.user_id == user_id)
         
-        # Processar resultados
-        total = total_result.scalar_one()
+        result = await self.db.execute(query)
         
-        status_stats = {row.status: row.count for row in status_result.fetchall()}
-        style_stats = {row.style: row.count for row in style_result.fetchall()}
+        total = 0
+        status_stats: Dict[Any, int] = {}
+        style_stats: Dict[Any, int] = {}
+        for row in result.all():
+            if not grouping_sets:
+                total += row.count
+                status_stats[row.status] = status_stats.get(row.status, 0) + row.count
+                style_stats[row.style] = style_stats.get(row.style, 0) + row.count
+            elif row.grouping == 3:
+                total = row.count
+            elif row.grouping == 1:
+                status_stats[row.status] = row.count
+            else:
+                style_stats[row.style] = row.count
         
         return {
             'total': total,
@@ -0,0 +1,175 @@
+"""
+Repository para checkpoints da geração de livros.
+"""
+
+from typing import Optional, Dict, Any
+from sqlalchemy import select, delete, func
+from sqlalchemy.ext.asyncio import AsyncSession
+from app.models.book import BookGenerationCheckpoint, CheckpointStage
+from app.repositories.base_repository import BaseRepository
+
+
+class GenerationCheckpointRepository(BaseRepository[BookGenerationCheckpoint]):
+    """Repository para gravar e retomar etapas da geração de livros."""
+
+    def __init__(self, db: AsyncSession):
+        super().__init__(BookGenerationCheckpoint, db)
+
+    async def get_latest_attempt(self, book_id: int) -> int:
+        """
+        Retorna a última tentativa de geração com checkpoints.
+
+        Args:
+            book_id: ID do livro
+
+        Returns:
+            Número da última tentativa ou 0 se não houver checkpoints
+        """
+        result = await self.db.execute(
+            select(func.max(BookGenerationCheckpoint.attempt))
+            .where(BookGenerationCheckpoint.book_id == book_id)
+        )
+        return result.scalar_one_or_none() or 0
+
+    async def get_checkpoint(
+        self,
+        book_id: int,
+        attempt: int,
+        stage: CheckpointStage,
+        page_number: int = 0
+    ) -> Optional[BookGenerationCheckpoint]:
+        """
+        Busca o checkpoint de uma etapa.
+
+        Args:
+            book_id: ID do livro
+            attempt: Tentativa de geração
+            stage: Etapa da geração
+            page_number: Página (0 para etapas do livro inteiro)
+
+        Returns:
+            Checkpoint ou None se a etapa ainda não foi concluída
+        """
+        result = await self.db.execute(
+            select(BookGenerationCheckpoint).where(
+                BookGenerationCheckpoint.book_id == book_id,
+                BookGenerationCheckpoint.attempt == attempt,
+                BookGenerationCheckpoint.stage == stage.value,
+                BookGenerationCheckpoint.page_number == page_number
+            )
+        )
+        return result.scalar_one_or_none()
+
+    async def get_payload(
+        self,
+        book_id: int,
+        attempt: int,
+        stage: CheckpointStage,
+        page_number: int = 0
+    ) -> Optional[Any]:
+        """
+        Retorna a saída gravada de uma etapa.
+
+        Args:
+            book_id: ID do livro
+            attempt: Tentativa de geração
+            stage: Etapa da geração
+            page_number: Página (0 para etapas do livro inteiro)
+
+        Returns:
+            Payload da etapa ou None se não houver checkpoint
+        """
+        checkpoint = await self.get_checkpoint(book_id, attempt, stage, page_number)
+        return checkpoint.payload if checkpoint else None
+
+    async def save_payload(
+        self,
+        book_id: int,
+        attempt: int,
+        stage: CheckpointStage,
+        payload: Any,
+        page_number: int = 0
+    ) -> BookGenerationCheckpoint:
+        """
+        Grava (ou substitui) a saída de uma etapa.
+
+        Args:
+            book_id: ID do livro
+            attempt: Tentativa de geração
+            stage: Etapa da geração
+            payload: Saída serializável em JSON
+            page_number: Página (0 para etapas do livro inteiro)
+
+        Returns:
+            Checkpoint gravado
+        """
+        checkpoint = await self.get_checkpoint(book_id, attempt, stage, page_number)
+        if checkpoint:
+            return await self.update(checkpoint.id, payload=payload)
+
+        return await self.create(
+            book_id=book_id,
+            attempt=attempt,
+            stage=stage.value,
+            page_number=page_number,
+            payload=payload
+        )
+
+    async def get_page_images(self, book_id: int, attempt: int) -> Dict[int, Dict[str, Any]]:
+        """
+        Retorna as imagens de página já enviadas ao storage na tentativa.
+
+        Args:
+            book_id: ID do livro
+            attempt: Tentativa de geração
+
+        Returns:
+            Dict page_number -> {"image_url", "image_prompt"}
+        """
+        result = await self.db.execute(
+            select(BookGenerationCheckpoint).where(
+                BookGenerationCheckpoint.book_id == book_id,
+                BookGenerationCheckpoint.attempt == attempt,
+                BookGenerationCheckpoint.stage == CheckpointStage.PAGE_IMAGE.value
+            )
+        )
+        return {
+            checkpoint.page_number: checkpoint.payload
+            for checkpoint in result.scalars().all()
+        }
+
+    async def delete_page_images(self, book_id: int, attempt: int) -> int:
+        """
+        Remove as imagens de página da tentativa (ex.: história gerada novamente).
+
+        Args:
+            book_id: ID do livro
+            attempt: Tentativa de geração
+
+        Returns:
+            Número de checkpoints removidos
+        """
+        result = await self.db.execute(
+            delete(BookGenerationCheckpoint).where(
+                BookGenerationCheckpoint.book_id == book_id,
+                BookGenerationCheckpoint.attempt == attempt,
+                BookGenerationCheckpoint.stage == CheckpointStage.PAGE_IMAGE.value
+            )
+        )
+        return result.rowcount
+
+    async def delete_by_book(self, book_id: int) -> int:
+        """
+        Remove todos os checkpoints do livro (após geração concluída).
+
+        Args:
+            book_id: ID do livro
+
+        Returns:
+            Número de checkpoints removidos
+        """
+        result = await self.db.execute(
+            delete(BookGenerationCheckpoint)
+            .where(BookGenerationCheckpoint.book_id == book_id)
+        )
+        return result.rowcount
@@ -0,0 +1,75 @@
+"""
+Repository para as páginas dos livros.
+"""
+
+from typing import Any, Dict, Iterable, Optional, Sequence
+from sqlalchemy import select, delete
+from sqlalchemy.ext.asyncio import AsyncSession
+from app.models.book import Page
+from app.repositories.base_repository import BaseRepository
+
+# Colunas sobrescritas quando a página já existe
+PAGE_CONTENT_COLUMNS = ("text_content", "image_prompt", "image_url")
+
+
+class PageRepository(BaseRepository[Page]):
+    """Repository para gravar as páginas geradas de um livro."""
+
+    def __init__(self, db: AsyncSession):
+        super().__init__(Page, db)
+
+    async def get_image_urls(self, book_id: int) -> Dict[int, Optional[str]]:
+        """
+        URLs das imagens das páginas atuais do livro.
+
+        Args:
+            book_id: ID do livro
+
+        Returns:
+            Dict número da página -> URL da imagem
+        """
+        result = await self.db.execute(
+            select(Page.page_number, Page.image_url).where(Page.book_id == book_id)
+        )
+        return dict(result.all())
+
+    async def upsert_pages(self, book_id: int, pages: Sequence[Dict[str, Any]]) -> None:
+        """
+        Grava as páginas do livro em um único INSERT ... ON CONFLICT.
+
+        O conflito é resolvido pelo índice único idx_book_page_unique
+        (book_id, page_number): páginas existentes têm o conteúdo substituído.
+
+        Args:
+            book_id: ID do livro
+            pages: Dicts com page_number, text_content, image_prompt e image_url
+        """
+        rows = [
+            {"book_id": book_id, "page_number": page["page_number"], **{
+                column: page.get(column) for column in PAGE_CONTENT_COLUMNS
+            }}
+            for page in pages
+        ]
+        await self.bulk_upsert(
+            rows,
+            index_elements=[Page.book_id, Page.page_number],
+            update_columns=PAGE_CONTENT_COLUMNS
+        )
+
+    async def delete_pages(self, book_id: int, page_numbers: Iterable[int]) -> int:
+        """
+        Remove páginas do livro pelo número.
+
+        Args:
+            book_id: ID do livro
+            page_numbers: Números das páginas
+
+        Returns:
+            Número de páginas removidas
+        """
+        result = await self.db.execute(
+            delete(Page)
+            .where(Page.book_id == book_id, Page.page_number.in_(list(page_numbers)))
+            .execution_options(synchronize_session=False)
+        )
+        return result.rowcount
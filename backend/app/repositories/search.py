@@ -0,0 +1,82 @@
+"""
+Busca textual ranqueada usada pelos repositories.
+
+No PostgreSQL a busca usa um índice GIN sobre a expressão tsvector de título
+e descrição (configuração portuguese) e índices pg_trgm para termos parciais
+e com erros de digitação: o custo depende do número de linhas encontradas,
+não do tamanho da tabela. Em outros bancos (SQLite nos testes)
+cai em LIKE com um ranking simples calculado em SQL.
+"""
+
+from typing import Sequence, Tuple
+from sqlalchemy import case, func, literal, literal_column
+from sqlalchemy.dialects.postgresql import TSVECTOR
+from sqlalchemy.sql.elements import ColumnElement
+
+# Configuração de texto do PostgreSQL (stemming e stopwords em português)
+SEARCH_CONFIG = "portuguese"
+
+# Expressão do índice idx_book_search_vector (migration add_search_indexes),
+# título com peso A e descrição com peso B. Tem que ser idêntica à do índice e
+# com constantes no SQL, não parâmetros: só assim o planejador usa o índice,
+# inclusive nos planos genéricos de prepared statements
+BOOK_SEARCH_VECTOR = literal_column(
+    "(setweight(to_tsvector('portuguese'::regconfig, coalesce(books.title, '')), 'A') || "
+    "setweight(to_tsvector('portuguese'::regconfig, coalesce(books.description, '')), 'B'))",
+    type_=TSVECTOR
+)
+
+
+def like_pattern(term: str) -> str:
+    """
+    Padrão ``%termo%`` com curingas do usuário escapados (use escape="\\").
+
+    Args:
+        term: Termo de busca
+
+    Returns:
+        Padrão para LIKE/ILIKE
+    """
+    escaped = term.replace("\\", "\\\\").replace("%", "\\%").replace("_", "\\_")
+    return f"%{escaped}%"
+
+
+def contains(column: ColumnElement, term: str) -> ColumnElement:
+    """ILIKE '%termo%' (acelerado pelos índices pg_trgm no PostgreSQL)."""
+    return column.ilike(like_pattern(term), escape="\\")
+
+
+def fuzzy_match(column: ColumnElement, term: str) -> ColumnElement:
+    """
+    Termo parecido com alguma palavra da coluna (operador <% do pg_trgm).
+
+    Tolera erros de digitação e prefixos ("aventura" -> "Aventureiro").
+    """
+    return literal(term).op("<%")(column)
+
+
+def text_query(term: str) -> ColumnElement:
+    """tsquery do termo com a sintaxe de buscadores (aspas, OR, -palavra)."""
+    return func.websearch_to_tsquery(SEARCH_CONFIG, term)
+
+
+def fallback_rank(term: str, weighted_columns: Sequence[Tuple[ColumnElement, int]]) -> ColumnElement:
+    """
+    Ranking do fallback: peso da coluna, em dobro quando ela começa com o termo.
+
+    Args:
+        term: Termo de busca
+        weighted_columns: Pares (coluna, peso)
+
+    Returns:
+        Expressão numérica para ORDER BY ... DESC
+    """
+    prefix = like_pattern(term)[1:]
+    score = literal(0)
+    for column, weight in weighted_columns:
+        score = score + case(
+            (column.ilike(prefix, escape="\\"), 2 * weight),
+            (contains(column, term), weight),
+            else_=0
+        )
+    return score
@@ -0,0 +1,86 @@
+"""
+Repository dos contadores de livros (tabela book_stats).
+"""
+
+from typing import Any, Dict, Optional
+from sqlalchemy import select, func, literal
+from sqlalchemy.dialects.postgresql import insert
+from sqlalchemy.ext.asyncio import AsyncSession
+from app.models.stats import BookStats, StatsDimension, GLOBAL_STATS_USER_ID
+from app.repositories.base_repository import BaseRepository
+
+
+class BookStatsRepository(BaseRepository[BookStats]):
+    """
+    Leitura dos contadores de livros.
+
+    Os contadores dos usuários são mantidos pelos triggers de ``books``
+    (PostgreSQL), na mesma transação das escritas; os globais, por
+    rollup_global.
+    """
+
+    def __init__(self, db: AsyncSession):
+        super().__init__(BookStats, db)
+
+    async def get_stats(self, user_id: Optional[int] = None) -> Dict[str, Any]:
+        """
+        Estatísticas de um usuário ou globais (busca pela chave primária).
+
+        As globais vêm do último rollup_global (atrasadas em até
+        BOOK_STATS_ROLLUP_SECONDS).
+
+        Args:
+            user_id: ID do usuário (None para todos os usuários)
+
+        Returns:
+            Dict com total, by_status e by_style (valores sem livros omitidos)
+        """
+        result = await self.db.execute(
+            select(BookStats.dimension, BookStats.value, BookStats.count).where(
+                BookStats.user_id == (user_id or GLOBAL_STATS_USER_ID),
+                BookStats.count > 0
+            )
+        )
+
+        stats = {'total': 0, 'by_status': {}, 'by_style': {}}
+        for row in result.all():
+            if row.dimension == StatsDimension.TOTAL:
+                stats['total'] = row.count
+            elif row.dimension == StatsDimension.STATUS:
+                stats['by_status'][row.value] = row.count
+            elif row.dimension == StatsDimension.STYLE:
+                stats['by_style'][row.value] = row.count
+        return stats
+
+    async def rollup_global(self) -> int:
+        """
+        Recalcula os contadores globais somando os contadores dos usuários.
+
+        Um único INSERT ... ON CONFLICT, em ordem de chave; o custo depende do
+        número de usuários, fora do caminho das leituras e das escritas em books.
+
+        Returns:
+            Número de contadores globais gravados
+        """
+        totals = (
+            select(
+                literal(GLOBAL_STATS_USER_ID),
+                BookStats.dimension,
+                BookStats.value,
+                func.sum(BookStats.count)
+            )
+            .where(BookStats.user_id != GLOBAL_STATS_USER_ID)
+            .group_by(BookStats.dimension, BookStats.value)
+            .order_by(BookStats.dimension, BookStats.value)
+        )
+        stmt = insert(BookStats).from_select(
+            [BookStats.user_id, BookStats.dimension, BookStats.value, BookStats.count],
+            totals
+        )
+        result = await self.db.execute(
+            stmt.on_conflict_do_update(
+                index_elements=[BookStats.user_id, BookStats.dimension, BookStats.value],
+                set_={"count": stmt.excluded.count}
+            )
+        )
+        return result.rowcount
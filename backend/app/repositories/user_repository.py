@@ -3,10 +3,11 @@ Repository específico para operações com usuários.
 """
 
 from typing import Optional, List
-from sqlalchemy import select, and_, or_
+from sqlalchemy import select, and_, or_, func
 from sqlalchemy.ext.asyncio import AsyncSession
 from app.models.user import User
-from app.repositories.base_repository import BaseRepository
+from app.repositories.base_repository import BaseRepository, uses_postgres
+from app.repositories.search import contains, fallback_rank, fuzzy_match
 
 
 class UserRepository(BaseRepository[User]):
@@ -71,30 +72,39 @@ class UserRepository(BaseRepository[User]):
     
     async def search_by_name_or_email(self, search_term: str, limit: int = 50) -> List[User]:
         """
-        Busca usuários por nome ou email (busca parcial).
+        Busca usuários por nome ou email (busca parcial), ordenados por relevância.
+        
+        No PostgreSQL usa os índices pg_trgm (parecido com o nome, ou contido
+        no nome/email); nos demais bancos, LIKE.
         
         Args:
             search_term: Termo de busca
             limit: Limite de resultados
             
         Returns:
-            Lista de usuários que correspondem ao termo
+            Lista de usuários que correspondem ao termo, mais relevantes primeiro
         """
-        search_pattern = f"%{search_term.lower()}%"
+        match = [contains(User.email, search_term), contains(User.full_name, search_term)]
+        
+        if uses_postgres(self.db):
+            match.append(fuzzy_match(User.full_name, search_term))
+            rank = func.greatest(
+                func.word_similarity(search_term, User.full_name),
+                func.similarity(search_term, User.email)
+            )
+        else:
+            rank = fallback_rank(search_term, [(User.full_name, 2), (User.email, 1)])
         
         result = await self.db.execute(
             select(User)
             .where(
                 and_(
                     User.is_active == True,
-                    or_(
-                        User.email.ilike(search_pattern),
-                        User.full_name.ilike(search_pattern)
-                    )
+                    or_(*match)
                 )
             )
+            .order_by(rank.desc(), User.id.desc())
             .limit(limit)
-            .order_by(User.full_name)
         )
         return list(result.scalars().all())
     
@@ -38,6 +38,7 @@ class BookResponse(BookBase):
     user_id: int
     cover_image: Optional[str] = None
     pdf_file: Optional[str] = None
+    pdf_preview_file: Optional[str] = None
     created_at: datetime
     updated_at: Optional[datetime] = None
     pages: List[Page] = []
@@ -1,5 +1,6 @@
+import asyncio
 from abc import ABC, abstractmethod
-from typing import Optional, Dict, Any
+from typing import Optional, Dict, Any, AsyncIterator, List, Union
 
 class AIProvider(ABC):
     """Base class for all AI providers"""
@@ -13,6 +14,39 @@ class AIProvider(ABC):
     ) -> str:
         pass
     
+    async def generate_text_stream(
+        self,
+        prompt: str,
+        model: Optional[str] = None,
+        **kwargs
+    ) -> AsyncIterator[str]:
+        """Streams the generated text in chunks. Default: a single chunk with the full text."""
+        yield await self.generate_text(prompt, model=model, **kwargs)
+    
+    async def generate_text_batch(
+        self,
+        prompts: List[str],
+        model: Optional[str] = None,
+        max_concurrency: int = 4,
+        return_exceptions: bool = False,
+        **kwargs
+    ) -> List[Union[str, Exception]]:
+        """
+        Generates one response per prompt, in the same order.
+        Default: bounded-concurrency fan-out over generate_text; providers that can
+        answer several prompts in one call override it.
+        """
+        semaphore = asyncio.Semaphore(max_concurrency)
+        
+        async def _generate(prompt: str) -> str:
+            async with semaphore:
+                return await self.generate_text(prompt, model=model, **kwargs)
+        
+        return list(await asyncio.gather(
+            *(_generate(prompt) for prompt in prompts),
+            return_exceptions=return_exceptions
+        ))
+    
     @abstractmethod
     async def generate_image(
         self,
@@ -0,0 +1,31 @@
+import json
+import re
+from typing import List, Optional
+
+# Fenced code block around the JSON array ("```json ... ```")
+_CODE_FENCE_RE = re.compile(r"^```(?:json)?\s*|\s*```$", re.IGNORECASE)
+
+
+def pack_prompts(prompts: List[str]) -> str:
+    """Packs several prompts into a single request that answers with a JSON array"""
+    sections = "\n\n".join(f"### Solicitação {idx}\n{prompt}" for idx, prompt in enumerate(prompts, start=1))
+    return (
+        f"Responda a cada uma das {len(prompts)} solicitações abaixo de forma independente.\n"
+        f"Devolva somente um array JSON com exatamente {len(prompts)} strings, "
+        f"uma resposta por solicitação, na mesma ordem, sem nenhum texto fora do array.\n\n"
+        f"{sections}"
+    )
+
+
+def unpack_responses(text: str, expected: int) -> Optional[List[str]]:
+    """Parses the JSON array of a packed request; None when it is malformed"""
+    cleaned = _CODE_FENCE_RE.sub("", text.strip())
+    try:
+        responses = json.loads(cleaned)
+    except (TypeError, ValueError):
+        return None
+    if not isinstance(responses, list) or len(responses) != expected:
+        return None
+    if not all(isinstance(response, str) for response in responses):
+        return None
+    return responses
@@ -0,0 +1,387 @@
+import asyncio
+import hashlib
+import json
+import logging
+import time
+from collections import Counter, OrderedDict
+from typing import Optional, Dict, Any, AsyncIterator, List, Tuple, Union
+from app.services.ai.base import AIProvider
+from app.core.config import settings
+
+logger = logging.getLogger(__name__)
+
+CacheValue = Union[str, bytes]
+
+METRICS_KEY = "ai_cache:metrics"
+METRIC_FIELDS = ("l1_hits", "l2_hits", "misses", "bypassed", "stores", "l1_evictions", "errors")
+
+
+class LRUCache:
+    """In-process LRU bounded by entry count and total size, with per-entry TTL"""
+
+    def __init__(self, max_entries: int, max_bytes: int):
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self.current_bytes = 0
+        self.evictions = 0
+        self._entries: OrderedDict[str, Tuple[CacheValue, float, int]] = OrderedDict()
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    @staticmethod
+    def _sizeof(value: CacheValue) -> int:
+        return len(value.encode("utf-8")) if isinstance(value, str) else len(value)
+
+    def get(self, key: str) -> Optional[CacheValue]:
+        entry = self._entries.get(key)
+        if entry is None:
+            return None
+        value, expires_at, _ = entry
+        if expires_at <= time.monotonic():
+            self._remove(key)
+            return None
+        self._entries.move_to_end(key)
+        return value
+
+    def set(self, key: str, value: CacheValue, ttl: int) -> bool:
+        """Stores the value; returns False when it is larger than the whole cache"""
+        size = self._sizeof(value)
+        if size > self.max_bytes or self.max_entries <= 0:
+            return False
+        if key in self._entries:
+            self._remove(key)
+
+        self._entries[key] = (value, time.monotonic() + ttl, size)
+        self.current_bytes += size
+
+        while len(self._entries) > self.max_entries or self.current_bytes > self.max_bytes:
+            oldest_key = next(iter(self._entries))
+            self._remove(oldest_key)
+            self.evictions += 1
+        return True
+
+    def _remove(self, key: str) -> None:
+        _, _, size = self._entries.pop(key)
+        self.current_bytes -= size
+
+    def clear(self) -> None:
+        self._entries.clear()
+        self.current_bytes = 0
+
+
+class AICacheMetrics:
+    """
+    Hit/miss counters for the AI cache (per process).
+
+    Increments are counted in memory and added to the shared Redis hash in the
+    background, at most once per ``flush_interval``: a lookup never waits on Redis
+    just to be counted.
+    """
+
+    def __init__(self, flush_interval: Optional[float] = None):
+        self.counters: Dict[str, int] = {field: 0 for field in METRIC_FIELDS}
+        self.pending: Counter = Counter()
+        self.flush_interval = (
+            settings.AI_CACHE_METRICS_FLUSH_SECONDS if flush_interval is None else flush_interval
+        )
+        self._last_flush = time.monotonic()
+        self._flushing: Optional[asyncio.Task] = None
+
+    def incr(self, field: str, amount: int = 1) -> None:
+        self.counters[field] += amount
+        self.pending[field] += amount
+
+    def snapshot(self) -> Dict[str, Any]:
+        return _with_hit_rate(dict(self.counters))
+
+    def schedule_flush(self, redis_client) -> None:
+        """Starts a background flush when the interval has elapsed (fire-and-forget)"""
+        if not self.pending or time.monotonic() - self._last_flush < self.flush_interval:
+            return
+        loop = asyncio.get_running_loop()
+        if self._flushing is not None and not self._flushing.done() and self._flushing.get_loop() is loop:
+            return
+        self._last_flush = time.monotonic()
+        self._flushing = loop.create_task(self.flush(redis_client))
+
+    async def flush(self, redis_client) -> None:
+        """Adds the pending increments to the shared hash; kept for the next flush on failure"""
+        pending, self.pending = self.pending, Counter()
+        self._last_flush = time.monotonic()
+        for field, amount in pending.items():
+            try:
+                await redis_client.hincrby(METRICS_KEY, field, amount)
+            except Exception as e:
+                logger.debug(f"AI cache metrics flush failed: {e}")
+                self.pending[field] += amount
+
+
+def _with_hit_rate(counters: Dict[str, int]) -> Dict[str, Any]:
+    lookups = counters.get("l1_hits", 0) + counters.get("l2_hits", 0) + counters.get("misses", 0)
+    hits = counters.get("l1_hits", 0) + counters.get("l2_hits", 0)
+    counters["hit_rate"] = round(hits / lookups, 4) if lookups else 0.0
+    return counters
+
+
+# Counters of every CachedAIProvider in this process
+ai_cache_metrics = AICacheMetrics()
+
+
+class CachedAIProvider(AIProvider):
+    """
+    Content-addressed cache around any AIProvider.
+
+    Responses are keyed by a hash of provider, operation, model, prompt, style and
+    extra parameters. Lookups go to the in-process LRU (L1) and then to Redis (L2);
+    Redis failures are logged and treated as misses. Pass ``cache=False`` to a call
+    to skip the cache when a fresh (non-deterministic) response is required.
+    """
+
+    def __init__(
+        self,
+        provider: AIProvider,
+        provider_name: str,
+        redis_client=None,
+        l1: Optional[LRUCache] = None,
+        text_ttl: Optional[int] = None,
+        image_ttl: Optional[int] = None,
+        metrics: Optional[AICacheMetrics] = None,
+        key_prefix: str = "ai_cache"
+    ):
+        self.provider = provider
+        self.provider_name = provider_name
+        self.redis = redis_client
+        self.l1 = l1 or LRUCache(
+            max_entries=settings.AI_CACHE_L1_MAX_ENTRIES,
+            max_bytes=settings.AI_CACHE_L1_MAX_MB * 1024 * 1024
+        )
+        self.text_ttl = text_ttl or settings.AI_CACHE_TTL_SECONDS
+        self.image_ttl = image_ttl or settings.AI_CACHE_IMAGE_TTL_SECONDS
+        self.metrics = metrics or ai_cache_metrics
+        self.key_prefix = key_prefix
+
+    def __getattr__(self, name: str):
+        # Expose the wrapped provider's attributes (e.g. text_model_name)
+        if name == "provider":
+            raise AttributeError(name)
+        return getattr(self.provider, name)
+
+    def make_key(
+        self,
+        kind: str,
+        prompt: str,
+        model: Optional[str] = None,
+        style: Optional[str] = None,
+        params: Optional[Dict[str, Any]] = None
+    ) -> str:
+        payload = json.dumps(
+            {
+                "provider": self.provider_name,
+                "kind": kind,
+                "model": model,
+                "prompt": prompt,
+                "style": style,
+                "params": params or {}
+            },
+            sort_keys=True,
+            ensure_ascii=False,
+            default=str
+        )
+        digest = hashlib.sha256(payload.encode("utf-8")).hexdigest()
+        return f"{self.key_prefix}:{kind}:{digest}"
+
+    def _record(self, field: str) -> None:
+        self.metrics.incr(field)
+        if self.redis is not None:
+            self.metrics.schedule_flush(self.redis)
+
+    async def _get(self, key: str, kind: str) -> Optional[CacheValue]:
+        value = self.l1.get(key)
+        if value is not None:
+            self._record("l1_hits")
+            return value
+
+        if self.redis is not None:
+            try:
+                raw = await self.redis.get(key)
+            except Exception as e:
+                logger.warning(f"AI cache L2 read failed: {e}")
+                self._record("errors")
+                raw = None
+            if raw is not None:
+                value = raw.decode("utf-8") if kind == "text" else bytes(raw)
+                self._set_l1(key, value, self._ttl(kind))
+                self._record("l2_hits")
+                return value
+
+        self._record("misses")
+        return None
+
+    async def _set(self, key: str, kind: str, value: CacheValue) -> None:
+        ttl = self._ttl(kind)
+        self._set_l1(key, value, ttl)
+        if self.redis is not None:
+            try:
+                data = value.encode("utf-8") if isinstance(value, str) else value
+                await self.redis.set(key, data, ex=ttl)
+            except Exception as e:
+                logger.warning(f"AI cache L2 write failed: {e}")
+                self._record("errors")
+        self._record("stores")
+
+    def _set_l1(self, key: str, value: CacheValue, ttl: int) -> None:
+        evictions = self.l1.evictions
+        self.l1.set(key, value, ttl)
+        if self.l1.evictions > evictions:
+            self.metrics.incr("l1_evictions", self.l1.evictions - evictions)
+
+    def _ttl(self, kind: str) -> int:
+        return self.image_ttl if kind == "image" else self.text_ttl
+
+    async def generate_text(
+        self,
+        prompt: str,
+        model: Optional[str] = None,
+        cache: bool = True,
+        **kwargs
+    ) -> str:
+        if not cache:
+            self._record("bypassed")
+            return await self.provider.generate_text(prompt, model=model, **kwargs)
+
+        key = self.make_key("text", prompt, model=model, params=kwargs)
+        cached = await self._get(key, "text")
+        if cached is not None:
+            return cached
+
+        text = await self.provider.generate_text(prompt, model=model, **kwargs)
+        await self._set(key, "text", text)
+        return text
+
+    async def generate_text_batch(
+        self,
+        prompts: List[str],
+        model: Optional[str] = None,
+        cache: bool = True,
+        return_exceptions: bool = False,
+        **kwargs
+    ) -> List[Union[str, Exception]]:
+        if not cache:
+            self._record("bypassed")
+            return await self.provider.generate_text_batch(
+                prompts, model=model, return_exceptions=return_exceptions, **kwargs
+            )
+
+        # Same keys as generate_text; only the misses go upstream, in one batch
+        params = {key: value for key, value in kwargs.items() if key != "max_concurrency"}
+        keys = [self.make_key("text", prompt, model=model, params=params) for prompt in prompts]
+        results: List[Optional[Union[str, Exception]]] = [await self._get(key, "text") for key in keys]
+        missing = [idx for idx, result in enumerate(results) if result is None]
+
+        if missing:
+            responses = await self.provider.generate_text_batch(
+                [prompts[idx] for idx in missing], model=model, return_exceptions=True, **kwargs
+            )
+            for idx, response in zip(missing, responses):
+                results[idx] = response
+                if not isinstance(response, Exception):
+                    await self._set(keys[idx], "text", response)
+
+        if not return_exceptions:
+            for result in results:
+                if isinstance(result, Exception):
+                    raise result
+        return results
+
+    async def generate_text_stream(
+        self,
+        prompt: str,
+        model: Optional[str] = None,
+        cache: bool = True,
+        **kwargs
+    ) -> AsyncIterator[str]:
+        if not cache:
+            self._record("bypassed")
+            async for chunk in self.provider.generate_text_stream(prompt, model=model, **kwargs):
+                yield chunk
+            return
+
+        # Same key as generate_text: a streamed story can be served to either API
+        key = self.make_key("text", prompt, model=model, params=kwargs)
+        cached = await self._get(key, "text")
+        if cached is not None:
+            yield cached
+            return
+
+        chunks = []
+        async for chunk in self.provider.generate_text_stream(prompt, model=model, **kwargs):
+            chunks.append(chunk)
+            yield chunk
+        await self._set(key, "text", "".join(chunks))
+
+    async def generate_image(
+        self,
+        description: str,
+        style: str,
+        model: Optional[str] = None,
+        cache: bool = True,
+        **kwargs
+    ) -> bytes:
+        if not cache:
+            self._record("bypassed")
+            return await self.provider.generate_image(description, style, model=model, **kwargs)
+
+        key = self.make_key("image", description, model=model, style=style, params=kwargs)
+        cached = await self._get(key, "image")
+        if cached is not None:
+            return cached
+
+        image = await self.provider.generate_image(description, style, model=model, **kwargs)
+        await self._set(key, "image", image)
+        return image
+
+
+def create_cache_redis_client():
+    """Redis client for the L2 tier (binary values), or None when disabled"""
+    if not settings.AI_CACHE_REDIS_ENABLED:
+        return None
+    try:
+        import redis.asyncio as redis
+        return redis.from_url(settings.REDIS_URL)
+    except Exception as e:
+        logger.warning(f"AI cache L2 disabled, Redis unavailable: {e}")
+        return None
+
+
+_cache_redis_client = None
+
+
+def get_cache_redis_client():
+    """L2 Redis client shared by every CachedAIProvider of this process (one pool)"""
+    global _cache_redis_client
+    if _cache_redis_client is None:
+        _cache_redis_client = create_cache_redis_client()
+    return _cache_redis_client
+
+
+async def get_cache_stats(redis_client=None) -> Dict[str, Any]:
+    """
+    Cache counters: this process and, when Redis is reachable, the totals of
+    every process (API and workers).
+    """
+    stats: Dict[str, Any] = {"process": ai_cache_metrics.snapshot()}
+    client = redis_client or get_cache_redis_client()
+    if client is None:
+        return stats
+    try:
+        await ai_cache_metrics.flush(client)
+        raw = await client.hgetall(METRICS_KEY)
+        totals = {
+            (field.decode() if isinstance(field, bytes) else field): int(value)
+            for field, value in raw.items()
+        }
+        stats["global"] = _with_hit_rate({field: totals.get(field, 0) for field in METRIC_FIELDS})
+    except Exception as e:
+        stats["global_error"] = str(e)
+    return stats
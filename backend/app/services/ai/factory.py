@@ -1,41 +1,74 @@
-from typing import Dict, Type, Optional
+import logging
+from typing import Dict, Type, Optional, List
 from app.services.ai.base import AIProvider
 from app.services.ai.gemini import GeminiProvider
+from app.services.ai.fake import FakeAIProvider
+from app.services.ai.router import RoutingAIProvider
+from app.services.ai.cache import CachedAIProvider, get_cache_redis_client
 from app.core.config import settings
 
+logger = logging.getLogger(__name__)
+
 class AIProviderFactory:
     """Factory to instantiate providers"""
     
     _providers: Dict[str, Type[AIProvider]] = {
         "gemini": GeminiProvider,
+        "fake": FakeAIProvider,
+        "router": RoutingAIProvider,
         # "openrouter": OpenRouterProvider, # To be implemented
     }
     
     @classmethod
-    def create(cls, provider: str = "gemini") -> AIProvider:
+    def create(cls, provider: str = "gemini", cached: Optional[bool] = None) -> AIProvider:
         if provider not in cls._providers:
             raise ValueError(f"Unknown provider: {provider}")
         
+        if provider == "router":
+            instance = cls.create_router()
+        else:
+            instance = cls._create_backend(provider)
+        
+        if cached is None:
+            cached = settings.AI_CACHE_ENABLED
+        if cached:
+            return CachedAIProvider(instance, provider_name=provider, redis_client=get_cache_redis_client())
+        return instance
+    
+    @classmethod
+    def _create_backend(cls, provider: str) -> AIProvider:
         if provider == "gemini":
             return GeminiProvider(api_key=settings.GEMINI_API_KEY)
-            
+        if provider == "fake":
+            return FakeAIProvider()
         return cls._providers[provider]()
+    
+    @classmethod
+    def create_router(cls, backends: Optional[List[str]] = None) -> RoutingAIProvider:
+        """Router over AI_ROUTER_BACKENDS (or the given backend names), in preference order"""
+        names = backends or [name.strip() for name in settings.AI_ROUTER_BACKENDS.split(",") if name.strip()]
+        unknown = [name for name in names if name not in cls._providers or name == "router"]
+        if unknown:
+            raise ValueError(f"Unknown router backends: {', '.join(unknown)}")
+        return RoutingAIProvider({name: cls._create_backend(name) for name in names})
 
 # Alias for backward compatibility with book_service.py
 class AIServiceFactory:
     """Alias for AIProviderFactory to maintain compatibility"""
     
     @staticmethod
-    def create_ai_service(provider: str = "gemini") -> Optional[AIProvider]:
-        """Create AI service instance"""
+    def create_ai_service(provider: Optional[str] = None) -> Optional[AIProvider]:
+        """Create AI service instance (AI_PROVIDER by default)"""
+        provider = provider or settings.AI_PROVIDER
         try:
             return AIProviderFactory.create(provider)
-        except Exception:
+        except Exception as e:
+            logger.error(f"Failed to create AI provider '{provider}': {e}", exc_info=True)
             return None
     
     @staticmethod
     def get_default_service() -> Optional[AIProvider]:
         """Get default AI service"""
-        if settings.GEMINI_API_KEY:
-            return AIProviderFactory.create("gemini")
+        if settings.AI_PROVIDER != "gemini" or settings.GEMINI_API_KEY:
+            return AIProviderFactory.create(settings.AI_PROVIDER)
         return None
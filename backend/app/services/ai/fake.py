@@ -0,0 +1,77 @@
+import asyncio
+import hashlib
+import io
+import random
+import re
+from typing import Optional, AsyncIterator, List, Union
+from PIL import Image
+from app.services.ai.base import AIProvider
+
+
+class FakeAIProvider(AIProvider):
+    """
+    Offline provider with configurable latency and failures.
+
+    Used to exercise routing, hedging and circuit breaking without network access,
+    and to run the generation pipeline locally (AI_PROVIDER=fake).
+    """
+
+    def __init__(
+        self,
+        name: str = "fake",
+        latency: float = 0.05,
+        jitter: float = 0.0,
+        failure_rate: float = 0.0,
+        seed: Optional[int] = None
+    ):
+        self.name = name
+        self.latency = latency
+        self.jitter = jitter
+        self.failure_rate = failure_rate
+        self.calls = 0
+        self._random = random.Random(seed)
+
+    async def _simulate(self) -> None:
+        self.calls += 1
+        delay = self.latency + (self._random.uniform(0, self.jitter) if self.jitter else 0)
+        await asyncio.sleep(delay)
+        if self.failure_rate and self._random.random() < self.failure_rate:
+            raise RuntimeError(f"{self.name}: simulated upstream failure")
+
+    def _story(self, prompt: str) -> str:
+        match = re.search(r"exatamente (\d+) páginas", prompt)
+        pages = int(match.group(1)) if match else 1
+        return "\n".join(
+            f"Página {n}: Cena {n} gerada por {self.name}." for n in range(1, pages + 1)
+        )
+
+    async def generate_text(self, prompt: str, model: Optional[str] = None, **kwargs) -> str:
+        await self._simulate()
+        return self._story(prompt)
+
+    async def generate_text_stream(self, prompt: str, model: Optional[str] = None, **kwargs) -> AsyncIterator[str]:
+        await self._simulate()
+        for line in self._story(prompt).splitlines(keepends=True):
+            await asyncio.sleep(0)
+            yield line
+
+    async def generate_text_batch(
+        self,
+        prompts: List[str],
+        model: Optional[str] = None,
+        max_concurrency: int = 4,
+        return_exceptions: bool = False,
+        **kwargs
+    ) -> List[Union[str, Exception]]:
+        # Native batching: a single simulated upstream call for all prompts
+        await self._simulate()
+        return [self._story(prompt) for prompt in prompts]
+
+    async def generate_image(self, description: str, style: str, model: Optional[str] = None, **kwargs) -> bytes:
+        await self._simulate()
+        # Solid color derived from the prompt: deterministic and cheap to encode
+        digest = hashlib.sha256(f"{style}:{description}".encode("utf-8")).digest()
+        img = Image.new("RGB", (64, 64), color=(digest[0], digest[1], digest[2]))
+        buffer = io.BytesIO()
+        img.save(buffer, format="PNG")
+        return buffer.getvalue()
@@ -1,9 +1,10 @@
 import google.generativeai as genai
-from typing import Optional
-from PIL import Image, ImageDraw, ImageFont
-import io
-import random
+import asyncio
+from typing import Optional, AsyncIterator, List, Union
 from app.services.ai.base import AIProvider
+from app.services.ai.batching import pack_prompts, unpack_responses
+from app.services.ai.placeholder import render_placeholder
+from app.core.executors import run_cpu_bound
 from app.core.config import settings
 import logging
 
@@ -12,6 +13,9 @@ logger = logging.getLogger(__name__)
 class GeminiProvider(AIProvider):
     """Specific implementation for Gemini"""
     
+    # Prompts packed into a single request by generate_text_batch
+    max_batch_size = 16
+    
     def __init__(self, api_key: str):
         genai.configure(api_key=api_key)
         # Default models
@@ -29,55 +33,70 @@ class GeminiProvider(AIProvider):
             # Fallback or re-raise
             raise e
     
+    async def generate_text_stream(self, prompt: str, model: Optional[str] = None, **kwargs) -> AsyncIterator[str]:
+        model_name = model or self.text_model_name
+        try:
+            model_instance = genai.GenerativeModel(model_name)
+            response = await model_instance.generate_content_async(prompt, stream=True)
+            async for chunk in response:
+                if chunk.text:
+                    yield chunk.text
+        except Exception as e:
+            logger.error(f"Gemini text streaming failed: {e}")
+            raise e
+    
+    async def generate_text_batch(
+        self,
+        prompts: List[str],
+        model: Optional[str] = None,
+        max_concurrency: int = 4,
+        return_exceptions: bool = False,
+        **kwargs
+    ) -> List[Union[str, Exception]]:
+        """
+        Packs up to max_batch_size prompts per request (JSON array answer).
+        Groups whose answer can't be parsed fall back to one request per prompt.
+        """
+        if len(prompts) <= 1:
+            return await super().generate_text_batch(
+                prompts, model=model, max_concurrency=max_concurrency,
+                return_exceptions=return_exceptions, **kwargs
+            )
+        
+        async def _generate_group(group: List[str]) -> List[Union[str, Exception]]:
+            try:
+                packed = await self.generate_text(pack_prompts(group), model=model, **kwargs)
+                responses = unpack_responses(packed, len(group))
+                if responses is not None:
+                    return responses
+                logger.warning(f"Gemini batch answer malformed, falling back to {len(group)} requests")
+            except Exception as e:
+                logger.warning(f"Gemini batch request failed, falling back to single requests: {e}")
+            return await super(GeminiProvider, self).generate_text_batch(
+                group, model=model, max_concurrency=max_concurrency, return_exceptions=True, **kwargs
+            )
+        
+        groups = [prompts[start:start + self.max_batch_size] for start in range(0, len(prompts), self.max_batch_size)]
+        results = [
+            response
+            for group_results in await asyncio.gather(*(_generate_group(group) for group in groups))
+            for response in group_results
+        ]
+        if not return_exceptions:
+            for response in results:
+                if isinstance(response, Exception):
+                    raise response
+        return results
+    
     async def generate_image(self, description: str, style: str, model: Optional[str] = None, **kwargs) -> bytes:
         """
         Generates a placeholder image using Pillow since Gemini Image Gen (Imagen) 
         via this SDK is not standard or might fail without Vertex AI.
         This ensures the PDF generation flow works.
+        Drawing and PNG encoding run in the media process pool, off the event loop.
         """
         try:
-            # Create a basic image
-            width, height = 1024, 1024
-            # Random background color based on style
-            colors = {
-                "cartoon": (255, 200, 200),
-                "realistic": (200, 200, 255),
-                "manga": (255, 255, 200),
-                "classic": (240, 240, 240)
-            }
-            bg_color = colors.get(style, (230, 230, 230))
-            
-            img = Image.new('RGB', (width, height), color=bg_color)
-            d = ImageDraw.Draw(img)
-            
-            # Draw some random shapes to make it look "generated"
-            for _ in range(5):
-                shape_color = (random.randint(0, 255), random.randint(0, 255), random.randint(0, 255))
-                x1 = random.randint(0, width)
-                y1 = random.randint(0, height)
-                x2 = random.randint(x1, width)
-                y2 = random.randint(y1, height)
-                d.rectangle([x1, y1, x2, y2], outline=shape_color, width=5)
-            
-            # Add text indicating it's a placeholder
-            # Trying to load a default font, otherwise default
-            try:
-                font = ImageFont.truetype("arial.ttf", 40)
-            except IOError:
-                font = ImageFont.load_default()
-                
-            text = f"AI Image Placeholder\nStyle: {style}\n{description[:30]}..."
-            
-            # Centered text (rough approximation)
-            d.text((width/2 - 100, height/2), text, fill=(0, 0, 0), font=font)
-            
-            # Save to bytes
-            img_byte_arr = io.BytesIO()
-            img.save(img_byte_arr, format='PNG')
-            img_byte_arr.seek(0)
-            
-            return img_byte_arr.getvalue()
-            
+            return await run_cpu_bound(render_placeholder, description, style)
         except Exception as e:
             logger.error(f"Image generation placeholder failed: {e}")
             raise e
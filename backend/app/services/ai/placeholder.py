@@ -0,0 +1,63 @@
+"""
+Placeholder illustrations rendered with Pillow.
+
+Runs inside the media process pool (see app.core.executors), so everything here is
+module-level and picklable. The font and the per-style background canvases are
+loaded once per process and reused across calls.
+"""
+
+import io
+import random
+from functools import lru_cache
+from typing import Optional
+from PIL import Image, ImageDraw, ImageFont
+
+WIDTH, HEIGHT = 1024, 1024
+
+STYLE_COLORS = {
+    "cartoon": (255, 200, 200),
+    "realistic": (200, 200, 255),
+    "manga": (255, 255, 200),
+    "classic": (240, 240, 240)
+}
+DEFAULT_COLOR = (230, 230, 230)
+
+
+@lru_cache(maxsize=1)
+def get_font() -> ImageFont.ImageFont:
+    """Placeholder font, falling back to Pillow's default"""
+    try:
+        return ImageFont.truetype("arial.ttf", 40)
+    except IOError:
+        return ImageFont.load_default()
+
+
+@lru_cache(maxsize=16)
+def get_canvas(style: str) -> Image.Image:
+    """Background for a style; callers must copy it before drawing"""
+    return Image.new('RGB', (WIDTH, HEIGHT), color=STYLE_COLORS.get(style, DEFAULT_COLOR))
+
+
+def render_placeholder(description: str, style: str, seed: Optional[int] = None) -> bytes:
+    """Draws the placeholder illustration and returns it PNG-encoded"""
+    rng = random.Random(seed)
+    img = get_canvas(style).copy()
+    d = ImageDraw.Draw(img)
+
+    # Draw some random shapes to make it look "generated"
+    for _ in range(5):
+        shape_color = (rng.randint(0, 255), rng.randint(0, 255), rng.randint(0, 255))
+        x1 = rng.randint(0, WIDTH)
+        y1 = rng.randint(0, HEIGHT)
+        x2 = rng.randint(x1, WIDTH)
+        y2 = rng.randint(y1, HEIGHT)
+        d.rectangle([x1, y1, x2, y2], outline=shape_color, width=5)
+
+    text = f"AI Image Placeholder\nStyle: {style}\n{description[:30]}..."
+
+    # Centered text (rough approximation)
+    d.text((WIDTH / 2 - 100, HEIGHT / 2), text, fill=(0, 0, 0), font=get_font())
+
+    img_byte_arr = io.BytesIO()
+    img.save(img_byte_arr, format='PNG')
+    return img_byte_arr.getvalue()
@@ -0,0 +1,321 @@
+import asyncio
+import logging
+import math
+import time
+from collections import deque
+from typing import Optional, Dict, Any, List, AsyncIterator, Awaitable, Callable, TypeVar, Union
+from app.services.ai.base import AIProvider
+from app.core.config import settings
+from app.exceptions.base_exceptions import ExternalServiceError
+
+logger = logging.getLogger(__name__)
+
+T = TypeVar("T")
+
+
+class LatencyStats:
+    """
+    Rolling window of latencies (successful calls) and outcomes.
+
+    Attempts cancelled after losing a hedge only tell us a lower bound on their
+    latency; they are counted apart and kept out of the percentiles.
+    """
+
+    def __init__(self, window_size: int):
+        self.latencies: deque = deque(maxlen=window_size)
+        self.outcomes: deque = deque(maxlen=window_size)
+        self.hedge_losses = 0
+
+    def record(self, latency: float, success: bool) -> None:
+        self.outcomes.append(success)
+        if success:
+            self.latencies.append(latency)
+
+    def record_cancelled(self) -> None:
+        self.hedge_losses += 1
+
+    @property
+    def samples(self) -> int:
+        return len(self.latencies)
+
+    def percentile(self, q: float) -> Optional[float]:
+        if not self.latencies:
+            return None
+        ordered = sorted(self.latencies)
+        index = max(0, math.ceil(q * len(ordered)) - 1)
+        return ordered[index]
+
+    @property
+    def error_rate(self) -> float:
+        if not self.outcomes:
+            return 0.0
+        return 1 - sum(self.outcomes) / len(self.outcomes)
+
+    def snapshot(self) -> Dict[str, Any]:
+        p50, p99 = self.percentile(0.5), self.percentile(0.99)
+        return {
+            "samples": len(self.outcomes),
+            "p50_ms": round(p50 * 1000, 2) if p50 is not None else None,
+            "p99_ms": round(p99 * 1000, 2) if p99 is not None else None,
+            "error_rate": round(self.error_rate, 4),
+            "hedge_losses": self.hedge_losses
+        }
+
+
+class CircuitBreaker:
+    """
+    Per-backend circuit: opens when the error rate over the window reaches the
+    threshold, lets traffic through again (half-open) after a cooldown, and closes
+    on the first success or reopens on the first failure.
+    """
+
+    CLOSED = "closed"
+    OPEN = "open"
+    HALF_OPEN = "half_open"
+
+    def __init__(self, failure_threshold: float, min_requests: int, window_size: int, open_seconds: float):
+        self.failure_threshold = failure_threshold
+        self.min_requests = min_requests
+        self.open_seconds = open_seconds
+        self.state = self.CLOSED
+        self.opened_at = 0.0
+        self._outcomes: deque = deque(maxlen=window_size)
+
+    def allows_request(self) -> bool:
+        if self.state == self.OPEN and time.monotonic() - self.opened_at >= self.open_seconds:
+            self.state = self.HALF_OPEN
+        return self.state != self.OPEN
+
+    def record(self, success: bool) -> None:
+        if self.state == self.HALF_OPEN:
+            if success:
+                self.state = self.CLOSED
+                self._outcomes.clear()
+            else:
+                self._open()
+            return
+
+        self._outcomes.append(success)
+        failures = self._outcomes.count(False)
+        if (
+            self.state == self.CLOSED
+            and len(self._outcomes) >= self.min_requests
+            and failures / len(self._outcomes) >= self.failure_threshold
+        ):
+            self._open()
+
+    def _open(self) -> None:
+        self.state = self.OPEN
+        self.opened_at = time.monotonic()
+        self._outcomes.clear()
+
+
+class RoutingAIProvider(AIProvider):
+    """
+    AIProvider over several backends.
+
+    Requests go to the healthy backend with the lowest rolling p50 (backends without
+    enough samples are tried first, in configured order). When the first attempt is
+    slower than the backend's hedge percentile, a second request is sent to the next
+    backend and the first response wins. Failures fall over to the next backend;
+    backends with a sustained error rate are skipped until their circuit half-opens.
+    """
+
+    def __init__(
+        self,
+        backends: Dict[str, AIProvider],
+        window_size: Optional[int] = None,
+        hedge_percentile: Optional[float] = None,
+        hedge_min_delay: Optional[float] = None,
+        hedge_max_delay: Optional[float] = None,
+        min_samples: Optional[int] = None,
+        failure_threshold: Optional[float] = None,
+        open_seconds: Optional[float] = None
+    ):
+        if not backends:
+            raise ValueError("RoutingAIProvider needs at least one backend")
+
+        window_size = window_size or settings.AI_ROUTER_WINDOW_SIZE
+        self.backends = backends
+        self.order = list(backends)
+        self.hedge_percentile = hedge_percentile or settings.AI_ROUTER_HEDGE_PERCENTILE
+        self.hedge_min_delay = (
+            hedge_min_delay if hedge_min_delay is not None else settings.AI_ROUTER_HEDGE_MIN_DELAY_MS / 1000
+        )
+        self.hedge_max_delay = (
+            hedge_max_delay if hedge_max_delay is not None else settings.AI_ROUTER_HEDGE_MAX_DELAY_MS / 1000
+        )
+        self.min_samples = min_samples or settings.AI_ROUTER_MIN_SAMPLES
+        self.stats: Dict[str, Dict[str, LatencyStats]] = {
+            name: {kind: LatencyStats(window_size) for kind in ("text", "batch", "image", "stream")}
+            for name in backends
+        }
+        self.circuits: Dict[str, CircuitBreaker] = {
+            name: CircuitBreaker(
+                failure_threshold=failure_threshold or settings.AI_ROUTER_FAILURE_THRESHOLD,
+                min_requests=self.min_samples,
+                window_size=window_size,
+                open_seconds=open_seconds if open_seconds is not None else settings.AI_ROUTER_OPEN_SECONDS
+            )
+            for name in backends
+        }
+        self.hedged_requests = 0
+
+    def candidates(self, kind: str) -> List[str]:
+        """Backends with a closed/half-open circuit, best first"""
+        def score(name: str):
+            stats = self.stats[name][kind]
+            p50 = stats.percentile(0.5) if stats.samples >= self.min_samples else 0.0
+            return (p50, self.order.index(name))
+
+        return sorted((name for name in self.order if self.circuits[name].allows_request()), key=score)
+
+    def hedge_delay(self, name: str, kind: str) -> float:
+        """How long to wait on a backend before hedging to the next one"""
+        stats = self.stats[name][kind]
+        if stats.samples < self.min_samples:
+            return self.hedge_max_delay
+        delay = stats.percentile(self.hedge_percentile)
+        return min(max(delay, self.hedge_min_delay), self.hedge_max_delay)
+
+    def _record(self, name: str, kind: str, latency: float, success: bool) -> None:
+        self.stats[name][kind].record(latency, success)
+        circuit = self.circuits[name]
+        previous_state = circuit.state
+        circuit.record(success)
+        if circuit.state != previous_state:
+            logger.warning(f"AI backend {name} circuit {previous_state} -> {circuit.state}")
+
+    async def _timed(self, name: str, kind: str, invoke: Callable[[AIProvider], Awaitable[T]]) -> T:
+        start = time.monotonic()
+        try:
+            result = await invoke(self.backends[name])
+        except asyncio.CancelledError:
+            # Loser of a hedge: neither a failure nor a latency sample
+            self.stats[name][kind].record_cancelled()
+            raise
+        except Exception:
+            self._record(name, kind, time.monotonic() - start, False)
+            raise
+        self._record(name, kind, time.monotonic() - start, True)
+        return result
+
+    async def _route(self, kind: str, invoke: Callable[[AIProvider], Awaitable[T]]) -> T:
+        remaining = self.candidates(kind)
+        if not remaining:
+            raise ExternalServiceError(
+                message="Nenhum backend de IA disponível (circuitos abertos)",
+                service="ai_router"
+            )
+
+        pending: Dict[asyncio.Task, str] = {}
+        errors: List[str] = []
+        hedged = False
+
+        def launch() -> str:
+            name = remaining.pop(0)
+            pending[asyncio.create_task(self._timed(name, kind, invoke))] = name
+            return name
+
+        primary = launch()
+        try:
+            while pending:
+                timeout = None
+                if remaining and not hedged:
+                    timeout = self.hedge_delay(primary, kind)
+
+                done, _ = await asyncio.wait(pending, timeout=timeout, return_when=asyncio.FIRST_COMPLETED)
+                if not done:
+                    hedged = True
+                    self.hedged_requests += 1
+                    logger.info(f"AI backend {primary} slow for {kind}, hedging to {remaining[0]}")
+                    launch()
+                    continue
+
+                winner = None
+                for task in done:
+                    name = pending.pop(task)
+                    if task.exception() is None:
+                        winner = winner or task
+                    else:
+                        errors.append(f"{name}: {task.exception()}")
+                if winner is not None:
+                    return winner.result()
+
+                # Failover: keep at least one request in flight while backends remain
+                if not pending and remaining:
+                    primary = launch()
+        finally:
+            for task in pending:
+                task.cancel()
+            if pending:
+                await asyncio.gather(*pending, return_exceptions=True)
+
+        raise ExternalServiceError(
+            message="Todos os backends de IA falharam",
+            service="ai_router",
+            details={"errors": errors}
+        )
+
+    async def generate_text(self, prompt: str, model: Optional[str] = None, **kwargs) -> str:
+        return await self._route(
+            "text", lambda backend: backend.generate_text(prompt, model=model, **kwargs)
+        )
+
+    async def generate_text_batch(
+        self,
+        prompts: List[str],
+        model: Optional[str] = None,
+        return_exceptions: bool = False,
+        **kwargs
+    ) -> List[Union[str, Exception]]:
+        # The whole batch is routed (and hedged) as one request
+        return await self._route(
+            "batch",
+            lambda backend: backend.generate_text_batch(
+                prompts, model=model, return_exceptions=return_exceptions, **kwargs
+            )
+        )
+
+    async def generate_image(self, description: str, style: str, model: Optional[str] = None, **kwargs) -> bytes:
+        return await self._route(
+            "image", lambda backend: backend.generate_image(description, style, model=model, **kwargs)
+        )
+
+    async def generate_text_stream(self, prompt: str, model: Optional[str] = None, **kwargs) -> AsyncIterator[str]:
+        # Streams are not hedged; a backend can only be swapped before the first chunk
+        errors: List[str] = []
+        for name in self.candidates("stream"):
+            start = time.monotonic()
+            started = False
+            try:
+                async for chunk in self.backends[name].generate_text_stream(prompt, model=model, **kwargs):
+                    started = True
+                    yield chunk
+            except Exception as e:
+                self._record(name, "stream", time.monotonic() - start, False)
+                if started:
+                    raise
+                errors.append(f"{name}: {e}")
+                continue
+            self._record(name, "stream", time.monotonic() - start, True)
+            return
+
+        raise ExternalServiceError(
+            message="Todos os backends de IA falharam",
+            service="ai_router",
+            details={"errors": errors}
+        )
+
+    def snapshot(self) -> Dict[str, Any]:
+        """Per-backend latency, error rate and circuit state"""
+        return {
+            "hedged_requests": self.hedged_requests,
+            "backends": {
+                name: {
+                    "circuit": self.circuits[name].state,
+                    **{kind: stats.snapshot() for kind, stats in self.stats[name].items()}
+                }
+                for name in self.order
+            }
+        }
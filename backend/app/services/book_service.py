@@ -7,6 +7,9 @@ from sqlalchemy.ext.asyncio import AsyncSession
 from fastapi import HTTPException, status
 from app.repositories.book_repository import BookRepository
 from app.repositories.user_repository import UserRepository
+from app.repositories.checkpoint_repository import GenerationCheckpointRepository
+from app.repositories.blob_repository import BlobRepository
+from app.repositories.base_repository import CursorPage, InvalidCursorError
 from app.models.book import Book
 from app.models.user import User
 from app.schemas.book import BookCreate, BookUpdate, BookResponse
@@ -29,6 +32,8 @@ class BookService:
         self.db = db
         self.book_repo = BookRepository(db)
         self.user_repo = UserRepository(db)
+        self.checkpoint_repo = GenerationCheckpointRepository(db)
+        self.blob_repo = BlobRepository(db)
         self.ai_service = AIServiceFactory.create_ai_service()
     
     async def create_book(self, book_data: BookCreate, current_user: User) -> Book:
@@ -88,21 +93,71 @@ class BookService:
                 detail=f"Livro não pode ser gerado no status '{book.status}'"
             )
         
+        # Nova tentativa: checkpoints de tentativas anteriores são ignorados
+        attempt = await self.checkpoint_repo.get_latest_attempt(book_id) + 1
+        
         # Atualizar status para processamento
         await self.book_repo.update_status(book_id, "processing")
         await self.db.commit()
         
         # Importação dinâmica para evitar circular import
-        from app.worker.tasks import generate_book_content
+        from app.worker.tasks import dispatch_book_generation
         
-        # Iniciar task assíncrona de geração
-        task = generate_book_content.delay(book_id, user_id, book.title)
+        # Iniciar workflow assíncrono de geração
+        task = dispatch_book_generation(book_id, current_user.id, attempt)
         
         return {
             "message": "Geração do livro iniciada",
             "task_id": task.id,
             "book_id": book_id,
-            "status": "processing"
+            "status": "processing",
+            "attempt": attempt
+        }
+    
+    async def resume_book_generation(self, book_id: int, current_user: User) -> Dict[str, Any]:
+        """
+        Retoma a geração de um livro que falhou a partir dos checkpoints.
+        
+        História, páginas e imagens já geradas na última tentativa são
+        reaproveitadas; apenas as etapas e páginas pendentes são refeitas.
+        
+        Args:
+            book_id: ID do livro
+            current_user: Usuário que está solicitando a retomada
+            
+        Returns:
+            Informações sobre a task de geração
+            
+        Raises:
+            HTTPException: Se livro não for encontrado, não pertencer ao usuário
+                ou não estiver com falha
+        """
+        # Verificar se livro existe e pertence ao usuário
+        book = await self._get_user_book(book_id, current_user.id)
+        
+        if book.status != "failed":
+            raise HTTPException(
+                status_code=status.HTTP_400_BAD_REQUEST,
+                detail=f"Apenas livros com falha podem ser retomados (status atual: '{book.status}')"
+            )
+        
+        # Reutilizar a última tentativa (ou iniciar a primeira, se não houver checkpoints)
+        attempt = await self.checkpoint_repo.get_latest_attempt(book_id) or 1
+        
+        await self.book_repo.update_status(book_id, "processing")
+        await self.db.commit()
+        
+        # Importação dinâmica para evitar circular import
+        from app.worker.tasks import dispatch_book_generation
+        
+        task = dispatch_book_generation(book_id, current_user.id, attempt)
+        
+        return {
+            "message": "Geração do livro retomada",
+            "task_id": task.id,
+            "book_id": book_id,
+            "status": "processing",
+            "attempt": attempt
         }
     
     async def get_book_generation_status(
@@ -161,12 +216,15 @@ class BookService:
                 detail="Livro deve estar completo para gerar PDF"
             )
         
-        # Iniciar task assíncrona de geração do PDF
-        task = generate_book_pdf.delay(book_id)
+        # Iniciar tasks assíncronas do PDF (preview rápido + impressão)
+        from app.worker.tasks import dispatch_book_pdfs
+        
+        tasks = dispatch_book_pdfs(book_id, current_user.id)
         
         return {
             "message": "Geração do PDF iniciada",
-            "task_id": task.id,
+            "task_id": tasks["print"].id,
+            "preview_task_id": tasks["preview"].id if "preview" in tasks else None,
             "book_id": book_id
         }
     
@@ -213,6 +271,50 @@ class BookService:
         else:
             return await self.book_repo.get_by_user(user_id, skip, limit)
     
+    async def get_user_books_page(
+        self,
+        user_id: int,
+        limit: int = 100,
+        cursor: Optional[str] = None,
+        status_filter: Optional[str] = None,
+        current_user: User = None
+    ) -> CursorPage:
+        """
+        Lista livros do usuário por cursor (keyset), mais recentes primeiro.
+        
+        Args:
+            user_id: ID do usuário
+            limit: Limite de registros por página
+            cursor: next_cursor da página anterior (None = primeira página)
+            status_filter: Filtro por status (opcional)
+            current_user: Usuário que está fazendo a requisição
+            
+        Returns:
+            CursorPage com os livros e o cursor da próxima página
+            
+        Raises:
+            HTTPException: Se não tiver permissão ou o cursor for inválido
+        """
+        if current_user.id != user_id and not self._is_admin(current_user):
+            raise HTTPException(
+                status_code=status.HTTP_403_FORBIDDEN,
+                detail="Sem permissão para ver livros deste usuário"
+            )
+        
+        if limit <= 0 or limit > 1000:
+            raise HTTPException(
+                status_code=status.HTTP_400_BAD_REQUEST,
+                detail="Parâmetros de paginação inválidos"
+            )
+        
+        try:
+            return await self.book_repo.get_page_by_user(user_id, limit, cursor, status=status_filter)
+        except InvalidCursorError:
+            raise HTTPException(
+                status_code=status.HTTP_400_BAD_REQUEST,
+                detail="Cursor de paginação inválido"
+            )
+    
     async def get_book_details(self, book_id: int, current_user: User) -> Book:
         """
         Retorna detalhes completos do livro.
@@ -323,6 +425,9 @@ class BookService:
                 detail="Não é possível remover livro em processamento"
             )
         
+        # Liberar as referências aos arquivos; o GC de storage remove os que ficarem sem uso
+        await self.blob_repo.release_book(book)
+        
         # Remover livro
         result = await self.book_repo.delete(book_id)
         await self.db.commit()
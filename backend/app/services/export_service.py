@@ -0,0 +1,160 @@
+import logging
+import os
+import re
+import zipfile
+from contextlib import aclosing
+from datetime import datetime
+from typing import AsyncIterator, Callable, List, NamedTuple, Optional, Tuple
+from app.core.config import settings
+from app.core.database import AsyncSessionLocal
+from app.models.book import Book
+from app.repositories.book_repository import BookRepository
+from app.services.storage.base import StorageProvider
+from app.services.storage.factory import StorageServiceFactory
+
+logger = logging.getLogger(__name__)
+
+# Already-compressed formats are stored as-is; deflating them only costs CPU
+STORED_EXTENSIONS = {".pdf", ".png", ".jpg", ".jpeg", ".webp", ".gif"}
+
+
+class ExportEntry(NamedTuple):
+    arcname: str
+    url: str
+    date_time: Tuple[int, int, int, int, int, int]
+
+
+class ZipStreamBuffer:
+    """
+    Write-only, non-seekable sink for zipfile.ZipFile.
+
+    zipfile detects that it cannot seek and writes each entry with a data
+    descriptor (CRC and sizes after the data), so the archive can be emitted
+    front to back. Whatever has been written since the last drain() is handed
+    out and forgotten.
+    """
+
+    def __init__(self):
+        self._chunks: List[bytes] = []
+
+    def write(self, data: bytes) -> int:
+        self._chunks.append(bytes(data))
+        return len(data)
+
+    def flush(self) -> None:
+        pass
+
+    def drain(self) -> bytes:
+        data = b"".join(self._chunks)
+        self._chunks.clear()
+        return data
+
+
+def _safe_name(title: str) -> str:
+    name = re.sub(r"[^\w\-]+", "_", title or "", flags=re.UNICODE).strip("_")
+    return name[:80] or "livro"
+
+
+def _zip_date_time(book: Book) -> Tuple[int, int, int, int, int, int]:
+    moment: Optional[datetime] = book.updated_at or book.created_at
+    if moment is None or moment.year < 1980:
+        return (1980, 1, 1, 0, 0, 0)
+    return moment.timetuple()[:6]
+
+
+def _extension(url: str, default: str) -> str:
+    ext = os.path.splitext(url.split("?", 1)[0])[1].lower()
+    return ext if ext else default
+
+
+def book_entries(book: Book, include_images: bool = False) -> List[ExportEntry]:
+    """Archive entries of one book: its PDF and, optionally, its page images"""
+    base = f"{book.id}_{_safe_name(book.title)}"
+    date_time = _zip_date_time(book)
+    entries = [ExportEntry(f"{base}.pdf", book.pdf_file, date_time)] if book.pdf_file else []
+    if include_images:
+        for page in sorted(book.pages, key=lambda page: page.page_number):
+            if page.image_url:
+                ext = _extension(page.image_url, ".png")
+                entries.append(ExportEntry(f"{base}/pagina_{page.page_number:02d}{ext}", page.image_url, date_time))
+    return entries
+
+
+class LibraryExportService:
+    """
+    Streams a ZIP with every completed book of a user.
+
+    Books are read from the database in batches and each file is copied from
+    storage into the archive chunk by chunk as the response is consumed: there
+    is no temporary file and memory use does not grow with the library (only
+    the central directory, a few dozen bytes per entry, is kept until the end).
+    """
+
+    def __init__(
+        self,
+        storage_provider: Optional[StorageProvider] = None,
+        session_factory: Callable = AsyncSessionLocal,
+        batch_size: Optional[int] = None,
+        chunk_size: Optional[int] = None
+    ):
+        self.storage = storage_provider or StorageServiceFactory.create_storage()
+        # The response outlives the request's session, so batches use their own
+        self.session_factory = session_factory
+        self.batch_size = batch_size or settings.LIBRARY_EXPORT_BATCH_SIZE
+        self.chunk_size = chunk_size or settings.LIBRARY_EXPORT_CHUNK_SIZE
+
+    async def iter_entries(self, user_id: int, include_images: bool = False) -> AsyncIterator[ExportEntry]:
+        skip = 0
+        while True:
+            async with self.session_factory() as session:
+                books = await BookRepository(session).get_completed_books(
+                    user_id=user_id,
+                    skip=skip,
+                    limit=self.batch_size,
+                    with_pages=include_images
+                )
+            for book in books:
+                for entry in book_entries(book, include_images):
+                    yield entry
+            if len(books) < self.batch_size:
+                return
+            skip += self.batch_size
+
+    async def stream_zip(self, user_id: int, include_images: bool = False) -> AsyncIterator[bytes]:
+        buffer = ZipStreamBuffer()
+        names = set()
+        archive = zipfile.ZipFile(buffer, mode="w", compression=zipfile.ZIP_DEFLATED, allowZip64=True)
+        try:
+            async for entry in self.iter_entries(user_id, include_images):
+                if entry.arcname in names:
+                    continue
+                # aclosing: an abandoned download must release the storage connection now
+                async with aclosing(self.storage.read_stream(entry.url, self.chunk_size)) as chunks:
+                    try:
+                        first = await anext(chunks)
+                    except StopAsyncIteration:
+                        first = b""
+                    except FileNotFoundError:
+                        logger.warning(f"Library export: {entry.url} not found in storage, skipping")
+                        continue
+
+                    names.add(entry.arcname)
+                    info = zipfile.ZipInfo(entry.arcname, date_time=entry.date_time)
+                    if _extension(entry.arcname, "") in STORED_EXTENSIONS:
+                        info.compress_type = zipfile.ZIP_STORED
+                    else:
+                        info.compress_type = zipfile.ZIP_DEFLATED
+                    # force_zip64: the size is unknown up front and may exceed 2 GiB
+                    with archive.open(info, mode="w", force_zip64=True) as dest:
+                        dest.write(first)
+                        async for chunk in chunks:
+                            if data := buffer.drain():
+                                yield data
+                            dest.write(chunk)
+                if data := buffer.drain():
+                    yield data
+        finally:
+            # Also on disconnect: closes the open entry and the archive
+            archive.close()
+        # Central directory
+        yield buffer.drain()
@@ -26,6 +26,23 @@ class NotificationService:
         """Set the WebSocket connection manager"""
         self.connection_manager = manager
     
+    async def send_ws_message(
+        self,
+        user_id: Optional[int],
+        message_type: str,
+        data: Dict[str, Any]
+    ):
+        """Send a raw WebSocket message (e.g. book_generation_update) to a user."""
+        if self.connection_manager and user_id is not None:
+            await self.connection_manager.send_personal_message(
+                {
+                    "type": message_type,
+                    "timestamp": datetime.now().isoformat(),
+                    "data": data
+                },
+                user_id
+            )
+
     async def _send_websocket_notification(
         self,
         user_id: int,
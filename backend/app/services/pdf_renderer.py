@@ -0,0 +1,416 @@
+"""
+Book PDF rendering with reportlab.
+
+Runs inside the media process pool (see app.core.executors): the input is a plain,
+picklable description of the book and images are read from local files, so no
+image or PDF bytes cross the process boundary. Decoded images are cached per
+renderer process by content hash, so re-rendering a book (or another book with
+the same images) skips decoding them again.
+
+Images are optimized for the selected profile before embedding: resampled to the
+profile DPI for the draw box, re-encoded as JPEG (photographic content) or Flate
+(flat artwork) and embedded once per distinct content.
+
+Every page is rendered as a one-page PDF fragment cached on disk under a hash of
+its content (text, image bytes, profile), and the book is assembled from the
+fragments; after an edit only the changed pages are rendered again.
+"""
+
+import hashlib
+import logging
+import math
+import json
+import os
+import tempfile
+import threading
+import uuid
+from collections import OrderedDict
+from typing import Any, BinaryIO, Callable, Dict, Optional, Tuple
+from PIL import Image
+from pypdf import PdfWriter
+from reportlab.lib.pagesizes import A4
+from reportlab.pdfgen import canvas
+from app.core.config import settings
+
+logger = logging.getLogger(__name__)
+
+# Box the page image is drawn into (points)
+IMAGE_BOX = (400, 300)
+
+# Part of every fragment key: bump when the page layout changes
+LAYOUT_VERSION = 1
+
+PDF_PROFILES: Dict[str, Dict[str, int]] = {
+    "screen": {"dpi": 110, "jpeg_quality": 72},
+    "print": {"dpi": 300, "jpeg_quality": 90},
+}
+
+
+class DecodedImageCache:
+    """
+    LRU of decoded PIL images keyed by content hash, bounded by pixel bytes.
+
+    Remote images reach the renderer through per-job links into the job's workdir,
+    so the path changes on every render; the content hash does not.
+    """
+
+    def __init__(self, max_bytes: int):
+        self.max_bytes = max_bytes
+        self.current_bytes = 0
+        self.hits = 0
+        self.misses = 0
+        self._lock = threading.Lock()
+        self._entries: "OrderedDict[str, Tuple[Image.Image, int]]" = OrderedDict()
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    def get(self, path: str, digest: Optional[str] = None) -> Image.Image:
+        """Decoded image of path; digest is its content hash, when the caller already has it"""
+        key = digest or file_digest(path)
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None:
+                self._entries.move_to_end(key)
+                self.hits += 1
+                return entry[0]
+            self.misses += 1
+
+        image = Image.open(path)
+        image.load()
+        size = image.width * image.height * len(image.getbands())
+
+        with self._lock:
+            if size <= self.max_bytes and key not in self._entries:
+                self._entries[key] = (image, size)
+                self.current_bytes += size
+                while self.current_bytes > self.max_bytes:
+                    _, (_, evicted_size) = self._entries.popitem(last=False)
+                    self.current_bytes -= evicted_size
+        return image
+
+    def clear(self) -> None:
+        with self._lock:
+            self._entries.clear()
+            self.current_bytes = 0
+
+
+_decoded_images: Optional[DecodedImageCache] = None
+
+
+def get_decoded_image_cache() -> DecodedImageCache:
+    """Decoded image cache of this process"""
+    global _decoded_images
+    if _decoded_images is None:
+        _decoded_images = DecodedImageCache(settings.PDF_DECODED_IMAGE_CACHE_MAX_MB * 1024 * 1024)
+    return _decoded_images
+
+
+class ImageOptimizer:
+    """
+    Prepares the page images of one document for embedding.
+
+    Each distinct image (by content hash) is resampled and encoded once and written
+    to a file named after its hash; reportlab keys image XObjects by file name, so
+    identical images end up as a single shared XObject.
+    """
+
+    def __init__(self, profile: str, workdir: str):
+        if profile not in PDF_PROFILES:
+            raise ValueError(f"Unknown PDF profile: {profile}")
+        self.profile = profile
+        self.dpi = PDF_PROFILES[profile]["dpi"]
+        self.jpeg_quality = PDF_PROFILES[profile]["jpeg_quality"]
+        self.workdir = workdir
+        self._prepared: Dict[str, str] = {}
+
+    @property
+    def unique_images(self) -> int:
+        return len(self._prepared)
+
+    def prepare(self, path: str, digest: Optional[str] = None) -> str:
+        """Returns the optimized file to draw in place of path"""
+        digest = digest or file_digest(path)
+        prepared = self._prepared.get(digest)
+        if prepared is None:
+            prepared = self._encode(get_decoded_image_cache().get(path, digest), digest)
+            self._prepared[digest] = prepared
+        return prepared
+
+    def target_size(self, size: Tuple[int, int]) -> Tuple[int, int]:
+        """Pixel size for the image at the profile DPI once fitted into IMAGE_BOX (never upscaled)"""
+        width, height = size
+        scale = min(IMAGE_BOX[0] / width, IMAGE_BOX[1] / height)
+        target = (
+            math.ceil(width * scale / 72 * self.dpi),
+            math.ceil(height * scale / 72 * self.dpi)
+        )
+        return target if target[0] < width else size
+
+    def _encode(self, image: Image.Image, digest: str) -> str:
+        image = _flatten(image)
+        target = self.target_size(image.size)
+        if target != image.size:
+            image = image.resize(target, Image.LANCZOS)
+
+        base = os.path.join(self.workdir, f"img_{digest[:32]}_{self.profile}")
+        if _is_flat(image):
+            # reportlab Flate-compresses the pixels itself; PNG is only the carrier
+            path = f"{base}.png"
+            image.save(path, format="PNG", compress_level=1)
+        else:
+            # JPEG files are embedded as-is (DCTDecode)
+            path = f"{base}.jpg"
+            image.save(path, format="JPEG", quality=self.jpeg_quality, optimize=True)
+        return path
+
+
+def file_digest(path: str) -> str:
+    """sha256 of a file's content"""
+    sha = hashlib.sha256()
+    with open(path, "rb") as f:
+        for chunk in iter(lambda: f.read(1024 * 1024), b""):
+            sha.update(chunk)
+    return sha.hexdigest()
+
+
+def _flatten(image: Image.Image) -> Image.Image:
+    """RGB/grayscale copy, with any transparency composited onto the white page"""
+    if image.mode in ("RGBA", "LA") or (image.mode == "P" and "transparency" in image.info):
+        rgba = image.convert("RGBA")
+        background = Image.new("RGB", rgba.size, (255, 255, 255))
+        background.paste(rgba, mask=rgba.getchannel("A"))
+        return background
+    if image.mode in ("RGB", "L"):
+        return image
+    return image.convert("RGB")
+
+
+def _is_flat(image: Image.Image) -> bool:
+    """Few distinct colors (drawings, placeholders): lossless compresses better than JPEG"""
+    thumbnail = image.copy()
+    thumbnail.thumbnail((64, 64))
+    return thumbnail.getcolors(maxcolors=256) is not None
+
+
+class FragmentCache:
+    """
+    One-page PDF fragments on disk, named by content key.
+
+    Writes go through a temporary file and an atomic rename, so renderer processes
+    can share the directory. Least recently used fragments are removed once the
+    directory grows past max_bytes. get/put hand out open files: another process
+    evicting a fragment only unlinks its name, and a render that already holds the
+    fragment keeps reading it until assembly.
+    """
+
+    def __init__(self, directory: str, max_bytes: int):
+        self.directory = directory
+        self.max_bytes = max_bytes
+        os.makedirs(directory, exist_ok=True)
+
+    def path_for(self, key: str) -> str:
+        return os.path.join(self.directory, f"{key}.pdf")
+
+    def get(self, key: str) -> Optional[BinaryIO]:
+        """Cached fragment opened for reading, or None; the caller closes it"""
+        path = self.path_for(key)
+        try:
+            fragment = open(path, "rb")
+        except FileNotFoundError:
+            return None
+        try:
+            os.utime(path)  # recency for eviction
+        except FileNotFoundError:
+            pass
+        return fragment
+
+    def put(self, key: str, render: Callable[[str], None]) -> BinaryIO:
+        """Renders and stores a fragment; returns it opened for reading"""
+        path = self.path_for(key)
+        partial_path = f"{path}.{uuid.uuid4().hex}.part"
+        try:
+            render(partial_path)
+            # Opened before the rename: the handle survives a concurrent eviction
+            fragment = open(partial_path, "rb")
+            os.replace(partial_path, path)
+        finally:
+            if os.path.exists(partial_path):
+                os.remove(partial_path)
+        return fragment
+
+    def evict(self, keep: Optional[set] = None) -> int:
+        """Removes least recently used fragments past max_bytes; returns how many"""
+        keep = keep or set()
+        files = []
+        total = 0
+        for entry in os.scandir(self.directory):
+            if entry.is_file() and entry.name.endswith(".pdf"):
+                stat = entry.stat()
+                files.append((stat.st_mtime, entry.path, stat.st_size))
+                total += stat.st_size
+        removed = 0
+        for _, path, size in sorted(files):
+            if total <= self.max_bytes:
+                break
+            if path in keep:
+                continue
+            try:
+                os.remove(path)
+            except FileNotFoundError:
+                pass
+            total -= size
+            removed += 1
+        return removed
+
+
+def get_fragment_cache() -> FragmentCache:
+    """Fragment cache configured for this process"""
+    return FragmentCache(
+        settings.PDF_FRAGMENT_CACHE_DIR or os.path.join(tempfile.gettempdir(), "book_pdf_fragments"),
+        settings.PDF_FRAGMENT_CACHE_MAX_MB * 1024 * 1024
+    )
+
+
+def fragment_key(kind: str, content: Dict[str, Any], profile: str) -> str:
+    """Hash of everything that affects how a page looks"""
+    payload = json.dumps(
+        {"layout": LAYOUT_VERSION, "kind": kind, "profile": profile, "content": content},
+        sort_keys=True,
+        ensure_ascii=False
+    )
+    return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+
+def _draw_title_page(c: canvas.Canvas, document: Dict[str, Any]) -> None:
+    width, height = A4
+    c.setFont("Helvetica-Bold", 24)
+    c.drawCentredString(width / 2, height / 2 + 50, document["title"])
+    c.setFont("Helvetica", 14)
+    c.drawCentredString(width / 2, height / 2, f"Theme: {document.get('theme') or 'General'}")
+    c.drawCentredString(width / 2, height / 2 - 30, f"Style: {document['style']}")
+    c.showPage()
+
+
+def _draw_content_page(c: canvas.Canvas, page: Dict[str, Any], image: Optional[str]) -> None:
+    width, height = A4
+
+    # Page Number
+    c.setFont("Helvetica", 10)
+    c.drawString(width - 50, 30, f"Page {page['page_number']}")
+
+    # Text Content
+    text_y = height - 100
+    if page.get("text"):
+        c.setFont("Helvetica", 12)
+        for line in page["text"].split('\n'):
+            chunks = [line[i:i+80] for i in range(0, len(line), 80)] if len(line) > 80 else [line]
+            for chunk in chunks:
+                c.drawCentredString(width / 2, text_y, chunk)
+                text_y -= 20
+
+    # Image Handling
+    image_drawn = False
+    if image:
+        try:
+            # Draw image centered
+            img_width = 400
+            img_height = 300
+            x = (width - img_width) / 2
+            y = height / 2 - 150
+            c.drawImage(image, x, y, width=img_width, height=img_height, preserveAspectRatio=True)
+            image_drawn = True
+        except Exception as e:
+            logger.warning(f"Failed to load image for page {page['page_number']}: {e}")
+
+    if not image_drawn:
+        # Placeholder if image failed or missing
+        c.rect(100, height / 2 - 150, width - 200, 300)
+        c.drawCentredString(width / 2, height / 2, "Image Placeholder")
+        if page.get("image_prompt"):
+            c.setFont("Helvetica-Oblique", 8)
+            c.drawCentredString(width / 2, height / 2 - 140, f"Prompt: {page['image_prompt'][:50]}...")
+
+    c.showPage()
+
+
+def _render_fragment(path: str, draw: Callable[[canvas.Canvas], None]) -> None:
+    c = canvas.Canvas(path, pagesize=A4, pageCompression=1)
+    draw(c)
+    c.save()
+
+
+def render_book_pdf(document: Dict[str, Any], output_path: str) -> Dict[str, int]:
+    """
+    Renders the book into output_path.
+
+    document: {"title", "theme", "style", "profile", "pages": [{"page_number",
+    "text", "image_path", "image_prompt"}]}. Pages whose fragment is cached are
+    not rendered again. Returns {"size", "rendered", "reused"}.
+    """
+    profile = document.get("profile") or settings.PDF_IMAGE_PROFILE
+    optimizer = ImageOptimizer(profile, os.path.dirname(output_path))
+    fragments = get_fragment_cache()
+    stats = {"rendered": 0, "reused": 0}
+    keys = []
+
+    def fragment(key: str, draw: Callable[[canvas.Canvas], None]) -> BinaryIO:
+        keys.append(key)
+        cached = fragments.get(key)
+        if cached is not None:
+            stats["reused"] += 1
+            return cached
+        stats["rendered"] += 1
+        return fragments.put(key, lambda target: _render_fragment(target, draw))
+
+    # Fragments stay open until assembled (see FragmentCache)
+    parts = []
+    try:
+        # Title Page
+        title = {key: document.get(key) for key in ("title", "theme", "style")}
+        parts.append(fragment(fragment_key("title", title, profile), lambda c: _draw_title_page(c, document)))
+
+        # Content Pages
+        for page in sorted(document["pages"], key=lambda p: p["page_number"]):
+            image_digest = None
+            if page.get("image_path"):
+                try:
+                    image_digest = file_digest(page["image_path"])
+                except OSError as e:
+                    logger.warning(f"Failed to load image for page {page['page_number']}: {e}")
+            content = {
+                "page_number": page["page_number"],
+                "text": page.get("text"),
+                "image": image_digest,
+                "image_prompt": page.get("image_prompt") if not image_digest else None
+            }
+
+            def draw(c: canvas.Canvas, page=page, image_digest=image_digest) -> None:
+                image = None
+                if image_digest:
+                    try:
+                        image = optimizer.prepare(page["image_path"], image_digest)
+                    except Exception as e:
+                        logger.warning(f"Failed to load image for page {page['page_number']}: {e}")
+                _draw_content_page(c, page, image)
+
+            parts.append(fragment(fragment_key("page", content, profile), draw))
+
+        # Assembly: identical objects (e.g. an image repeated on several pages) are merged
+        writer = PdfWriter()
+        for part in parts:
+            writer.append(part)
+        writer.add_metadata({"/Title": document["title"]})
+        writer.compress_identical_objects()
+        with open(output_path, "wb") as f:
+            writer.write(f)
+    finally:
+        for part in parts:
+            part.close()
+
+    fragments.evict(keep={fragments.path_for(key) for key in keys})
+    logger.debug(
+        f"PDF assembled from {len(parts)} fragments ({stats['rendered']} rendered, "
+        f"{stats['reused']} reused, {optimizer.unique_images} images, {profile})"
+    )
+    return {"size": os.path.getsize(output_path), **stats}
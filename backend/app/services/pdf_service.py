@@ -1,128 +1,420 @@
-from reportlab.lib.pagesizes import A4
-from reportlab.pdfgen import canvas
-from reportlab.lib.utils import ImageReader
+import asyncio
+import hashlib
+import logging
+import os
+import shutil
+import tempfile
+import uuid
+from collections import OrderedDict
+from contextlib import asynccontextmanager
 from io import BytesIO
-from typing import List
+from typing import Any, AsyncIterator, Dict, List, NamedTuple, Optional, Tuple
 import aiohttp
-import os
 from app.models.book import Book
 from app.core.config import settings
+from app.core.executors import run_cpu_bound
+from app.services.pdf_renderer import PDF_PROFILES, file_digest, render_book_pdf
+from app.services.storage.base import StorageProvider
+from app.services.storage.factory import StorageServiceFactory
+from app.worker.runtime import worker_runtime
+
+logger = logging.getLogger(__name__)
+
+
+class StoredPDF(NamedTuple):
+    """A generated PDF ready to be served (path is None for remote storage)"""
+    path: Optional[str]
+    url: str
+    size: int
+    mtime: float
+    etag: str
+
+
+# Content ETags by file identity (path, mtime, size), so each file is hashed once
+_etag_cache: OrderedDict[Tuple[str, int, int], str] = OrderedDict()
+_ETAG_CACHE_MAX_ENTRIES = 1024
+
+
+async def compute_file_etag(path: str, stat_result: Optional[os.stat_result] = None) -> str:
+    """Strong ETag derived from the file content (sha256)"""
+    stat_result = stat_result or await asyncio.to_thread(os.stat, path)
+    key = (path, stat_result.st_mtime_ns, stat_result.st_size)
+    etag = _etag_cache.get(key)
+    if etag is None:
+        etag = f'"{await asyncio.to_thread(file_digest, path)}"'
+        _etag_cache[key] = etag
+        if len(_etag_cache) > _ETAG_CACHE_MAX_ENTRIES:
+            _etag_cache.popitem(last=False)
+    else:
+        _etag_cache.move_to_end(key)
+    return etag
+
+
+class RemoteImageCache:
+    """
+    Disk cache of remote page images, shared by the PDF jobs of a worker.
+    
+    Files are named by the hash of their URL and evicted oldest-first once the
+    cache grows past max_bytes. Jobs hard-link cached files into their own work
+    directory, so an eviction never pulls an image out from under a render.
+    """
+    
+    def __init__(self, directory: str, max_bytes: int):
+        self.directory = directory
+        self.max_bytes = max_bytes
+        self.current_bytes = 0
+        self.hits = 0
+        self.misses = 0
+        self._entries: "OrderedDict[str, int]" = OrderedDict()
+        self._inflight: Dict[str, asyncio.Future] = {}
+        self._scanned = False
+    
+    def _scan(self) -> None:
+        """Indexes files left by earlier processes, oldest first"""
+        os.makedirs(self.directory, exist_ok=True)
+        files = []
+        for entry in os.scandir(self.directory):
+            if entry.is_file() and not entry.name.endswith(".part"):
+                stat = entry.stat()
+                files.append((stat.st_mtime, entry.path, stat.st_size))
+        for _, path, size in sorted(files):
+            self._entries[path] = size
+            self.current_bytes += size
+        self._scanned = True
+    
+    def path_for(self, url: str) -> str:
+        return os.path.join(self.directory, hashlib.sha256(url.encode("utf-8")).hexdigest())
+    
+    async def fetch(self, session: aiohttp.ClientSession, url: str) -> Optional[str]:
+        """
+        Returns the cached file for url, downloading it on a miss. Concurrent
+        requests for the same URL share one download.
+        """
+        if not self._scanned:
+            await asyncio.to_thread(self._scan)
+        
+        path = self.path_for(url)
+        if path in self._entries and os.path.exists(path):
+            self._entries.move_to_end(path)
+            self.hits += 1
+            return path
+        
+        inflight = self._inflight.get(path)
+        if inflight is not None:
+            return await asyncio.shield(inflight)
+        
+        future = asyncio.get_running_loop().create_future()
+        self._inflight[path] = future
+        self.misses += 1
+        try:
+            result = await self._download(session, url, path)
+        except asyncio.CancelledError:
+            future.cancel()
+            raise
+        except Exception as e:
+            future.set_exception(e)
+            future.exception()  # mark retrieved; waiters still receive it
+            raise
+        finally:
+            del self._inflight[path]
+        future.set_result(result)
+        return result
+    
+    async def _download(self, session: aiohttp.ClientSession, url: str, path: str) -> Optional[str]:
+        # Unique partial name: other worker processes may share the directory
+        partial_path = f"{path}.{uuid.uuid4().hex}.part"
+        try:
+            if not await PDFService._download_image_to_file(session, url, partial_path):
+                return None
+            os.replace(partial_path, path)
+        finally:
+            if os.path.exists(partial_path):
+                os.remove(partial_path)
+        self._add(path, os.path.getsize(path))
+        return path
+    
+    def _add(self, path: str, size: int) -> None:
+        self.current_bytes += size - self._entries.pop(path, 0)
+        self._entries[path] = size
+        while self.current_bytes > self.max_bytes and len(self._entries) > 1:
+            oldest, oldest_size = self._entries.popitem(last=False)
+            self.current_bytes -= oldest_size
+            try:
+                os.remove(oldest)
+            except FileNotFoundError:
+                pass
+
+
+_remote_image_cache: Optional[RemoteImageCache] = None
+
+
+def get_remote_image_cache() -> RemoteImageCache:
+    """Remote image cache of this process"""
+    global _remote_image_cache
+    if _remote_image_cache is None:
+        _remote_image_cache = RemoteImageCache(
+            settings.PDF_IMAGE_CACHE_DIR or os.path.join(tempfile.gettempdir(), "book_pdf_images"),
+            settings.PDF_IMAGE_CACHE_MAX_MB * 1024 * 1024
+        )
+    return _remote_image_cache
+
 
 class PDFService:
     
     @staticmethod
-    async def _fetch_image(url_or_path: str) -> BytesIO:
+    async def _download_image(session: aiohttp.ClientSession, url: str) -> BytesIO:
+        """
+        Downloads an image over HTTP using the given session.
+        """
+        async with session.get(url) as response:
+            if response.status == 200:
+                data = await response.read()
+                return BytesIO(data)
+        return None
+
+    @staticmethod
+    async def _download_image_to_file(session: aiohttp.ClientSession, url: str, path: str) -> bool:
+        """
+        Streams an image over HTTP into a local file, one chunk at a time.
+        """
+        async with session.get(url) as response:
+            if response.status != 200:
+                return False
+            out = await asyncio.to_thread(open, path, "wb")
+            try:
+                async for chunk in response.content.iter_chunked(settings.PDF_STREAM_CHUNK_SIZE):
+                    await asyncio.to_thread(out.write, chunk)
+            finally:
+                out.close()
+        return True
+
+    @staticmethod
+    def _local_image_path(url_or_path: str, storage: Optional[StorageProvider] = None) -> Optional[str]:
+        """
+        Maps a stored image URL back to the file system.
+        """
+        # The provider knows its layout (flat or sharded ab/cd/...) and finds
+        # files in either one, so URLs saved before a layout migration resolve
+        storage = storage or StorageServiceFactory.create_storage()
+        stored_path = storage.local_path(url_or_path)
+        if stored_path:
+            return os.path.abspath(stored_path)
+        
+        # Our LocalStorageProvider saves to 'frontend/public/uploads' and returns '/uploads/...'
+        # Strip leading slash if present to join correctly
+        clean_path = url_or_path.lstrip('/')
+        
+        # Try to find the file in frontend/public if it looks like a relative upload
+        potential_path = os.path.join("frontend/public", clean_path)
+        
+        # Absolute, so the renderer process does not depend on the working directory
+        if os.path.exists(potential_path):
+            return os.path.abspath(potential_path)
+        elif os.path.exists(url_or_path):
+            return os.path.abspath(url_or_path)
+        return None
+
+    @staticmethod
+    def _read_file(path: str) -> bytes:
+        with open(path, "rb") as f:
+            return f.read()
+
+    @staticmethod
+    async def _fetch_image(url_or_path: str, storage: Optional[StorageProvider] = None) -> BytesIO:
         """
         Fetches image data from a URL or local path.
         """
         if url_or_path.startswith("http"):
-            async with aiohttp.ClientSession() as session:
-                async with session.get(url_or_path) as response:
-                    if response.status == 200:
-                        data = await response.read()
-                        return BytesIO(data)
+            # Inside workers, reuse the runtime HTTP session (persistent connection pool)
+            async with PDFService._http_session() as session:
+                return await PDFService._download_image(session, url_or_path)
         else:
-            # Assume local path (relative to project root or absolute)
-            # If path starts with /, treat as absolute or relative to root
-            # Adjust based on where files are stored.
-            # Our LocalStorageProvider saves to 'frontend/public/uploads' and returns '/uploads/...'
-            # We need to map that back to the file system.
-            
-            # Strip leading slash if present to join correctly
-            clean_path = url_or_path.lstrip('/')
-            
-            # Try to find the file in frontend/public if it looks like a relative upload
-            potential_path = os.path.join("frontend/public", clean_path)
-            
-            if os.path.exists(potential_path):
-                 with open(potential_path, "rb") as f:
-                     return BytesIO(f.read())
-            elif os.path.exists(url_or_path):
-                with open(url_or_path, "rb") as f:
-                     return BytesIO(f.read())
+            local_path = PDFService._local_image_path(url_or_path, storage)
+            if local_path:
+                return BytesIO(await asyncio.to_thread(PDFService._read_file, local_path))
                      
         return None
 
     @staticmethod
-    async def generate_book_pdf(book: Book) -> str:
+    @asynccontextmanager
+    async def _http_session(needed: bool = True) -> AsyncIterator[Optional[aiohttp.ClientSession]]:
         """
-        Generates a PDF for the given book and saves it.
-        Returns the path/url to the generated PDF.
+        One pooled session for a whole job: the worker runtime session when
+        available, otherwise a session opened (and closed) here.
+        """
+        if not needed:
+            yield None
+            return
+        shared_session = worker_runtime.get_http_session()
+        if shared_session is not None:
+            yield shared_session
+            return
+        async with aiohttp.ClientSession() as session:
+            yield session
+
+    @staticmethod
+    async def _resolve_image(
+        url_or_path: str,
+        session: Optional[aiohttp.ClientSession],
+        workdir: str,
+        page_number: int,
+        storage: Optional[StorageProvider] = None
+    ) -> Optional[str]:
+        """
+        Returns a local file the renderer can read: stored images are used in
+        place, remote ones come from the remote image cache (linked into workdir).
         """
-        buffer = BytesIO()
-        c = canvas.Canvas(buffer, pagesize=A4)
-        width, height = A4
-
-        # Title Page
-        c.setFont("Helvetica-Bold", 24)
-        c.drawCentredString(width / 2, height / 2 + 50, book.title)
-        c.setFont("Helvetica", 14)
-        # Handle potential missing fields safely
-        theme = getattr(book, 'theme', 'General')
-        c.drawCentredString(width / 2, height / 2, f"Theme: {theme}")
-        c.drawCentredString(width / 2, height / 2 - 30, f"Style: {book.style}")
-        c.showPage()
-
-        # Content Pages
-        sorted_pages = sorted(book.pages, key=lambda p: p.page_number)
+        if not url_or_path.startswith("http"):
+            return PDFService._local_image_path(url_or_path, storage)
         
-        for page in sorted_pages:
-            # Page Number
-            c.setFont("Helvetica", 10)
-            c.drawString(width - 50, 30, f"Page {page.page_number}")
-            
-            # Text Content
-            text_y = height - 100
-            if page.text_content:
-                c.setFont("Helvetica", 12)
-                text_lines = page.text_content.split('\n')
-                for line in text_lines:
-                    if len(line) > 80:
-                        chunks = [line[i:i+80] for i in range(0, len(line), 80)]
-                        for chunk in chunks:
-                            c.drawCentredString(width / 2, text_y, chunk)
-                            text_y -= 20
-                    else:
-                        c.drawCentredString(width / 2, text_y, line)
-                        text_y -= 20
+        cached_path = await get_remote_image_cache().fetch(session, url_or_path)
+        if cached_path is None:
+            return None
+        
+        path = os.path.join(workdir, f"page_{page_number}.img")
+        try:
+            os.link(cached_path, path)
+        except OSError:
+            # Cache on another file system (or no hard links): copy instead
+            await asyncio.to_thread(shutil.copyfile, cached_path, path)
+        return path
+
+    @staticmethod
+    async def _prefetch_images(
+        pages: List[Any],
+        workdir: str,
+        storage: Optional[StorageProvider] = None
+    ) -> Dict[int, Optional[str]]:
+        """
+        Resolves every page image concurrently (PDF_IMAGE_PREFETCH_CONCURRENCY at
+        a time) over a single HTTP session, before the canvas pass starts.
+        """
+        pages = [page for page in pages if page.image_url]
+        storage = storage or StorageServiceFactory.create_storage()
+        remote = any(page.image_url.startswith("http") for page in pages)
+        semaphore = asyncio.Semaphore(settings.PDF_IMAGE_PREFETCH_CONCURRENCY)
+        
+        async with PDFService._http_session(remote) as session:
+            async def _prefetch(page) -> Optional[str]:
+                async with semaphore:
+                    try:
+                        return await PDFService._resolve_image(
+                            page.image_url, session, workdir, page.page_number, storage
+                        )
+                    except Exception as e:
+                        logger.warning(f"Failed to load image for page {page.page_number}: {e}")
+                        return None
             
-            # Image Handling
-            image_drawn = False
-            if page.image_url:
-                try:
-                    img_data = await PDFService._fetch_image(page.image_url)
-                    if img_data:
-                        img = ImageReader(img_data)
-                        # Draw image centered
-                        img_width = 400
-                        img_height = 300
-                        x = (width - img_width) / 2
-                        y = height / 2 - 150
-                        c.drawImage(img, x, y, width=img_width, height=img_height, preserveAspectRatio=True)
-                        image_drawn = True
-                except Exception as e:
-                    print(f"Failed to load image for page {page.page_number}: {e}")
-
-            if not image_drawn:
-                # Placeholder if image failed or missing
-                c.rect(100, height / 2 - 150, width - 200, 300)
-                c.drawCentredString(width / 2, height / 2, "Image Placeholder")
-                if page.image_prompt:
-                     c.setFont("Helvetica-Oblique", 8)
-                     c.drawCentredString(width / 2, height / 2 - 140, f"Prompt: {page.image_prompt[:50]}...")
-
-            c.showPage()
-
-        c.save()
-        buffer.seek(0)
+            paths = await asyncio.gather(*(_prefetch(page) for page in pages))
+        
+        return {page.page_number: path for page, path in zip(pages, paths)}
+
+    @staticmethod
+    async def _iter_file(path: str, chunk_size: int) -> AsyncIterator[bytes]:
+        """
+        Reads a file in chunks without blocking the event loop.
+        """
+        f = await asyncio.to_thread(open, path, "rb")
+        try:
+            while True:
+                chunk = await asyncio.to_thread(f.read, chunk_size)
+                if not chunk:
+                    break
+                yield chunk
+        finally:
+            f.close()
+
+    @staticmethod
+    async def generate_book_pdf(
+        book: Book,
+        storage_provider: Optional[StorageProvider] = None,
+        profile: Optional[str] = None,
+        filename: Optional[str] = None
+    ) -> str:
+        """
+        Generates a PDF for the given book and saves it.
+        Returns the path/url to the generated PDF.
         
-        # Save PDF locally using Storage Service logic (conceptually)
-        # For now, we save directly to the public uploads folder to return a URL
-        filename = f"book_{book.id}.pdf"
-        output_path = os.path.join("frontend/public/uploads", filename)
-        os.makedirs(os.path.dirname(output_path), exist_ok=True)
+        Rendering runs in the media process pool and writes to a temporary file,
+        which is then streamed to the storage provider in chunks; the PDF is
+        never held in memory by the calling process. `profile` ("screen" or
+        "print", default PDF_IMAGE_PROFILE) selects image resolution and quality;
+        `filename` defaults to book_<id>.pdf.
+        """
+        profile = profile or settings.PDF_IMAGE_PROFILE
+        if profile not in PDF_PROFILES:
+            raise ValueError(f"Unknown PDF profile: {profile}")
+        storage = storage_provider or StorageServiceFactory.create_storage()
+        filename = filename or f"book_{book.id}.pdf"
         
-        with open(output_path, "wb") as f:
-            f.write(buffer.getvalue())
+        with tempfile.TemporaryDirectory(prefix="book_pdf_") as workdir:
+            sorted_pages = sorted(book.pages, key=lambda p: p.page_number)
+            image_paths = await PDFService._prefetch_images(sorted_pages, workdir, storage)
+            pages = [
+                {
+                    "page_number": page.page_number,
+                    "text": page.text_content,
+                    "image_path": image_paths.get(page.page_number),
+                    "image_prompt": page.image_prompt
+                }
+                for page in sorted_pages
+            ]
             
-        return f"/uploads/{filename}"
+            document: Dict[str, Any] = {
+                "title": book.title,
+                # Handle potential missing fields safely
+                "theme": getattr(book, 'theme', 'General'),
+                "style": book.style,
+                "profile": profile,
+                "pages": pages
+            }
+            output_path = os.path.join(workdir, filename)
+            await run_cpu_bound(render_book_pdf, document, output_path)
+            
+            return await storage.upload_stream(
+                PDFService._iter_file(output_path, settings.PDF_STREAM_CHUNK_SIZE),
+                filename,
+                content_type="application/pdf"
+            )
+
+    @staticmethod
+    async def get_book_pdf(
+        book: Book,
+        variant: str = "print",
+        storage_provider: Optional[StorageProvider] = None
+    ) -> Optional[StoredPDF]:
+        """
+        Locates a generated PDF of the book ("print" or "preview") for download.
+        Returns None when that variant hasn't been generated or its file is gone.
+        PDFs in remote storage (S3) have no path and are sent with stream_book_pdf.
+        """
+        url = book.pdf_preview_file if variant == "preview" else book.pdf_file
+        if not url:
+            return None
+        storage = storage_provider or StorageServiceFactory.create_storage()
+        path = storage.local_path(url)
+        if path is None:
+            info = await storage.stat(url)
+            if info is None:
+                return None
+            return StoredPDF(path=None, url=url, size=info.size, mtime=info.last_modified, etag=info.etag)
+        try:
+            stat_result = await asyncio.to_thread(os.stat, path)
+        except FileNotFoundError:
+            return None
+        return StoredPDF(
+            path=path,
+            url=url,
+            size=stat_result.st_size,
+            mtime=stat_result.st_mtime,
+            etag=await compute_file_etag(path, stat_result)
+        )
+
+    @staticmethod
+    def stream_book_pdf(
+        pdf: StoredPDF,
+        storage_provider: Optional[StorageProvider] = None
+    ) -> AsyncIterator[bytes]:
+        """Streams a stored PDF from storage, one chunk in memory at a time."""
+        storage = storage_provider or StorageServiceFactory.create_storage()
+        return storage.read_stream(pdf.url, settings.PDF_STREAM_CHUNK_SIZE)
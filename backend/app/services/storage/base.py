@@ -1,16 +1,104 @@
 from abc import ABC, abstractmethod
-from typing import BinaryIO
+from typing import AsyncIterator, BinaryIO, Iterable, NamedTuple, Optional
+import asyncio
 import os
+import tempfile
+
+
+class ObjectInfo(NamedTuple):
+    """Metadata of a stored object"""
+    size: int
+    etag: str
+    last_modified: float
+
 
 class StorageProvider(ABC):
     """Abstract base class for file storage providers."""
     
+    # Chunks kept in memory by the default upload_stream before spilling to disk
+    spool_max_size = 8 * 1024 * 1024
+    
     @abstractmethod
     async def upload(self, file_data: BinaryIO, filename: str, content_type: str = "image/png") -> str:
         """Upload a file and return its URL/path."""
         pass
 
+    async def upload_stream(
+        self,
+        chunks: AsyncIterator[bytes],
+        filename: str,
+        content_type: str = "application/octet-stream"
+    ) -> str:
+        """
+        Upload a file produced as a stream of chunks and return its URL/path.
+        
+        Default: spool the chunks (memory up to spool_max_size, then disk) and
+        hand the spool to upload(). Providers that can write incrementally
+        should override this.
+        """
+        with tempfile.SpooledTemporaryFile(max_size=self.spool_max_size) as spool:
+            async for chunk in chunks:
+                spool.write(chunk)
+            spool.seek(0)
+            return await self.upload(spool, filename, content_type)
+
+    def url_for(self, filename: str) -> str:
+        """URL that upload() returns for this filename."""
+        raise NotImplementedError(f"{type(self).__name__} cannot derive URLs before upload")
+
+    async def exists(self, filename: str) -> bool:
+        """Whether an object with this filename is already stored."""
+        return False
+
+    def local_path(self, url: str) -> Optional[str]:
+        """
+        Path on this machine's file system for a stored URL, when the provider
+        keeps files locally (lets them be served with sendfile); None otherwise.
+        """
+        return None
+
+    async def stat(self, url: str) -> Optional[ObjectInfo]:
+        """
+        Size, ETag and modification time of a stored URL that has no local
+        path; None when the object is missing or the provider keeps files
+        locally (use local_path() there).
+        """
+        return None
+
+    async def read_stream(self, url: str, chunk_size: int = 1024 * 1024) -> AsyncIterator[bytes]:
+        """
+        Read a stored file as a stream of chunks (at most one chunk in memory).
+        
+        Default: read the local file behind the URL. Raises FileNotFoundError
+        when the URL does not belong to this provider or the file is gone.
+        """
+        path = self.local_path(url)
+        if path is None:
+            raise FileNotFoundError(url)
+        f = await asyncio.to_thread(open, path, "rb")
+        try:
+            while True:
+                chunk = await asyncio.to_thread(f.read, chunk_size)
+                if not chunk:
+                    break
+                yield chunk
+        finally:
+            f.close()
+
     @abstractmethod
     async def delete(self, filename: str) -> bool:
         """Delete a file."""
         pass
+
+    async def delete_many(self, filenames: Iterable[str]) -> int:
+        """
+        Delete several files and return how many were deleted.
+        
+        Default: one delete() per file. Providers with a batch API should
+        override this.
+        """
+        deleted = 0
+        for filename in filenames:
+            if await self.delete(filename):
+                deleted += 1
+        return deleted
@@ -0,0 +1,137 @@
+import hashlib
+import os
+import re
+import tempfile
+from typing import AsyncIterator, Awaitable, BinaryIO, Callable, Iterable, Optional, Tuple
+from app.core.config import settings
+from app.core.executors import run_blocking_io
+from app.services.storage.base import ObjectInfo, StorageProvider
+
+# Blob objects live under this prefix of the wrapped provider
+CAS_PREFIX = "cas"
+
+# Optionally under the local provider's fan-out directories (cas/ab/cd/<digest>)
+_CAS_URL = re.compile(r"/" + CAS_PREFIX + r"/(?:[0-9a-f]{2}/)*([0-9a-f]{64})(\.[A-Za-z0-9]+)?$")
+
+# (url, digest, size, content_type): records the blob before it is referenced;
+# True when the record was (re)created, i.e. the object must be written again
+BlobRegistry = Callable[[str, str, int, str], Awaitable[bool]]
+
+
+def blob_digest(url: Optional[str]) -> Optional[str]:
+    """SHA-256 of a content-addressed URL, or None for any other URL."""
+    match = _CAS_URL.search(url or "")
+    return match.group(1) if match else None
+
+
+def is_content_addressed(url: Optional[str]) -> bool:
+    return blob_digest(url) is not None
+
+
+def blob_filename(digest: str, ext: str = "") -> str:
+    """Name of a blob inside the wrapped provider."""
+    return f"{CAS_PREFIX}/{digest}{ext}"
+
+
+def blob_filename_from_url(url: str) -> str:
+    match = _CAS_URL.search(url)
+    if not match:
+        raise ValueError(f"Not a content-addressed URL: {url}")
+    return blob_filename(match.group(1), match.group(2) or "")
+
+
+def _hash_file(file_data: BinaryIO, chunk_size: int) -> Tuple[str, int]:
+    start = file_data.tell()
+    digest = hashlib.sha256()
+    size = 0
+    while True:
+        chunk = file_data.read(chunk_size)
+        if not chunk:
+            break
+        digest.update(chunk)
+        size += len(chunk)
+    file_data.seek(start)
+    return digest.hexdigest(), size
+
+
+class ContentAddressedStorage(StorageProvider):
+    """
+    Deduplicating wrapper around any StorageProvider.
+
+    Objects are stored under the SHA-256 of their content (the requested
+    filename only contributes its extension), so identical images and
+    re-rendered PDFs map to the same blob and are written once. Each blob is
+    recorded through ``registry`` (the storage_blobs table); references from
+    pages and books are counted by BlobRepository and unreferenced blobs are
+    removed by the storage GC task, never by delete() callers.
+    """
+
+    def __init__(
+        self,
+        backend: StorageProvider,
+        registry: Optional[BlobRegistry] = None,
+        chunk_size: Optional[int] = None
+    ):
+        self.backend = backend
+        self.registry = registry
+        self.chunk_size = chunk_size or settings.STORAGE_IO_CHUNK_SIZE
+
+    async def _store(self, file_data: BinaryIO, digest: str, size: int, ext: str, content_type: str) -> str:
+        filename = blob_filename(digest, ext)
+        url = self.backend.url_for(filename)
+        # Register (and touch) first: the GC skips blobs touched within the grace period.
+        # A freshly created record may follow a GC claim whose file deletion is
+        # pending, so the object is rewritten even if it still exists
+        created = False
+        if self.registry is not None:
+            created = await self.registry(url, digest, size, content_type)
+        if created or not await self.backend.exists(filename):
+            await self.backend.upload(file_data, filename, content_type)
+        return url
+
+    async def upload(self, file_data: BinaryIO, filename: str, content_type: str = "image/png") -> str:
+        digest, size = await run_blocking_io(_hash_file, file_data, self.chunk_size)
+        ext = os.path.splitext(filename)[1].lower()
+        return await self._store(file_data, digest, size, ext, content_type)
+
+    async def upload_stream(
+        self,
+        chunks: AsyncIterator[bytes],
+        filename: str,
+        content_type: str = "application/octet-stream"
+    ) -> str:
+        """
+        Spool the stream while hashing it: the name is only known at the end.
+        """
+        digest = hashlib.sha256()
+        size = 0
+        with tempfile.SpooledTemporaryFile(max_size=self.spool_max_size) as spool:
+            async for chunk in chunks:
+                digest.update(chunk)
+                size += len(chunk)
+                await run_blocking_io(spool.write, chunk)
+            spool.seek(0)
+            ext = os.path.splitext(filename)[1].lower()
+            return await self._store(spool, digest.hexdigest(), size, ext, content_type)
+
+    def url_for(self, filename: str) -> str:
+        return self.backend.url_for(filename)
+
+    async def exists(self, filename: str) -> bool:
+        return await self.backend.exists(filename)
+
+    def local_path(self, url: str) -> Optional[str]:
+        return self.backend.local_path(url)
+
+    async def stat(self, url: str) -> Optional[ObjectInfo]:
+        return await self.backend.stat(url)
+
+    def read_stream(self, url: str, chunk_size: int = 1024 * 1024) -> AsyncIterator[bytes]:
+        return self.backend.read_stream(url, chunk_size)
+
+    async def delete(self, filename: str) -> bool:
+        """Remove the object itself (used by the GC once a blob has no references)."""
+        return await self.backend.delete(filename)
+
+    async def delete_many(self, filenames: Iterable[str]) -> int:
+        return await self.backend.delete_many(filenames)
@@ -1,12 +1,36 @@
 from typing import Optional
+from app.core.config import settings
 from app.services.storage.base import StorageProvider
+from app.services.storage.content_addressed import ContentAddressedStorage
 from app.services.storage.local import LocalStorageProvider
-# from app.services.storage.s3 import S3StorageProvider # To be implemented for prod
+
+STORAGE_BACKENDS = ("local", "s3")
+
+
+async def register_blob(url: str, digest: str, size: int, content_type: str) -> bool:
+    """Records a content-addressed blob in the storage_blobs table (own transaction)."""
+    from app.core.database import AsyncSessionLocal
+    from app.repositories.blob_repository import BlobRepository
+
+    async with AsyncSessionLocal() as session:
+        created = await BlobRepository(session).register(url, digest, size, content_type)
+        await session.commit()
+        return created
+
 
 class StorageServiceFactory:
     
     @staticmethod
     def create_storage() -> StorageProvider:
-        # Logic to choose provider based on environment
-        # For now, default to local
-        return LocalStorageProvider()
+        backend = settings.STORAGE_BACKEND
+        if backend == "s3":
+            # Imported lazily: only S3 deployments need the client code
+            from app.services.storage.s3 import S3StorageProvider
+            storage: StorageProvider = S3StorageProvider()
+        elif backend == "local":
+            storage = LocalStorageProvider()
+        else:
+            raise ValueError(f"Unknown storage backend: {backend} (expected one of {STORAGE_BACKENDS})")
+        if settings.STORAGE_CONTENT_ADDRESSED:
+            return ContentAddressedStorage(storage, registry=register_blob)
+        return storage
@@ -0,0 +1,153 @@
+"""
+Moves LocalStorageProvider files from the flat layout to the sharded one.
+
+The migration runs in three resumable phases, and files stay readable in
+every state because the provider looks a name up in both layouts:
+
+1. link: each flat file gets a hard link (or a streamed copy) at its
+   ab/cd/<name> location; the flat file is kept.
+2. rewrite: stored URLs (pages, books, storage blobs) are rewritten to the
+   sharded form in small batches.
+3. prune: flat files whose sharded copy is in place are removed.
+"""
+
+import logging
+import os
+import shutil
+import uuid
+from pathlib import Path
+from typing import Callable, Dict, Iterator
+from sqlalchemy import select, update
+from app.services.storage.local import LocalStorageProvider, shard_name, unshard_name
+
+logger = logging.getLogger(__name__)
+
+
+def iter_unsharded_files(provider: LocalStorageProvider) -> Iterator[str]:
+    """
+    Relative paths of the files not yet in the sharded layout.
+
+    Directories are walked with os.scandir, so huge flat directories are
+    streamed instead of listed in memory. Temporary files are skipped.
+    """
+    pending = [provider.public_dir]
+    while pending:
+        directory = pending.pop()
+        with os.scandir(directory) as entries:
+            for entry in entries:
+                if entry.name.startswith("."):
+                    continue
+                if entry.is_dir(follow_symlinks=False):
+                    pending.append(Path(entry.path))
+                elif entry.is_file(follow_symlinks=False):
+                    relative = Path(entry.path).relative_to(provider.public_dir).as_posix()
+                    if unshard_name(relative, provider.shard_depth) is None:
+                        yield relative
+
+
+def link_into_layout(provider: LocalStorageProvider, relative: str) -> bool:
+    """
+    Makes a flat file available at its sharded location.
+
+    Returns:
+        True if the sharded copy was created, False if it already existed
+    """
+    source = provider.public_dir / relative
+    target = provider.public_dir / shard_name(relative, provider.shard_depth)
+    if target.exists():
+        return False
+    target.parent.mkdir(parents=True, exist_ok=True)
+    try:
+        os.link(source, target)
+    except FileExistsError:
+        return False
+    except OSError:
+        # No hard links here: stream a copy and rename it into place
+        partial_path = target.with_name(f".{target.name}.{uuid.uuid4().hex}.part")
+        try:
+            with open(source, "rb") as src, open(partial_path, "wb") as dst:
+                shutil.copyfileobj(src, dst, provider.chunk_size)
+                dst.flush()
+                os.fsync(dst.fileno())
+            os.replace(partial_path, target)
+        except BaseException:
+            partial_path.unlink(missing_ok=True)
+            raise
+    return True
+
+
+def prune_flat(provider: LocalStorageProvider, relative: str) -> bool:
+    """
+    Removes a flat file whose sharded copy is in place.
+
+    Returns:
+        True if the flat file was removed
+    """
+    source = provider.public_dir / relative
+    target = provider.public_dir / shard_name(relative, provider.shard_depth)
+    try:
+        if not (os.path.samefile(source, target) or source.stat().st_size == target.stat().st_size):
+            logger.warning(f"Layout migration: {relative} differs from its sharded copy, keeping it")
+            return False
+    except FileNotFoundError:
+        return False
+    os.remove(source)
+    return True
+
+
+async def rewrite_urls(
+    session_factory: Callable,
+    provider: LocalStorageProvider,
+    batch_size: int = 500,
+    dry_run: bool = False
+) -> Dict[str, int]:
+    """
+    Rewrites stored /uploads/ URLs to the provider's layout, batch by batch.
+
+    Each batch is its own transaction and rows are visited in id order, so an
+    interrupted run resumes safely. ``updated_at`` is preserved.
+
+    Returns:
+        Rewritten URLs per column
+    """
+    from app.models.book import Book, Page
+    from app.models.storage import StorageBlob
+
+    columns = [
+        (Page, Page.image_url),
+        (Book, Book.pdf_file),
+        (Book, Book.pdf_preview_file),
+        (Book, Book.cover_image),
+        (StorageBlob, StorageBlob.url),
+    ]
+    rewritten: Dict[str, int] = {}
+    for model, column in columns:
+        name = f"{model.__tablename__}.{column.key}"
+        rewritten[name] = 0
+        last_id = 0
+        while True:
+            async with session_factory() as session:
+                result = await session.execute(
+                    select(model.id, column)
+                    .where(model.id > last_id, column.like("/uploads/%"))
+                    .order_by(model.id)
+                    .limit(batch_size)
+                )
+                rows = result.all()
+                if not rows:
+                    break
+                for row_id, url in rows:
+                    new_url = provider.url_for(url)
+                    if new_url == url:
+                        continue
+                    rewritten[name] += 1
+                    if not dry_run:
+                        await session.execute(
+                            update(model)
+                            .where(model.id == row_id)
+                            .values({column.key: new_url, "updated_at": model.updated_at})
+                        )
+                if not dry_run:
+                    await session.commit()
+                last_id = rows[-1][0]
+    return rewritten
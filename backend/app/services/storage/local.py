@@ -1,40 +1,230 @@
+import hashlib
 import os
+import posixpath
+import re
 import shutil
+import uuid
 from pathlib import Path
-from typing import BinaryIO
+from typing import AsyncIterator, BinaryIO, IO, List, Optional, Tuple
 from app.services.storage.base import StorageProvider
 from app.core.config import settings
+from app.core.executors import run_blocking_io
+
+FSYNC_POLICIES = ("none", "file", "dir")
+LAYOUTS = ("flat", "sharded")
+
+_HEX_DIGEST = re.compile(r"[0-9a-f]{64}")
+
+
+def shard_key(basename: str) -> str:
+    """Hex key that spreads a file over the fan-out directories."""
+    stem = basename.split(".", 1)[0]
+    # Content-addressed names already are a uniform hash
+    if _HEX_DIGEST.fullmatch(stem):
+        return stem
+    return hashlib.sha256(basename.encode("utf-8")).hexdigest()
+
+
+def shard_name(filename: str, depth: int = 2) -> str:
+    """
+    Fan-out location of a logical filename: "dir/x.png" -> "dir/ab/cd/x.png".
+    """
+    directory, basename = posixpath.split(filename)
+    key = shard_key(basename)
+    return posixpath.join(directory, *(key[2 * level:2 * level + 2] for level in range(depth)), basename)
+
+
+def unshard_name(relative: str, depth: int = 2) -> Optional[str]:
+    """Logical filename of a sharded path, or None if the path is not sharded."""
+    parts = relative.split("/")
+    if len(parts) < depth + 1:
+        return None
+    logical = "/".join(parts[:-depth - 1] + parts[-1:])
+    return logical if shard_name(logical, depth) == relative else None
 
 class LocalStorageProvider(StorageProvider):
-    """Implementation for local file system storage (dev/testing)."""
+    """
+    Implementation for local file system storage (dev/testing).
     
-    def __init__(self, upload_dir: str = "uploads"):
+    Every blocking file operation runs on the storage I/O thread pool, never on
+    the event loop. Writes go to a temporary file that is renamed into place,
+    so readers only ever see complete files. fsync_policy controls durability:
+    "none" (rename only), "file" (fsync the data before the rename) or "dir"
+    (also fsync the directory, making the rename itself durable).
+    """
+    
+    def __init__(
+        self,
+        upload_dir: str = "uploads",
+        fsync_policy: Optional[str] = None,
+        chunk_size: Optional[int] = None,
+        layout: Optional[str] = None,
+        shard_depth: Optional[int] = None
+    ):
         self.upload_dir = Path(upload_dir)
         self.upload_dir.mkdir(parents=True, exist_ok=True)
         
         # Ensure public directory exists for serving files
         self.public_dir = Path("frontend/public/uploads")
         self.public_dir.mkdir(parents=True, exist_ok=True)
+        
+        self.fsync_policy = fsync_policy or settings.STORAGE_FSYNC_POLICY
+        if self.fsync_policy not in FSYNC_POLICIES:
+            raise ValueError(f"Unknown fsync policy: {self.fsync_policy} (expected one of {FSYNC_POLICIES})")
+        self.chunk_size = chunk_size or settings.STORAGE_IO_CHUNK_SIZE
+        
+        self.layout = layout or settings.STORAGE_LOCAL_LAYOUT
+        if self.layout not in LAYOUTS:
+            raise ValueError(f"Unknown storage layout: {self.layout} (expected one of {LAYOUTS})")
+        self.shard_depth = shard_depth or settings.STORAGE_SHARD_DEPTH
+
+    def relative_path(self, filename: str) -> str:
+        """Path of a logical filename under public_dir in the configured layout."""
+        filename = filename.removeprefix("/uploads/").lstrip("/")
+        # Callers may pass back a name/URL that is already sharded
+        logical = unshard_name(filename, self.shard_depth) or filename
+        if self.layout == "sharded":
+            return shard_name(logical, self.shard_depth)
+        return logical
+
+    def candidate_paths(self, relative: str) -> List[str]:
+        """
+        Where a stored file may be, in both layouts: files stay readable while
+        they are migrated and URLs saved before the migration keep working.
+        """
+        flat = unshard_name(relative, self.shard_depth)
+        if flat is not None:
+            return [relative, flat]
+        return [relative, shard_name(relative, self.shard_depth)]
+
+    def _existing_path(self, relative: str) -> Optional[Path]:
+        root = self.public_dir.resolve()
+        for candidate in self.candidate_paths(relative):
+            file_path = (self.public_dir / candidate).resolve()
+            # Never resolve outside the public uploads directory
+            if root in file_path.parents and file_path.is_file():
+                return file_path
+        return None
+
+    @staticmethod
+    def _open_partial(file_path: Path) -> Tuple[Path, IO[bytes]]:
+        # Unique name: concurrent writers of the same file never share a temp file
+        file_path.parent.mkdir(parents=True, exist_ok=True)
+        partial_path = file_path.with_name(f".{file_path.name}.{uuid.uuid4().hex}.part")
+        return partial_path, open(partial_path, "wb")
+
+    @staticmethod
+    def _fsync_dir(directory: Path) -> None:
+        fd = os.open(directory, os.O_RDONLY)
+        try:
+            os.fsync(fd)
+        finally:
+            os.close(fd)
+
+    def _commit(self, out: IO[bytes], partial_path: Path, file_path: Path) -> None:
+        try:
+            out.flush()
+            if self.fsync_policy != "none":
+                os.fsync(out.fileno())
+        finally:
+            out.close()
+        os.replace(partial_path, file_path)
+        if self.fsync_policy == "dir":
+            self._fsync_dir(file_path.parent)
+
+    @staticmethod
+    def _abort(out: IO[bytes], partial_path: Path) -> None:
+        out.close()
+        partial_path.unlink(missing_ok=True)
+
+    def _write_file(self, file_data: BinaryIO, file_path: Path) -> None:
+        partial_path, out = self._open_partial(file_path)
+        try:
+            shutil.copyfileobj(file_data, out, self.chunk_size)
+            self._commit(out, partial_path, file_path)
+        except BaseException:
+            self._abort(out, partial_path)
+            raise
 
     async def upload(self, file_data: BinaryIO, filename: str, content_type: str = "image/png") -> str:
         """
         Save file locally and return a relative URL.
         For this MVP, we'll save to frontend/public so Next.js can serve it directly.
         """
-        file_path = self.public_dir / filename
+        file_path = self.public_dir / self.relative_path(filename)
         
-        with open(file_path, "wb") as buffer:
-            shutil.copyfileobj(file_data, buffer)
+        # The whole chunked copy (and fsync/rename) is a single job on the I/O pool
+        await run_blocking_io(self._write_file, file_data, file_path)
             
         # Return URL relative to frontend
-        return f"/uploads/{filename}"
+        return self.url_for(filename)
 
-    async def delete(self, filename: str) -> bool:
+    async def upload_stream(
+        self,
+        chunks: AsyncIterator[bytes],
+        filename: str,
+        content_type: str = "application/octet-stream"
+    ) -> str:
+        """
+        Write chunks to a temporary file as they arrive and move it into place.
+        Readers never see a partial file; only one chunk is held in memory.
+        """
+        file_path = self.public_dir / self.relative_path(filename)
+        partial_path, out = await run_blocking_io(self._open_partial, file_path)
+        
         try:
-            file_path = self.public_dir / filename
-            if file_path.exists():
+            async for chunk in chunks:
+                await run_blocking_io(out.write, chunk)
+            await run_blocking_io(self._commit, out, partial_path, file_path)
+        except BaseException:
+            # Synchronous on purpose: must also run when the task is cancelled
+            self._abort(out, partial_path)
+            raise
+        
+        return self.url_for(filename)
+
+    def url_for(self, filename: str) -> str:
+        return f"/uploads/{self.relative_path(filename)}"
+
+    async def exists(self, filename: str) -> bool:
+        return await run_blocking_io(self._existing_path, self.relative_path(filename)) is not None
+
+    def local_path(self, url: str) -> Optional[str]:
+        if not url.startswith("/uploads/"):
+            return None
+        file_path = self._existing_path(url[len("/uploads/"):])
+        return str(file_path) if file_path else None
+
+    async def read_stream(self, url: str, chunk_size: int = 1024 * 1024) -> AsyncIterator[bytes]:
+        path = self.local_path(url)
+        if path is None:
+            raise FileNotFoundError(url)
+        f = await run_blocking_io(open, path, "rb")
+        try:
+            while True:
+                chunk = await run_blocking_io(f.read, chunk_size)
+                if not chunk:
+                    break
+                yield chunk
+        finally:
+            f.close()
+
+    def _remove(self, relative: str) -> bool:
+        # Mid-migration a file may exist in both layouts (hard links): remove both
+        removed = False
+        for candidate in self.candidate_paths(relative):
+            file_path = self.public_dir / candidate
+            try:
                 os.remove(file_path)
-                return True
-            return False
+            except FileNotFoundError:
+                continue
+            removed = True
+            if self.fsync_policy == "dir":
+                self._fsync_dir(file_path.parent)
+        return removed
+
+    async def delete(self, filename: str) -> bool:
+        try:
+            return await run_blocking_io(self._remove, self.relative_path(filename))
         except Exception:
             return False
@@ -0,0 +1,458 @@
+import asyncio
+import base64
+import hashlib
+import hmac
+import logging
+import weakref
+from datetime import datetime, timezone
+from email.utils import parsedate_to_datetime
+from typing import AsyncIterator, BinaryIO, Dict, Iterable, List, Optional
+from urllib.parse import parse_qsl, quote, unquote, urlsplit
+from xml.etree import ElementTree
+import aiohttp
+from yarl import URL
+from app.core.config import settings
+from app.core.executors import run_blocking_io
+from app.services.storage.base import ObjectInfo, StorageProvider
+
+logger = logging.getLogger(__name__)
+
+S3_NAMESPACE = "http://s3.amazonaws.com/doc/2006-03-01/"
+UNSIGNED_PAYLOAD = "UNSIGNED-PAYLOAD"
+EMPTY_SHA256 = hashlib.sha256(b"").hexdigest()
+# DeleteObjects accepts at most this many keys per request
+MAX_DELETE_KEYS = 1000
+ADDRESSING_STYLES = ("path", "virtual")
+
+_RETRY_STATUSES = {500, 502, 503, 504}
+
+# One pooled session per event loop (API loop, worker runtime loop, tests)
+_sessions: "weakref.WeakKeyDictionary[asyncio.AbstractEventLoop, aiohttp.ClientSession]" = weakref.WeakKeyDictionary()
+
+
+class S3Error(Exception):
+    """Error response from the S3 API"""
+
+    def __init__(self, status: int, code: str = "", message: str = ""):
+        self.status = status
+        self.code = code
+        super().__init__(f"S3 error {status} {code}: {message}".rstrip(": "))
+
+
+def _quote(value: str, safe: str = "-_.~") -> str:
+    return quote(value, safe=safe)
+
+
+def _hmac(key: bytes, message: str) -> bytes:
+    return hmac.new(key, message.encode("utf-8"), hashlib.sha256).digest()
+
+
+def sign_request(
+    method: str,
+    url: str,
+    headers: Dict[str, str],
+    access_key: str,
+    secret_key: str,
+    region: str,
+    payload_hash: str = UNSIGNED_PAYLOAD,
+    now: Optional[datetime] = None,
+    service: str = "s3"
+) -> Dict[str, str]:
+    """
+    AWS Signature Version 4 for a request whose URL is already percent-encoded.
+
+    Every header passed in is signed, plus host, x-amz-date and
+    x-amz-content-sha256. Returns the headers to send (with Authorization).
+    """
+    now = now or datetime.now(timezone.utc)
+    amz_date = now.strftime("%Y%m%dT%H%M%SZ")
+    date = amz_date[:8]
+    parts = urlsplit(url)
+    host = parts.hostname or ""
+    if parts.port and (parts.scheme, parts.port) not in (("http", 80), ("https", 443)):
+        host = f"{host}:{parts.port}"
+
+    signed = {name.lower(): str(value).strip() for name, value in headers.items()}
+    signed.update({"host": host, "x-amz-date": amz_date, "x-amz-content-sha256": payload_hash})
+    names = sorted(signed)
+    query = sorted(
+        (_quote(name), _quote(value))
+        for name, value in parse_qsl(parts.query, keep_blank_values=True)
+    )
+    canonical_request = "\n".join([
+        method.upper(),
+        parts.path or "/",
+        "&".join(f"{name}={value}" for name, value in query),
+        "".join(f"{name}:{signed[name]}\n" for name in names),
+        ";".join(names),
+        payload_hash
+    ])
+    scope = f"{date}/{region}/{service}/aws4_request"
+    string_to_sign = "\n".join([
+        "AWS4-HMAC-SHA256",
+        amz_date,
+        scope,
+        hashlib.sha256(canonical_request.encode("utf-8")).hexdigest()
+    ])
+    key = _hmac(("AWS4" + secret_key).encode("utf-8"), date)
+    for part in (region, service, "aws4_request"):
+        key = _hmac(key, part)
+    signature = hmac.new(key, string_to_sign.encode("utf-8"), hashlib.sha256).hexdigest()
+
+    result = dict(headers)
+    result.update({
+        "x-amz-date": amz_date,
+        "x-amz-content-sha256": payload_hash,
+        "Authorization": (
+            f"AWS4-HMAC-SHA256 Credential={access_key}/{scope}, "
+            f"SignedHeaders={';'.join(names)}, Signature={signature}"
+        )
+    })
+    return result
+
+
+def get_s3_session() -> aiohttp.ClientSession:
+    """
+    Pooled HTTP session of the running event loop.
+
+    Connections are kept alive and reused by every S3StorageProvider
+    instance on the loop, up to S3_MAX_CONNECTIONS.
+    """
+    loop = asyncio.get_running_loop()
+    session = _sessions.get(loop)
+    if session is None or session.closed:
+        session = aiohttp.ClientSession(
+            connector=aiohttp.TCPConnector(limit=settings.S3_MAX_CONNECTIONS, keepalive_timeout=30),
+            timeout=aiohttp.ClientTimeout(total=None, sock_connect=10, sock_read=60),
+            auto_decompress=False,
+            skip_auto_headers=("Content-Type",)
+        )
+        _sessions[loop] = session
+    return session
+
+
+async def close_s3_session() -> None:
+    """Close the pooled session of the running event loop, if any."""
+    session = _sessions.pop(asyncio.get_running_loop(), None)
+    if session is not None and not session.closed:
+        await session.close()
+
+
+async def _blocks(chunks: AsyncIterator[bytes], size: int) -> AsyncIterator[bytes]:
+    """Regroup a stream of chunks into blocks of exactly ``size`` bytes (the last may be smaller)."""
+    buffer = bytearray()
+    async for chunk in chunks:
+        buffer += chunk
+        while len(buffer) >= size:
+            yield bytes(buffer[:size])
+            del buffer[:size]
+    if buffer:
+        yield bytes(buffer)
+
+
+async def _read_file(file_data: BinaryIO, chunk_size: int) -> AsyncIterator[bytes]:
+    while True:
+        chunk = await run_blocking_io(file_data.read, chunk_size)
+        if not chunk:
+            return
+        yield chunk
+
+
+def _xml_text(element: ElementTree.Element, tag: str) -> str:
+    found = element.find(f"{{{S3_NAMESPACE}}}{tag}")
+    if found is None:
+        found = element.find(tag)
+    return (found.text or "") if found is not None else ""
+
+
+async def _raise_for_status(response: aiohttp.ClientResponse) -> None:
+    if response.status < 300:
+        return
+    body = await response.read()
+    code = message = ""
+    try:
+        root = ElementTree.fromstring(body)
+        code, message = _xml_text(root, "Code"), _xml_text(root, "Message")
+    except ElementTree.ParseError:
+        message = body[:200].decode("utf-8", "replace")
+    raise S3Error(response.status, code, message)
+
+
+class S3StorageProvider(StorageProvider):
+    """
+    Storage on any S3-compatible service (AWS S3, MinIO, R2...).
+
+    Lets API and worker nodes share files without a shared disk. Requests are
+    signed with SigV4 and go through one pooled aiohttp session per event
+    loop. Uploads of at least ``multipart_threshold`` bytes are sent as a
+    multipart upload with up to ``multipart_concurrency`` parts in flight
+    (and in memory) at a time; smaller ones are a single PUT. Downloads are
+    streamed and deletes are batched with DeleteObjects.
+    """
+
+    def __init__(
+        self,
+        bucket: Optional[str] = None,
+        endpoint_url: Optional[str] = None,
+        region: Optional[str] = None,
+        access_key: Optional[str] = None,
+        secret_key: Optional[str] = None,
+        addressing_style: Optional[str] = None,
+        key_prefix: Optional[str] = None,
+        public_url: Optional[str] = None,
+        multipart_threshold: Optional[int] = None,
+        part_size: Optional[int] = None,
+        multipart_concurrency: Optional[int] = None,
+        max_retries: Optional[int] = None
+    ):
+        self.bucket = bucket or settings.S3_BUCKET
+        if not self.bucket:
+            raise ValueError("S3_BUCKET must be set to use the S3 storage provider")
+        self.endpoint_url = (endpoint_url or settings.S3_ENDPOINT_URL).rstrip("/")
+        self.region = region or settings.S3_REGION
+        self.access_key = access_key or settings.S3_ACCESS_KEY_ID or ""
+        self.secret_key = secret_key or settings.S3_SECRET_ACCESS_KEY or ""
+        self.addressing_style = addressing_style or settings.S3_ADDRESSING_STYLE
+        if self.addressing_style not in ADDRESSING_STYLES:
+            raise ValueError(
+                f"Unknown S3 addressing style: {self.addressing_style} (expected one of {ADDRESSING_STYLES})"
+            )
+        self.key_prefix = (settings.S3_KEY_PREFIX if key_prefix is None else key_prefix).strip("/")
+
+        endpoint = urlsplit(self.endpoint_url)
+        if self.addressing_style == "virtual":
+            self.bucket_url = f"{endpoint.scheme}://{self.bucket}.{endpoint.netloc}"
+        else:
+            self.bucket_url = f"{self.endpoint_url}/{_quote(self.bucket)}"
+        self.public_url = (public_url or settings.S3_PUBLIC_URL or self.bucket_url).rstrip("/")
+
+        self.multipart_threshold = multipart_threshold or settings.S3_MULTIPART_THRESHOLD_MB * 1024 * 1024
+        self.part_size = part_size or settings.S3_MULTIPART_PART_SIZE_MB * 1024 * 1024
+        self.multipart_concurrency = multipart_concurrency or settings.S3_MULTIPART_CONCURRENCY
+        self.max_retries = settings.S3_MAX_RETRIES if max_retries is None else max_retries
+
+    def key_for(self, filename: str) -> str:
+        """Object key of a logical filename or of a URL returned by this provider."""
+        if filename.startswith(self.public_url + "/"):
+            return unquote(filename[len(self.public_url) + 1:].split("?", 1)[0])
+        filename = filename.lstrip("/")
+        return f"{self.key_prefix}/{filename}" if self.key_prefix else filename
+
+    def owns(self, url: str) -> bool:
+        return url.startswith(self.public_url + "/")
+
+    def url_for(self, filename: str) -> str:
+        return f"{self.public_url}/{_quote(self.key_for(filename), safe='/-_.~')}"
+
+    def _object_url(self, key: str = "", params: Optional[Dict[str, Optional[str]]] = None) -> str:
+        url = f"{self.bucket_url}/{_quote(key, safe='/-_.~')}"
+        if params:
+            url += "?" + "&".join(
+                _quote(name) if value is None else f"{_quote(name)}={_quote(str(value))}"
+                for name, value in params.items()
+            )
+        return url
+
+    async def _request(
+        self,
+        method: str,
+        key: str = "",
+        params: Optional[Dict[str, Optional[str]]] = None,
+        headers: Optional[Dict[str, str]] = None,
+        data: Optional[bytes] = None
+    ) -> aiohttp.ClientResponse:
+        """
+        Send a signed request; the caller must release the response.
+
+        Bodies are always bytes, so 5xx and connection errors are retried
+        with exponential backoff.
+        """
+        url = self._object_url(key, params)
+        attempt = 0
+        while True:
+            signed = sign_request(
+                method, url, headers or {}, self.access_key, self.secret_key, self.region
+            )
+            try:
+                response = await get_s3_session().request(
+                    method, URL(url, encoded=True), headers=signed, data=data
+                )
+            except (aiohttp.ClientConnectionError, asyncio.TimeoutError):
+                if attempt >= self.max_retries:
+                    raise
+            else:
+                if response.status not in _RETRY_STATUSES or attempt >= self.max_retries:
+                    return response
+                response.release()
+            attempt += 1
+            await asyncio.sleep(0.1 * 2 ** attempt)
+
+    async def _put_object(self, key: str, body: bytes, content_type: str) -> None:
+        async with await self._request("PUT", key, headers={"Content-Type": content_type}, data=body) as response:
+            await _raise_for_status(response)
+
+    async def _upload_part(
+        self,
+        key: str,
+        upload_id: str,
+        number: int,
+        body: bytes,
+        slots: asyncio.Semaphore
+    ) -> str:
+        try:
+            params = {"partNumber": str(number), "uploadId": upload_id}
+            async with await self._request("PUT", key, params=params, data=body) as response:
+                await _raise_for_status(response)
+                return response.headers["ETag"]
+        finally:
+            slots.release()
+
+    async def _multipart_upload(self, key: str, blocks: AsyncIterator[bytes], content_type: str) -> None:
+        async with await self._request(
+            "POST", key, params={"uploads": None}, headers={"Content-Type": content_type}, data=b""
+        ) as response:
+            await _raise_for_status(response)
+            upload_id = _xml_text(ElementTree.fromstring(await response.read()), "UploadId")
+
+        slots = asyncio.Semaphore(self.multipart_concurrency)
+        parts: List[asyncio.Task] = []
+        try:
+            async for body in blocks:
+                # Bounds the parts held in memory; a failed part stops the upload early
+                await slots.acquire()
+                for task in parts:
+                    if task.done() and task.exception() is not None:
+                        slots.release()
+                        raise task.exception()
+                parts.append(asyncio.create_task(
+                    self._upload_part(key, upload_id, len(parts) + 1, body, slots)
+                ))
+            etags = await asyncio.gather(*parts)
+
+            manifest = "".join(
+                f"<Part><PartNumber>{number}</PartNumber><ETag>{etag}</ETag></Part>"
+                for number, etag in enumerate(etags, start=1)
+            )
+            body = f"<CompleteMultipartUpload>{manifest}</CompleteMultipartUpload>".encode("utf-8")
+            async with await self._request("POST", key, params={"uploadId": upload_id}, data=body) as response:
+                await _raise_for_status(response)
+                # S3 may report a failed completion in a 200 response
+                payload = await response.read()
+                if b"<Error>" in payload:
+                    root = ElementTree.fromstring(payload)
+                    raise S3Error(response.status, _xml_text(root, "Code"), _xml_text(root, "Message"))
+        except BaseException:
+            for task in parts:
+                task.cancel()
+            await asyncio.gather(*parts, return_exceptions=True)
+            try:
+                async with await self._request("DELETE", key, params={"uploadId": upload_id}) as response:
+                    await _raise_for_status(response)
+            except Exception as e:
+                logger.warning(f"Could not abort multipart upload {upload_id} of {key}: {e}")
+            raise
+
+    async def _upload_blocks(self, key: str, blocks: AsyncIterator[bytes], content_type: str) -> None:
+        """Single PUT when the stream ends below the threshold, multipart otherwise."""
+        head: List[bytes] = []
+        size = 0
+        async for block in blocks:
+            head.append(block)
+            size += len(block)
+            if size >= self.multipart_threshold:
+                break
+        else:
+            await self._put_object(key, b"".join(head), content_type)
+            return
+
+        async def all_blocks() -> AsyncIterator[bytes]:
+            while head:
+                yield head.pop(0)
+            async for block in blocks:
+                yield block
+
+        await self._multipart_upload(key, all_blocks(), content_type)
+
+    async def upload(self, file_data: BinaryIO, filename: str, content_type: str = "image/png") -> str:
+        key = self.key_for(filename)
+        await self._upload_blocks(key, _blocks(_read_file(file_data, self.part_size), self.part_size), content_type)
+        return self.url_for(filename)
+
+    async def upload_stream(
+        self,
+        chunks: AsyncIterator[bytes],
+        filename: str,
+        content_type: str = "application/octet-stream"
+    ) -> str:
+        """Parts are uploaded while the stream is still being produced."""
+        key = self.key_for(filename)
+        await self._upload_blocks(key, _blocks(chunks, self.part_size), content_type)
+        return self.url_for(filename)
+
+    async def _head(self, key: str) -> Optional[ObjectInfo]:
+        async with await self._request("HEAD", key) as response:
+            if response.status == 404:
+                return None
+            await _raise_for_status(response)
+            last_modified = response.headers.get("Last-Modified")
+            return ObjectInfo(
+                size=int(response.headers.get("Content-Length", 0)),
+                etag=response.headers.get("ETag", ""),
+                last_modified=parsedate_to_datetime(last_modified).timestamp() if last_modified else 0.0
+            )
+
+    async def exists(self, filename: str) -> bool:
+        return await self._head(self.key_for(filename)) is not None
+
+    async def stat(self, url: str) -> Optional[ObjectInfo]:
+        if not self.owns(url):
+            return None
+        return await self._head(self.key_for(url))
+
+    async def read_stream(self, url: str, chunk_size: int = 1024 * 1024) -> AsyncIterator[bytes]:
+        """Stream the object body; the connection goes back to the pool at the end."""
+        if not self.owns(url):
+            raise FileNotFoundError(url)
+        async with await self._request("GET", self.key_for(url)) as response:
+            if response.status == 404:
+                raise FileNotFoundError(url)
+            await _raise_for_status(response)
+            async for chunk in response.content.iter_chunked(chunk_size):
+                yield chunk
+
+    async def delete(self, filename: str) -> bool:
+        try:
+            async with await self._request("DELETE", self.key_for(filename)) as response:
+                await _raise_for_status(response)
+                return True
+        except Exception as e:
+            logger.warning(f"S3 delete of {filename} failed: {e}")
+            return False
+
+    async def delete_many(self, filenames: Iterable[str]) -> int:
+        """DeleteObjects in batches of up to 1000 keys (quiet mode: only errors are reported)."""
+        keys = list(dict.fromkeys(self.key_for(filename) for filename in filenames))
+        deleted = 0
+        for start in range(0, len(keys), MAX_DELETE_KEYS):
+            batch = keys[start:start + MAX_DELETE_KEYS]
+            root = ElementTree.Element("Delete")
+            ElementTree.SubElement(root, "Quiet").text = "true"
+            for key in batch:
+                ElementTree.SubElement(ElementTree.SubElement(root, "Object"), "Key").text = key
+            body = ElementTree.tostring(root, encoding="utf-8")
+            headers = {
+                "Content-Type": "application/xml",
+                "Content-MD5": base64.b64encode(hashlib.md5(body).digest()).decode("ascii")
+            }
+            try:
+                async with await self._request("POST", params={"delete": None}, headers=headers, data=body) as response:
+                    await _raise_for_status(response)
+                    result = ElementTree.fromstring(await response.read())
+            except Exception as e:
+                logger.warning(f"S3 batch delete of {len(batch)} keys failed: {e}")
+                continue
+            errors = result.findall(f"{{{S3_NAMESPACE}}}Error") + result.findall("Error")
+            for error in errors:
+                logger.warning(f"S3 could not delete {_xml_text(error, 'Key')}: {_xml_text(error, 'Code')}")
+            deleted += len(batch) - len(errors)
+        return deleted
@@ -1,8 +1,13 @@
 from celery import Celery
-from celery.signals import worker_init, worker_shutdown, task_prerun, task_postrun
+from celery.concurrency import get_implementation
+from celery.signals import (
+    worker_init, worker_shutdown, worker_process_init, worker_process_shutdown,
+    task_prerun, task_postrun
+)
 from app.core.config import settings
+from app.core.executors import shutdown_io_thread_pool, shutdown_process_pool
+from app.worker.runtime import worker_runtime
 import logging
-import asyncio
 from typing import Any
 
 # Configurar logging
@@ -31,11 +36,19 @@ celery_app.conf.update(
     # Task routing
     task_routes={
         "app.worker.tasks.generate_book_content": {"queue": "book_generation"},
+        "app.worker.tasks.generate_book_story": {"queue": "book_generation"},
+        "app.worker.tasks.finalize_book_generation": {"queue": "book_generation"},
         "app.worker.tasks.generate_book_pdf": {"queue": "pdf_generation"},
         "app.worker.tasks.generate_book_images": {"queue": "image_generation"},
         "app.worker.tasks.*": {"queue": "default"}
     },
     
+    # Prioridades por fila (Redis: 0 = mais alta); o preview de PDF passa na frente do PDF de impressão
+    broker_transport_options={
+        "queue_order_strategy": "priority",
+        "priority_steps": list(range(10)),
+    },
+    
     # Worker configuration
     worker_concurrency=2,
     worker_prefetch_multiplier=1,
@@ -62,25 +75,51 @@ celery_app.conf.update(
             "task": "app.worker.tasks.cleanup_failed_books",
             "schedule": 3600.0,  # Every hour
         },
+        "collect-storage-garbage": {
+            "task": "app.worker.tasks.collect_storage_garbage",
+            "schedule": 3600.0,  # Every hour
+        },
+        "rollup-book-stats": {
+            "task": "app.worker.tasks.rollup_book_stats",
+            "schedule": float(settings.BOOK_STATS_ROLLUP_SECONDS),
+        },
     }
 )
 
 
+def _runs_tasks_in_worker_process(worker) -> bool:
+    """Indica se o pool do worker executa as tasks no próprio processo (solo/threads)."""
+    pool_cls = getattr(worker, "pool_cls", None)
+    if pool_cls is None:
+        return False
+    return get_implementation(pool_cls) in (get_implementation("solo"), get_implementation("threads"))
+
+
 @worker_init.connect
 def worker_init_handler(sender=None, **kwargs):
     """Inicialização do worker."""
     logger.info("Celery worker initialized")
     
-    # Verificar se há um loop de eventos ativo
-    try:
-        loop = asyncio.get_event_loop()
-        if loop.is_closed():
-            raise RuntimeError("Event loop is closed")
-    except RuntimeError:
-        # Criar novo loop para o worker
-        loop = asyncio.new_event_loop()
-        asyncio.set_event_loop(loop)
-        logger.info("Created new event loop for worker")
+    # Loop persistente só onde as tasks rodam: no prefork, o pai ainda vai fazer
+    # fork e os filhos herdariam um loop sem a thread que o executa; cada filho
+    # inicia o seu no worker_process_init
+    if _runs_tasks_in_worker_process(sender):
+        worker_runtime.start()
+
+
+@worker_process_init.connect
+def worker_process_init_handler(sender=None, **kwargs):
+    """Inicialização de cada processo filho do pool prefork."""
+    # start() detecta o fork e descarta o loop e o pool de conexões herdados do pai
+    worker_runtime.start()
+
+
+@worker_process_shutdown.connect
+def worker_process_shutdown_handler(sender=None, **kwargs):
+    """Limpeza de cada processo filho do pool prefork."""
+    worker_runtime.stop()
+    shutdown_process_pool()
+    shutdown_io_thread_pool()
 
 
 @worker_shutdown.connect
@@ -88,23 +127,12 @@ def worker_shutdown_handler(sender=None, **kwargs):
     """Limpeza no shutdown do worker."""
     logger.info("Celery worker shutting down")
     
-    # Fechar loop de eventos se existir
     try:
-        loop = asyncio.get_event_loop()
-        if not loop.is_closed():
-            # Cancelar tasks pendentes
-            pending_tasks = asyncio.all_tasks(loop)
-            for task in pending_tasks:
-                task.cancel()
-            
-            # Aguardar finalização das tasks canceladas
-            if pending_tasks:
-                loop.run_until_complete(asyncio.gather(*pending_tasks, return_exceptions=True))
-            
-            loop.close()
-            logger.info("Event loop closed")
+        worker_runtime.stop()
     except Exception as e:
         logger.error(f"Error closing event loop: {e}")
+    shutdown_process_pool()
+    shutdown_io_thread_pool()
 
 
 @task_prerun.connect
@@ -149,41 +177,19 @@ async def run_async_task(coro_func, *args, **kwargs) -> Any:
         Resultado da função async
     """
     try:
-        # Verificar se há loop de eventos
-        loop = asyncio.get_event_loop()
-        if loop.is_closed():
-            raise RuntimeError("Event loop is closed")
-    except RuntimeError:
-        # Criar novo loop se necessário
-        loop = asyncio.new_event_loop()
-        asyncio.set_event_loop(loop)
-    
-    try:
-        # Executar função async
-        result = await coro_func(*args, **kwargs)
-        return result
+        return await coro_func(*args, **kwargs)
     except Exception as e:
         logger.error(f"Error in async task: {e}", exc_info=True)
         raise
-    finally:
-        # Cleanup de tasks pendentes
-        pending_tasks = [task for task in asyncio.all_tasks(loop) if not task.done()]
-        if pending_tasks:
-            logger.warning(f"Cleaning up {len(pending_tasks)} pending tasks")
-            for task in pending_tasks:
-                task.cancel()
-            
-            # Aguardar cancelamento
-            try:
-                await asyncio.gather(*pending_tasks, return_exceptions=True)
-            except Exception as e:
-                logger.error(f"Error cleaning up tasks: {e}")
 
 
 def sync_run_async_task(coro_func, *args, **kwargs) -> Any:
     """
     Wrapper síncrono para executar funções async em tasks Celery.
     
+    A corrotina roda no loop persistente do processo worker, reaproveitando o pool
+    de conexões do banco, o cliente de IA e as sessões HTTP entre tasks.
+    
     Args:
         coro_func: Função async para executar
         *args: Argumentos posicionais  
@@ -192,35 +198,7 @@ def sync_run_async_task(coro_func, *args, **kwargs) -> Any:
     Returns:
         Resultado da função async
     """
-    try:
-        # Verificar se há loop de eventos ativo
-        loop = asyncio.get_event_loop()
-        if loop.is_running():
-            # Se o loop está rodando, criar task
-            return loop.create_task(run_async_task(coro_func, *args, **kwargs))
-    except RuntimeError:
-        pass
-    
-    # Criar novo loop e executar
-    loop = asyncio.new_event_loop()
-    asyncio.set_event_loop(loop)
-    
-    try:
-        return loop.run_until_complete(run_async_task(coro_func, *args, **kwargs))
-    finally:
-        # Cleanup do loop
-        try:
-            # Cancelar tasks pendentes
-            pending_tasks = asyncio.all_tasks(loop)
-            for task in pending_tasks:
-                task.cancel()
-            
-            if pending_tasks:
-                loop.run_until_complete(asyncio.gather(*pending_tasks, return_exceptions=True))
-        except Exception as e:
-            logger.error(f"Error during loop cleanup: {e}")
-        finally:
-            loop.close()
+    return worker_runtime.run(run_async_task, coro_func, *args, **kwargs)
 
 
 # Configurações específicas por ambiente
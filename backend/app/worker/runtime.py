@@ -0,0 +1,224 @@
+"""
+Runtime assíncrono persistente dos workers Celery.
+
+Cada processo worker mantém um único loop de eventos de longa duração, rodando em
+uma thread dedicada. Todas as tasks do processo executam suas corrotinas nesse loop,
+o que permite reaproveitar entre tasks o pool de conexões do SQLAlchemy (conexões
+asyncpg ficam presas ao loop em que foram abertas), o cliente de IA e as sessões HTTP.
+"""
+
+import asyncio
+import logging
+import os
+import threading
+from typing import Any, Awaitable, Callable, Optional
+
+logger = logging.getLogger(__name__)
+
+
+class WorkerRuntime:
+    """
+    Loop de eventos e recursos compartilhados de um processo worker.
+
+    O runtime é iniciado no `worker_process_init` de cada filho do prefork, no
+    `worker_init` dos pools solo/threads (ou sob demanda na primeira task) e
+    encerrado no `worker_shutdown`/`worker_process_shutdown`.
+    Após um fork o estado herdado do processo pai é descartado automaticamente.
+    """
+
+    def __init__(self):
+        self._lock = threading.RLock()
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+        self._thread: Optional[threading.Thread] = None
+        self._pid: Optional[int] = None
+        self._ai_service = None
+        self._http_session = None
+
+    @property
+    def loop(self) -> Optional[asyncio.AbstractEventLoop]:
+        """Loop do runtime no processo atual (None se não iniciado)."""
+        if self._pid != os.getpid():
+            return None
+        return self._loop
+
+    @property
+    def is_running(self) -> bool:
+        """Indica se o loop do runtime está ativo neste processo."""
+        loop = self.loop
+        return loop is not None and loop.is_running()
+
+    def start(self) -> asyncio.AbstractEventLoop:
+        """
+        Inicia o loop persistente (idempotente).
+
+        Returns:
+            Loop de eventos do runtime
+        """
+        with self._lock:
+            if self._pid is not None and self._pid != os.getpid():
+                self._reset_after_fork()
+
+            if self._loop is not None and not self._loop.is_closed():
+                return self._loop
+
+            loop = asyncio.new_event_loop()
+            started = threading.Event()
+            thread = threading.Thread(
+                target=self._run_loop,
+                args=(loop, started),
+                name="worker-runtime-loop",
+                daemon=True
+            )
+            thread.start()
+            started.wait()
+
+            self._loop = loop
+            self._thread = thread
+            self._pid = os.getpid()
+            logger.info(f"Worker runtime loop started (pid={self._pid})")
+            return loop
+
+    @staticmethod
+    def _run_loop(loop: asyncio.AbstractEventLoop, started: threading.Event) -> None:
+        asyncio.set_event_loop(loop)
+        loop.call_soon(started.set)
+        loop.run_forever()
+
+    def run(self, coro_func: Callable[..., Awaitable[Any]], *args, **kwargs) -> Any:
+        """
+        Executa uma função async no loop do runtime e aguarda o resultado.
+
+        Args:
+            coro_func: Função async para executar
+            *args: Argumentos posicionais
+            **kwargs: Argumentos nomeados
+
+        Returns:
+            Resultado da função async
+
+        Raises:
+            RuntimeError: Se chamado de dentro do próprio loop do runtime
+        """
+        loop = self.start()
+        if threading.current_thread() is self._thread:
+            raise RuntimeError("WorkerRuntime.run() não pode ser chamado de dentro do loop do runtime")
+
+        future = asyncio.run_coroutine_threadsafe(coro_func(*args, **kwargs), loop)
+        try:
+            return future.result()
+        except BaseException:
+            # Time limit do Celery ou interrupção: não deixar a corrotina órfã no loop
+            future.cancel()
+            raise
+
+    def stop(self, timeout: float = 10.0) -> None:
+        """
+        Fecha os recursos compartilhados e encerra o loop.
+
+        Args:
+            timeout: Tempo máximo (segundos) para o encerramento
+        """
+        with self._lock:
+            if self._pid is None:
+                return
+            if self._pid != os.getpid():
+                self._reset_after_fork()
+                return
+
+            loop, thread = self._loop, self._thread
+            if loop is None or loop.is_closed():
+                return
+
+            try:
+                asyncio.run_coroutine_threadsafe(self._aclose(), loop).result(timeout)
+            except Exception as e:
+                logger.error(f"Error closing worker runtime resources: {e}")
+
+            loop.call_soon_threadsafe(loop.stop)
+            if thread is not None:
+                thread.join(timeout)
+            if not loop.is_running():
+                loop.close()
+
+            self._loop = None
+            self._thread = None
+            self._pid = None
+            logger.info("Worker runtime loop stopped")
+
+    async def _aclose(self) -> None:
+        """Fecha sessões HTTP, clientes e o pool do banco dentro do loop."""
+        current = asyncio.current_task()
+        pending = [task for task in asyncio.all_tasks() if task is not current]
+        for task in pending:
+            task.cancel()
+        if pending:
+            await asyncio.gather(*pending, return_exceptions=True)
+
+        if self._http_session is not None:
+            await self._http_session.close()
+            self._http_session = None
+
+        from app.services.storage.s3 import close_s3_session
+        await close_s3_session()
+
+        close = getattr(self._ai_service, "aclose", None)
+        if close is not None:
+            await close()
+        self._ai_service = None
+
+        from app.core.database import engine
+        await engine.dispose()
+
+    def _reset_after_fork(self) -> None:
+        """
+        Descarta o estado herdado do processo pai.
+
+        A thread do loop não sobrevive ao fork e as conexões do pool pertencem ao pai,
+        então o pool é descartado sem fechar os sockets compartilhados.
+        """
+        self._loop = None
+        self._thread = None
+        self._pid = None
+        self._ai_service = None
+        self._http_session = None
+
+        from app.core.database import engine
+        engine.sync_engine.dispose(close=False)
+
+    def get_ai_service(self):
+        """
+        Retorna o cliente de IA compartilhado pelo processo.
+
+        Returns:
+            Provider de IA ou None se indisponível
+        """
+        if self._ai_service is None:
+            from app.services.ai.factory import AIServiceFactory
+            self._ai_service = AIServiceFactory.create_ai_service()
+        return self._ai_service
+
+    def get_http_session(self):
+        """
+        Retorna a sessão aiohttp compartilhada do runtime.
+
+        Só pode ser usada por corrotinas executando no loop do runtime; em qualquer
+        outro loop (ex.: API) retorna None e o chamador deve abrir sua própria sessão.
+
+        Returns:
+            aiohttp.ClientSession ou None fora do loop do runtime
+        """
+        try:
+            running = asyncio.get_running_loop()
+        except RuntimeError:
+            return None
+        if running is not self.loop:
+            return None
+
+        if self._http_session is None or self._http_session.closed:
+            import aiohttp
+            self._http_session = aiohttp.ClientSession()
+        return self._http_session
+
+
+# Instância global do runtime (uma por processo)
+worker_runtime = WorkerRuntime()
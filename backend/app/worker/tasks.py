@@ -2,28 +2,70 @@
 Tasks assíncronas para processamento de livros com gestão robusta de sessões.
 """
 
-from celery import Task
+from celery import Task, chord, group
 from celery.exceptions import Retry, MaxRetriesExceededError
 from app.worker.celery_app import celery_app, sync_run_async_task, get_async_session
-from app.services.ai.factory import AIServiceFactory
+from app.worker.runtime import worker_runtime
 from app.repositories.book_repository import BookRepository
 from app.repositories.user_repository import UserRepository
-from app.models.book import Book
+from app.repositories.checkpoint_repository import GenerationCheckpointRepository
+from app.repositories.blob_repository import BlobRepository
+from app.repositories.page_repository import PageRepository
+from app.repositories.stats_repository import BookStatsRepository
+from app.services.storage.content_addressed import blob_filename_from_url, is_content_addressed
+from app.models.book import Book, CheckpointStage
 from app.exceptions.base_exceptions import (
     BookNotFoundError,
     ExternalServiceError,
     ErrorCode
 )
 from sqlalchemy.ext.asyncio import AsyncSession
-from sqlalchemy import select, update
-from typing import Dict, Any, Optional, List
+from sqlalchemy import select
+from typing import Dict, Any, Optional, List, Callable, Awaitable, Tuple
+import asyncio
+import io
 import logging
 import json
-from datetime import datetime
+import re
+import weakref
+from datetime import datetime, timedelta, timezone
+from app.core.config import settings
 from app.services.notification_service import notification_service
 
 logger = logging.getLogger(__name__)
 
+# Marcador de início de página na história gerada ("Página 3:", "**Página 3**", "Page 3 -")
+_PAGE_MARKER_RE = re.compile(
+    r"^[ \t*#]*(?:P[áa]gina|Page)\s+(\d+)[ \t*]*[:.\-–]?[ \t*]*",
+    re.IGNORECASE | re.MULTILINE
+)
+
+# Tamanho máximo do texto de uma página (Page.text_content)
+_MAX_PAGE_TEXT_LENGTH = 2000
+
+# Semáforos de geração de imagens por event loop (limite global do processo worker)
+_worker_image_semaphores: "weakref.WeakKeyDictionary[asyncio.AbstractEventLoop, asyncio.Semaphore]" = (
+    weakref.WeakKeyDictionary()
+)
+
+
+def _send_ws_message_sync(user_id: Optional[int], message_type: str, data: Dict[str, Any]) -> None:
+    """
+    Envia uma mensagem WebSocket a partir de código síncrono (hooks do Celery).
+
+    send_ws_message é async: roda no loop do worker_runtime. Falhas na
+    notificação são apenas registradas, sem afetar o resultado da task.
+    """
+    try:
+        worker_runtime.run(
+            notification_service.send_ws_message,
+            user_id=user_id,
+            message_type=message_type,
+            data=data
+        )
+    except Exception as e:
+        logger.warning(f"Failed to send WebSocket message: {e}")
+
 
 class BaseTask(Task):
     """Task base com tratamento robusto de exceções."""
@@ -37,13 +79,14 @@ class BaseTask(Task):
             extra={
                 "task_id": task_id,
                 "exception": str(exc),
-                "args": args,
-                "kwargs": kwargs,
+                # "args" é reservado no LogRecord
+                "task_args": args,
+                "task_kwargs": kwargs,
                 "traceback": str(einfo)
             }
         )
         # Enviar notificação de falha via WebSocket
-        notification_service.send_ws_message(
+        _send_ws_message_sync(
             user_id=kwargs.get('user_id'), # Assumindo que user_id é passado como kwargs
             message_type="book_generation_update",
             data={
@@ -67,7 +110,7 @@ class BaseTask(Task):
             }
         )
         # Enviar notificação de retry via WebSocket
-        notification_service.send_ws_message(
+        _send_ws_message_sync(
             user_id=kwargs.get('user_id'),
             message_type="book_generation_update",
             data={
@@ -89,7 +132,7 @@ class BaseTask(Task):
             }
         )
         # Enviar notificação de sucesso via WebSocket
-        notification_service.send_ws_message(
+        _send_ws_message_sync(
             user_id=kwargs.get('user_id'),
             message_type="book_generation_update",
             data={
@@ -102,18 +145,613 @@ class BaseTask(Task):
         )
 
 
+class WorkflowStepTask(BaseTask):
+    """
+    Task intermediária do workflow de geração (história, imagem de página).
+
+    Não envia notificações de conclusão/retry do livro: apenas a task final
+    do workflow representa o livro como um todo.
+    """
+    
+    abstract = True
+    
+    def on_retry(self, exc, task_id, args, kwargs, einfo):
+        """Callback executado quando task é retentada."""
+        logger.warning(
+            f"Task {self.name} retrying",
+            extra={
+                "task_id": task_id,
+                "exception": str(exc),
+                "retry_count": self.request.retries,
+                "max_retries": self.max_retries
+            }
+        )
+    
+    def on_success(self, retval, task_id, args, kwargs):
+        """Callback executado quando task é bem-sucedida."""
+        logger.info(
+            f"Task {self.name} completed successfully",
+            extra={
+                "task_id": task_id,
+                "result": str(retval)[:200]
+            }
+        )
+
+
+def _build_story_prompt(book: Book) -> str:
+    """
+    Monta o prompt de geração da história do livro.
+
+    O formato pedido ("Página N:" no início de cada página) é o mesmo
+    esperado por ``_parse_story_into_pages``.
+
+    Args:
+        book: Livro a ser gerado
+
+    Returns:
+        Prompt de texto para o provider de IA
+    """
+    theme = book.description or "uma aventura divertida e educativa"
+    return (
+        f"Escreva uma história infantil em português do Brasil para um livro de colorir "
+        f"no estilo {book.style}, com exatamente {book.pages_count} páginas.\n"
+        f"Título: {book.title}\n"
+        f"Tema: {theme}\n\n"
+        f"Comece cada página com 'Página N:' em uma linha própria (N de 1 a {book.pages_count}) "
+        f"e use no máximo 3 frases curtas por página, descrevendo uma cena fácil de ilustrar."
+    )
+
+
+def _split_into_chunks(items: List[str], count: int) -> List[str]:
+    """
+    Distribui itens de texto em ``count`` blocos de tamanho aproximado.
+
+    Args:
+        items: Parágrafos ou frases
+        count: Número de blocos desejado
+
+    Returns:
+        Lista de blocos (pode ter menos de ``count`` se houver poucos itens)
+    """
+    if not items:
+        return []
+    size, remainder = divmod(len(items), count)
+    chunks = []
+    start = 0
+    for idx in range(count):
+        end = start + size + (1 if idx < remainder else 0)
+        if end > start:
+            chunks.append(" ".join(items[start:end]))
+        start = end
+    return chunks
+
+
+def _parse_story_into_pages(story_text: str, pages_count: int) -> List[Dict[str, Any]]:
+    """
+    Divide o texto da história nas páginas do livro.
+
+    Usa os marcadores "Página N:" quando presentes; caso contrário distribui
+    os parágrafos (ou frases) igualmente entre as páginas.
+
+    Args:
+        story_text: Texto completo retornado pela IA
+        pages_count: Número de páginas do livro
+
+    Returns:
+        Lista com exatamente ``pages_count`` dicts {"page_number", "text"}
+    """
+    matches = list(_PAGE_MARKER_RE.finditer(story_text))
+
+    if matches:
+        texts = []
+        for idx, match in enumerate(matches):
+            end = matches[idx + 1].start() if idx + 1 < len(matches) else len(story_text)
+            texts.append(story_text[match.end():end].strip())
+        texts = [text for text in texts if text]
+    else:
+        paragraphs = [p.strip() for p in re.split(r"\n\s*\n", story_text) if p.strip()]
+        if len(paragraphs) < pages_count:
+            paragraphs = [s.strip() for s in re.split(r"(?<=[.!?])\s+", story_text) if s.strip()]
+        texts = _split_into_chunks(paragraphs, pages_count)
+
+    # Páginas excedentes são anexadas à última página
+    if len(texts) > pages_count:
+        texts = texts[:pages_count - 1] + [" ".join(texts[pages_count - 1:])]
+    texts += [""] * (pages_count - len(texts))
+
+    return [
+        {"page_number": idx + 1, "text": text[:_MAX_PAGE_TEXT_LENGTH]}
+        for idx, text in enumerate(texts)
+    ]
+
+
+class _IncrementalPageParser:
+    """
+    Divide a história em páginas à medida que o texto chega em streaming.
+
+    A página N é considerada completa quando o marcador da página N+1 aparece.
+    A última página só é emitida no ``close()``, pois recebe o texto de páginas
+    excedentes; sem marcadores, nenhuma página é emitida antes do fim. O
+    resultado final é sempre idêntico a ``_parse_story_into_pages``.
+    """
+
+    def __init__(self, pages_count: int):
+        self.pages_count = pages_count
+        self._chunks: List[str] = []
+        self._emitted: List[Dict[str, Any]] = []
+        self._scan_from = 0
+
+    @property
+    def text(self) -> str:
+        """Texto recebido até o momento."""
+        return "".join(self._chunks)
+
+    def feed(self, chunk: str) -> List[Dict[str, Any]]:
+        """
+        Adiciona um trecho do stream.
+
+        Args:
+            chunk: Trecho de texto recebido do provider
+
+        Returns:
+            Páginas que ficaram completas com este trecho
+        """
+        self._chunks.append(chunk)
+        story_text = self.text
+        matches = list(_PAGE_MARKER_RE.finditer(story_text, self._scan_from))
+
+        new_pages = []
+        for idx in range(len(matches) - 1):
+            self._scan_from = matches[idx + 1].start()
+            page_text = story_text[matches[idx].end():matches[idx + 1].start()].strip()
+            if not page_text or len(self._emitted) >= self.pages_count - 1:
+                continue
+            page = {"page_number": len(self._emitted) + 1, "text": page_text[:_MAX_PAGE_TEXT_LENGTH]}
+            self._emitted.append(page)
+            new_pages.append(page)
+        return new_pages
+
+    def close(self) -> List[Dict[str, Any]]:
+        """
+        Finaliza o stream.
+
+        Returns:
+            Lista com exatamente ``pages_count`` páginas; as páginas já emitidas
+            são os mesmos dicts devolvidos por ``feed``
+        """
+        pages = _parse_story_into_pages(self.text, self.pages_count)
+        pages[:len(self._emitted)] = self._emitted
+        return pages
+
+
+def _build_image_prompt(page_text: str, style: str) -> str:
+    """
+    Monta o prompt de geração de imagem de uma página.
+
+    Args:
+        page_text: Texto da página
+        style: Estilo do livro
+
+    Returns:
+        Prompt de imagem (limitado a 1000 caracteres, como em Page.image_prompt)
+    """
+    prompt = (
+        f"Ilustração em estilo {style} para livro infantil de colorir, "
+        f"traços simples e contornos bem definidos. Cena: {page_text.strip()}"
+    )
+    return prompt[:1000]
+
+
+def _build_scene_prompt(page_text: str, style: str) -> str:
+    """
+    Monta o pedido à IA da descrição da cena ilustrada em uma página.
+
+    Args:
+        page_text: Texto da página
+        style: Estilo do livro
+
+    Returns:
+        Prompt de texto (a resposta alimenta ``_build_image_prompt``)
+    """
+    return (
+        f"Descreva em uma única frase curta, em português, a cena principal a ser ilustrada "
+        f"em estilo {style} para um livro infantil de colorir, com personagens, ação e cenário. "
+        f"Trecho da página: {page_text.strip()}"
+    )
+
+
+async def _refine_image_prompts(ai_service, pages_data: List[Dict[str, Any]], style: str) -> None:
+    """
+    Preenche o "image_prompt" das páginas com cenas descritas pela IA, em lote.
+
+    Usa uma única chamada de ``generate_text_batch`` por até
+    IMAGE_PROMPT_BATCH_SIZE páginas. Páginas cuja descrição falhar usam o
+    prompt montado a partir do texto. Páginas que já têm imagem ou prompt
+    são ignoradas.
+
+    Args:
+        ai_service: Provider de IA
+        pages_data: Páginas (dicts com a chave "text"), atualizadas no lugar
+        style: Estilo do livro
+    """
+    pending = [
+        page for page in pages_data
+        if not page.get("image_url") and not page.get("image_prompt") and page.get("text")
+    ]
+    if not settings.IMAGE_PROMPT_REFINEMENT or not pending:
+        return
+
+    batch_size = settings.IMAGE_PROMPT_BATCH_SIZE
+    for start in range(0, len(pending), batch_size):
+        batch = pending[start:start + batch_size]
+        try:
+            scenes = await ai_service.generate_text_batch(
+                [_build_scene_prompt(page["text"], style) for page in batch],
+                return_exceptions=True
+            )
+        except Exception as e:
+            logger.warning(f"Scene description batch failed, using page text: {e}")
+            scenes = [e] * len(batch)
+
+        for page, scene in zip(batch, scenes):
+            if isinstance(scene, Exception) or not scene.strip():
+                page["image_prompt"] = _build_image_prompt(page["text"], style)
+            else:
+                page["image_prompt"] = _build_image_prompt(scene, style)
+
+
+class _ImagePromptBatcher:
+    """
+    Agrupa as páginas que chegam ao pipeline de imagens em lotes de
+    ``_refine_image_prompts``.
+
+    Um lote é enviado ao atingir IMAGE_PROMPT_BATCH_SIZE páginas ou
+    IMAGE_PROMPT_BATCH_DELAY_MS após a primeira página pendente, de modo
+    que páginas submetidas juntas (ou quase juntas, em streaming) viram uma
+    única chamada ao provider.
+    """
+
+    def __init__(self, ai_service, style: str):
+        self.ai_service = ai_service
+        self.style = style
+        self._pending: List[Tuple[Dict[str, Any], asyncio.Future]] = []
+        self._timer: Optional[asyncio.TimerHandle] = None
+        self._batches: List[asyncio.Task] = []
+
+    async def refine(self, page_data: Dict[str, Any]) -> None:
+        """
+        Preenche o "image_prompt" da página, aguardando o lote dela.
+
+        Args:
+            page_data: Dict da página (chave "text")
+        """
+        loop = asyncio.get_running_loop()
+        future = loop.create_future()
+        self._pending.append((page_data, future))
+
+        if len(self._pending) >= settings.IMAGE_PROMPT_BATCH_SIZE:
+            self._flush()
+        elif self._timer is None:
+            self._timer = loop.call_later(settings.IMAGE_PROMPT_BATCH_DELAY_MS / 1000, self._flush)
+
+        await future
+
+    def _flush(self) -> None:
+        if self._timer is not None:
+            self._timer.cancel()
+            self._timer = None
+        batch, self._pending = self._pending, []
+        if batch:
+            self._batches.append(asyncio.create_task(self._run(batch)))
+
+    async def cancel(self) -> None:
+        """Cancela os lotes em andamento."""
+        if self._timer is not None:
+            self._timer.cancel()
+            self._timer = None
+        for task in self._batches:
+            task.cancel()
+        await asyncio.gather(*self._batches, return_exceptions=True)
+
+    async def _run(self, batch: List[Tuple[Dict[str, Any], asyncio.Future]]) -> None:
+        try:
+            await _refine_image_prompts(self.ai_service, [page for page, _ in batch], self.style)
+        finally:
+            for _, future in batch:
+                if not future.done():
+                    future.set_result(None)
+
+
+def _get_worker_image_semaphore() -> asyncio.Semaphore:
+    """
+    Retorna o semáforo que limita a geração de imagens no processo worker.
+
+    O semáforo é criado por event loop, já que primitivas asyncio não podem
+    ser compartilhadas entre loops diferentes.
+
+    Returns:
+        Semáforo compartilhado por todas as gerações do loop atual
+    """
+    loop = asyncio.get_running_loop()
+    semaphore = _worker_image_semaphores.get(loop)
+    if semaphore is None:
+        semaphore = asyncio.Semaphore(settings.IMAGE_GENERATION_CONCURRENCY_PER_WORKER)
+        _worker_image_semaphores[loop] = semaphore
+    return semaphore
+
+
+async def _generate_single_page_image(
+    ai_service,
+    storage_provider,
+    book_id: int,
+    page_number: int,
+    page_data: Dict[str, Any],
+    style: str
+) -> Dict[str, Any]:
+    """
+    Gera e salva a imagem de uma única página.
+
+    Args:
+        ai_service: Provider de IA usado para gerar a imagem
+        storage_provider: Provider de storage usado para salvar a imagem
+        book_id: ID do livro
+        page_number: Número da página (1-based)
+        page_data: Dict da página (chave "text" e, opcionalmente, o
+            "image_prompt" já refinado), atualizado com "image_prompt" e "image_url"
+        style: Estilo do livro
+
+    Returns:
+        O próprio ``page_data`` atualizado
+
+    Raises:
+        Exception: Qualquer falha do provider de IA ou do storage
+    """
+    image_prompt = page_data.get("image_prompt") or _build_image_prompt(page_data["text"], style)
+    page_data["image_prompt"] = image_prompt
+    image_bytes = await ai_service.generate_image(image_prompt, style)
+
+    filename = f"book_{book_id}_page_{page_number}_{datetime.utcnow().timestamp()}.png"
+    page_data["image_url"] = await storage_provider.upload(
+        io.BytesIO(image_bytes), filename, content_type="image/png"
+    )
+    return page_data
+
+
+class _PageImagePipeline:
+    """
+    Gera as imagens das páginas à medida que elas são submetidas.
+
+    Cada página é processada de forma isolada: uma falha apenas deixa
+    ``image_url`` como None para aquela página. Os dicts submetidos são
+    atualizados no próprio lugar. Páginas que já possuem ``image_url``
+    (restauradas de checkpoint) não são geradas novamente.
+    """
+
+    def __init__(
+        self,
+        ai_service,
+        storage_provider,
+        book_id: int,
+        style: str,
+        total_pages: int,
+        on_page_done: Optional[Callable[[int, int, int, bool], Awaitable[None]]] = None,
+        max_concurrency: Optional[int] = None
+    ):
+        """
+        Args:
+            ai_service: Provider de IA usado para gerar as imagens
+            storage_provider: Provider de storage usado para salvar as imagens
+            book_id: ID do livro
+            style: Estilo do livro
+            total_pages: Número total de páginas (para o progresso)
+            on_page_done: Callback async chamado a cada página finalizada com
+                (page_idx, páginas_concluídas, total_páginas, sucesso)
+            max_concurrency: Limite por livro (padrão: IMAGE_GENERATION_CONCURRENCY_PER_BOOK)
+        """
+        self.ai_service = ai_service
+        self.storage_provider = storage_provider
+        self.book_id = book_id
+        self.style = style
+        self.total_pages = total_pages
+        self.on_page_done = on_page_done
+        self.pages: Dict[int, Dict[str, Any]] = {}
+        self._book_semaphore = asyncio.Semaphore(
+            max_concurrency or settings.IMAGE_GENERATION_CONCURRENCY_PER_BOOK
+        )
+        self._worker_semaphore = _get_worker_image_semaphore()
+        self._prompt_batcher = _ImagePromptBatcher(ai_service, style)
+        self._tasks: List[asyncio.Task] = []
+        self._completed_pages = 0
+
+    def submit(self, page_idx: int, page_data: Dict[str, Any]) -> None:
+        """
+        Agenda a geração da imagem de uma página (no máximo uma vez por página).
+
+        Args:
+            page_idx: Índice da página (0-based)
+            page_data: Dict da página (chave "text")
+        """
+        if page_idx in self.pages:
+            return
+        self.pages[page_idx] = page_data
+        self._tasks.append(asyncio.create_task(self._process_page(page_idx, page_data)))
+
+    async def _process_page(self, page_idx: int, page_data: Dict[str, Any]) -> bool:
+        if page_data.get("image_url"):
+            success = True
+        else:
+            # Descrição da cena em lote com as demais páginas, antes de ocupar os semáforos
+            if settings.IMAGE_PROMPT_REFINEMENT and not page_data.get("image_prompt"):
+                await self._prompt_batcher.refine(page_data)
+            
+            # Ordem de aquisição fixa (livro -> worker) para evitar deadlocks
+            async with self._book_semaphore, self._worker_semaphore:
+                try:
+                    await _generate_single_page_image(
+                        self.ai_service, self.storage_provider, self.book_id,
+                        page_idx + 1, page_data, self.style
+                    )
+                    success = True
+                except Exception as e:
+                    logger.warning(f"Failed to generate image for page {page_idx + 1}: {e}")
+                    page_data["image_url"] = None
+                    success = False
+
+        self._completed_pages += 1
+        if self.on_page_done:
+            try:
+                await self.on_page_done(page_idx, self._completed_pages, self.total_pages, success)
+            except Exception as e:
+                logger.warning(f"Progress callback failed for page {page_idx + 1}: {e}")
+
+        return success
+
+    async def wait(self) -> int:
+        """
+        Aguarda todas as páginas submetidas.
+
+        Returns:
+            Número de imagens geradas (ou restauradas) com sucesso
+        """
+        results = await asyncio.gather(*self._tasks)
+        return sum(1 for success in results if success)
+
+    async def cancel(self) -> None:
+        """Cancela as páginas em andamento (ex.: falha no stream da história)."""
+        for task in self._tasks:
+            task.cancel()
+        await asyncio.gather(*self._tasks, return_exceptions=True)
+        await self._prompt_batcher.cancel()
+
+
+async def _generate_page_images(
+    ai_service,
+    storage_provider,
+    book_id: int,
+    style: str,
+    pages_data: List[Dict[str, Any]],
+    on_page_done: Optional[Callable[[int, int, int, bool], Awaitable[None]]] = None,
+    max_concurrency: Optional[int] = None
+) -> int:
+    """
+    Gera e salva as imagens das páginas com concorrência limitada.
+
+    Args:
+        ai_service: Provider de IA usado para gerar as imagens
+        storage_provider: Provider de storage usado para salvar as imagens
+        book_id: ID do livro
+        style: Estilo do livro
+        pages_data: Lista de páginas (dicts com a chave "text")
+        on_page_done: Callback async chamado a cada página finalizada com
+            (page_idx, páginas_concluídas, total_páginas, sucesso)
+        max_concurrency: Limite por livro (padrão: IMAGE_GENERATION_CONCURRENCY_PER_BOOK)
+
+    Returns:
+        Número de imagens geradas com sucesso
+    """
+    pipeline = _PageImagePipeline(
+        ai_service, storage_provider, book_id, style, len(pages_data),
+        on_page_done=on_page_done, max_concurrency=max_concurrency
+    )
+    for page_idx, page_data in enumerate(pages_data):
+        pipeline.submit(page_idx, page_data)
+    return await pipeline.wait()
+
+
+async def _stream_story_pages(
+    ai_service,
+    prompt: str,
+    pages_count: int,
+    image_pipeline: _PageImagePipeline
+) -> Tuple[str, List[Dict[str, Any]]]:
+    """
+    Gera a história em streaming, submetendo cada página ao pipeline de
+    imagens assim que o texto dela estiver completo.
+
+    Args:
+        ai_service: Provider de IA usado para gerar a história
+        prompt: Prompt da história
+        pages_count: Número de páginas do livro
+        image_pipeline: Pipeline que recebe as páginas completas
+
+    Returns:
+        Tupla (texto completo da história, páginas)
+
+    Raises:
+        Exception: Falha do provider (as imagens em andamento são canceladas)
+    """
+    parser = _IncrementalPageParser(pages_count)
+    try:
+        async for chunk in ai_service.generate_text_stream(prompt):
+            for page in parser.feed(chunk):
+                image_pipeline.submit(page["page_number"] - 1, page)
+    except BaseException:
+        await image_pipeline.cancel()
+        raise
+    return parser.text, parser.close()
+
+
+async def _save_book_pages(
+    session: AsyncSession,
+    book_id: int,
+    pages_data: List[Dict[str, Any]]
+) -> None:
+    """
+    Salva as páginas geradas do livro, substituindo as páginas anteriores.
+
+    As páginas são gravadas com um único upsert em (book_id, page_number);
+    só páginas que deixaram de existir são removidas à parte.
+
+    Args:
+        session: Sessão de banco da task
+        book_id: ID do livro
+        pages_data: Páginas na ordem, com "text", "image_prompt" e "image_url"
+    """
+    page_repo = PageRepository(session)
+    previous = await page_repo.get_image_urls(book_id)
+    pages = [
+        {
+            "page_number": page_data.get("page_number", page_idx + 1),
+            "text_content": page_data.get("text"),
+            "image_prompt": page_data.get("image_prompt"),
+            "image_url": page_data.get("image_url")
+        }
+        for page_idx, page_data in enumerate(pages_data)
+    ]
+    await page_repo.upsert_pages(book_id, pages)
+    stale = set(previous) - {page["page_number"] for page in pages}
+    if stale:
+        await page_repo.delete_pages(book_id, stale)
+    # Imagens repetidas (retries, livros clonados) apontam para o mesmo blob
+    await BlobRepository(session).replace(
+        previous.values(), [page["image_url"] for page in pages]
+    )
+
+
 async def _generate_book_content_async(
     book_id: int,
     user_id: int, # Adicionado user_id para notificações
-    progress_callback: Optional[callable] = None
+    progress_callback: Optional[callable] = None,
+    attempt: Optional[int] = None,
+    task_id: Optional[str] = None,
+    last_try: bool = True
 ) -> Dict[str, Any]:
     """
     Lógica assíncrona para geração de conteúdo do livro.
     
+    A saída de cada etapa (história, páginas, imagem de cada página) é
+    gravada como checkpoint da tentativa; ao retentar a mesma tentativa,
+    etapas e páginas já concluídas são puladas.
+    
     Args:
         book_id: ID do livro
         user_id: ID do usuário proprietário do livro para notificações
         progress_callback: Callback para reportar progresso
+        attempt: Tentativa de geração (padrão: nova tentativa)
+        task_id: ID da task Celery (para notificações)
+        last_try: Sem retries restantes: falhas marcam o livro como falhado.
+            Se False, o erro original é relançado para a task retentar a
+            mesma tentativa
         
     Returns:
         Dict com resultado da geração
@@ -125,6 +763,7 @@ async def _generate_book_content_async(
     async with get_async_session() as session:
         book_repo = BookRepository(session)
         user_repo = UserRepository(session) # Instantiate UserRepo
+        checkpoint_repo = GenerationCheckpointRepository(session)
         
         try:
             # 1. Buscar livro e usuário
@@ -135,6 +774,8 @@ async def _generate_book_content_async(
             if not user:
                 logger.error(f"User {user_id} not found for book {book_id}. Cannot send notifications.")
                 # Continue without user-specific notifications if user is missing
+            if attempt is None:
+                attempt = await checkpoint_repo.get_latest_attempt(book_id) + 1
             
             if progress_callback:
                 progress_callback({
@@ -145,7 +786,7 @@ async def _generate_book_content_async(
                     "user_id": user_id
                 })
             if user: # Only send WS if user is found
-                notification_service.send_ws_message(
+                await notification_service.send_ws_message(
                     user_id=user_id,
                     message_type="book_generation_update",
                     data={
@@ -157,8 +798,9 @@ async def _generate_book_content_async(
                 )
             
             # 2. Atualizar status para processamento
-            await book_repo.update_status(book_id, "processing")
-            await session.commit()
+            if book.status != "processing":
+                await book_repo.update_status(book_id, "processing")
+                await session.commit()
             
             if progress_callback:
                 progress_callback({
@@ -169,7 +811,7 @@ async def _generate_book_content_async(
                     "user_id": user_id
                 })
             if user: # Only send WS if user is found
-                notification_service.send_ws_message(
+                await notification_service.send_ws_message(
                     user_id=user_id,
                     message_type="book_generation_update",
                     data={
@@ -180,11 +822,93 @@ async def _generate_book_content_async(
                     }
                 )
             
-            # 3. Gerar história com IA
-            ai_service = AIServiceFactory.create_ai_service()
+            # 3. Gerar história com IA (ou restaurar do checkpoint). Em streaming, a imagem
+            # de cada página começa assim que o texto da página fica completo
+            ai_service = worker_runtime.get_ai_service()
+            
+            from app.services.storage.factory import StorageServiceFactory
+            storage_provider = StorageServiceFactory.create_storage()
+            
+            # A sessão não suporta uso concorrente entre as páginas
+            checkpoint_lock = asyncio.Lock()
+            saved_images = {}
+            
+            async def _on_page_done(page_idx: int, completed: int, total: int, success: bool):
+                """Grava o checkpoint e notifica o progresso de cada página finalizada."""
+                page_data = image_pipeline.pages[page_idx]
+                if success and page_data["page_number"] not in saved_images:
+                    async with checkpoint_lock:
+                        await checkpoint_repo.save_payload(
+                            book_id,
+                            attempt,
+                            CheckpointStage.PAGE_IMAGE,
+                            {
+                                "image_url": page_data["image_url"],
+                                "image_prompt": page_data.get("image_prompt")
+                            },
+                            page_number=page_data["page_number"]
+                        )
+                        await session.commit()
+                if progress_callback:
+                    progress_callback({
+                        "current": 4,
+                        "total": 5,
+                        "status": "Gerando imagens",
+                        "book_id": book_id,
+                        "user_id": user_id,
+                        "pages_completed": completed,
+                        "pages_total": total
+                    })
+                if not user: # Only send WS if user is found
+                    return
+                if success:
+                    await notification_service.send_ws_message(
+                        user_id=user_id,
+                        message_type="book_generation_update",
+                        data={
+                            "book_id": book_id,
+                            "status": "processing",
+                            "progress": 80 + (20 * completed / total), # Progress entre 80-100
+                            "message": f"Imagem da página {page_idx + 1} gerada ({completed} de {total})",
+                            "current_step": "generating_images",
+                            "page_number": page_idx + 1
+                        }
+                    )
+                else:
+                    await notification_service.send_ws_message(
+                        user_id=user_id,
+                        message_type="book_generation_update",
+                        data={
+                            "book_id": book_id,
+                            "status": "processing",
+                            "progress": 80 + (20 * completed / total),
+                            "message": f"Falha ao gerar imagem para página {page_idx + 1}. Prosseguindo...",
+                            "current_step": "generating_images_error",
+                            "page_number": page_idx + 1
+                        }
+                    )
+            
+            image_pipeline = _PageImagePipeline(
+                ai_service,
+                storage_provider,
+                book_id,
+                book.style,
+                book.pages_count,
+                on_page_done=_on_page_done
+            )
             
-            story_prompt = _build_story_prompt(book)
-            story_text = await ai_service.generate_text(story_prompt)
+            story_text = await checkpoint_repo.get_payload(book_id, attempt, CheckpointStage.STORY)
+            pages_data = None
+            if story_text is None:
+                # Imagens de um stream anterior interrompido pertencem a outra história
+                await checkpoint_repo.delete_page_images(book_id, attempt)
+                story_text, pages_data = await _stream_story_pages(
+                    ai_service, _build_story_prompt(book), book.pages_count, image_pipeline
+                )
+                async with checkpoint_lock:
+                    await checkpoint_repo.save_payload(book_id, attempt, CheckpointStage.STORY, story_text)
+                    await checkpoint_repo.save_payload(book_id, attempt, CheckpointStage.PAGES, pages_data)
+                    await session.commit()
             
             if progress_callback:
                 progress_callback({
@@ -195,7 +919,7 @@ async def _generate_book_content_async(
                     "user_id": user_id
                 })
             if user: # Only send WS if user is found
-                notification_service.send_ws_message(
+                await notification_service.send_ws_message(
                     user_id=user_id,
                     message_type="book_generation_update",
                     data={
@@ -206,8 +930,18 @@ async def _generate_book_content_async(
                     }
                 )
             
-            # 4. Processar e salvar páginas
-            pages_data = _parse_story_into_pages(story_text, book.pages_count)
+            # 4. Processar páginas restauradas do checkpoint; imagens já enviadas ao storage
+            # nesta tentativa só valem para a mesma história
+            if pages_data is None:
+                pages_data = await checkpoint_repo.get_payload(book_id, attempt, CheckpointStage.PAGES)
+                if pages_data is None:
+                    pages_data = _parse_story_into_pages(story_text, book.pages_count)
+                    await checkpoint_repo.save_payload(book_id, attempt, CheckpointStage.PAGES, pages_data)
+                    await session.commit()
+                
+                saved_images = await checkpoint_repo.get_page_images(book_id, attempt)
+                for page_data in pages_data:
+                    page_data.update(saved_images.get(page_data["page_number"], {}))
             
             if progress_callback:
                 progress_callback({
@@ -218,7 +952,7 @@ async def _generate_book_content_async(
                     "user_id": user_id
                 })
             if user: # Only send WS if user is found
-                notification_service.send_ws_message(
+                await notification_service.send_ws_message(
                     user_id=user_id,
                     message_type="book_generation_update",
                     data={
@@ -229,61 +963,17 @@ async def _generate_book_content_async(
                     }
                 )
             
-            # 5. Gerar imagens para cada página
-            images_generated = 0
-            total_pages = len(pages_data)
-            
-            from app.services.storage.factory import StorageServiceFactory
-            storage_provider = StorageServiceFactory.create_storage()
-            
+            # 5. Gerar imagens das páginas restantes (em paralelo, com concorrência limitada)
             for page_idx, page_data in enumerate(pages_data):
-                try:
-                    image_prompt = _build_image_prompt(page_data["text"], book.style)
-                    image_bytes = await ai_service.generate_image(image_prompt, book.style)
-                    
-                    # Salvar imagem usando Storage Service
-                    import io
-                    file_data = io.BytesIO(image_bytes)
-                    filename = f"book_{book_id}_page_{page_idx+1}_{datetime.utcnow().timestamp()}.png"
-                    image_url = await storage_provider.upload(file_data, filename, content_type="image/png")
-                    
-                    page_data["image_url"] = image_url
-                    images_generated += 1
-                    
-                    # Notificação de progresso da imagem
-                    if user: # Only send WS if user is found
-                        await notification_service.send_ws_message(
-                            user_id=user_id,
-                            message_type="book_generation_update",
-                            data={
-                                "book_id": book_id,
-                                "status": "processing",
-                                "progress": 80 + (20 * (page_idx + 1) / total_pages), # Progress entre 80-100
-                                "message": f"Gerando imagem para página {page_idx + 1} de {total_pages}",
-                                "current_step": "generating_images"
-                            }
-                        )
-                        
-                except Exception as e:
-                    logger.warning(f"Failed to generate image for page {page_idx + 1}: {e}")
-                    page_data["image_url"] = None
-                    if user: # Only send WS if user is found
-                        await notification_service.send_ws_message(
-                            user_id=user_id,
-                            message_type="book_generation_update",
-                            data={
-                                "book_id": book_id,
-                                "status": "processing",
-                                "message": f"Falha ao gerar imagem para página {page_idx + 1}. Prosseguindo...",
-                                "current_step": "generating_images_error"
-                            }
-                        )
+                image_pipeline.submit(page_idx, page_data)
+            images_generated = await image_pipeline.wait()
             
             # 6. Salvar dados no banco
             await _save_book_pages(session, book_id, pages_data)
             
-            # 7. Atualizar status final
+            # 7. Atualizar status final e descartar checkpoints
             await book_repo.update_status(book_id, "completed")
+            await checkpoint_repo.delete_by_book(book_id)
             await session.commit()
             
             if progress_callback:
@@ -308,7 +998,7 @@ async def _generate_book_content_async(
                 await notification_service.notify_book_generation_completed(
                     user=user,
                     book_id=book_id,
-                    task_id=self.request.id,
+                    task_id=task_id,
                     book_title=book.title
                 )
             
@@ -323,6 +1013,11 @@ async def _generate_book_content_async(
         except Exception as e:
             logger.error(f"Error generating book content for book {book_id}: {e}", exc_info=True)
             
+            # Erro transitório com retries restantes: o livro segue em processamento
+            # e a task retenta reaproveitando os checkpoints desta tentativa
+            if not last_try and not isinstance(e, BookNotFoundError):
+                raise
+            
             # Marcar livro como falhado
             try:
                 await book_repo.update_status(book_id, "failed")
@@ -335,7 +1030,7 @@ async def _generate_book_content_async(
                 await notification_service.notify_book_generation_failed(
                     user=user,
                     book_id=book_id,
-                    task_id=self.request.id,
+                    task_id=task_id,
                     book_title=book.title,
                     error_message=f"Falha na geração: {str(e)}"
                 )
@@ -352,13 +1047,14 @@ async def _generate_book_content_async(
 
 
 @celery_app.task(bind=True, base=BaseTask, max_retries=3, default_retry_delay=60)
-def generate_book_content(self, book_id: int, user_id: int) -> Dict[str, Any]: # Adicionado user_id aqui
+def generate_book_content(self, book_id: int, user_id: int, attempt: Optional[int] = None) -> Dict[str, Any]: # Adicionado user_id aqui
     """
     Task para gerar conteúdo completo do livro.
     
     Args:
         book_id: ID do livro para gerar
         user_id: ID do usuário proprietário do livro
+        attempt: Tentativa de geração cujos checkpoints serão reaproveitados
         
     Returns:
         Dict com resultado da operação
@@ -371,53 +1067,663 @@ def generate_book_content(self, book_id: int, user_id: int) -> Dict[str, Any]: #
                 meta=progress_info
             )
         
+        # Fixar a tentativa para que retries reaproveitem os mesmos checkpoints
+        if attempt is None:
+            attempt = sync_run_async_task(_next_generation_attempt, book_id)
+        
         # Executar geração assíncrona
-        result = sync_run_async_task(_generate_book_content_async, book_id, user_id, progress_callback)
-        
-        # Enviar notificação final se a task não falhou antes
-        if self.request.state != "FAILED":
-            notification_service.send_ws_message(
-                user_id=user_id,
-                message_type="book_generation_update",
-                data={
-                    "book_id": book_id,
-                    "task_id": self.request.id,
-                    "status": "completed",
-                    "progress": 100,
-                    "message": "Geração do livro finalizada!"
-                }
-            )
+        result = sync_run_async_task(
+            _generate_book_content_async, book_id, user_id, progress_callback, attempt, self.request.id,
+            last_try=self.request.retries >= self.max_retries
+        )
+        
+        # Enviar notificação final (falhas levantam exceção antes daqui)
+        _send_ws_message_sync(
+            user_id=user_id,
+            message_type="book_generation_update",
+            data={
+                "book_id": book_id,
+                "task_id": self.request.id,
+                "status": "completed",
+                "progress": 100,
+                "message": "Geração do livro finalizada!"
+            }
+        )
+        _dispatch_book_pdfs_after_generation(book_id, user_id)
         return result
         
-    except (BookNotFoundError, ExternalServiceError) as e:
-        # Erros que não devem ser retentados
+    except BookNotFoundError as e:
+        # Erro que não deve ser retentado
         logger.error(f"Non-retryable error in book generation: {e}")
         # A notificação de falha já foi enviada no on_failure da BaseTask
         raise
         
     except Exception as e:
-        # Outros erros podem ser retentados
-        logger.error(f"Retryable error in book generation: {e}")
-        try:
-            raise self.retry(exc=e)
-        except MaxRetriesExceededError:
-            logger.error(f"Max retries exceeded for book {book_id}")
-            # A notificação de falha já foi enviada no on_failure da BaseTask
-            raise ExternalServiceError(
-                message="Falha na geração após múltiplas tentativas",
-                service="book_generation",
-                original_error=e
+        # Falhas de IA (ExternalServiceError) e demais erros são retentados com a
+        # mesma tentativa, reaproveitando os checkpoints já gravados
+        if self.request.retries < self.max_retries:
+            logger.error(f"Retryable error in book generation: {e}")
+            raise self.retry(
+                exc=e,
+                kwargs={"book_id": book_id, "user_id": user_id, "attempt": attempt}
+            )
+        logger.error(f"Max retries exceeded for book {book_id}: {e}")
+        # O livro já foi marcado como falhado na última tentativa; a notificação
+        # de falha é enviada no on_failure da BaseTask
+        if isinstance(e, ExternalServiceError):
+            raise
+        raise ExternalServiceError(
+            message="Falha na geração após múltiplas tentativas",
+            service="book_generation",
+            original_error=e
+        )
+
+
+async def _next_generation_attempt(book_id: int) -> int:
+    """
+    Retorna o número da próxima tentativa de geração do livro.
+    
+    Args:
+        book_id: ID do livro
+        
+    Returns:
+        Última tentativa com checkpoints + 1
+    """
+    async with get_async_session() as session:
+        return await GenerationCheckpointRepository(session).get_latest_attempt(book_id) + 1
+
+
+async def _mark_book_failed(book_id: int) -> None:
+    """
+    Marca o livro como falhado (usado quando o workflow desiste).
+    
+    Args:
+        book_id: ID do livro
+    """
+    async with get_async_session() as session:
+        try:
+            await BookRepository(session).update_status(book_id, "failed")
+            await session.commit()
+        except Exception as e:
+            logger.error(f"Failed to update book status to failed for book {book_id}: {e}")
+
+
+async def _stream_story_with_early_images(
+    session: AsyncSession,
+    checkpoint_repo: GenerationCheckpointRepository,
+    ai_service,
+    book: Book,
+    user_id: int,
+    attempt: int
+) -> Tuple[str, List[Dict[str, Any]]]:
+    """
+    Gera a história em streaming e já gera as imagens das páginas completas.
+    
+    As imagens geradas durante o stream são gravadas como checkpoint, então
+    o chord de imagens só recebe as páginas que ficaram para o fim (a última
+    página, ou todas se o texto vier sem marcadores) e as que falharam.
+    
+    Args:
+        session: Sessão de banco da task
+        checkpoint_repo: Repository de checkpoints da sessão
+        ai_service: Provider de IA
+        book: Livro a ser gerado
+        user_id: ID do usuário proprietário do livro
+        attempt: Tentativa de geração
+        
+    Returns:
+        Tupla (texto completo da história, páginas)
+    """
+    from app.services.storage.factory import StorageServiceFactory
+    
+    # Imagens de um stream anterior interrompido pertencem a outra história
+    await checkpoint_repo.delete_page_images(book.id, attempt)
+    
+    # A sessão não suporta uso concorrente entre as páginas
+    checkpoint_lock = asyncio.Lock()
+    
+    async def _on_page_done(page_idx: int, completed: int, total: int, success: bool):
+        if not success:
+            return
+        page_data = image_pipeline.pages[page_idx]
+        async with checkpoint_lock:
+            await checkpoint_repo.save_payload(
+                book.id,
+                attempt,
+                CheckpointStage.PAGE_IMAGE,
+                {"image_url": page_data["image_url"], "image_prompt": page_data.get("image_prompt")},
+                page_number=page_data["page_number"]
             )
+            await session.commit()
+        await notification_service.send_ws_message(
+            user_id=user_id,
+            message_type="book_generation_update",
+            data={
+                "book_id": book.id,
+                "status": "processing",
+                "message": f"Imagem da página {page_data['page_number']} gerada",
+                "current_step": "generating_images",
+                "page_number": page_data["page_number"]
+            }
+        )
+    
+    image_pipeline = _PageImagePipeline(
+        ai_service,
+        StorageServiceFactory.create_storage(),
+        book.id,
+        book.style,
+        book.pages_count,
+        on_page_done=_on_page_done
+    )
+    story_text, pages_data = await _stream_story_pages(
+        ai_service, _build_story_prompt(book), book.pages_count, image_pipeline
+    )
+    await image_pipeline.wait()
+    return story_text, pages_data
+
+
+async def _generate_book_story_async(book_id: int, user_id: int, attempt: int) -> Dict[str, Any]:
+    """
+    Etapa 1 do workflow: gera a história e divide em páginas.
+    
+    História e páginas são restauradas dos checkpoints da tentativa quando
+    existirem; páginas cuja imagem já foi enviada ao storage voltam com
+    ``image_url`` preenchida.
+    
+    Args:
+        book_id: ID do livro
+        user_id: ID do usuário proprietário do livro
+        attempt: Tentativa de geração
+        
+    Returns:
+        Dict com o estilo do livro e a lista de páginas
+        
+    Raises:
+        BookNotFoundError: Se livro não for encontrado
+        ExternalServiceError: Se serviço de IA não estiver disponível
+    """
+    async with get_async_session() as session:
+        book_repo = BookRepository(session)
+        checkpoint_repo = GenerationCheckpointRepository(session)
+        
+        book = await book_repo.get(book_id)
+        if not book:
+            raise BookNotFoundError(book_id)
+        
+        if book.status != "processing":
+            await book_repo.update_status(book_id, "processing")
+            await session.commit()
+        
+        await notification_service.send_ws_message(
+            user_id=user_id,
+            message_type="book_generation_update",
+            data={
+                "book_id": book_id,
+                "status": "processing",
+                "progress": 20,
+                "message": "Gerando história e conteúdo das páginas..."
+            }
+        )
+        
+        pages_data = await checkpoint_repo.get_payload(book_id, attempt, CheckpointStage.PAGES)
+        if pages_data is None:
+            ai_service = worker_runtime.get_ai_service()
+            story_text = await checkpoint_repo.get_payload(book_id, attempt, CheckpointStage.STORY)
+            if story_text is None:
+                if not ai_service:
+                    raise ExternalServiceError(
+                        message="Serviço de IA indisponível",
+                        service="ai_provider"
+                    )
+                story_text, pages_data = await _stream_story_with_early_images(
+                    session, checkpoint_repo, ai_service, book, user_id, attempt
+                )
+                await checkpoint_repo.save_payload(book_id, attempt, CheckpointStage.STORY, story_text)
+            else:
+                pages_data = _parse_story_into_pages(story_text, book.pages_count)
+            
+            # Cenas das páginas que irão para o chord, descritas em lote
+            if ai_service:
+                await _refine_image_prompts(ai_service, pages_data, book.style)
+            
+            await checkpoint_repo.save_payload(book_id, attempt, CheckpointStage.PAGES, pages_data)
+            await session.commit()
+        
+        saved_images = await checkpoint_repo.get_page_images(book_id, attempt)
+        for page_data in pages_data:
+            page_data.update(saved_images.get(page_data["page_number"], {}))
+        
+        await notification_service.send_ws_message(
+            user_id=user_id,
+            message_type="book_generation_update",
+            data={
+                "book_id": book_id,
+                "status": "processing",
+                "progress": 40,
+                "message": f"História pronta. Gerando imagens de {len(pages_data)} páginas..."
+            }
+        )
+        
+        return {"style": book.style, "pages": pages_data, "attempt": attempt}
+
+
+async def _generate_page_image_step_async(
+    book_id: int,
+    user_id: int,
+    page_data: Dict[str, Any],
+    style: str,
+    attempt: Optional[int] = None
+) -> Dict[str, Any]:
+    """
+    Etapa 2 do workflow: gera e salva a imagem de uma página.
+    
+    Se a imagem já foi enviada ao storage nesta tentativa, o checkpoint é
+    reaproveitado sem chamar o provider de IA.
+    
+    Args:
+        book_id: ID do livro
+        user_id: ID do usuário proprietário do livro
+        page_data: Dict da página ("page_number" e "text")
+        style: Estilo do livro
+        attempt: Tentativa de geração
+        
+    Returns:
+        Dict da página com "image_prompt" e "image_url"
+    """
+    from app.services.storage.factory import StorageServiceFactory
+    
+    page_number = page_data["page_number"]
+    
+    async with get_async_session() as session:
+        checkpoint_repo = GenerationCheckpointRepository(session)
+        
+        if attempt is not None:
+            saved_image = await checkpoint_repo.get_payload(
+                book_id, attempt, CheckpointStage.PAGE_IMAGE, page_number=page_number
+            )
+            if saved_image:
+                page_data.update(saved_image)
+                return page_data
+        
+        await _generate_single_page_image(
+            worker_runtime.get_ai_service(),
+            StorageServiceFactory.create_storage(),
+            book_id,
+            page_number,
+            page_data,
+            style
+        )
+        
+        if attempt is not None:
+            await checkpoint_repo.save_payload(
+                book_id,
+                attempt,
+                CheckpointStage.PAGE_IMAGE,
+                {"image_url": page_data["image_url"], "image_prompt": page_data.get("image_prompt")},
+                page_number=page_number
+            )
+            await session.commit()
+    
+    await notification_service.send_ws_message(
+        user_id=user_id,
+        message_type="book_generation_update",
+        data={
+            "book_id": book_id,
+            "status": "processing",
+            "message": f"Imagem da página {page_data['page_number']} gerada",
+            "current_step": "generating_images",
+            "page_number": page_data["page_number"]
+        }
+    )
+    return page_data
+
+
+async def _finalize_book_generation_async(
+    book_id: int,
+    user_id: int,
+    pages_data: List[Dict[str, Any]],
+    task_id: Optional[str] = None,
+    attempt: Optional[int] = None
+) -> Dict[str, Any]:
+    """
+    Etapa 3 do workflow: salva as páginas e marca o livro como concluído.
+    
+    Páginas que não passaram pelo chord (imagem restaurada de checkpoint)
+    são completadas a partir dos checkpoints da tentativa.
+    
+    Args:
+        book_id: ID do livro
+        user_id: ID do usuário proprietário do livro
+        pages_data: Resultados das tasks de imagem (um dict por página)
+        task_id: ID da task de finalização (para notificações)
+        attempt: Tentativa de geração
+        
+    Returns:
+        Dict com resultado da geração
+    """
+    async with get_async_session() as session:
+        book_repo = BookRepository(session)
+        user_repo = UserRepository(session)
+        checkpoint_repo = GenerationCheckpointRepository(session)
+        
+        book = await book_repo.get(book_id)
+        if not book:
+            raise BookNotFoundError(book_id)
+        
+        pages_by_number = {}
+        if attempt is not None:
+            saved_pages = await checkpoint_repo.get_payload(book_id, attempt, CheckpointStage.PAGES) or []
+            saved_images = await checkpoint_repo.get_page_images(book_id, attempt)
+            for page in saved_pages:
+                page.update(saved_images.get(page["page_number"], {}))
+                pages_by_number[page["page_number"]] = page
+        for page in pages_data:
+            pages_by_number[page["page_number"]] = page
+        
+        pages_data = [pages_by_number[number] for number in sorted(pages_by_number)]
+        images_generated = sum(1 for page in pages_data if page.get("image_url"))
+        
+        await _save_book_pages(session, book_id, pages_data)
+        await book_repo.update_status(book_id, "completed")
+        await checkpoint_repo.delete_by_book(book_id)
+        await session.commit()
+        
+        # Falhas de notificação não devem desfazer um livro já concluído
+        try:
+            user = await user_repo.get(user_id)
+            if user:
+                await notification_service.notify_book_generation_completed(
+                    user=user,
+                    book_id=book_id,
+                    task_id=task_id,
+                    book_title=book.title
+                )
+        except Exception as e:
+            logger.warning(f"Failed to send completion notification for book {book_id}: {e}")
+    
+    return {
+        "status": "success",
+        "book_id": book_id,
+        "pages_generated": len(pages_data),
+        "images_generated": images_generated,
+        "message": f"Livro {book_id} gerado com sucesso"
+    }
+
+
+@celery_app.task(bind=True, base=WorkflowStepTask, max_retries=3, default_retry_delay=60)
+def generate_book_story(self, book_id: int, user_id: int, attempt: Optional[int] = None):
+    """
+    Etapa 1 do workflow de geração: história e divisão em páginas.
+    
+    Ao terminar, a task é substituída por um chord: uma task
+    ``generate_book_images`` por página pendente (fila image_generation) e
+    ``finalize_book_generation`` como callback. Assim, retries são por
+    página e não refazem a história nem as demais imagens.
+    
+    Args:
+        book_id: ID do livro para gerar
+        user_id: ID do usuário proprietário do livro
+        attempt: Tentativa de geração cujos checkpoints serão reaproveitados
+    """
+    try:
+        # Fixar a tentativa para que retries reaproveitem os mesmos checkpoints
+        if attempt is None:
+            attempt = sync_run_async_task(_next_generation_attempt, book_id)
+        
+        story = sync_run_async_task(_generate_book_story_async, book_id, user_id, attempt)
+        
+    except BookNotFoundError as e:
+        logger.error(f"Non-retryable error in story generation: {e}")
+        raise
+        
+    except Exception as e:
+        # Com exc, o retry esgotado relança e (não MaxRetriesExceededError):
+        # a desistência é decidida aqui, antes de retentar
+        if self.request.retries < self.max_retries:
+            logger.error(f"Retryable error in story generation for book {book_id}: {e}")
+            raise self.retry(
+                exc=e,
+                kwargs={"book_id": book_id, "user_id": user_id, "attempt": attempt}
+            )
+        logger.error(f"Max retries exceeded for story of book {book_id}: {e}")
+        sync_run_async_task(_mark_book_failed, book_id)
+        raise ExternalServiceError(
+            message="Falha na geração da história após múltiplas tentativas",
+            service="book_generation",
+            original_error=e
+        )
+    
+    finalize = finalize_book_generation.s(book_id=book_id, user_id=user_id, attempt=attempt)
+    pending_pages = [page for page in story["pages"] if not page.get("image_url")]
+    
+    # Todas as imagens já estão nos checkpoints: apenas finalizar
+    if not pending_pages:
+        raise self.replace(finalize.clone(args=([],)))
+    
+    page_tasks = group(
+        generate_book_images.s(
+            book_id=book_id,
+            user_id=user_id,
+            page_number=page["page_number"],
+            page_text=page["text"],
+            style=story["style"],
+            attempt=attempt,
+            image_prompt=page.get("image_prompt")
+        )
+        for page in pending_pages
+    )
+    raise self.replace(chord(page_tasks, finalize))
+
+
+@celery_app.task(bind=True, base=WorkflowStepTask, max_retries=3, default_retry_delay=10)
+def generate_book_images(
+    self,
+    book_id: int,
+    user_id: int,
+    page_number: int,
+    page_text: str,
+    style: str,
+    attempt: Optional[int] = None,
+    image_prompt: Optional[str] = None
+) -> Dict[str, Any]:
+    """
+    Etapa 2 do workflow de geração: imagem de uma página.
+    
+    Falhas são retentadas apenas para esta página. Esgotadas as tentativas,
+    a página segue sem imagem para não bloquear o restante do livro.
+    
+    Args:
+        book_id: ID do livro
+        user_id: ID do usuário proprietário do livro
+        page_number: Número da página
+        page_text: Texto da página
+        style: Estilo do livro
+        attempt: Tentativa de geração (para checkpoint da imagem)
+        image_prompt: Prompt de imagem já descrito na etapa da história
+        
+    Returns:
+        Dict da página com "image_url" (None se a imagem falhou)
+    """
+    page_data = {"page_number": page_number, "text": page_text}
+    if image_prompt:
+        page_data["image_prompt"] = image_prompt
+    
+    try:
+        return sync_run_async_task(
+            _generate_page_image_step_async, book_id, user_id, page_data, style, attempt
+        )
+    except Exception as e:
+        if self.request.retries < self.max_retries:
+            logger.warning(f"Image generation failed for page {page_number} of book {book_id}: {e}")
+            raise self.retry(exc=e)
+        
+        logger.error(f"Giving up image for page {page_number} of book {book_id}: {e}")
+        page_data["image_url"] = None
+        return page_data
+
+
+@celery_app.task(bind=True, base=BaseTask, max_retries=3, default_retry_delay=30)
+def finalize_book_generation(
+    self,
+    pages_data: List[Dict[str, Any]],
+    book_id: int,
+    user_id: int,
+    attempt: Optional[int] = None
+) -> Dict[str, Any]:
+    """
+    Etapa 3 do workflow de geração (callback do chord).
+    
+    Args:
+        pages_data: Resultados das tasks de imagem, na ordem das páginas
+        book_id: ID do livro
+        user_id: ID do usuário proprietário do livro
+        attempt: Tentativa de geração
+        
+    Returns:
+        Dict com resultado da operação
+    """
+    try:
+        result = sync_run_async_task(
+            _finalize_book_generation_async, book_id, user_id, pages_data, self.request.id, attempt
+        )
+        
+    except BookNotFoundError:
+        raise
+        
+    except Exception as e:
+        logger.error(f"Error finalizing book {book_id}: {e}")
+        if self.request.retries < self.max_retries:
+            raise self.retry(exc=e)
+        sync_run_async_task(_mark_book_failed, book_id)
+        raise ExternalServiceError(
+            message="Falha ao salvar as páginas do livro",
+            service="book_generation",
+            original_error=e
+        )
+    
+    _dispatch_book_pdfs_after_generation(book_id, user_id)
+    return result
+
+
+def dispatch_book_generation(book_id: int, user_id: int, attempt: Optional[int] = None):
+    """
+    Enfileira a geração do livro conforme ``BOOK_GENERATION_MODE``.
+    
+    - ``canvas``: história -> chord de imagens por página -> finalização
+    - ``single``: task única ``generate_book_content``
+    
+    Args:
+        book_id: ID do livro
+        user_id: ID do usuário proprietário do livro
+        attempt: Tentativa de geração (reutilizar uma tentativa anterior
+            retoma a partir dos seus checkpoints)
+        
+    Returns:
+        AsyncResult da task inicial (o ID acompanha o workflow até o fim)
+    """
+    task_kwargs = {"book_id": book_id, "user_id": user_id, "attempt": attempt}
+    
+    if settings.BOOK_GENERATION_MODE == "canvas":
+        return generate_book_story.apply_async(kwargs=task_kwargs)
+    
+    return generate_book_content.apply_async(kwargs=task_kwargs)
+
+
+PDF_VARIANTS = ("preview", "print")
+
+
+async def _generate_book_pdf_async(book_id: int, variant: str = "print") -> str:
+    """
+    Gera uma variante do PDF do livro e registra seu caminho.
+    
+    - ``preview``: perfil PDF_PREVIEW_PROFILE, salvo em `pdf_preview_file`
+    - ``print``: perfil PDF_IMAGE_PROFILE, salvo em `pdf_file`
+    
+    A renderização roda no pool de processos de mídia e o arquivo é enviado
+    ao storage em chunks (ver PDFService.generate_book_pdf).
+    
+    Args:
+        book_id: ID do livro
+        variant: Variante do PDF ("preview" ou "print")
+        
+    Returns:
+        Caminho/URL do PDF gerado
+    """
+    from app.services.pdf_service import PDFService
+    from app.services.storage.factory import StorageServiceFactory
+    
+    if variant not in PDF_VARIANTS:
+        raise ValueError(f"Variante de PDF inválida: {variant}")
+    preview = variant == "preview"
+    
+    async with get_async_session() as session:
+        book_repo = BookRepository(session)
+        book = await book_repo.get_with_pages(book_id)
+        if not book:
+            raise BookNotFoundError(book_id)
+        
+        pdf_path = await PDFService.generate_book_pdf(
+            book,
+            StorageServiceFactory.create_storage(),
+            profile=settings.PDF_PREVIEW_PROFILE if preview else settings.PDF_IMAGE_PROFILE,
+            filename=f"book_{book_id}_preview.pdf" if preview else f"book_{book_id}.pdf"
+        )
+        previous_path = book.pdf_preview_file if preview else book.pdf_file
+        if preview:
+            book.pdf_preview_file = pdf_path
+        else:
+            book.pdf_file = pdf_path
+        # PDF renderizado de novo com o mesmo conteúdo reaproveita o blob
+        await BlobRepository(session).replace([previous_path], [pdf_path])
+        await session.commit()
+    
+    return pdf_path
+
+
+def dispatch_book_pdfs(book_id: int, user_id: int) -> Dict[str, Any]:
+    """
+    Enfileira os PDFs do livro na fila pdf_generation.
+    
+    O preview (baixa resolução) entra com prioridade alta para ficar pronto
+    logo após a geração; o PDF de impressão segue com prioridade baixa.
+    
+    Args:
+        book_id: ID do livro
+        user_id: ID do usuário proprietário do livro
+        
+    Returns:
+        Dict variante -> AsyncResult da task enfileirada
+    """
+    results = {}
+    if settings.PDF_PREVIEW_ENABLED:
+        results["preview"] = generate_book_pdf.apply_async(
+            kwargs={"book_id": book_id, "user_id": user_id, "variant": "preview"},
+            priority=settings.PDF_PREVIEW_PRIORITY
+        )
+    results["print"] = generate_book_pdf.apply_async(
+        kwargs={"book_id": book_id, "user_id": user_id, "variant": "print"},
+        priority=settings.PDF_PRINT_PRIORITY
+    )
+    return results
+
+
+def _dispatch_book_pdfs_after_generation(book_id: int, user_id: int) -> None:
+    """Enfileira os PDFs de um livro recém-concluído sem falhar a geração."""
+    try:
+        dispatch_book_pdfs(book_id, user_id)
+    except Exception as e:
+        logger.error(f"Failed to enqueue PDFs for book {book_id}: {e}")
 
 
 @celery_app.task(bind=True, base=BaseTask, max_retries=2)
-def generate_book_pdf(self, book_id: int, user_id: int) -> Dict[str, Any]:
+def generate_book_pdf(self, book_id: int, user_id: int, variant: str = "print") -> Dict[str, Any]:
     """
     Task para gerar PDF do livro.
     
     Args:
         book_id: ID do livro
         user_id: ID do usuário proprietário do livro
+        variant: "preview" (rápido, baixa resolução) ou "print" (alta resolução)
         
     Returns:
         Dict com resultado da geração de PDF
@@ -438,7 +1744,7 @@ def generate_book_pdf(self, book_id: int, user_id: int) -> Dict[str, Any]:
 
             pdf_path = None
             try:
-                pdf_path = await _generate_book_pdf_async(book_id) # This now returns pdf path
+                pdf_path = await _generate_book_pdf_async(book_id, variant)
                 
                 if user:
                     # WebSocket message for general update
@@ -449,18 +1755,23 @@ def generate_book_pdf(self, book_id: int, user_id: int) -> Dict[str, Any]:
                             "book_id": book_id,
                             "task_id": self.request.id,
                             "status": "completed",
-                            "message": "PDF do livro gerado com sucesso!",
+                            "variant": variant,
+                            "message": (
+                                "Pré-visualização do PDF pronta!" if variant == "preview"
+                                else "PDF do livro gerado com sucesso!"
+                            ),
                             "pdf_path": pdf_path
                         }
                     )
-                    # Email notification for completion
-                    await notification_service.notify_pdf_generation_completed(
-                        user=user,
-                        book_id=book_id,
-                        book_title=book.title,
-                        pdf_url=pdf_path
-                    )
-                return {"status": "success", "pdf_path": pdf_path}
+                    # Email notification only for the final (print) PDF
+                    if variant == "print":
+                        await notification_service.notify_pdf_generation_completed(
+                            user=user,
+                            book_id=book_id,
+                            book_title=book.title,
+                            pdf_url=pdf_path
+                        )
+                return {"status": "success", "variant": variant, "pdf_path": pdf_path}
             except Exception as e:
                 logger.error(f"Error in PDF generation for book {book_id}: {e}", exc_info=True)
                 if user:
@@ -472,9 +1783,11 @@ def generate_book_pdf(self, book_id: int, user_id: int) -> Dict[str, Any]:
                             "book_id": book_id,
                             "task_id": self.request.id,
                             "status": "failed",
+                            "variant": variant,
                             "message": f"Falha ao gerar PDF: {str(e)}"
                         }
                     )
+                if user and variant == "print":
                     # Email notification for failure
                     # Since notify_pdf_generation_completed implies success, we'll send a direct email here for failure
                     await notification_service._send_email_notification(
@@ -517,6 +1830,7 @@ def cleanup_failed_books(self) -> Dict[str, int]:
     async def _cleanup_async():
         async with get_async_session() as session:
             book_repo = BookRepository(session)
+            blob_repo = BlobRepository(session)
             from app.models.book import Book # Import Book model here for filtering
             from datetime import timedelta
             
@@ -538,16 +1852,20 @@ def cleanup_failed_books(self) -> Dict[str, int]:
             failed_books = failed_books_query.scalars().all()
             
             cleaned_count = 0
+            orphan_files = []
             for book in failed_books:
                 # Delete associated image files (if any and if we have page details)
                 # This assumes pages are still linked to the book for their image_url
                 # For simplicity, we'll try to delete book's cover_image and pdf_file directly.
                 # A more robust solution would iterate through pages if they were still available.
                 
-                if book.cover_image:
-                    await storage_provider.delete(book.cover_image)
-                if book.pdf_file:
-                    await storage_provider.delete(book.pdf_file)
+                # Blobs endereçados por conteúdo podem ser compartilhados: só liberam a
+                # referência e o GC de storage apaga o arquivo quando ninguém mais usa
+                await blob_repo.release_book(book)
+                orphan_files.extend(
+                    url for url in (book.cover_image, book.pdf_file, book.pdf_preview_file)
+                    if url and not is_content_addressed(url)
+                )
                 
                 # Delete the book record itself
                 await book_repo.delete(book.id)
@@ -556,6 +1874,10 @@ def cleanup_failed_books(self) -> Dict[str, int]:
             
             await session.commit()
             
+            # Arquivos removidos em lote depois do commit
+            if orphan_files:
+                await storage_provider.delete_many(orphan_files)
+            
             logger.info(f"Cleanup task executed. Cleaned {cleaned_count} failed books.")
             
             return {"cleaned": cleaned_count, "checked": len(failed_books)}
@@ -569,6 +1891,91 @@ def cleanup_failed_books(self) -> Dict[str, int]:
         raise
 
 
+async def _collect_storage_garbage_async(storage_provider=None) -> Dict[str, int]:
+    """
+    Remove do storage os blobs sem referências há mais de STORAGE_GC_GRACE_HOURS.
+    
+    O registro do blob é removido condicionalmente: um upload concorrente do
+    mesmo conteúdo renova ``updated_at`` e faz a remoção falhar, preservando
+    o arquivo. Os arquivos são apagados antes do commit, enquanto a transação
+    ainda segura os registros removidos: um registro concorrente da mesma URL
+    espera o commit, é recriado e reenvia o arquivo (ContentAddressedStorage).
+    
+    Args:
+        storage_provider: Provider de storage (padrão: StorageServiceFactory)
+        
+    Returns:
+        Dict com blobs verificados e removidos
+    """
+    from app.services.storage.factory import StorageServiceFactory
+    
+    storage = storage_provider or StorageServiceFactory.create_storage()
+    cutoff = datetime.now(timezone.utc) - timedelta(hours=settings.STORAGE_GC_GRACE_HOURS)
+    claimed = []
+    
+    async with get_async_session() as session:
+        blob_repo = BlobRepository(session)
+        candidates = await blob_repo.get_collectable(cutoff, limit=settings.STORAGE_GC_BATCH_SIZE)
+        for blob in candidates:
+            if await blob_repo.claim_unreferenced(blob.id, cutoff):
+                claimed.append(blob.url)
+        
+        # Uma remoção em lote no storage (DeleteObjects no S3) para todo o lote;
+        # se falhar, o rollback devolve os registros para a próxima coleta
+        deleted = await storage.delete_many(blob_filename_from_url(url) for url in claimed)
+        await session.commit()
+    
+    if deleted < len(claimed):
+        logger.warning(f"Storage GC: {len(claimed) - deleted} claimed blobs were not deleted")
+    
+    return {"checked": len(candidates), "deleted": deleted}
+
+
+@celery_app.task(bind=True, base=BaseTask)
+def collect_storage_garbage(self) -> Dict[str, int]:
+    """
+    Task periódica do GC de blobs endereçados por conteúdo.
+    
+    Returns:
+        Dict com estatísticas da coleta
+    """
+    try:
+        result = sync_run_async_task(_collect_storage_garbage_async)
+        logger.info(f"Storage GC completed: {result}")
+        return result
+    except Exception as e:
+        logger.error(f"Error in storage GC task: {e}")
+        raise
+
+
+async def _rollup_book_stats_async() -> Dict[str, int]:
+    """
+    Recalcula os contadores globais de book_stats a partir dos contadores dos usuários.
+    
+    Returns:
+        Dict com o número de contadores globais gravados
+    """
+    async with get_async_session() as session:
+        updated = await BookStatsRepository(session).rollup_global()
+        await session.commit()
+    return {"updated": updated}
+
+
+@celery_app.task(bind=True, base=BaseTask)
+def rollup_book_stats(self) -> Dict[str, int]:
+    """
+    Task periódica (BOOK_STATS_ROLLUP_SECONDS) dos contadores globais de livros.
+    
+    Returns:
+        Dict com estatísticas do rollup
+    """
+    try:
+        return sync_run_async_task(_rollup_book_stats_async)
+    except Exception as e:
+        logger.error(f"Error in book stats rollup task: {e}")
+        raise
+
+
 @celery_app.task(bind=True, base=BaseTask)
 def health_check(self) -> Dict[str, Any]:
     """
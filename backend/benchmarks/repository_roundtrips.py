@@ -0,0 +1,117 @@
+#!/usr/bin/env python3
+"""
+Conta os comandos SQL emitidos pelo BookRepository ao longo de uma geração.
+
+Reproduz as chamadas de repository de uma geração no modo canvas (criação
+pela API, início da geração, task da história e finalização) e compara o
+repository atual (INSERT/UPDATE ... RETURNING) com o comportamento antigo
+(`create` com flush + refresh; `update` com SELECT, atribuição, flush e
+refresh). Cada comando é uma ida e volta ao banco.
+
+Usa SQLite em memória com uma sessão síncrona por baixo da interface async
+dos repositories: a contagem de comandos é a mesma no PostgreSQL.
+
+Uso:
+    python benchmarks/repository_roundtrips.py
+"""
+
+import asyncio
+import sys
+from collections import Counter
+from pathlib import Path
+from typing import List, Tuple
+
+# Adicionar o diretório do backend ao Python path
+sys.path.insert(0, str(Path(__file__).parent.parent))
+
+from sqlalchemy import create_engine, event
+from sqlalchemy.orm import Session
+
+import app.models  # noqa: F401 (registra todos os modelos)
+from app.models.book import Book
+from app.repositories.book_repository import BookRepository
+
+
+class SyncSessionAdapter:
+    """Interface async mínima usada pelos repositories sobre uma Session síncrona."""
+
+    def __init__(self, session: Session):
+        self.session = session
+
+    async def execute(self, *args, **kwargs):
+        return self.session.execute(*args, **kwargs)
+
+    async def flush(self):
+        self.session.flush()
+
+    async def refresh(self, instance):
+        self.session.refresh(instance)
+
+    def add(self, instance):
+        self.session.add(instance)
+
+
+class LegacyBookRepository(BookRepository):
+    """Reprodução do comportamento antigo: flush + refresh e SELECT antes do UPDATE."""
+
+    async def create(self, **kwargs):
+        instance = await super().create(**kwargs)
+        await self.db.refresh(instance)
+        return instance
+
+    async def update(self, id, **kwargs):
+        return await self._update_loaded(id, **kwargs)
+
+
+async def run_generation(repo: BookRepository) -> List[Tuple[str, int]]:
+    """Chamadas de repository de uma geração; retorna (etapa, comandos)."""
+    steps = []
+
+    async def step(name, coro):
+        before = len(statements)
+        result = await coro
+        steps.append((name, len(statements) - before))
+        return result
+
+    book = await step("API: create", repo.create(
+        title="O Gato Aventureiro", user_id=1, pages_count=8, style="cartoon", status="draft"
+    ))
+    await step("API: get (start)", repo.get(book.id))
+    await step("API: update_status processing", repo.update_status(book.id, "processing"))
+    await step("worker: get (história)", repo.get(book.id))
+    await step("worker: get (finalização)", repo.get(book.id))
+    await step("worker: update_status completed", repo.update_status(book.id, "completed"))
+    return steps
+
+
+statements: List[str] = []
+
+
+def measure(repo_class) -> List[Tuple[str, int]]:
+    engine = create_engine("sqlite://")
+    Book.__table__.create(engine)
+    event.listen(engine, "before_cursor_execute", lambda *args: statements.append(args[2].split()[0]))
+    with Session(engine, expire_on_commit=False) as session:
+        return asyncio.run(run_generation(repo_class(SyncSessionAdapter(session))))
+
+
+def main() -> None:
+    results = {}
+    for label, repo_class in (("antigo", LegacyBookRepository), ("RETURNING", BookRepository)):
+        statements.clear()
+        results[label] = measure(repo_class)
+        results[label + "_kinds"] = Counter(statements)
+
+    print(f"\n{'etapa':<34} {'antigo':>7} {'RETURNING':>10}")
+    for (name, legacy), (_, current) in zip(results["antigo"], results["RETURNING"]):
+        print(f"{name:<34} {legacy:>7} {current:>10}")
+    print(
+        f"{'total por geração':<34} {sum(n for _, n in results['antigo']):>7} "
+        f"{sum(n for _, n in results['RETURNING']):>10}"
+    )
+    for label in ("antigo", "RETURNING"):
+        print(f"{label}: {dict(results[label + '_kinds'])}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,112 @@
+#!/usr/bin/env python3
+"""
+Benchmark de uploads concorrentes no storage local: lag do loop de eventos.
+
+Compara o modo antigo do `LocalStorageProvider.upload` (open/copyfileobj direto
+na coroutine, bloqueando o loop durante toda a escrita) com o provider atual,
+que executa a cópia em chunks no pool de threads de I/O e grava via arquivo
+temporário + rename. Um "ticker" dorme 1ms em loop e registra o atraso de cada
+despertar: é o tempo que qualquer outra coroutine (requisições, heartbeats do
+worker) teria esperado.
+
+Uso:
+    python benchmarks/storage_io_benchmark.py --uploads 200 --size-kb 2048
+    python benchmarks/storage_io_benchmark.py --uploads 50 --fsync dir
+"""
+
+import argparse
+import asyncio
+import io
+import os
+import shutil
+import statistics
+import sys
+import tempfile
+import time
+from pathlib import Path
+from typing import List, Optional
+
+# Adicionar o diretório do backend ao Python path
+sys.path.insert(0, str(Path(__file__).parent.parent))
+
+from app.core.executors import shutdown_io_thread_pool
+from app.services.storage.local import LocalStorageProvider
+
+
+class LegacyLocalStorage(LocalStorageProvider):
+    """Reprodução do comportamento antigo: escrita bloqueante dentro do async def."""
+
+    async def upload(self, file_data, filename, content_type="image/png"):
+        file_path = self.public_dir / filename
+        with open(file_path, "wb") as buffer:
+            shutil.copyfileobj(file_data, buffer)
+        return f"/uploads/{filename}"
+
+
+async def _ticker(lags: List[float], stop: asyncio.Event, interval: float = 0.001) -> None:
+    """Mede o atraso de cada despertar do loop em relação ao esperado (ms)."""
+    loop = asyncio.get_running_loop()
+    while not stop.is_set():
+        start = loop.time()
+        await asyncio.sleep(interval)
+        lags.append(max(0.0, (loop.time() - start - interval) * 1000))
+
+
+async def run_uploads(storage: LocalStorageProvider, uploads: int, payload: bytes, concurrency: int):
+    lags: List[float] = []
+    stop = asyncio.Event()
+    ticker = asyncio.create_task(_ticker(lags, stop))
+    semaphore = asyncio.Semaphore(concurrency)
+
+    async def upload(n: int) -> None:
+        async with semaphore:
+            await storage.upload(io.BytesIO(payload), f"bench_{n}.bin", "application/octet-stream")
+
+    start = time.perf_counter()
+    await asyncio.gather(*(upload(n) for n in range(uploads)))
+    elapsed = time.perf_counter() - start
+    stop.set()
+    await ticker
+    return elapsed, lags
+
+
+def report(label: str, elapsed: float, lags: List[float], uploads: int, size: int) -> None:
+    lags = sorted(lags) or [0.0]
+    p99 = lags[max(0, int(len(lags) * 0.99) - 1)]
+    throughput = uploads * size / elapsed / (1024 * 1024)
+    print(
+        f"{label:<34} {throughput:8.1f} MB/s  lag p50={statistics.median(lags):7.2f}ms  "
+        f"p99={p99:7.2f}ms  max={lags[-1]:7.2f}ms  ticks={len(lags)}"
+    )
+
+
+def main(argv: Optional[List[str]] = None) -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--uploads", type=int, default=200, help="Número de uploads")
+    parser.add_argument("--size-kb", type=int, default=2048, help="Tamanho de cada arquivo (KB)")
+    parser.add_argument("--concurrency", type=int, default=16, help="Uploads simultâneos")
+    parser.add_argument("--fsync", default="file", choices=["none", "file", "dir"], help="Política de fsync do provider novo")
+    args = parser.parse_args(argv)
+
+    payload = os.urandom(args.size_kb * 1024)
+    workdir = tempfile.mkdtemp(prefix="storage_bench_")
+    cwd = os.getcwd()
+    os.chdir(workdir)
+    try:
+        print(f"\n== {args.uploads} uploads de {args.size_kb}KB, {args.concurrency} simultâneos ==")
+        legacy = LegacyLocalStorage(fsync_policy="none")
+        elapsed, lags = asyncio.run(run_uploads(legacy, args.uploads, payload, args.concurrency))
+        report("bloqueante (antigo)", elapsed, lags, args.uploads, len(payload))
+
+        for policy in dict.fromkeys(["none", args.fsync]):
+            storage = LocalStorageProvider(fsync_policy=policy)
+            elapsed, lags = asyncio.run(run_uploads(storage, args.uploads, payload, args.concurrency))
+            report(f"pool de I/O (fsync={policy})", elapsed, lags, args.uploads, len(payload))
+    finally:
+        os.chdir(cwd)
+        shutdown_io_thread_pool()
+        shutil.rmtree(workdir, ignore_errors=True)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,189 @@
+#!/usr/bin/env python3
+"""
+Benchmark do overhead por task: loop novo por task vs. runtime persistente.
+
+Compara o modo antigo do `sync_run_async_task` (criar loop, executar, cancelar
+pendências e fechar o loop a cada task) com o `WorkerRuntime`, que mantém um loop
+por processo e reaproveita o pool de conexões do banco.
+
+Uso:
+    python benchmarks/worker_runtime_benchmark.py --tasks 500
+    python benchmarks/worker_runtime_benchmark.py --tasks 200 --database-url postgresql+asyncpg://...
+"""
+
+import argparse
+import asyncio
+import statistics
+import sys
+import time
+from pathlib import Path
+from typing import Callable, List, Optional
+
+# Adicionar o diretório do backend ao Python path
+sys.path.insert(0, str(Path(__file__).parent.parent))
+
+from app.worker.runtime import WorkerRuntime
+
+
+def run_in_new_loop(coro_func, *args, **kwargs):
+    """Reprodução do comportamento antigo: um loop de eventos por task."""
+    loop = asyncio.new_event_loop()
+    asyncio.set_event_loop(loop)
+    try:
+        return loop.run_until_complete(coro_func(*args, **kwargs))
+    finally:
+        pending_tasks = asyncio.all_tasks(loop)
+        for task in pending_tasks:
+            task.cancel()
+        if pending_tasks:
+            loop.run_until_complete(asyncio.gather(*pending_tasks, return_exceptions=True))
+        loop.close()
+
+
+def measure(label: str, runner: Callable, coro_func, tasks: int) -> List[float]:
+    """Executa `tasks` vezes e imprime as estatísticas de latência (ms)."""
+    samples = []
+    for _ in range(tasks):
+        start = time.perf_counter()
+        runner(coro_func)
+        samples.append((time.perf_counter() - start) * 1000)
+
+    samples.sort()
+    p95 = samples[int(len(samples) * 0.95) - 1]
+    print(
+        f"{label:<34} mean={statistics.mean(samples):8.3f}ms  "
+        f"p50={statistics.median(samples):8.3f}ms  p95={p95:8.3f}ms"
+    )
+    return samples
+
+
+async def noop_task():
+    """Task vazia: mede só o custo de entrar/sair do loop."""
+    await asyncio.sleep(0)
+
+
+def bench_loop_overhead(tasks: int) -> None:
+    print(f"\n== Overhead do loop ({tasks} tasks) ==")
+    legacy = measure("loop novo por task", run_in_new_loop, noop_task, tasks)
+
+    runtime = WorkerRuntime()
+    runtime.start()
+    try:
+        persistent = measure("runtime persistente", runtime.run, noop_task, tasks)
+    finally:
+        runtime.stop()
+
+    print(f"speedup: {statistics.mean(legacy) / statistics.mean(persistent):.1f}x")
+
+
+def _start_http_server() -> str:
+    """Sobe um servidor HTTP local (thread própria) que responde uma imagem fake."""
+    import threading
+    from aiohttp import web
+
+    ready = threading.Event()
+    address = {}
+
+    async def handler(request):
+        return web.Response(body=b"\x89PNG" + b"0" * 4096, content_type="image/png")
+
+    def serve():
+        loop = asyncio.new_event_loop()
+        asyncio.set_event_loop(loop)
+        app = web.Application()
+        app.router.add_get("/image.png", handler)
+        runner = web.AppRunner(app)
+        loop.run_until_complete(runner.setup())
+        site = web.TCPSite(runner, "127.0.0.1", 0)
+        loop.run_until_complete(site.start())
+        address["url"] = f"http://127.0.0.1:{site._server.sockets[0].getsockname()[1]}/image.png"
+        ready.set()
+        loop.run_forever()
+
+    threading.Thread(target=serve, daemon=True).start()
+    ready.wait()
+    return address["url"]
+
+
+def bench_http(tasks: int) -> None:
+    import aiohttp
+
+    print(f"\n== Download de imagem por task ({tasks} tasks) ==")
+    url = _start_http_server()
+
+    # Modo antigo: uma ClientSession (e uma conexão TCP) por download
+    async def legacy_fetch():
+        async with aiohttp.ClientSession() as session:
+            async with session.get(url) as response:
+                await response.read()
+
+    runtime = WorkerRuntime()
+
+    async def shared_fetch():
+        async with runtime.get_http_session().get(url) as response:
+            await response.read()
+
+    legacy = measure("loop novo + ClientSession nova", run_in_new_loop, legacy_fetch, tasks)
+
+    runtime.start()
+    try:
+        persistent = measure("runtime + sessão compartilhada", runtime.run, shared_fetch, tasks)
+    finally:
+        runtime.stop()
+
+    print(f"speedup: {statistics.mean(legacy) / statistics.mean(persistent):.1f}x")
+
+
+def bench_database(tasks: int, database_url: str) -> None:
+    from sqlalchemy import text
+    from sqlalchemy.ext.asyncio import create_async_engine
+    from sqlalchemy.pool import NullPool
+
+    print(f"\n== SELECT 1 por task ({tasks} tasks) ==")
+
+    # Modo antigo: conexões do pool ficam presas ao loop morto, então cada task reconecta
+    legacy_engine = create_async_engine(database_url, poolclass=NullPool)
+
+    async def legacy_query():
+        async with legacy_engine.connect() as conn:
+            await conn.execute(text("SELECT 1"))
+
+    pooled_engine = create_async_engine(database_url, pool_size=5)
+
+    async def pooled_query():
+        async with pooled_engine.connect() as conn:
+            await conn.execute(text("SELECT 1"))
+
+    try:
+        run_in_new_loop(legacy_query)
+    except Exception as e:
+        print(f"banco indisponível ({e.__class__.__name__}: {e}); pulando")
+        return
+
+    legacy = measure("loop novo + reconexão", run_in_new_loop, legacy_query, tasks)
+
+    runtime = WorkerRuntime()
+    runtime.start()
+    try:
+        persistent = measure("runtime + pool reaproveitado", runtime.run, pooled_query, tasks)
+        runtime.run(pooled_engine.dispose)
+    finally:
+        runtime.stop()
+
+    print(f"speedup: {statistics.mean(legacy) / statistics.mean(persistent):.1f}x")
+
+
+def main(argv: Optional[List[str]] = None) -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--tasks", type=int, default=500, help="Número de tasks simuladas")
+    parser.add_argument("--database-url", default=None, help="URL async do banco (opcional)")
+    args = parser.parse_args(argv)
+
+    bench_loop_overhead(args.tasks)
+    bench_http(args.tasks)
+    if args.database_url:
+        bench_database(args.tasks, args.database_url)
+
+
+if __name__ == "__main__":
+    main()
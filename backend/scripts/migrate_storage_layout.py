@@ -0,0 +1,86 @@
+#!/usr/bin/env python3
+"""
+Migra os uploads locais do layout plano para o layout sharded (ab/cd/<arquivo>).
+
+Executar a partir do diretório backend/, com STORAGE_LOCAL_LAYOUT=sharded já
+em uso pela API e pelos workers (arquivos novos já vão para o layout novo e
+os antigos continuam legíveis nos dois layouts durante a migração).
+
+Fases (cada uma pode ser repetida; interromper e rodar de novo é seguro):
+    link     cria o hard link (ou cópia em stream) de cada arquivo plano no layout sharded
+    rewrite  regrava as URLs salvas no banco (páginas, livros, blobs) em lotes
+    prune    remove os arquivos planos que já têm cópia no layout sharded
+
+Uso:
+    python scripts/migrate_storage_layout.py                 # todas as fases, em ordem
+    python scripts/migrate_storage_layout.py --phase link --dry-run
+    python scripts/migrate_storage_layout.py --phase rewrite --batch-size 1000
+"""
+
+import argparse
+import asyncio
+import sys
+import time
+from pathlib import Path
+from typing import List, Optional
+
+# Adicionar o diretório do backend ao Python path
+sys.path.insert(0, str(Path(__file__).parent.parent))
+
+from app.services.storage.layout_migration import (
+    iter_unsharded_files,
+    link_into_layout,
+    prune_flat,
+    rewrite_urls
+)
+from app.services.storage.local import LocalStorageProvider
+
+PHASES = ("link", "rewrite", "prune")
+
+
+def run_file_phase(phase: str, provider: LocalStorageProvider, dry_run: bool, progress_every: int) -> None:
+    action = link_into_layout if phase == "link" else prune_flat
+    seen = changed = 0
+    start = time.perf_counter()
+    for relative in iter_unsharded_files(provider):
+        seen += 1
+        if dry_run or action(provider, relative):
+            changed += 1
+        if seen % progress_every == 0:
+            print(f"[{phase}] {seen} arquivos verificados, {changed} alterados")
+    verb = "seriam processados" if dry_run else "alterados"
+    print(f"[{phase}] concluído: {seen} arquivos planos, {changed} {verb} em {time.perf_counter() - start:.1f}s")
+
+
+def run_rewrite_phase(provider: LocalStorageProvider, dry_run: bool, batch_size: int) -> None:
+    from app.core.database import AsyncSessionLocal, engine
+
+    async def _rewrite():
+        try:
+            return await rewrite_urls(AsyncSessionLocal, provider, batch_size=batch_size, dry_run=dry_run)
+        finally:
+            await engine.dispose()
+
+    rewritten = asyncio.run(_rewrite())
+    for column, count in rewritten.items():
+        print(f"[rewrite] {column}: {count} URLs {'a regravar' if dry_run else 'regravadas'}")
+
+
+def main(argv: Optional[List[str]] = None) -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--phase", choices=PHASES + ("all",), default="all", help="Fase a executar")
+    parser.add_argument("--dry-run", action="store_true", help="Só conta o que seria alterado")
+    parser.add_argument("--batch-size", type=int, default=500, help="Linhas por transação na fase rewrite")
+    parser.add_argument("--progress-every", type=int, default=10000, help="Intervalo do log de progresso")
+    args = parser.parse_args(argv)
+
+    provider = LocalStorageProvider(layout="sharded")
+    for phase in PHASES if args.phase == "all" else (args.phase,):
+        if phase == "rewrite":
+            run_rewrite_phase(provider, args.dry_run, args.batch_size)
+        else:
+            run_file_phase(phase, provider, args.dry_run, args.progress_every)
+
+
+if __name__ == "__main__":
+    main()
@@ -6,3 +6,109 @@ from pathlib import Path
 # This assumes conftest.py is in backend/tests/
 backend_path = Path(__file__).parent.parent
 sys.path.insert(0, str(backend_path))
+
+import pytest
+import pytest_asyncio
+
+
+class SyncSessionAdapter:
+    """
+    Async interface used by the repositories on top of a synchronous Session,
+    so repository SQL can run against in-memory SQLite without an async driver.
+    """
+
+    def __init__(self, session):
+        self.session = session
+        self.statements = []
+
+    @property
+    def bind(self):
+        return self.session.bind
+
+    async def execute(self, *args, **kwargs):
+        return self.session.execute(*args, **kwargs)
+
+    async def connection(self):
+        return self.session.connection()
+
+    async def flush(self):
+        self.session.flush()
+
+    async def commit(self):
+        self.session.commit()
+
+    async def refresh(self, instance):
+        self.session.refresh(instance)
+
+    def add(self, instance):
+        self.session.add(instance)
+
+
+@pytest.fixture
+def sqlite_db():
+    """In-memory SQLite with the books, pages and checkpoint tables; records every statement."""
+    from sqlalchemy import create_engine, event
+    from sqlalchemy.orm import Session
+    import app.models  # noqa: F401
+    from app.models.book import Book, BookGenerationCheckpoint, Page
+
+    engine = create_engine("sqlite://")
+    Book.__table__.create(engine)
+    Page.__table__.create(engine)
+    BookGenerationCheckpoint.__table__.create(engine)
+    with Session(engine) as session:
+        db = SyncSessionAdapter(session)
+        event.listen(engine, "before_cursor_execute", lambda *args: db.statements.append(args[2]))
+        yield db
+    engine.dispose()
+
+
+def pytest_configure(config):
+    config.addinivalue_line(
+        "markers",
+        "postgres: needs a PostgreSQL server (TEST_POSTGRES_URL or DATABASE_URL); skipped when unreachable"
+    )
+
+
+def _postgres_url():
+    url = os.environ.get("TEST_POSTGRES_URL") or os.environ.get("DATABASE_URL", "")
+    if not url.startswith("postgresql"):
+        return None
+    return "postgresql+asyncpg://" + url.split("://", 1)[1]
+
+
+@pytest_asyncio.fixture
+async def postgres_engine():
+    """
+    Async engine bound to a throwaway schema of the test PostgreSQL server
+    (dropped afterwards); the test is skipped when no server is reachable.
+    """
+    import uuid
+    from sqlalchemy import text
+    from sqlalchemy.ext.asyncio import create_async_engine
+
+    url = _postgres_url()
+    if url is None:
+        pytest.skip("PostgreSQL not configured (TEST_POSTGRES_URL / DATABASE_URL)")
+
+    schema = f"test_{uuid.uuid4().hex[:12]}"
+    admin = create_async_engine(url, connect_args={"timeout": 5})
+    try:
+        async with admin.begin() as connection:
+            await connection.execute(text("CREATE EXTENSION IF NOT EXISTS pg_trgm"))
+            await connection.execute(text(f"CREATE SCHEMA {schema}"))
+    except Exception as e:
+        await admin.dispose()
+        pytest.skip(f"PostgreSQL unavailable: {e}")
+
+    engine = create_async_engine(
+        url,
+        connect_args={"timeout": 5, "server_settings": {"search_path": f"{schema},public"}}
+    )
+    try:
+        yield engine
+    finally:
+        await engine.dispose()
+        async with admin.begin() as connection:
+            await connection.execute(text(f"DROP SCHEMA {schema} CASCADE"))
+        await admin.dispose()
@@ -0,0 +1,82 @@
+import pytest
+from types import SimpleNamespace
+from unittest.mock import MagicMock
+from fastapi import FastAPI, HTTPException
+from fastapi.testclient import TestClient
+from app.api import deps
+from app.api.v1.endpoints import books
+from app.exceptions.base_exceptions import AppException
+from app.exceptions.http_exceptions import HTTPExceptionHandler
+from app.repositories.base_repository import CursorPage
+from app.repositories.book_repository import BookRepository
+from app.services.book_service import BookService
+
+
+class StubBookService:
+    def __init__(self):
+        self.calls = []
+
+    async def get_user_books(self, **kwargs):
+        self.calls.append(("offset", kwargs))
+        return []
+
+    async def get_user_books_page(self, **kwargs):
+        self.calls.append(("cursor", kwargs))
+        return CursorPage([], "next-token" if kwargs["cursor"] is None else None)
+
+
+@pytest.fixture
+def client(monkeypatch):
+    monkeypatch.setattr(books, "log_user_action", lambda **kwargs: None)
+    service = StubBookService()
+    app = FastAPI()
+    app.add_exception_handler(AppException, HTTPExceptionHandler.app_exception_handler)
+    app.include_router(books.router, prefix="/books")
+    app.dependency_overrides[deps.get_current_active_user] = lambda: SimpleNamespace(id=1)
+    app.dependency_overrides[books.get_book_service] = lambda: service
+    test_client = TestClient(app)
+    test_client.service = service
+    return test_client
+
+
+class TestBookListing:
+
+    def test_cursor_pagination_by_default(self, client):
+        """Test that the first page is keyset-paginated and advertises the next cursor."""
+        first = client.get("/books/", params={"limit": 10})
+        last = client.get("/books/", params={"limit": 10, "cursor": first.headers["X-Next-Cursor"]})
+
+        assert first.status_code == last.status_code == 200
+        assert "X-Next-Cursor" not in last.headers
+        assert [call[0] for call in client.service.calls] == ["cursor", "cursor"]
+        assert client.service.calls[1][1]["cursor"] == "next-token"
+
+    def test_offset_pagination_is_kept(self, client):
+        """Test that skip > 0 still uses OFFSET pagination."""
+        response = client.get("/books/", params={"skip": 20, "limit": 10})
+
+        assert response.status_code == 200
+        assert "X-Next-Cursor" not in response.headers
+        [(mode, kwargs)] = client.service.calls
+        assert mode == "offset"
+        assert (kwargs["skip"], kwargs["limit"]) == (20, 10)
+
+    def test_rejects_skip_with_cursor(self, client):
+        """Test that skip and cursor cannot be combined."""
+        response = client.get("/books/", params={"skip": 5, "cursor": "abc"})
+
+        assert response.status_code == 400
+        assert client.service.calls == []
+
+
+class TestBookServicePage:
+
+    @pytest.mark.asyncio
+    async def test_invalid_cursor_is_bad_request(self):
+        """Test that a malformed cursor becomes a 400."""
+        service = BookService.__new__(BookService)
+        service.book_repo = BookRepository(MagicMock())
+
+        with pytest.raises(HTTPException) as exc_info:
+            await service.get_user_books_page(1, cursor="garbage", current_user=SimpleNamespace(id=1))
+        assert exc_info.value.status_code == 400
@@ -0,0 +1,140 @@
+import importlib.util
+import pytest
+import pytest_asyncio
+from pathlib import Path
+from alembic.migration import MigrationContext
+from alembic.operations import Operations
+from sqlalchemy import insert, select, text
+from sqlalchemy.ext.asyncio import AsyncSession
+from app.core.database import Base
+from app.models.book import Book
+from app.models.stats import BookStats
+from app.models.user import User
+from app.repositories.book_repository import BookRepository
+from app.repositories.stats_repository import BookStatsRepository
+
+pytestmark = pytest.mark.postgres
+
+MIGRATION = Path(__file__).parents[2] / "alembic" / "versions" / "add_book_stats.py"
+
+
+def _migration():
+    spec = importlib.util.spec_from_file_location("add_book_stats", MIGRATION)
+    module = importlib.util.module_from_spec(spec)
+    spec.loader.exec_module(module)
+    return module
+
+
+async def _run(engine, step):
+    def migrate(sync_connection):
+        with Operations.context(MigrationContext.configure(sync_connection)):
+            step()
+
+    async with engine.begin() as connection:
+        await connection.run_sync(migrate)
+
+
+def _book(user_id, status="draft", style="cartoon"):
+    return {"title": "Livro de teste", "pages_count": 8, "style": style, "status": status, "user_id": user_id}
+
+
+@pytest_asyncio.fixture
+async def db(postgres_engine):
+    async with postgres_engine.begin() as connection:
+        await connection.run_sync(
+            lambda sync_connection: Base.metadata.create_all(
+                sync_connection, tables=[User.__table__, Book.__table__]
+            )
+        )
+        await connection.execute(insert(User.__table__), [
+            {
+                "id": n, "email": f"autor{n}@example.com", "password_hash": "x",
+                "full_name": f"Autor {n}", "role": "user", "status": "active"
+            }
+            for n in (1, 2)
+        ])
+    async with AsyncSession(postgres_engine, expire_on_commit=False) as session:
+        yield session
+
+
+async def _assert_counters_match(session):
+    """The trigger-maintained counters (and a fresh rollup) agree with a GROUPING SETS scan."""
+    await BookStatsRepository(session).rollup_global()
+    await session.commit()
+    repo = BookRepository(session)
+    for user_id in (None, 1, 2):
+        assert await repo.get_books_stats(user_id) == await repo.compute_books_stats(user_id)
+
+
+class TestBookStatsCounters:
+
+    @pytest.mark.asyncio
+    async def test_backfill_counts_existing_books(self, db, postgres_engine):
+        """Test that the migration's GROUPING SETS backfill matches the books table."""
+        await db.execute(insert(Book), [
+            _book(1, "draft"), _book(1, "completed", "manga"), _book(1, None),
+            _book(2, "failed", "classic")
+        ])
+        await db.commit()
+
+        await _run(postgres_engine, _migration().upgrade)
+
+        stats = await BookRepository(db).get_books_stats(1)
+        assert stats == {
+            'total': 3,
+            'by_status': {'draft': 1, 'completed': 1},
+            'by_style': {'cartoon': 2, 'manga': 1}
+        }
+        # Globais preenchidos pela própria migration, antes de qualquer rollup
+        repo = BookRepository(db)
+        assert await repo.get_books_stats() == await repo.compute_books_stats()
+        await _assert_counters_match(db)
+
+    @pytest.mark.asyncio
+    async def test_triggers_follow_every_write_path(self, db, postgres_engine, monkeypatch):
+        """Test that inserts, transitions, bulk writes and deletes keep the counters exact."""
+        await _run(postgres_engine, _migration().upgrade)
+        repo = BookRepository(db)
+
+        book = await repo.create(**_book(1))
+        await repo.update_status(book.id, "processing")
+        await repo.update_status(book.id, "completed")
+        await db.commit()
+        await _assert_counters_match(db)
+
+        created = await repo.bulk_create([_book(2, style="manga") for _ in range(5)], returning=True)
+        await repo.bulk_update([{"id": created[0].id, "style": "classic"}])
+        await repo.update(created[1].id, user_id=1)
+        await db.commit()
+        await _assert_counters_match(db)
+
+        # COPY também dispara os triggers de INSERT
+        monkeypatch.setattr("app.repositories.base_repository.settings.DB_BULK_COPY_MIN_ROWS", 3)
+        assert await repo.bulk_create([_book(1, "failed", "realistic") for _ in range(4)]) == 4
+        await db.commit()
+        await _assert_counters_match(db)
+
+        # UPDATE sem colunas das estatísticas: deltas se anulam
+        counters = select(BookStats.user_id, BookStats.dimension, BookStats.value, BookStats.count)
+        before = (await db.execute(counters)).all()
+        await repo.update(book.id, description="Nova descrição")
+        await db.commit()
+        assert sorted((await db.execute(counters)).all()) == sorted(before)
+
+        await repo.delete(book.id)
+        await repo.bulk_delete_by_ids([row.id for row in created[2:]])
+        await db.commit()
+        await _assert_counters_match(db)
+        assert (await repo.get_books_stats())['total'] == 6
+
+    @pytest.mark.asyncio
+    async def test_downgrade_removes_triggers(self, db, postgres_engine):
+        """Test that after a downgrade books accept writes without book_stats."""
+        migration = _migration()
+        await _run(postgres_engine, migration.upgrade)
+        await _run(postgres_engine, migration.downgrade)
+
+        await db.execute(insert(Book), [_book(1)])
+        await db.commit()
+
+        assert (await db.execute(text("SELECT to_regclass('book_stats')"))).scalar() is None
@@ -51,7 +51,7 @@ class TestEndpointsStructure:
         route_paths = [route.path for route in routes if hasattr(route, 'path')]
         
         expected_routes = [
-            "/", "/{book_id}", "/{book_id}/generate", "/{book_id}/pdf",
+            "/", "/{book_id}", "/{book_id}/generate", "/{book_id}/resume", "/{book_id}/pdf",
             "/search/{search_term}", "/stats/overview", "/recent/list"
         ]
         for expected in expected_routes:
@@ -77,7 +77,7 @@ class TestEndpointsStructure:
         services_tests = [
             (AuthService, ["login", "register", "change_password"]),
             (UserService, ["create_user", "get_user_profile", "update_user"]),
-            (BookService, ["create_book", "get_book_details", "start_book_generation"])
+            (BookService, ["create_book", "get_book_details", "start_book_generation", "resume_book_generation"])
         ]
         
         for service_class, methods in services_tests:
@@ -0,0 +1,163 @@
+import hashlib
+import pytest
+from types import SimpleNamespace
+from fastapi import FastAPI
+from fastapi.testclient import TestClient
+from app.api import deps
+from app.api.v1.endpoints import books
+from app.exceptions.base_exceptions import ValidationError
+from app.middleware.compression_middleware import SelectiveGZipMiddleware
+
+PDF_BYTES = b"%PDF-1.4\n" + bytes(range(256)) * 40
+
+
+class StubBookService:
+    def __init__(self, book):
+        self.book = book
+
+    async def get_book_details(self, book_id, current_user):
+        return self.book
+
+
+@pytest.fixture
+def stored_pdf(tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+    uploads = tmp_path / "frontend/public/uploads"
+    uploads.mkdir(parents=True)
+    (uploads / "book_3.pdf").write_bytes(PDF_BYTES)
+    (uploads / "book_3_preview.pdf").write_bytes(b"%PDF-preview")
+    return uploads
+
+
+@pytest.fixture
+def client(stored_pdf, monkeypatch):
+    monkeypatch.setattr(books, "log_user_action", lambda **kwargs: None)
+    book = SimpleNamespace(
+        id=3,
+        title="O Gato Aventureiro",
+        pdf_file="/uploads/book_3.pdf",
+        pdf_preview_file="/uploads/book_3_preview.pdf"
+    )
+    app = FastAPI()
+    app.add_middleware(SelectiveGZipMiddleware, minimum_size=100)
+    app.include_router(books.router, prefix="/books")
+
+    @app.get("/listing")
+    async def listing():
+        return {"items": ["livro"] * 200}
+
+    app.dependency_overrides[deps.get_current_active_user] = lambda: SimpleNamespace(id=1)
+    app.dependency_overrides[books.get_book_service] = lambda: StubBookService(book)
+    test_client = TestClient(app)
+    test_client.book = book
+    return test_client
+
+
+def _etag(data):
+    return f'"{hashlib.sha256(data).hexdigest()}"'
+
+
+class TestPdfDownload:
+
+    def test_serves_stored_file_with_content_etag(self, client):
+        """Test a full download: file content, strong ETag and byte ranges advertised."""
+        response = client.get("/books/3/pdf")
+
+        assert response.status_code == 200
+        assert response.content == PDF_BYTES
+        assert response.headers["etag"] == _etag(PDF_BYTES)
+        assert response.headers["accept-ranges"] == "bytes"
+        assert response.headers["content-type"] == "application/pdf"
+        assert "O_Gato_Aventureiro.pdf" in response.headers["content-disposition"]
+
+    def test_pdf_downloads_are_not_gzipped(self, client):
+        """Test that PDFs skip gzip while other large responses are still compressed."""
+        headers = {"Accept-Encoding": "gzip"}
+
+        assert "content-encoding" not in client.get("/books/3/pdf", headers=headers).headers
+        assert client.get("/listing", headers=headers).headers["content-encoding"] == "gzip"
+
+    def test_range_request_returns_partial_content(self, client):
+        """Test that Range requests are answered with 206 and the requested bytes."""
+        response = client.get("/books/3/pdf", headers={"Range": "bytes=100-199"})
+
+        assert response.status_code == 206
+        assert response.content == PDF_BYTES[100:200]
+        assert response.headers["content-range"] == f"bytes 100-199/{len(PDF_BYTES)}"
+
+    def test_if_range_with_stale_etag_sends_full_file(self, client):
+        """Test that a Range for an outdated version falls back to the whole file."""
+        response = client.get("/books/3/pdf", headers={"Range": "bytes=0-9", "If-Range": '"stale"'})
+
+        assert response.status_code == 200
+        assert response.content == PDF_BYTES
+
+    @pytest.mark.parametrize("if_none_match", [_etag(PDF_BYTES), f'W/{_etag(PDF_BYTES)}', f'"x", {_etag(PDF_BYTES)}', "*"])
+    def test_matching_etag_returns_not_modified(self, client, if_none_match):
+        """Test the conditional GET: a cached copy gets 304 without a body."""
+        response = client.get("/books/3/pdf", headers={"If-None-Match": if_none_match})
+
+        assert response.status_code == 304
+        assert response.content == b""
+        assert response.headers["etag"] == _etag(PDF_BYTES)
+
+    def test_etag_changes_with_content(self, client, stored_pdf):
+        """Test that a regenerated PDF gets a new ETag."""
+        first = client.get("/books/3/pdf").headers["etag"]
+        (stored_pdf / "book_3.pdf").write_bytes(PDF_BYTES + b"v2")
+
+        response = client.get("/books/3/pdf", headers={"If-None-Match": first})
+
+        assert response.status_code == 200
+        assert response.headers["etag"] != first
+
+    def test_preview_variant(self, client):
+        """Test that the preview PDF can be downloaded separately."""
+        response = client.get("/books/3/pdf", params={"variant": "preview"})
+
+        assert response.content == b"%PDF-preview"
+
+    def test_delegates_to_reverse_proxy(self, client, monkeypatch):
+        """Test the X-Accel-Redirect mode: headers only, the proxy sends the file."""
+        monkeypatch.setattr(books.settings, "PDF_DOWNLOAD_ACCEL_REDIRECT_PREFIX", "/protected-uploads/")
+
+        response = client.get("/books/3/pdf")
+
+        assert response.status_code == 200
+        assert response.content == b""
+        assert response.headers["x-accel-redirect"] == "/protected-uploads/book_3.pdf"
+        assert response.headers["etag"] == _etag(PDF_BYTES)
+
+    def test_missing_pdf_is_a_validation_error(self, client):
+        """Test that a book without a generated PDF is rejected."""
+        client.book.pdf_file = None
+
+        with pytest.raises(ValidationError):
+            client.get("/books/3/pdf")
+
+    def test_paths_outside_uploads_are_not_served(self, client):
+        """Test that a stored URL cannot point outside the uploads directory."""
+        client.book.pdf_file = "/uploads/../../../etc/passwd"
+
+        with pytest.raises(ValidationError):
+            client.get("/books/3/pdf")
+
+
+class TestLibraryExportEndpoint:
+
+    def test_export_route_streams_zip(self, client, monkeypatch):
+        """Test that /books/export is not captured by /{book_id} and streams a ZIP."""
+        from app.services import export_service
+
+        async def fake_stream(self, user_id, include_images=False):
+            yield b"PK"
+            yield str(include_images).encode()
+
+        monkeypatch.setattr(export_service.LibraryExportService, "stream_zip", fake_stream)
+
+        response = client.get("/books/export", params={"include_images": "true"})
+
+        assert response.status_code == 200
+        assert response.content == b"PKTrue"
+        assert response.headers["content-type"] == "application/zip"
+        assert "biblioteca_" in response.headers["content-disposition"]
@@ -0,0 +1,132 @@
+import asyncio
+import json
+import pytest
+from unittest.mock import AsyncMock, patch
+from app.services.ai.base import AIProvider
+from app.services.ai.batching import pack_prompts, unpack_responses
+from app.services.ai.cache import AICacheMetrics, CachedAIProvider, LRUCache
+from app.services.ai.gemini import GeminiProvider
+
+
+class EchoProvider(AIProvider):
+    """Provider sem batch nativo: registra a concorrência do fan-out."""
+
+    def __init__(self):
+        self.in_flight = 0
+        self.max_in_flight = 0
+        self.prompts = []
+
+    async def generate_text(self, prompt, model=None, **kwargs):
+        self.prompts.append(prompt)
+        self.in_flight += 1
+        self.max_in_flight = max(self.max_in_flight, self.in_flight)
+        try:
+            await asyncio.sleep(0.01 if prompt != "p0" else 0.03)
+            if prompt == "boom":
+                raise RuntimeError("boom")
+            return prompt.upper()
+        finally:
+            self.in_flight -= 1
+
+    async def generate_image(self, description, style, model=None, **kwargs):
+        return b""
+
+
+class TestDefaultBatch:
+
+    @pytest.mark.asyncio
+    async def test_fan_out_keeps_order_and_bounds_concurrency(self):
+        """Test that results follow prompt order under limited concurrency."""
+        provider = EchoProvider()
+
+        results = await provider.generate_text_batch([f"p{n}" for n in range(8)], max_concurrency=3)
+
+        assert results == [f"P{n}" for n in range(8)]
+        assert provider.max_in_flight == 3
+
+    @pytest.mark.asyncio
+    async def test_return_exceptions_isolates_failures(self):
+        """Test that one failed prompt does not discard the others."""
+        results = await EchoProvider().generate_text_batch(["a", "boom", "b"], return_exceptions=True)
+
+        assert results[0] == "A" and results[2] == "B"
+        assert isinstance(results[1], RuntimeError)
+
+
+class TestPacking:
+
+    def test_round_trip(self):
+        """Test that a packed request lists every prompt and parses the array answer."""
+        packed = pack_prompts(["um", "dois"])
+
+        assert "Solicitação 1\num" in packed and "Solicitação 2\ndois" in packed
+        assert unpack_responses('```json\n["A", "B"]\n```', 2) == ["A", "B"]
+
+    @pytest.mark.parametrize("answer", ["não é json", '["A"]', '[1, 2]', '{"a": 1}'])
+    def test_malformed_answers_are_rejected(self, answer):
+        """Test that unusable answers trigger the fallback."""
+        assert unpack_responses(answer, 2) is None
+
+
+class TestGeminiBatch:
+
+    @pytest.mark.asyncio
+    async def test_packs_prompts_into_one_request(self):
+        """Test that Gemini answers a batch with a single call."""
+        provider = GeminiProvider(api_key=None)
+        with patch.object(provider, "generate_text", AsyncMock(return_value=json.dumps(["A", "B", "C"]))) as call:
+            results = await provider.generate_text_batch(["a", "b", "c"])
+
+        assert results == ["A", "B", "C"]
+        call.assert_awaited_once()
+
+    @pytest.mark.asyncio
+    async def test_malformed_answer_falls_back_to_single_requests(self):
+        """Test the bounded fan-out fallback when the packed answer is unusable."""
+        provider = GeminiProvider(api_key=None)
+        answers = {"a": "A", "b": "B"}
+
+        async def fake_generate_text(prompt, model=None, **kwargs):
+            return answers.get(prompt, "resposta sem json")
+
+        with patch.object(provider, "generate_text", side_effect=fake_generate_text) as call:
+            results = await provider.generate_text_batch(["a", "b"])
+
+        assert results == ["A", "B"]
+        assert call.call_count == 3
+
+    @pytest.mark.asyncio
+    async def test_large_batches_are_split(self):
+        """Test that batches above max_batch_size use several packed requests."""
+        provider = GeminiProvider(api_key=None)
+        provider.max_batch_size = 2
+
+        async def fake_generate_text(prompt, model=None, **kwargs):
+            count = prompt.count("### Solicitação")
+            return json.dumps([f"r{n}" for n in range(count)])
+
+        with patch.object(provider, "generate_text", side_effect=fake_generate_text) as call:
+            results = await provider.generate_text_batch(["a", "b", "c", "d", "e"])
+
+        assert results == ["r0", "r1", "r0", "r1", "r0"]
+        assert call.call_count == 3
+
+
+class TestCachedBatch:
+
+    @pytest.mark.asyncio
+    async def test_only_misses_go_upstream(self):
+        """Test that cached prompts are served locally and the rest are batched."""
+        provider = EchoProvider()
+        cached = CachedAIProvider(
+            provider, provider_name="echo",
+            l1=LRUCache(max_entries=16, max_bytes=1024), metrics=AICacheMetrics()
+        )
+        await cached.generate_text("a")
+
+        results = await cached.generate_text_batch(["a", "b", "c"])
+
+        assert results == ["A", "B", "C"]
+        assert provider.prompts == ["a", "b", "c"]
+        assert await cached.generate_text("c") == "C"
+        assert provider.prompts == ["a", "b", "c"]
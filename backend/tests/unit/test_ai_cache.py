@@ -0,0 +1,257 @@
+import asyncio
+import pytest
+from unittest.mock import patch
+from app.services.ai import cache as cache_module
+from app.services.ai.base import AIProvider
+from app.services.ai.cache import AICacheMetrics, CachedAIProvider, LRUCache, get_cache_stats
+from app.services.ai.factory import AIProviderFactory
+
+
+class CountingProvider(AIProvider):
+    """Provider falso que conta as chamadas reais."""
+
+    def __init__(self):
+        self.text_calls = 0
+        self.image_calls = 0
+
+    async def generate_text(self, prompt, model=None, **kwargs):
+        self.text_calls += 1
+        return f"texto {self.text_calls}: {prompt}"
+
+    async def generate_text_stream(self, prompt, model=None, **kwargs):
+        self.text_calls += 1
+        for chunk in ("Página 1: ", "Um.", "\nPágina 2: Dois."):
+            yield chunk
+
+    async def generate_image(self, description, style, model=None, **kwargs):
+        self.image_calls += 1
+        return f"{style}:{description}".encode()
+
+
+class FakeRedis:
+    """Redis em memória com a API async usada pelo cache."""
+
+    def __init__(self, fail=False):
+        self.data = {}
+        self.hashes = {}
+        self.fail = fail
+        self.closed = False
+        self.calls = 0
+
+    async def aclose(self):
+        self.closed = True
+
+    async def get(self, key):
+        self.calls += 1
+        if self.fail:
+            raise ConnectionError("redis down")
+        return self.data.get(key)
+
+    async def set(self, key, value, ex=None):
+        if self.fail:
+            raise ConnectionError("redis down")
+        self.data[key] = value
+
+    async def hincrby(self, key, field, amount):
+        self.calls += 1
+        if self.fail:
+            raise ConnectionError("redis down")
+        bucket = self.hashes.setdefault(key, {})
+        bucket[field] = bucket.get(field, 0) + amount
+
+    async def hgetall(self, key):
+        return {field.encode(): str(value).encode() for field, value in self.hashes.get(key, {}).items()}
+
+
+def _cached(provider, redis=None, **kwargs):
+    return CachedAIProvider(
+        provider,
+        provider_name="fake",
+        redis_client=redis,
+        l1=kwargs.pop("l1", LRUCache(max_entries=16, max_bytes=1024 * 1024)),
+        metrics=kwargs.pop("metrics", AICacheMetrics(flush_interval=3600)),
+        **kwargs
+    )
+
+
+class TestLRUCache:
+
+    def test_evicts_least_recently_used_entry(self):
+        """Test that the entry-count bound evicts the oldest unused item."""
+        cache = LRUCache(max_entries=2, max_bytes=1024)
+        cache.set("a", "1", ttl=60)
+        cache.set("b", "2", ttl=60)
+        cache.get("a")
+        cache.set("c", "3", ttl=60)
+
+        assert cache.get("b") is None
+        assert cache.get("a") == "1"
+        assert cache.evictions == 1
+
+    def test_size_based_eviction(self):
+        """Test that the byte bound evicts until the new value fits."""
+        cache = LRUCache(max_entries=10, max_bytes=10)
+        cache.set("a", b"12345", ttl=60)
+        cache.set("b", b"12345", ttl=60)
+        cache.set("c", b"123", ttl=60)
+
+        assert cache.get("a") is None
+        assert cache.current_bytes == 8
+        assert cache.set("big", b"x" * 11, ttl=60) is False
+
+    def test_expired_entries_are_dropped(self):
+        """Test that an entry past its TTL is a miss."""
+        cache = LRUCache(max_entries=10, max_bytes=1024)
+        with patch("app.services.ai.cache.time.monotonic", return_value=100.0):
+            cache.set("a", "1", ttl=10)
+        with patch("app.services.ai.cache.time.monotonic", return_value=111.0):
+            assert cache.get("a") is None
+        assert len(cache) == 0
+
+
+class TestCachedAIProvider:
+
+    @pytest.mark.asyncio
+    async def test_identical_prompts_hit_l1(self):
+        """Test that repeated prompts are served without calling the provider."""
+        provider = CountingProvider()
+        cached = _cached(provider)
+
+        first = await cached.generate_text("história do gato")
+        second = await cached.generate_text("história do gato")
+
+        assert first == second
+        assert provider.text_calls == 1
+        assert cached.metrics.counters["l1_hits"] == 1
+        assert cached.metrics.counters["misses"] == 1
+
+    @pytest.mark.asyncio
+    async def test_key_includes_model_style_and_params(self):
+        """Test that different parameters produce different cache entries."""
+        provider = CountingProvider()
+        cached = _cached(provider)
+
+        await cached.generate_image("gato", "cartoon")
+        await cached.generate_image("gato", "manga")
+        await cached.generate_text("gato", temperature=0.2)
+        await cached.generate_text("gato", temperature=0.9)
+        await cached.generate_text("gato", model="outro-modelo", temperature=0.2)
+
+        assert provider.image_calls == 2
+        assert provider.text_calls == 3
+
+    @pytest.mark.asyncio
+    async def test_l2_shared_between_processes(self):
+        """Test that a fresh L1 is filled from Redis."""
+        redis = FakeRedis()
+        await _cached(CountingProvider(), redis).generate_image("gato", "cartoon")
+
+        provider = CountingProvider()
+        other_process = _cached(provider, redis)
+        image = await other_process.generate_image("gato", "cartoon")
+
+        assert image == b"cartoon:gato"
+        assert provider.image_calls == 0
+        assert other_process.metrics.counters["l2_hits"] == 1
+        assert await other_process.generate_image("gato", "cartoon") == image
+        assert other_process.metrics.counters["l1_hits"] == 1
+
+    @pytest.mark.asyncio
+    async def test_opt_out_bypasses_cache(self):
+        """Test that cache=False always reaches the provider."""
+        provider = CountingProvider()
+        cached = _cached(provider)
+
+        await cached.generate_text("gato", cache=False)
+        await cached.generate_text("gato", cache=False)
+
+        assert provider.text_calls == 2
+        assert cached.metrics.counters["bypassed"] == 2
+        assert len(cached.l1) == 0
+
+    @pytest.mark.asyncio
+    async def test_redis_failure_falls_back_to_provider(self):
+        """Test that an unavailable L2 does not break generation."""
+        provider = CountingProvider()
+        cached = _cached(provider, FakeRedis(fail=True))
+
+        assert await cached.generate_text("gato") == "texto 1: gato"
+        assert await cached.generate_text("gato") == "texto 1: gato"
+        assert provider.text_calls == 1
+        assert cached.metrics.counters["errors"] == 2
+
+    @pytest.mark.asyncio
+    async def test_stream_is_cached_as_full_text(self):
+        """Test that a streamed story is reused by later streams and plain calls."""
+        provider = CountingProvider()
+        cached = _cached(provider)
+
+        streamed = "".join([chunk async for chunk in cached.generate_text_stream("história")])
+        replayed = [chunk async for chunk in cached.generate_text_stream("história")]
+
+        assert replayed == [streamed]
+        assert await cached.generate_text("história") == streamed
+        assert provider.text_calls == 1
+
+    @pytest.mark.asyncio
+    async def test_global_stats_aggregate_redis_counters(self):
+        """Test that stats expose hit rate from the shared counters."""
+        redis = FakeRedis()
+        cached = _cached(CountingProvider(), redis)
+        await cached.generate_text("gato")
+        await cached.generate_text("gato")
+        await cached.metrics.flush(redis)
+
+        stats = await get_cache_stats(redis)
+
+        assert stats["global"]["misses"] == 1
+        assert stats["global"]["l1_hits"] == 1
+        assert stats["global"]["hit_rate"] == 0.5
+        assert not redis.closed
+
+    @pytest.mark.asyncio
+    async def test_l1_hits_do_not_touch_redis(self):
+        """Test that in-process hits are counted in memory, with no Redis round trip."""
+        redis = FakeRedis()
+        cached = _cached(CountingProvider(), redis)
+        await cached.generate_text("gato")
+        calls = redis.calls
+
+        for _ in range(10):
+            await cached.generate_text("gato")
+
+        assert redis.calls == calls
+        assert cached.metrics.pending["l1_hits"] == 10
+
+    @pytest.mark.asyncio
+    async def test_metrics_flushed_in_background_batches(self):
+        """Test that due counters go to Redis as one increment per field, off the lookup path."""
+        redis = FakeRedis()
+        cached = _cached(CountingProvider(), redis, metrics=AICacheMetrics(flush_interval=0))
+        cached.metrics.incr("l1_hits", 4)
+
+        await cached.generate_text("gato")
+        await asyncio.sleep(0)
+
+        assert redis.hashes[cache_module.METRICS_KEY] == {"l1_hits": 4, "misses": 1, "stores": 1}
+        assert not cached.metrics.pending
+
+    @pytest.mark.asyncio
+    async def test_failed_flush_keeps_the_counters(self):
+        """Test that counters that could not be written are sent by the next flush."""
+        metrics = AICacheMetrics()
+        metrics.incr("misses", 3)
+
+        await metrics.flush(FakeRedis(fail=True))
+
+        assert metrics.pending["misses"] == 3
+
+    def test_providers_share_one_redis_client(self, monkeypatch):
+        """Test that every cached provider (one per request) reuses the process client."""
+        monkeypatch.setattr(cache_module, "_cache_redis_client", None)
+        with patch.object(cache_module, "create_cache_redis_client", side_effect=lambda: FakeRedis()) as create:
+            first = AIProviderFactory.create("fake", cached=True)
+            second = AIProviderFactory.create("fake", cached=True)
+
+        assert first.redis is second.redis
+        create.assert_called_once()
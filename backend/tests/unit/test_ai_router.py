@@ -0,0 +1,172 @@
+import asyncio
+import pytest
+from unittest.mock import patch
+from app.exceptions.base_exceptions import ExternalServiceError
+from app.services.ai.fake import FakeAIProvider
+from app.services.ai.factory import AIProviderFactory, AIServiceFactory
+from app.services.ai.router import CircuitBreaker, RoutingAIProvider
+
+
+def _router(backends, **kwargs):
+    options = dict(
+        window_size=20,
+        hedge_percentile=0.9,
+        hedge_min_delay=0.0,
+        hedge_max_delay=1.0,
+        min_samples=3,
+        failure_threshold=0.5,
+        open_seconds=60
+    )
+    options.update(kwargs)
+    return RoutingAIProvider(backends, **options)
+
+
+class TestCircuitBreaker:
+
+    def test_opens_on_sustained_failures_and_half_opens_after_cooldown(self):
+        """Test the closed -> open -> half-open -> closed cycle."""
+        circuit = CircuitBreaker(failure_threshold=0.5, min_requests=4, window_size=10, open_seconds=30)
+
+        with patch("app.services.ai.router.time.monotonic", return_value=100.0):
+            for success in (True, False, False, True):
+                circuit.record(success)
+            assert circuit.state == CircuitBreaker.OPEN
+            assert not circuit.allows_request()
+
+        with patch("app.services.ai.router.time.monotonic", return_value=131.0):
+            assert circuit.allows_request()
+            assert circuit.state == CircuitBreaker.HALF_OPEN
+            circuit.record(True)
+
+        assert circuit.state == CircuitBreaker.CLOSED
+
+    def test_half_open_failure_reopens(self):
+        """Test that a failed probe reopens the circuit."""
+        circuit = CircuitBreaker(failure_threshold=0.5, min_requests=1, window_size=10, open_seconds=0)
+        circuit.record(False)
+        assert circuit.allows_request()
+
+        circuit.record(False)
+
+        assert circuit.state == CircuitBreaker.OPEN
+
+
+class TestRoutingAIProvider:
+
+    @pytest.mark.asyncio
+    async def test_routes_to_lowest_latency_backend(self):
+        """Test that, once warmed up, the fastest backend gets the traffic."""
+        slow = FakeAIProvider("slow", latency=0.03)
+        fast = FakeAIProvider("fast", latency=0.001)
+        router = _router({"slow": slow, "fast": fast}, hedge_min_delay=5.0, hedge_max_delay=5.0)
+
+        for stats, latency in ((router.stats["slow"]["text"], 0.03), (router.stats["fast"]["text"], 0.001)):
+            for _ in range(3):
+                stats.record(latency, True)
+
+        await router.generate_text("prompt")
+
+        assert router.candidates("text") == ["fast", "slow"]
+        assert fast.calls == 1
+        assert slow.calls == 0
+
+    @pytest.mark.asyncio
+    async def test_hedges_when_primary_exceeds_percentile(self):
+        """Test that a slow primary triggers a second request whose result wins."""
+        degraded = FakeAIProvider("degraded", latency=0.5)
+        healthy = FakeAIProvider("healthy", latency=0.01)
+        router = _router({"degraded": degraded, "healthy": healthy})
+        for _ in range(3):
+            router.stats["degraded"]["text"].record(0.02, True)
+            router.stats["healthy"]["text"].record(0.05, True)
+
+        story = await asyncio.wait_for(router.generate_text("exatamente 1 páginas"), timeout=0.3)
+
+        assert "healthy" in story
+        assert router.hedged_requests == 1
+        assert degraded.calls == 1 and healthy.calls == 1
+        # The cancelled loser is counted apart, not as a (too low) latency sample
+        degraded_stats = router.stats["degraded"]["text"]
+        assert list(degraded_stats.latencies) == [0.02] * 3
+        assert degraded_stats.snapshot()["hedge_losses"] == 1
+
+    @pytest.mark.asyncio
+    async def test_fails_over_on_error(self):
+        """Test that an upstream error is retried on the next backend."""
+        broken = FakeAIProvider("broken", latency=0, failure_rate=1.0)
+        backup = FakeAIProvider("backup", latency=0)
+        router = _router({"broken": broken, "backup": backup})
+
+        image = await router.generate_image("gato", "cartoon")
+
+        assert image.startswith(b"\x89PNG")
+        assert router.stats["broken"]["image"].error_rate == 1.0
+
+    @pytest.mark.asyncio
+    async def test_open_circuit_skips_backend(self):
+        """Test that a backend with sustained failures stops receiving requests."""
+        broken = FakeAIProvider("broken", latency=0, failure_rate=1.0)
+        backup = FakeAIProvider("backup", latency=0)
+        router = _router({"broken": broken, "backup": backup})
+
+        for _ in range(5):
+            await router.generate_text("prompt")
+
+        assert router.circuits["broken"].state == "open"
+        assert broken.calls == 3
+        assert backup.calls == 5
+
+    @pytest.mark.asyncio
+    async def test_all_backends_failing_raises(self):
+        """Test that exhausting every backend surfaces an ExternalServiceError."""
+        router = _router({
+            "a": FakeAIProvider("a", latency=0, failure_rate=1.0),
+            "b": FakeAIProvider("b", latency=0, failure_rate=1.0)
+        })
+
+        with pytest.raises(ExternalServiceError) as exc:
+            await router.generate_text("prompt")
+
+        assert len(exc.value.details["errors"]) == 2
+
+    @pytest.mark.asyncio
+    async def test_stream_fails_over_before_first_chunk(self):
+        """Test that streaming switches backend only before any chunk is sent."""
+        router = _router({
+            "broken": FakeAIProvider("broken", latency=0, failure_rate=1.0),
+            "backup": FakeAIProvider("backup", latency=0)
+        })
+
+        story = "".join([chunk async for chunk in router.generate_text_stream("exatamente 2 páginas")])
+
+        assert story.count("backup") == 2
+
+    @pytest.mark.asyncio
+    async def test_batch_is_routed_as_one_request(self):
+        """Test that a batch goes to a single backend call and fails over as a whole."""
+        broken = FakeAIProvider("broken", latency=0, failure_rate=1.0)
+        backup = FakeAIProvider("backup", latency=0)
+        router = _router({"broken": broken, "backup": backup})
+
+        results = await router.generate_text_batch(["exatamente 1 páginas"] * 3)
+
+        assert len(results) == 3 and all("backup" in result for result in results)
+        assert broken.calls == 1 and backup.calls == 1
+        assert router.stats["backup"]["batch"].samples == 1
+
+
+class TestAIProviderFactoryRouting:
+
+    def test_creates_router_from_settings(self, monkeypatch):
+        """Test that AI_ROUTER_BACKENDS defines the routed backends in order."""
+        monkeypatch.setattr("app.services.ai.factory.settings.AI_ROUTER_BACKENDS", "fake, gemini")
+
+        provider = AIProviderFactory.create("router", cached=False)
+
+        assert isinstance(provider, RoutingAIProvider)
+        assert provider.order == ["fake", "gemini"]
+
+    def test_create_ai_service_logs_failures(self, caplog):
+        """Test that factory errors are logged instead of silently swallowed."""
+        assert AIServiceFactory.create_ai_service("unknown") is None
+        assert "unknown" in caplog.text
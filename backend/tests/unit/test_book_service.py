@@ -1,5 +1,5 @@
 import pytest
-from unittest.mock import AsyncMock, MagicMock, PropertyMock
+from unittest.mock import AsyncMock, MagicMock, PropertyMock, patch
 from fastapi import HTTPException
 from app.services.book_service import BookService
 from app.models.user import User, UserRole
@@ -21,10 +21,15 @@ class TestBookService:
         return AsyncMock()
         
     @pytest.fixture
-    def book_service(self, mock_db, mock_user_repo, mock_book_repo):
+    def mock_checkpoint_repo(self):
+        return AsyncMock()
+        
+    @pytest.fixture
+    def book_service(self, mock_db, mock_user_repo, mock_book_repo, mock_checkpoint_repo):
         service = BookService(mock_db)
         service.user_repo = mock_user_repo
         service.book_repo = mock_book_repo
+        service.checkpoint_repo = mock_checkpoint_repo
         # Mock AI service to avoid real instantiation
         service.ai_service = MagicMock()
         return service
@@ -122,3 +127,43 @@ class TestBookService:
         assert result.title == "Test Book"
         mock_book_repo.create.assert_called_once()
         mock_db.commit.assert_called_once()
+
+    @pytest.mark.asyncio
+    async def test_start_generation_uses_new_attempt(self, book_service, mock_book_repo, mock_checkpoint_repo):
+        """Test that a fresh generation ignores previous checkpoints."""
+        user = MagicMock(id=1)
+        mock_book_repo.get.return_value = MagicMock(id=10, user_id=1, status="failed")
+        mock_checkpoint_repo.get_latest_attempt.return_value = 2
+        
+        with patch("app.worker.tasks.dispatch_book_generation") as dispatch:
+            dispatch.return_value.id = "task-1"
+            result = await book_service.start_book_generation(10, user)
+        
+        dispatch.assert_called_once_with(10, 1, 3)
+        assert result["attempt"] == 3
+
+    @pytest.mark.asyncio
+    async def test_resume_generation_reuses_latest_attempt(self, book_service, mock_book_repo, mock_checkpoint_repo):
+        """Test that resuming keeps the attempt so checkpoints are reused."""
+        user = MagicMock(id=1)
+        mock_book_repo.get.return_value = MagicMock(id=10, user_id=1, status="failed")
+        mock_checkpoint_repo.get_latest_attempt.return_value = 2
+        
+        with patch("app.worker.tasks.dispatch_book_generation") as dispatch:
+            dispatch.return_value.id = "task-2"
+            result = await book_service.resume_book_generation(10, user)
+        
+        dispatch.assert_called_once_with(10, 1, 2)
+        mock_book_repo.update_status.assert_called_once_with(10, "processing")
+        assert result["task_id"] == "task-2"
+
+    @pytest.mark.asyncio
+    async def test_resume_generation_requires_failed_book(self, book_service, mock_book_repo):
+        """Test that only failed books can be resumed."""
+        user = MagicMock(id=1)
+        mock_book_repo.get.return_value = MagicMock(id=10, user_id=1, status="completed")
+        
+        with pytest.raises(HTTPException) as exc:
+            await book_service.resume_book_generation(10, user)
+        
+        assert exc.value.status_code == 400
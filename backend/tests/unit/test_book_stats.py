@@ -0,0 +1,134 @@
+import pytest
+from types import SimpleNamespace
+from unittest.mock import AsyncMock, MagicMock
+from sqlalchemy.dialects import postgresql
+from app.core.config import settings
+from app.models.book import Book
+from app.models.stats import GLOBAL_STATS_USER_ID
+from app.repositories.book_repository import BookRepository
+from app.repositories.stats_repository import BookStatsRepository
+
+
+def _db(rows, dialect="postgresql"):
+    db = MagicMock()
+    db.bind.dialect.name = dialect
+    result = MagicMock()
+    result.all.return_value = rows
+    db.execute = AsyncMock(return_value=result)
+    return db
+
+
+def _sql(db):
+    statement = db.execute.await_args.args[0]
+    return str(statement.compile(dialect=postgresql.dialect(), compile_kwargs={"literal_binds": True}))
+
+
+class TestCounterStats:
+
+    @pytest.mark.asyncio
+    async def test_reads_counters_by_primary_key(self):
+        """Test that stats come from book_stats in one query, skipping zeroed counters."""
+        db = _db([
+            SimpleNamespace(dimension="total", value="", count=5),
+            SimpleNamespace(dimension="status", value="completed", count=3),
+            SimpleNamespace(dimension="status", value="draft", count=2),
+            SimpleNamespace(dimension="style", value="cartoon", count=5),
+        ])
+
+        stats = await BookRepository(db).get_books_stats(7)
+
+        assert stats == {
+            'total': 5,
+            'by_status': {'completed': 3, 'draft': 2},
+            'by_style': {'cartoon': 5},
+        }
+        assert db.execute.await_count == 1
+        sql = _sql(db)
+        assert "FROM book_stats" in sql
+        assert "book_stats.user_id = 7 AND book_stats.count > 0" in sql
+
+    @pytest.mark.asyncio
+    async def test_global_stats_read_the_rolled_up_rows(self):
+        """Test that stats for all users are a primary key read of the global rows."""
+        db = _db([
+            SimpleNamespace(dimension="total", value="", count=9),
+            SimpleNamespace(dimension="status", value="draft", count=9),
+        ])
+
+        stats = await BookRepository(db).get_books_stats()
+
+        assert stats == {'total': 9, 'by_status': {'draft': 9}, 'by_style': {}}
+        sql = _sql(db)
+        assert f"book_stats.user_id = {GLOBAL_STATS_USER_ID} AND book_stats.count > 0" in sql
+        assert "sum(" not in sql
+
+    @pytest.mark.asyncio
+    async def test_rollup_sums_user_rows_into_global_rows(self):
+        """Test that the rollup rewrites the global rows from the per-user counters in key order."""
+        db = _db([])
+
+        await BookStatsRepository(db).rollup_global()
+
+        sql = _sql(db)
+        assert sql.startswith("INSERT INTO book_stats (user_id, dimension, value, count) SELECT 0 AS ")
+        assert "sum(book_stats.count)" in sql
+        assert f"WHERE book_stats.user_id != {GLOBAL_STATS_USER_ID}" in sql
+        assert "ORDER BY book_stats.dimension, book_stats.value" in sql
+        assert "DO UPDATE SET count = excluded.count" in sql
+
+    @pytest.mark.asyncio
+    async def test_counters_can_be_disabled(self, monkeypatch):
+        """Test that BOOK_STATS_COUNTERS=False aggregates books instead."""
+        monkeypatch.setattr(settings, "BOOK_STATS_COUNTERS", False)
+        db = _db([])
+
+        await BookRepository(db).get_books_stats(7)
+
+        assert "FROM books" in _sql(db)
+
+
+class TestComputedStats:
+
+    @pytest.mark.asyncio
+    async def test_grouping_sets_single_scan(self):
+        """Test that total, status and style come from one GROUPING SETS query."""
+        db = _db([
+            SimpleNamespace(grouping=3, status=None, style=None, count=4),
+            SimpleNamespace(grouping=1, status="draft", style=None, count=1),
+            SimpleNamespace(grouping=1, status="completed", style=None, count=3),
+            SimpleNamespace(grouping=2, status=None, style="cartoon", count=4),
+        ])
+
+        stats = await BookRepository(db).compute_books_stats(7)
+
+        assert stats == {
+            'total': 4,
+            'by_status': {'draft': 1, 'completed': 3},
+            'by_style': {'cartoon': 4},
+        }
+        assert db.execute.await_count == 1
+        sql = _sql(db)
+        assert "GROUP BY GROUPING SETS((), books.status, books.style)" in sql
+        assert "books.user_id = 7" in sql
+
+    @pytest.mark.asyncio
+    async def test_fallback_without_postgres(self, sqlite_db):
+        """Test that other databases get the same result from one GROUP BY query."""
+        for user_id, status, style in [
+            (1, "draft", "cartoon"),
+            (1, "completed", "cartoon"),
+            (1, "completed", "realistic"),
+            (2, "completed", "cartoon"),
+        ]:
+            sqlite_db.add(Book(title="Livro de teste", user_id=user_id, pages_count=8, style=style, status=status))
+        sqlite_db.session.flush()
+        sqlite_db.statements.clear()
+        repo = BookRepository(sqlite_db)
+
+        assert await repo.get_books_stats(1) == {
+            'total': 3,
+            'by_status': {'draft': 1, 'completed': 2},
+            'by_style': {'cartoon': 2, 'realistic': 1},
+        }
+        assert (await repo.get_books_stats())['total'] == 4
+        assert len(sqlite_db.statements) == 2
@@ -0,0 +1,144 @@
+import pytest
+from types import SimpleNamespace
+from unittest.mock import AsyncMock, MagicMock
+from sqlalchemy.dialects import postgresql
+from app.exceptions.base_exceptions import ValidationError
+from app.repositories.book_repository import BookRepository
+from app.repositories.page_repository import PageRepository
+from app.worker import tasks
+
+
+def _books(count, **overrides):
+    return [
+        {"title": f"Livro {n:03d}", "user_id": 1, "pages_count": 5, "style": "cartoon", **overrides}
+        for n in range(count)
+    ]
+
+
+class TestBulkOperations:
+
+    @pytest.mark.asyncio
+    async def test_bulk_create_uses_multi_row_insert(self, sqlite_db):
+        """Test that bulk_create batches rows instead of one INSERT per row."""
+        repo = BookRepository(sqlite_db)
+
+        assert await repo.bulk_create(_books(50)) == 50
+
+        inserts = [sql for sql in sqlite_db.statements if sql.startswith("INSERT")]
+        assert len(inserts) < 50
+        assert await repo.count() == 50
+        # Default do Python aplicado
+        assert {book.status for book in await repo.get_by_filters()} == {"draft"}
+
+    @pytest.mark.asyncio
+    async def test_bulk_create_returning(self, sqlite_db):
+        """Test that returning=True hydrates instances with ids and server defaults."""
+        books = await BookRepository(sqlite_db).bulk_create(_books(3), returning=True)
+
+        assert [book.title for book in books] == ["Livro 000", "Livro 001", "Livro 002"]
+        assert all(book.id and book.created_at for book in books)
+
+    @pytest.mark.asyncio
+    async def test_bulk_create_validates_rows(self, sqlite_db):
+        """Test that model validators run on every row before anything is sent."""
+        with pytest.raises(ValidationError):
+            await BookRepository(sqlite_db).bulk_create(_books(2) + _books(1, style="anime"))
+        assert sqlite_db.statements == []
+
+    @pytest.mark.asyncio
+    async def test_bulk_update_and_delete(self, sqlite_db):
+        """Test bulk_update by primary key and chunked bulk_delete_by_ids."""
+        repo = BookRepository(sqlite_db)
+        books = await repo.bulk_create(_books(6), returning=True)
+        ids = [book.id for book in books]
+
+        await repo.bulk_update([{"id": ids[0], "title": "  Renomeado  "}, {"id": ids[1], "style": "manga"}])
+        with pytest.raises(ValueError):
+            await repo.bulk_update([{"title": "Sem id"}])
+
+        rows = {book.id: book for book in await repo.get_by_filters()}
+        assert rows[ids[0]].title == "Renomeado"
+        assert rows[ids[1]].style == "manga"
+
+        sqlite_db.statements.clear()
+        with pytest.MonkeyPatch.context() as mp:
+            mp.setattr("app.repositories.base_repository.settings.DB_BULK_CHUNK_SIZE", 2)
+            assert await repo.bulk_delete_by_ids(ids[:5] + ids[:1]) == 5
+        assert len(sqlite_db.statements) == 3
+        assert await repo.count() == 1
+
+    @pytest.mark.asyncio
+    async def test_large_batches_use_copy_on_asyncpg(self, monkeypatch):
+        """Test the COPY path: column order, Python defaults and the session transaction."""
+        monkeypatch.setattr("app.repositories.base_repository.settings.DB_BULK_COPY_MIN_ROWS", 3)
+        driver = MagicMock()
+        driver.copy_records_to_table = AsyncMock()
+        connection = MagicMock()
+        connection.dialect.driver = "asyncpg"
+        connection.get_raw_connection = AsyncMock(return_value=SimpleNamespace(driver_connection=driver))
+        db = MagicMock()
+        db.connection = AsyncMock(return_value=connection)
+        db.flush = AsyncMock()
+        db.execute = AsyncMock()
+
+        assert await BookRepository(db).bulk_create(_books(3)) == 3
+
+        db.execute.assert_not_awaited()
+        kwargs = driver.copy_records_to_table.await_args.kwargs
+        assert driver.copy_records_to_table.await_args.args == ("books",)
+        assert kwargs["columns"] == ["title", "user_id", "pages_count", "style", "status"]
+        assert kwargs["records"][0] == ("Livro 000", 1, 5, "cartoon", "draft")
+
+    @pytest.mark.asyncio
+    async def test_copy_falls_back_on_other_drivers(self, sqlite_db, monkeypatch):
+        """Test that drivers without COPY use the multi-row INSERT."""
+        monkeypatch.setattr("app.repositories.base_repository.settings.DB_BULK_COPY_MIN_ROWS", 3)
+
+        assert await BookRepository(sqlite_db).bulk_create(_books(4)) == 4
+        assert await BookRepository(sqlite_db).count() == 4
+
+
+class TestPageUpsert:
+
+    @pytest.mark.asyncio
+    async def test_upsert_is_one_statement_on_unique_index(self):
+        """Test that saving pages is one INSERT ... ON CONFLICT (book_id, page_number)."""
+        db = MagicMock()
+        db.execute = AsyncMock()
+
+        await PageRepository(db).upsert_pages(7, [
+            {"page_number": 1, "text_content": "Era uma vez", "image_url": "/uploads/a.png"},
+            {"page_number": 2, "text_content": "Fim", "image_prompt": "castelo"},
+        ])
+
+        db.execute.assert_awaited_once()
+        sql = str(db.execute.await_args.args[0].compile(dialect=postgresql.dialect()))
+        assert "VALUES (%(book_id_m0)s" in sql and "%(book_id_m1)s" in sql
+        assert "ON CONFLICT (book_id, page_number) DO UPDATE SET" in sql
+        assert "image_url = excluded.image_url" in sql
+        assert "updated_at = now()" in sql
+
+    @pytest.mark.asyncio
+    async def test_save_book_pages_removes_only_stale_pages(self, monkeypatch):
+        """Test that regenerated pages are upserted and only dropped pages are deleted."""
+        page_repo = MagicMock()
+        page_repo.get_image_urls = AsyncMock(return_value={1: "/uploads/old1.png", 2: None, 3: "/uploads/old3.png"})
+        page_repo.upsert_pages = AsyncMock()
+        page_repo.delete_pages = AsyncMock()
+        blob_repo = MagicMock()
+        blob_repo.replace = AsyncMock()
+        monkeypatch.setattr(tasks, "PageRepository", lambda session: page_repo)
+        monkeypatch.setattr(tasks, "BlobRepository", lambda session: blob_repo)
+
+        await tasks._save_book_pages(MagicMock(), 7, [
+            {"page_number": 1, "text": "Um", "image_url": "/uploads/new1.png"},
+            {"page_number": 2, "text": "Dois"},
+        ])
+
+        pages = page_repo.upsert_pages.await_args.args[1]
+        assert [page["page_number"] for page in pages] == [1, 2]
+        assert pages[0]["text_content"] == "Um"
+        page_repo.delete_pages.assert_awaited_once_with(7, {3})
+        old, new = blob_repo.replace.await_args.args
+        assert list(old) == ["/uploads/old1.png", None, "/uploads/old3.png"]
+        assert new == ["/uploads/new1.png", None]
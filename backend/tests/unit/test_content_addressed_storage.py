@@ -0,0 +1,256 @@
+import asyncio
+import hashlib
+import io
+import pytest
+from datetime import datetime, timezone
+from types import SimpleNamespace
+from unittest.mock import AsyncMock, MagicMock, patch
+from sqlalchemy.dialects import postgresql
+from app.repositories.blob_repository import BlobRepository
+from app.services.storage.content_addressed import (
+    ContentAddressedStorage,
+    blob_digest,
+    blob_filename_from_url,
+    is_content_addressed
+)
+from app.services.storage.local import LocalStorageProvider
+from app.worker import tasks
+
+PNG = b"\x89PNG" + b"imagem" * 100
+DIGEST = hashlib.sha256(PNG).hexdigest()
+
+
+class RecordingRegistry:
+    """Registro de blobs em memória."""
+
+    def __init__(self):
+        self.calls = []
+
+    async def __call__(self, url, digest, size, content_type):
+        self.calls.append((url, digest, size, content_type))
+        return len([call for call in self.calls if call[0] == url]) == 1
+
+
+class RecordingSession:
+    """Sessão falsa que guarda o SQL (dialeto PostgreSQL) de cada execute."""
+
+    def __init__(self):
+        self.statements = []
+
+    async def execute(self, statement):
+        compiled = statement.compile(dialect=postgresql.dialect(), compile_kwargs={"literal_binds": True})
+        self.statements.append(str(compiled))
+        return MagicMock(rowcount=1)
+
+
+@pytest.fixture
+def storage(tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+    registry = RecordingRegistry()
+    return ContentAddressedStorage(LocalStorageProvider(), registry=registry)
+
+
+def _cas_url(content=PNG, ext=".png"):
+    return f"/uploads/cas/{hashlib.sha256(content).hexdigest()}{ext}"
+
+
+class TestContentAddressedStorage:
+
+    @pytest.mark.asyncio
+    async def test_identical_content_is_stored_once(self, storage, tmp_path):
+        """Test that retried uploads of the same image map to one blob."""
+        first = await storage.upload(io.BytesIO(PNG), "book_1_page_1_111.png")
+        second = await storage.upload(io.BytesIO(PNG), "book_2_page_5_222.png")
+
+        assert first == second == f"/uploads/cas/{DIGEST[:2]}/{DIGEST[2:4]}/{DIGEST}.png"
+        blobs = [path for path in (tmp_path / "frontend/public/uploads/cas").rglob("*") if path.is_file()]
+        assert [blob.name for blob in blobs] == [f"{DIGEST}.png"]
+        assert storage.registry.calls[0] == (first, DIGEST, len(PNG), "image/png")
+        assert len(storage.registry.calls) == 2
+
+    @pytest.mark.asyncio
+    async def test_stream_is_addressed_by_content(self, storage):
+        """Test that streamed PDFs get the same name as an equal upload."""
+        async def chunks():
+            yield PNG[:100]
+            yield PNG[100:]
+
+        url = await storage.upload_stream(chunks(), "book_3.pdf", "application/pdf")
+
+        assert url.endswith(f"/{DIGEST}.pdf")
+        assert open(storage.local_path(url), "rb").read() == PNG
+
+    @pytest.mark.asyncio
+    async def test_different_content_gets_different_blobs(self, storage):
+        """Test that the digest, not the filename, names the blob."""
+        a = await storage.upload(io.BytesIO(b"a"), "same.png")
+        b = await storage.upload(io.BytesIO(b"b"), "same.png")
+
+        assert a != b
+
+    @pytest.mark.asyncio
+    async def test_recreated_record_rewrites_existing_file(self, storage):
+        """Test that a blob re-registered after a GC claim is uploaded even if the file is still there."""
+        await storage.upload(io.BytesIO(PNG), "page.png")
+        storage.registry = AsyncMock(return_value=True)
+
+        with patch.object(storage.backend, "upload", wraps=storage.backend.upload) as upload:
+            await storage.upload(io.BytesIO(PNG), "page.png")
+
+        upload.assert_awaited_once()
+
+    @pytest.mark.asyncio
+    async def test_touched_record_skips_existing_file(self, storage):
+        """Test that a blob whose record already existed is not written again."""
+        await storage.upload(io.BytesIO(PNG), "page.png")
+
+        with patch.object(storage.backend, "upload", wraps=storage.backend.upload) as upload:
+            await storage.upload(io.BytesIO(PNG), "other.png")
+
+        upload.assert_not_awaited()
+
+    def test_url_helpers(self):
+        """Test digest extraction and the legacy (non content-addressed) URLs."""
+        url = _cas_url()
+
+        assert blob_digest(url) == DIGEST
+        assert blob_filename_from_url(url) == f"cas/{DIGEST}.png"
+        assert blob_digest(f"/uploads/cas/{DIGEST[:2]}/{DIGEST[2:4]}/{DIGEST}.png") == DIGEST
+        assert not is_content_addressed("/uploads/book_1_page_1_123.45.png")
+        assert not is_content_addressed(None)
+
+
+class TestBlobRepository:
+
+    @pytest.mark.asyncio
+    async def test_replace_only_writes_the_difference(self):
+        """Test that shared URLs are untouched and duplicates count once per reference."""
+        session = RecordingSession()
+        kept, dropped, added = _cas_url(b"kept"), _cas_url(b"dropped"), _cas_url(b"added")
+
+        await BlobRepository(session).replace(
+            [kept, dropped, "/uploads/legacy.png", None],
+            [kept, added, added]
+        )
+
+        assert len(session.statements) == 2
+        acquire, release = session.statements
+        assert "ON CONFLICT (url) DO UPDATE SET refcount = (storage_blobs.refcount + 2)" in acquire
+        assert added in acquire
+        assert "greatest(storage_blobs.refcount - 1, 0)" in release
+        assert dropped in release
+
+    @pytest.mark.asyncio
+    async def test_release_book_covers_pages_and_pdfs(self):
+        """Test that removing a book releases its page images and PDFs."""
+        session = RecordingSession()
+        page_url, pdf_url = _cas_url(b"page"), _cas_url(b"pdf", ".pdf")
+        pages_result = MagicMock()
+        pages_result.scalars.return_value.all.return_value = [page_url]
+
+        repo = BlobRepository(session)
+        with patch.object(session, "execute", AsyncMock(side_effect=[pages_result, None, None])) as execute:
+            await repo.release_book(SimpleNamespace(id=1, pdf_file=pdf_url, pdf_preview_file=None, cover_image=None))
+
+        released = [str(call.args[0].compile(dialect=postgresql.dialect(), compile_kwargs={"literal_binds": True}))
+                    for call in execute.await_args_list[1:]]
+        assert any(page_url in sql for sql in released)
+        assert any(pdf_url in sql for sql in released)
+
+    @pytest.mark.asyncio
+    async def test_collectable_excludes_blobs_pending_in_checkpoints(self):
+        """Test that the GC query skips referenced blobs and resumable page images."""
+        session = RecordingSession()
+        session.execute = AsyncMock(return_value=MagicMock())
+
+        await BlobRepository(session).get_collectable(datetime(2026, 1, 1, tzinfo=timezone.utc), limit=10)
+
+        sql = str(session.execute.await_args.args[0].compile(dialect=postgresql.dialect()))
+        assert "storage_blobs.refcount = " in sql
+        assert "NOT (EXISTS" in sql
+        assert "book_generation_checkpoints.payload ->> " in sql
+
+    @pytest.mark.asyncio
+    async def test_register_reports_new_records(self):
+        """Test that register tells an inserted record apart from a touched one."""
+        session = RecordingSession()
+
+        await BlobRepository(session).register(_cas_url(), DIGEST, len(PNG), "image/png")
+
+        assert "DO UPDATE SET updated_at = now() RETURNING xmax = 0" in session.statements[0]
+
+
+class TestStorageGarbageCollection:
+
+    @staticmethod
+    def _session():
+        session = MagicMock()
+        session.commit = AsyncMock()
+        session.__aenter__ = AsyncMock(return_value=session)
+        session.__aexit__ = AsyncMock(return_value=False)
+        return session
+
+    @pytest.mark.asyncio
+    async def test_upload_racing_the_gc_keeps_the_file(self, storage):
+        """Test that an upload registered while the GC holds the claimed record ends with the file stored."""
+        url = await storage.upload(io.BytesIO(PNG), "page.png")
+        claimed, committed = asyncio.Event(), asyncio.Event()
+        session = self._session()
+        session.commit = AsyncMock(side_effect=lambda: committed.set())
+        repo = MagicMock()
+        repo.get_collectable = AsyncMock(return_value=[SimpleNamespace(id=1, url=url)])
+
+        async def claim(blob_id, older_than):
+            claimed.set()
+            await asyncio.sleep(0)
+            return True
+
+        async def register(url, digest, size, content_type):
+            # Como no PostgreSQL: o INSERT da mesma URL espera a transação do GC
+            await committed.wait()
+            return True
+
+        delete_many = storage.backend.delete_many
+
+        async def slow_delete_many(filenames):
+            # A remoção no storage demora: o upload concorrente roda antes dela terminar
+            filenames = list(filenames)
+            for _ in range(5):
+                await asyncio.sleep(0)
+            return await delete_many(filenames)
+
+        repo.claim_unreferenced = claim
+        storage.registry = register
+
+        with patch.object(tasks, "get_async_session", return_value=session), \
+                patch.object(tasks, "BlobRepository", return_value=repo), \
+                patch.object(storage.backend, "delete_many", slow_delete_many):
+            gc = asyncio.create_task(tasks._collect_storage_garbage_async(storage))
+            await claimed.wait()
+            again, result = await asyncio.gather(storage.upload(io.BytesIO(PNG), "page.png"), gc)
+
+        assert again == url
+        assert result["deleted"] == 1
+        assert open(storage.local_path(url), "rb").read() == PNG
+
+    @pytest.mark.asyncio
+    async def test_deletes_claimed_blobs_only(self, storage):
+        """Test that the GC deletes files whose row it could claim, before committing the claim."""
+        url = await storage.upload(io.BytesIO(PNG), "page.png")
+        reused = await storage.upload(io.BytesIO(b"reused"), "page.png")
+        blobs = [SimpleNamespace(id=1, url=url), SimpleNamespace(id=2, url=reused)]
+
+        session = self._session()
+        repo = MagicMock()
+        repo.get_collectable = AsyncMock(return_value=blobs)
+        # O blob 2 foi reenviado durante a coleta: a remoção condicional falha
+        repo.claim_unreferenced = AsyncMock(side_effect=[True, False])
+
+        with patch.object(tasks, "get_async_session", return_value=session), \
+                patch.object(tasks, "BlobRepository", return_value=repo):
+            result = await tasks._collect_storage_garbage_async(storage)
+
+        assert result == {"checked": 2, "deleted": 1}
+        assert storage.local_path(url) is None
+        assert storage.local_path(reused) is not None
+        session.commit.assert_awaited_once()
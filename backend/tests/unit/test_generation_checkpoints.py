@@ -0,0 +1,135 @@
+import pytest
+from contextlib import asynccontextmanager
+from unittest.mock import patch
+from sqlalchemy import func, select
+from app.models.book import Book, BookGenerationCheckpoint, CheckpointStage, Page
+from app.repositories.checkpoint_repository import GenerationCheckpointRepository
+from app.worker import tasks
+
+
+@pytest.fixture
+def book(sqlite_db):
+    book = Book(title="Livro retomado", user_id=7, pages_count=5, style="cartoon", status="processing")
+    sqlite_db.add(book)
+    sqlite_db.session.commit()
+    return book
+
+
+class TestGenerationCheckpointRepository:
+
+    @pytest.mark.asyncio
+    async def test_save_and_load_payload(self, sqlite_db, book):
+        """Test that a stage payload is read back for the same attempt only."""
+        repo = GenerationCheckpointRepository(sqlite_db)
+
+        await repo.save_payload(book.id, 1, CheckpointStage.STORY, "Página 1: Era uma vez.")
+
+        assert await repo.get_payload(book.id, 1, CheckpointStage.STORY) == "Página 1: Era uma vez."
+        assert await repo.get_payload(book.id, 2, CheckpointStage.STORY) is None
+        assert await repo.get_payload(book.id, 1, CheckpointStage.PAGES) is None
+        assert await repo.get_latest_attempt(book.id) == 1
+
+    @pytest.mark.asyncio
+    async def test_save_replaces_existing_stage(self, sqlite_db, book):
+        """Test that saving a stage twice keeps a single checkpoint with the new payload."""
+        repo = GenerationCheckpointRepository(sqlite_db)
+
+        await repo.save_payload(book.id, 1, CheckpointStage.PAGES, [{"page_number": 1}])
+        await repo.save_payload(book.id, 1, CheckpointStage.PAGES, [{"page_number": 1}, {"page_number": 2}])
+
+        assert len(await repo.get_payload(book.id, 1, CheckpointStage.PAGES)) == 2
+        count = await sqlite_db.execute(select(func.count()).select_from(BookGenerationCheckpoint))
+        assert count.scalar() == 1
+
+    @pytest.mark.asyncio
+    async def test_page_images_by_page_number(self, sqlite_db, book):
+        """Test that page image checkpoints are keyed by page and can be discarded."""
+        repo = GenerationCheckpointRepository(sqlite_db)
+        for number in (1, 3):
+            await repo.save_payload(
+                book.id, 1, CheckpointStage.PAGE_IMAGE, {"image_url": f"/uploads/p{number}.png"},
+                page_number=number
+            )
+
+        images = await repo.get_page_images(book.id, 1)
+        assert images == {1: {"image_url": "/uploads/p1.png"}, 3: {"image_url": "/uploads/p3.png"}}
+
+        assert await repo.delete_page_images(book.id, 1) == 2
+        assert await repo.get_page_images(book.id, 1) == {}
+
+    @pytest.mark.asyncio
+    async def test_finalize_restores_checkpoints_and_clears_them(self, sqlite_db, book):
+        """Test that a successful generation reuses saved pages and then drops every checkpoint."""
+        repo = GenerationCheckpointRepository(sqlite_db)
+        await repo.save_payload(book.id, 1, CheckpointStage.PAGES, [
+            {"page_number": 1, "text": "Um"}, {"page_number": 2, "text": "Dois"}
+        ])
+        await repo.save_payload(
+            book.id, 1, CheckpointStage.PAGE_IMAGE, {"image_url": "/uploads/p1.png"}, page_number=1
+        )
+        sqlite_db.session.commit()
+
+        @asynccontextmanager
+        async def session():
+            yield sqlite_db
+
+        with patch.object(tasks, "get_async_session", session):
+            result = await tasks._finalize_book_generation_async(
+                book.id, 7, [{"page_number": 2, "text": "Dois", "image_url": "/uploads/p2.png"}], attempt=1
+            )
+
+        assert result["pages_generated"] == 2
+        assert result["images_generated"] == 2
+        pages = sqlite_db.session.scalars(select(Page).order_by(Page.page_number)).all()
+        assert [page.image_url for page in pages] == ["/uploads/p1.png", "/uploads/p2.png"]
+        assert await repo.get_latest_attempt(book.id) == 0
+
+
+class TestSingleModeRetries:
+
+    def _run(self, retries, error):
+        task = tasks.generate_book_content
+        task.push_request(id="task-1", retries=retries)
+        try:
+            with patch.object(tasks, "sync_run_async_task", side_effect=error) as run, \
+                    patch.object(task, "retry", return_value=tasks.Retry()) as retry:
+                with pytest.raises((tasks.Retry, tasks.ExternalServiceError)) as raised:
+                    task.run(book_id=3, user_id=7, attempt=2)
+        finally:
+            task.pop_request()
+        return run, retry, raised.value
+
+    def test_ai_failure_is_retried_with_the_same_attempt(self):
+        """Test that an AI outage retries the task so the attempt's checkpoints are reused."""
+        error = tasks.ExternalServiceError(message="providers down", service="ai")
+        run, retry, raised = self._run(0, error)
+
+        assert isinstance(raised, tasks.Retry)
+        assert retry.call_args.kwargs["kwargs"] == {"book_id": 3, "user_id": 7, "attempt": 2}
+        assert run.call_args.kwargs == {"last_try": False}
+
+    def test_last_retry_lets_the_coroutine_fail_the_book(self):
+        """Test that the final retry asks the coroutine to mark the book failed."""
+        error = tasks.ExternalServiceError(message="providers down", service="ai")
+        run, retry, raised = self._run(tasks.generate_book_content.max_retries, error)
+
+        assert raised is error
+        retry.assert_not_called()
+        assert run.call_args.kwargs == {"last_try": True}
+
+    @pytest.mark.asyncio
+    @pytest.mark.parametrize("last_try, status", [(False, "processing"), (True, "failed")])
+    async def test_coroutine_fails_the_book_only_on_last_try(self, sqlite_db, book, last_try, status):
+        """Test that a transient error keeps the book processing while retries remain."""
+        @asynccontextmanager
+        async def session():
+            yield sqlite_db
+
+        with patch.object(tasks, "get_async_session", session), \
+                patch.object(tasks.UserRepository, "get", return_value=None), \
+                patch.object(tasks.worker_runtime, "get_ai_service", side_effect=RuntimeError("timeout")):
+            with pytest.raises((RuntimeError, tasks.ExternalServiceError)):
+                await tasks._generate_book_content_async(book.id, 7, attempt=1, last_try=last_try)
+
+        sqlite_db.session.expire_all()
+        assert sqlite_db.session.get(Book, book.id).status == status
@@ -0,0 +1,139 @@
+import io
+import zipfile
+import pytest
+from contextlib import asynccontextmanager
+from datetime import datetime, timezone
+from types import SimpleNamespace
+from app.services import export_service
+from app.services.export_service import LibraryExportService
+from app.services.storage.local import LocalStorageProvider
+
+
+def _book(book_id, title, pages=()):
+    return SimpleNamespace(
+        id=book_id,
+        title=title,
+        pdf_file=f"/uploads/book_{book_id}.pdf",
+        updated_at=datetime(2026, 3, 4, 5, 6, 8, tzinfo=timezone.utc),
+        created_at=None,
+        pages=[SimpleNamespace(page_number=n, image_url=url) for n, url in pages]
+    )
+
+
+class FakeBookRepository:
+    """Repositório em memória que registra as consultas paginadas."""
+
+    books = []
+    calls = []
+
+    def __init__(self, session):
+        pass
+
+    async def get_completed_books(self, user_id=None, skip=0, limit=100, with_pages=False):
+        FakeBookRepository.calls.append((user_id, skip, limit, with_pages))
+        return FakeBookRepository.books[skip:skip + limit]
+
+
+@asynccontextmanager
+async def _session():
+    yield None
+
+
+@pytest.fixture
+def storage(tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+    monkeypatch.setattr(export_service, "BookRepository", FakeBookRepository)
+    FakeBookRepository.calls = []
+    return LocalStorageProvider()
+
+
+def _service(storage, **kwargs):
+    return LibraryExportService(storage, session_factory=_session, **kwargs)
+
+
+async def _collect(service, **kwargs):
+    return [chunk async for chunk in service.stream_zip(1, **kwargs)]
+
+
+class TestLibraryExport:
+
+    @pytest.mark.asyncio
+    async def test_zip_contains_every_completed_pdf(self, storage):
+        """Test that each book's PDF is archived, in batches, without recompression."""
+        FakeBookRepository.books = [_book(n, f"Livro {n}") for n in range(1, 6)]
+        for n in range(1, 6):
+            (storage.public_dir / f"book_{n}.pdf").write_bytes(b"%PDF" + bytes([n]) * 1000)
+
+        chunks = await _collect(_service(storage, batch_size=2))
+
+        archive = zipfile.ZipFile(io.BytesIO(b"".join(chunks)))
+        assert archive.testzip() is None
+        assert archive.namelist() == [f"{n}_Livro_{n}.pdf" for n in range(1, 6)]
+        assert archive.read("3_Livro_3.pdf") == b"%PDF" + bytes([3]) * 1000
+        assert all(info.compress_type == zipfile.ZIP_STORED for info in archive.infolist())
+        assert archive.getinfo("1_Livro_1.pdf").date_time == (2026, 3, 4, 5, 6, 8)
+        assert [call[1] for call in FakeBookRepository.calls] == [0, 2, 4]
+
+    @pytest.mark.asyncio
+    async def test_output_is_streamed_in_bounded_chunks(self, storage):
+        """Test that a large file is emitted progressively, never held whole in memory."""
+        FakeBookRepository.books = [_book(1, "Grande")]
+        data = bytes(range(256)) * 4096
+        (storage.public_dir / "book_1.pdf").write_bytes(data)
+
+        chunks = await _collect(_service(storage, chunk_size=64 * 1024))
+
+        assert len(chunks) > 10
+        assert max(len(chunk) for chunk in chunks) <= 64 * 1024 + 1024
+        assert zipfile.ZipFile(io.BytesIO(b"".join(chunks))).read("1_Grande.pdf") == data
+
+    @pytest.mark.asyncio
+    async def test_includes_page_images_and_skips_missing_files(self, storage):
+        """Test the optional page images and that files missing from storage are skipped."""
+        FakeBookRepository.books = [
+            _book(1, "Gato Astronauta", pages=[(2, "/uploads/p2.jpg"), (1, "/uploads/p1.png"), (3, None)]),
+            _book(2, "Sem arquivo")
+        ]
+        (storage.public_dir / "book_1.pdf").write_bytes(b"%PDF-1")
+        (storage.public_dir / "p1.png").write_bytes(b"png")
+        (storage.public_dir / "p2.jpg").write_bytes(b"jpg")
+
+        chunks = await _collect(_service(storage), include_images=True)
+
+        archive = zipfile.ZipFile(io.BytesIO(b"".join(chunks)))
+        assert archive.namelist() == [
+            "1_Gato_Astronauta.pdf",
+            "1_Gato_Astronauta/pagina_01.png",
+            "1_Gato_Astronauta/pagina_02.jpg"
+        ]
+        assert FakeBookRepository.calls[0][3] is True
+
+    @pytest.mark.asyncio
+    async def test_empty_library_is_a_valid_zip(self, storage):
+        """Test that a user without completed books gets an empty archive."""
+        FakeBookRepository.books = []
+
+        chunks = await _collect(_service(storage))
+
+        assert zipfile.ZipFile(io.BytesIO(b"".join(chunks))).namelist() == []
+
+    @pytest.mark.asyncio
+    async def test_abandoned_export_closes_the_storage_stream(self, storage):
+        """Test that closing the export mid-file releases the storage read stream."""
+        FakeBookRepository.books = [_book(1, "Grande")]
+        closed = []
+
+        async def read_stream(url, chunk_size):
+            try:
+                while True:
+                    yield b"x" * chunk_size
+            finally:
+                closed.append(url)
+
+        storage.read_stream = read_stream
+        stream = _service(storage, chunk_size=1024).stream_zip(1)
+
+        await anext(stream)
+        await stream.aclose()
+
+        assert closed == ["/uploads/book_1.pdf"]
@@ -0,0 +1,100 @@
+import asyncio
+import io
+import threading
+import pytest
+from app.services.storage import local
+from app.services.storage.local import LocalStorageProvider
+
+
+@pytest.fixture
+def storage_dir(tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+    return tmp_path / "frontend/public/uploads"
+
+
+@pytest.fixture
+def fsync_calls(monkeypatch):
+    calls = []
+    real_fsync = local.os.fsync
+    monkeypatch.setattr(local.os, "fsync", lambda fd: calls.append(fd) or real_fsync(fd))
+    return calls
+
+
+class ThreadRecordingReader(io.BytesIO):
+    """Arquivo em memória que registra em qual thread foi lido."""
+
+    def __init__(self, data):
+        super().__init__(data)
+        self.threads = set()
+
+    def read(self, size=-1):
+        self.threads.add(threading.current_thread().name)
+        return super().read(size)
+
+
+class TestLocalStorageProvider:
+
+    @pytest.mark.asyncio
+    async def test_upload_runs_on_io_pool_in_chunks(self, storage_dir):
+        """Test that the copy happens off the event loop thread, chunk by chunk."""
+        storage = LocalStorageProvider(chunk_size=1024)
+        data = ThreadRecordingReader(b"x" * 10_000)
+
+        url = await storage.upload(data, "page.png")
+
+        assert url == storage.url_for("page.png")
+        assert open(storage.local_path(url), "rb").read() == b"x" * 10_000
+        assert data.threads and all(name.startswith("storage-io") for name in data.threads)
+        assert not list(storage_dir.rglob(".*.part"))
+
+    @pytest.mark.asyncio
+    async def test_failed_upload_keeps_previous_file(self, storage_dir):
+        """Test that a failing write never replaces or truncates the published file."""
+        storage = LocalStorageProvider()
+        url = await storage.upload(io.BytesIO(b"original"), "page.png")
+
+        class BrokenReader(io.BytesIO):
+            def read(self, size=-1):
+                raise OSError("disk full")
+
+        with pytest.raises(OSError):
+            await storage.upload(BrokenReader(), "page.png")
+
+        assert open(storage.local_path(url), "rb").read() == b"original"
+        assert not list(storage_dir.rglob(".*.part"))
+
+    @pytest.mark.asyncio
+    @pytest.mark.parametrize("policy, expected", [("none", 0), ("file", 1), ("dir", 2)])
+    async def test_fsync_policy(self, storage_dir, fsync_calls, policy, expected):
+        """Test that none/file/dir fsync nothing, the file, and the file plus its directory."""
+        storage = LocalStorageProvider(fsync_policy=policy)
+
+        await storage.upload(io.BytesIO(b"data"), "page.png")
+
+        assert len(fsync_calls) == expected
+
+    def test_unknown_fsync_policy_is_rejected(self, storage_dir):
+        """Test that a misconfigured policy fails fast."""
+        with pytest.raises(ValueError):
+            LocalStorageProvider(fsync_policy="always")
+
+    @pytest.mark.asyncio
+    async def test_concurrent_uploads_of_same_name(self, storage_dir):
+        """Test that concurrent writers use separate temp files and one complete version wins."""
+        storage = LocalStorageProvider(chunk_size=512)
+        versions = [bytes([n]) * 50_000 for n in range(8)]
+
+        urls = await asyncio.gather(*(storage.upload(io.BytesIO(data), "page.png") for data in versions))
+
+        assert open(storage.local_path(urls[0]), "rb").read() in versions
+        assert not list(storage_dir.rglob(".*.part"))
+
+    @pytest.mark.asyncio
+    async def test_delete(self, storage_dir):
+        """Test that delete reports whether a file was removed."""
+        storage = LocalStorageProvider()
+        await storage.upload(io.BytesIO(b"data"), "page.png")
+
+        assert await storage.delete("page.png") is True
+        assert await storage.delete("page.png") is False
+        assert not list(storage_dir.rglob("page.png"))
@@ -0,0 +1,104 @@
+import asyncio
+import io
+import os
+import threading
+import pytest
+from PIL import Image
+from app.core import executors
+from app.core.executors import get_process_pool, run_cpu_bound, shutdown_process_pool
+from app.services.ai import placeholder
+from app.services.ai.gemini import GeminiProvider
+
+
+@pytest.fixture
+def process_pool(monkeypatch):
+    monkeypatch.setattr(executors.settings, "MEDIA_PROCESS_POOL_ENABLED", True)
+    monkeypatch.setattr(executors.settings, "MEDIA_PROCESS_POOL_SIZE", 1)
+    yield
+    shutdown_process_pool()
+
+
+class TestMediaProcessPool:
+
+    @pytest.mark.asyncio
+    async def test_runs_in_another_process(self, process_pool):
+        """Test that CPU-bound work leaves the calling process."""
+        assert await run_cpu_bound(os.getpid) != os.getpid()
+
+    @pytest.mark.asyncio
+    async def test_loop_keeps_running_during_render(self, process_pool):
+        """Test that the event loop is not blocked while an image is encoded."""
+        await run_cpu_bound(os.getpid)  # spawn the worker before timing
+        ticks = 0
+
+        async def ticker():
+            nonlocal ticks
+            while True:
+                await asyncio.sleep(0.001)
+                ticks += 1
+
+        ticking = asyncio.create_task(ticker())
+        image = await run_cpu_bound(placeholder.render_placeholder, "gato", "cartoon", seed=1)
+        ticking.cancel()
+
+        assert image.startswith(b"\x89PNG")
+        assert ticks > 0
+
+    @pytest.mark.asyncio
+    async def test_disabled_pool_uses_threads(self, monkeypatch):
+        """Test the thread fallback when the process pool is disabled."""
+        monkeypatch.setattr(executors.settings, "MEDIA_PROCESS_POOL_ENABLED", False)
+
+        thread_id = await run_cpu_bound(threading.get_ident)
+
+        assert get_process_pool() is None
+        assert thread_id != threading.get_ident()
+
+    def test_pool_is_recreated_after_fork(self, process_pool, monkeypatch):
+        """Test that an executor inherited from the parent process is not reused."""
+        inherited = get_process_pool()
+        monkeypatch.setattr(executors, "_executor_pid", -1)
+
+        fresh = get_process_pool()
+
+        assert fresh is not inherited
+        inherited.shutdown()
+
+
+class TestPlaceholderRendering:
+
+    def test_font_and_canvas_are_cached(self):
+        """Test that repeated renders reuse the font and style background."""
+        placeholder.get_font.cache_clear()
+        placeholder.get_canvas.cache_clear()
+
+        first = placeholder.render_placeholder("gato", "manga", seed=7)
+        second = placeholder.render_placeholder("gato", "manga", seed=7)
+
+        assert first == second
+        assert placeholder.get_font.cache_info().misses == 1
+        assert placeholder.get_canvas.cache_info().hits == 1
+        assert placeholder.get_canvas("manga").getpixel((0, 0)) == placeholder.STYLE_COLORS["manga"]
+
+    def test_render_does_not_mutate_cached_canvas(self):
+        """Test that drawing happens on a copy of the cached background."""
+        image = Image.open(io.BytesIO(placeholder.render_placeholder("gato", "classic", seed=3)))
+
+        assert image.size == (placeholder.WIDTH, placeholder.HEIGHT)
+        assert set(placeholder.get_canvas("classic").getdata()) == {placeholder.STYLE_COLORS["classic"]}
+
+    @pytest.mark.asyncio
+    async def test_gemini_placeholder_renders_off_loop(self, monkeypatch):
+        """Test that GeminiProvider.generate_image delegates to the media executor."""
+        calls = []
+
+        async def fake_run_cpu_bound(func, *args, **kwargs):
+            calls.append(func)
+            return func(*args, **kwargs)
+
+        monkeypatch.setattr("app.services.ai.gemini.run_cpu_bound", fake_run_cpu_bound)
+
+        image = await GeminiProvider(api_key=None).generate_image("gato", "cartoon")
+
+        assert calls == [placeholder.render_placeholder]
+        assert image.startswith(b"\x89PNG")
@@ -0,0 +1,83 @@
+import pytest
+from datetime import datetime, timedelta, timezone
+from types import SimpleNamespace
+from unittest.mock import AsyncMock, MagicMock
+from sqlalchemy.dialects import postgresql
+from app.repositories.base_repository import InvalidCursorError, decode_cursor, encode_cursor
+from app.repositories.book_repository import BookRepository
+
+START = datetime(2026, 10, 1, 12, 0, tzinfo=timezone.utc)
+
+
+def _books(count):
+    # Dois livros por instante: o id desempata
+    return [SimpleNamespace(id=100 - n, created_at=START - timedelta(minutes=n // 2)) for n in range(count)]
+
+
+def _repository(rows):
+    db = MagicMock()
+    result = MagicMock()
+    result.scalars.return_value.all.return_value = rows
+    db.execute = AsyncMock(return_value=result)
+    return BookRepository(db), db
+
+
+def _sql(db):
+    statement = db.execute.await_args.args[0]
+    return str(statement.compile(dialect=postgresql.dialect(), compile_kwargs={"literal_binds": True}))
+
+
+class TestCursorEncoding:
+
+    def test_round_trip(self):
+        """Test that a cursor decodes to the position it was built from."""
+        cursor = encode_cursor(START, 42)
+
+        assert decode_cursor(cursor) == (START, 42)
+        assert "=" not in cursor
+
+    @pytest.mark.parametrize("cursor", ["", "not base64!", "WzEsMl0", encode_cursor(START, 1)[:-3] + "xyz"])
+    def test_rejects_malformed_cursors(self, cursor):
+        """Test that tampered or truncated tokens raise InvalidCursorError."""
+        with pytest.raises(InvalidCursorError):
+            decode_cursor(cursor)
+
+
+class TestKeysetPagination:
+
+    @pytest.mark.asyncio
+    async def test_first_page_returns_next_cursor(self):
+        """Test that one extra row is fetched to detect the next page."""
+        rows = _books(4)
+        repo, db = _repository(rows)
+
+        page = await repo.get_page_by_user(7, limit=3)
+
+        assert page.items == rows[:3]
+        assert decode_cursor(page.next_cursor) == (rows[2].created_at, rows[2].id)
+        sql = _sql(db)
+        assert "books.user_id = 7" in sql
+        assert "ORDER BY books.created_at DESC, books.id DESC" in sql
+        assert "LIMIT 4" in sql
+        assert "OFFSET" not in sql
+
+    @pytest.mark.asyncio
+    async def test_cursor_seeks_past_last_row(self):
+        """Test that a cursor becomes a (created_at, id) row comparison, combined with filters."""
+        repo, db = _repository(_books(2))
+
+        page = await repo.get_page_by_user(7, limit=3, cursor=encode_cursor(START, 99), status="completed")
+
+        assert page.next_cursor is None
+        sql = _sql(db)
+        assert "(books.created_at, books.id) < ('2026-10-01 12:00:00+00:00'" in sql
+        assert "books.status = 'completed'" in sql
+
+    @pytest.mark.asyncio
+    async def test_invalid_cursor_does_not_query(self):
+        """Test that a malformed cursor fails before reaching the database."""
+        repo, db = _repository([])
+
+        with pytest.raises(InvalidCursorError):
+            await repo.get_page_by_style("manga", cursor="garbage")
+        db.execute.assert_not_awaited()
@@ -0,0 +1,453 @@
+import asyncio
+import io
+import os
+import pytest
+import pytest_asyncio
+from types import SimpleNamespace
+from aiohttp import web
+from PIL import Image
+from app.core import executors
+from app.services import pdf_service
+import re
+from pypdf import PdfReader
+from app.services.pdf_renderer import DecodedImageCache, FragmentCache, ImageOptimizer, render_book_pdf
+from app.services.pdf_service import PDFService, RemoteImageCache
+from app.services.storage.base import StorageProvider
+from app.services.storage.local import LocalStorageProvider
+
+
+class RecordingStorage(StorageProvider):
+    """Storage em memória que registra como o arquivo chegou."""
+
+    def __init__(self):
+        self.uploads = {}
+        self.chunk_sizes = []
+
+    async def upload(self, file_data, filename, content_type="image/png"):
+        self.uploads[filename] = (file_data.read(), content_type)
+        return f"/uploads/{filename}"
+
+    async def upload_stream(self, chunks, filename, content_type="application/octet-stream"):
+        data = bytearray()
+        async for chunk in chunks:
+            self.chunk_sizes.append(len(chunk))
+            data.extend(chunk)
+        self.uploads[filename] = (bytes(data), content_type)
+        return f"/uploads/{filename}"
+
+    async def delete(self, filename):
+        return self.uploads.pop(filename, None) is not None
+
+
+def _png(color=(10, 200, 30), size=32):
+    buffer = io.BytesIO()
+    Image.new("RGB", (size, size), color=color).save(buffer, format="PNG")
+    return buffer.getvalue()
+
+
+def _book(image_url=None, pages=3):
+    return SimpleNamespace(
+        id=7,
+        title="O Gato",
+        theme="Aventura",
+        style="cartoon",
+        pages=[
+            SimpleNamespace(
+                page_number=n,
+                text_content=f"Texto da página {n}",
+                image_url=image_url if n == 1 else None,
+                image_prompt=f"prompt {n}"
+            )
+            for n in range(pages, 0, -1)
+        ]
+    )
+
+
+@pytest.fixture(autouse=True)
+def fragment_cache_dir(tmp_path, monkeypatch):
+    directory = tmp_path / "fragments"
+    monkeypatch.setattr("app.services.pdf_renderer.settings.PDF_FRAGMENT_CACHE_DIR", str(directory))
+    return directory
+
+
+@pytest.fixture
+def uploads(tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+    image_dir = tmp_path / "frontend/public/uploads"
+    image_dir.mkdir(parents=True)
+    (image_dir / "page.png").write_bytes(_png())
+    return image_dir
+
+
+@pytest_asyncio.fixture
+async def image_server():
+    """Servidor HTTP local que serve PNGs e registra a concorrência."""
+    state = SimpleNamespace(requests=0, in_flight=0, max_in_flight=0)
+
+    async def handler(request):
+        state.requests += 1
+        state.in_flight += 1
+        state.max_in_flight = max(state.max_in_flight, state.in_flight)
+        try:
+            await asyncio.sleep(0.02)
+            return web.Response(body=_png(), content_type="image/png")
+        finally:
+            state.in_flight -= 1
+
+    app = web.Application()
+    app.router.add_get("/{name}", handler)
+    runner = web.AppRunner(app)
+    await runner.setup()
+    site = web.TCPSite(runner, "127.0.0.1", 0)
+    await site.start()
+    port = site._server.sockets[0].getsockname()[1]
+    state.url = f"http://127.0.0.1:{port}"
+    yield state
+    await runner.cleanup()
+
+
+@pytest.fixture
+def remote_cache(tmp_path, monkeypatch):
+    cache = RemoteImageCache(str(tmp_path / "image_cache"), max_bytes=10 * 1024 * 1024)
+    monkeypatch.setattr(pdf_service, "_remote_image_cache", cache)
+    return cache
+
+
+def _remote_book(base_url, pages=6):
+    book = _book(pages=pages)
+    for page in book.pages:
+        page.image_url = f"{base_url}/page{page.page_number}.png"
+    return book
+
+
+class TestGenerateBookPdf:
+
+    @pytest.mark.asyncio
+    async def test_renders_in_process_pool_and_streams_to_storage(self, uploads, monkeypatch):
+        """Test that the PDF is rendered off-process and reaches storage in bounded chunks."""
+        monkeypatch.setattr(executors.settings, "MEDIA_PROCESS_POOL_SIZE", 1)
+        monkeypatch.setattr("app.services.pdf_service.settings.PDF_STREAM_CHUNK_SIZE", 1024)
+        storage = RecordingStorage()
+
+        try:
+            url = await PDFService.generate_book_pdf(_book("/uploads/page.png"), storage)
+        finally:
+            executors.shutdown_process_pool()
+
+        data, content_type = storage.uploads["book_7.pdf"]
+        assert url == "/uploads/book_7.pdf"
+        assert content_type == "application/pdf"
+        assert data.startswith(b"%PDF") and data.count(b"/Type /Page\n") == 4
+        assert b"/Subtype /Image" in data
+        assert len(storage.chunk_sizes) > 1 and max(storage.chunk_sizes) <= 1024
+
+    @pytest.mark.asyncio
+    async def test_missing_image_renders_placeholder(self, uploads, monkeypatch):
+        """Test that an unreachable image does not fail the PDF."""
+        monkeypatch.setattr(executors.settings, "MEDIA_PROCESS_POOL_ENABLED", False)
+        storage = RecordingStorage()
+
+        await PDFService.generate_book_pdf(_book("/uploads/missing.png"), storage)
+
+        data, _ = storage.uploads["book_7.pdf"]
+        assert b"/Subtype /Image" not in data
+
+    @pytest.mark.asyncio
+    async def test_local_storage_writes_public_file(self, uploads, monkeypatch):
+        """Test the default local provider: file appears only once complete."""
+        monkeypatch.setattr(executors.settings, "MEDIA_PROCESS_POOL_ENABLED", False)
+
+        storage = LocalStorageProvider(upload_dir=str(uploads.parent / "raw"))
+        url = await PDFService.generate_book_pdf(_book(), storage)
+
+        assert url == storage.url_for("book_7.pdf")
+        assert open(storage.local_path(url), "rb").read().startswith(b"%PDF")
+        assert not list(uploads.rglob(".*.part"))
+
+
+class TestImagePrefetch:
+
+    @pytest.mark.asyncio
+    async def test_prefetch_is_concurrent_and_bounded(self, uploads, image_server, remote_cache, monkeypatch):
+        """Test that page images are downloaded in parallel up to the configured limit."""
+        monkeypatch.setattr(executors.settings, "MEDIA_PROCESS_POOL_ENABLED", False)
+        monkeypatch.setattr(pdf_service.settings, "PDF_IMAGE_PREFETCH_CONCURRENCY", 3)
+        storage = RecordingStorage()
+
+        await PDFService.generate_book_pdf(_remote_book(image_server.url), storage)
+
+        assert image_server.requests == 6
+        assert image_server.max_in_flight == 3
+        assert storage.uploads["book_7.pdf"][0].count(b"/Subtype /Image") == 1  # identical content embedded once
+
+    @pytest.mark.asyncio
+    async def test_repeated_render_reuses_downloads(self, uploads, image_server, remote_cache, monkeypatch):
+        """Test that rendering the same book again does not download its images again."""
+        monkeypatch.setattr(executors.settings, "MEDIA_PROCESS_POOL_ENABLED", False)
+        book = _remote_book(image_server.url)
+
+        await PDFService.generate_book_pdf(book, RecordingStorage())
+        await PDFService.generate_book_pdf(book, RecordingStorage())
+
+        assert image_server.requests == 6
+        assert remote_cache.hits == 6 and remote_cache.misses == 6
+
+    @pytest.mark.asyncio
+    async def test_concurrent_requests_share_one_download(self, image_server, remote_cache):
+        """Test that simultaneous jobs needing the same image download it once."""
+        async with PDFService._http_session() as session:
+            paths = await asyncio.gather(*(
+                remote_cache.fetch(session, f"{image_server.url}/shared.png") for _ in range(5)
+            ))
+
+        assert len(set(paths)) == 1
+        assert image_server.requests == 1
+
+    @pytest.mark.asyncio
+    async def test_cache_is_bounded(self, image_server, tmp_path):
+        """Test that the oldest downloads are evicted past the size limit."""
+        cache = RemoteImageCache(str(tmp_path / "small_cache"), max_bytes=len(_png()) * 2)
+
+        async with PDFService._http_session() as session:
+            first = await cache.fetch(session, f"{image_server.url}/a.png")
+            for name in ("b", "c"):
+                await cache.fetch(session, f"{image_server.url}/{name}.png")
+
+        assert not os.path.exists(first)
+        assert len(os.listdir(tmp_path / "small_cache")) == 2
+        assert cache.current_bytes <= cache.max_bytes
+
+
+class TestDecodedImageCache:
+
+    def test_reuses_decoded_images_until_file_changes(self, tmp_path):
+        """Test that an image is decoded once and re-decoded after it is replaced."""
+        path = tmp_path / "page.png"
+        path.write_bytes(_png())
+        cache = DecodedImageCache(max_bytes=1024 * 1024)
+
+        first = cache.get(str(path))
+        assert cache.get(str(path)) is first
+
+        path.write_bytes(_png(color=(1, 2, 3), size=40))
+
+        assert cache.get(str(path)) is not first
+        assert (cache.hits, cache.misses) == (1, 2)
+
+    def test_hits_across_job_workdirs(self, tmp_path):
+        """Test that the same remote image linked into another job's workdir is not decoded again."""
+        cached = tmp_path / "remote_cache" / "abc"
+        cached.parent.mkdir()
+        cached.write_bytes(_png())
+        cache = DecodedImageCache(max_bytes=1024 * 1024)
+
+        images = []
+        for job in ("job1", "job2"):
+            (tmp_path / job).mkdir()
+            os.link(cached, tmp_path / job / "page_1.img")
+            images.append(cache.get(str(tmp_path / job / "page_1.img")))
+
+        assert images[0] is images[1]
+        assert (cache.hits, cache.misses) == (1, 1)
+
+    def test_bounded_by_decoded_size(self, tmp_path):
+        """Test that least recently used images are evicted past the byte limit."""
+        cache = DecodedImageCache(max_bytes=2 * 32 * 32 * 3)
+        for shade, name in enumerate(("a", "b", "c")):
+            (tmp_path / f"{name}.png").write_bytes(_png(color=(shade, shade, shade)))
+            cache.get(str(tmp_path / f"{name}.png"))
+
+        assert len(cache) == 2
+        assert cache.current_bytes <= cache.max_bytes
+
+
+def _noise_png(size=512, seed=1):
+    import random
+    rng = random.Random(seed)
+    buffer = io.BytesIO()
+    Image.frombytes("RGB", (size, size), bytes(rng.getrandbits(8) for _ in range(size * size * 3))).save(buffer, format="PNG")
+    return buffer.getvalue()
+
+
+class TestImageOptimization:
+
+    @pytest.fixture(autouse=True)
+    def _threads(self, monkeypatch):
+        monkeypatch.setattr(executors.settings, "MEDIA_PROCESS_POOL_ENABLED", False)
+
+    async def _render(self, uploads, image, profile=None, pages=3, shared=True):
+        for n in range(1, pages + 1):
+            (uploads / f"p{n}.png").write_bytes(image)
+        book = _book(pages=pages)
+        for page in book.pages:
+            page.image_url = "/uploads/p1.png" if shared else f"/uploads/p{page.page_number}.png"
+        storage = RecordingStorage()
+        await PDFService.generate_book_pdf(book, storage, profile=profile)
+        return storage.uploads["book_7.pdf"][0]
+
+    @pytest.mark.asyncio
+    async def test_photographic_images_become_jpeg_at_profile_resolution(self, uploads):
+        """Test that screen downsamples to its DPI and print keeps the source pixels."""
+        screen = await self._render(uploads, _noise_png(), profile="screen")
+        printed = await self._render(uploads, _noise_png(), profile="print")
+
+        assert b"/DCTDecode" in screen and b"/DCTDecode" in printed
+        assert re.search(rb"/Width (\d+)", screen).group(1) == b"459"
+        assert re.search(rb"/Width (\d+)", printed).group(1) == b"512"
+        assert len(screen) < len(printed)
+
+    @pytest.mark.asyncio
+    async def test_flat_artwork_stays_lossless(self, uploads):
+        """Test that images with few colors are Flate-encoded, not JPEG."""
+        data = await self._render(uploads, _png(size=256))
+
+        assert b"/DCTDecode" not in data
+        assert b"/Subtype /Image" in data
+
+    @pytest.mark.asyncio
+    async def test_identical_images_are_embedded_once(self, uploads):
+        """Test that the same image on several pages (different files) is one XObject."""
+        data = await self._render(uploads, _noise_png(size=128), pages=4, shared=False)
+
+        assert data.count(b"/Subtype /Image") == 1
+        assert data.count(b"/Type /Page\n") == 5
+
+    @pytest.mark.asyncio
+    async def test_page_streams_are_compressed(self, uploads):
+        """Test that page content streams are Flate-compressed."""
+        data = await self._render(uploads, _png())
+
+        assert "Texto da página".encode("latin-1") not in data
+
+    @pytest.mark.asyncio
+    async def test_unknown_profile_is_rejected(self, uploads):
+        """Test that an invalid profile fails before any rendering."""
+        with pytest.raises(ValueError):
+            await PDFService.generate_book_pdf(_book(), RecordingStorage(), profile="poster")
+
+    def test_target_size_never_upscales(self, tmp_path):
+        """Test the resampling target for the 400x300pt draw box."""
+        optimizer = ImageOptimizer("screen", str(tmp_path))
+
+        assert optimizer.target_size((1024, 1024)) == (459, 459)
+        assert optimizer.target_size((2000, 1000)) == (612, 306)
+        assert optimizer.target_size((100, 100)) == (100, 100)
+
+
+class TestIncrementalRendering:
+
+    @staticmethod
+    def _document(uploads, texts, profile="screen"):
+        return {
+            "title": "O Gato",
+            "theme": "Aventura",
+            "style": "cartoon",
+            "profile": profile,
+            "pages": [
+                {
+                    "page_number": n,
+                    "text": text,
+                    "image_path": str(uploads / f"p{n}.png"),
+                    "image_prompt": f"prompt {n}"
+                }
+                for n, text in enumerate(texts, start=1)
+            ]
+        }
+
+    @pytest.fixture
+    def images(self, uploads):
+        for n in range(1, 5):
+            (uploads / f"p{n}.png").write_bytes(_png(color=(n * 40, 20, 20)))
+        return uploads
+
+    def test_unchanged_book_reuses_every_fragment(self, images, tmp_path):
+        """Test that rendering the same book again only runs the assembly step."""
+        document = self._document(images, ["um", "dois", "três", "quatro"])
+
+        first = render_book_pdf(document, str(tmp_path / "a.pdf"))
+        second = render_book_pdf(document, str(tmp_path / "b.pdf"))
+
+        assert (first["rendered"], first["reused"]) == (5, 0)
+        assert (second["rendered"], second["reused"]) == (0, 5)
+        assert len(PdfReader(str(tmp_path / "b.pdf")).pages) == 5
+
+    def test_edited_page_is_the_only_one_rendered(self, images, tmp_path):
+        """Test that changing one page's text or image re-renders just that page."""
+        render_book_pdf(self._document(images, ["um", "dois", "três", "quatro"]), str(tmp_path / "a.pdf"))
+
+        edited = render_book_pdf(self._document(images, ["um", "DOIS", "três", "quatro"]), str(tmp_path / "b.pdf"))
+        (images / "p4.png").write_bytes(_png(color=(1, 2, 3)))
+        retried = render_book_pdf(self._document(images, ["um", "DOIS", "três", "quatro"]), str(tmp_path / "c.pdf"))
+
+        assert edited["rendered"] == 1 and retried["rendered"] == 1
+        assert "DOIS" in PdfReader(str(tmp_path / "c.pdf")).pages[2].extract_text()
+
+    def test_profiles_do_not_share_fragments(self, images, tmp_path):
+        """Test that screen and print renders are cached separately."""
+        render_book_pdf(self._document(images, ["um"], profile="screen"), str(tmp_path / "a.pdf"))
+
+        printed = render_book_pdf(self._document(images, ["um"], profile="print"), str(tmp_path / "b.pdf"))
+
+        assert printed["reused"] == 0
+
+    def test_fragment_cache_is_bounded(self, tmp_path):
+        """Test that least recently used fragments are evicted past the size limit."""
+        cache = FragmentCache(str(tmp_path / "bounded"), max_bytes=10)
+        for key in ("a", "b", "c"):
+            cache.put(key, lambda path: open(path, "wb").write(b"12345")).close()
+        os.utime(cache.path_for("a"), (0, 0))
+
+        removed = cache.evict(keep={cache.path_for("b")})
+
+        assert removed == 1
+        assert cache.get("a") is None
+        for key in ("b", "c"):
+            with cache.get(key) as fragment:
+                assert fragment.read() == b"12345"
+
+    def test_fragments_survive_eviction_by_another_render(self, tmp_path):
+        """Test that a fragment already handed out stays readable after another process evicts it."""
+        cache = FragmentCache(str(tmp_path / "shared"), max_bytes=0)
+        with cache.put("a", lambda path: open(path, "wb").write(b"rendered")) as rendered:
+            cache.put("b", lambda path: open(path, "wb").write(b"cached")).close()
+            with cache.get("b") as reused:
+                FragmentCache(str(tmp_path / "shared"), max_bytes=0).evict()
+
+                assert not os.listdir(tmp_path / "shared")
+                assert rendered.read() == b"rendered"
+                assert reused.read() == b"cached"
+
+
+class TestUploadStream:
+
+    @pytest.mark.asyncio
+    async def test_local_stream_failure_leaves_no_file(self, uploads):
+        """Test that an interrupted stream never publishes a partial file."""
+        storage = LocalStorageProvider(upload_dir=str(uploads.parent / "raw"))
+
+        async def broken_chunks():
+            yield b"%PDF-1.4 parcial"
+            raise RuntimeError("render interrompido")
+
+        with pytest.raises(RuntimeError):
+            await storage.upload_stream(broken_chunks(), "book_9.pdf", "application/pdf")
+
+        assert not (uploads / "book_9.pdf").exists()
+        assert not list(uploads.glob(".*.part"))
+
+    @pytest.mark.asyncio
+    async def test_default_upload_stream_spools_into_upload(self):
+        """Test the base-class fallback for providers without incremental writes."""
+
+        class PlainStorage(RecordingStorage):
+            upload_stream = StorageProvider.upload_stream
+
+        storage = PlainStorage()
+
+        async def chunks():
+            yield b"abc"
+            yield b"def"
+
+        await storage.upload_stream(chunks(), "file.bin")
+
+        assert storage.uploads["file.bin"] == (b"abcdef", "application/octet-stream")
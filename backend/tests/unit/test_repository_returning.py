@@ -0,0 +1,72 @@
+import pytest
+from app.exceptions.base_exceptions import ValidationError
+from app.repositories.book_repository import BookRepository
+
+
+@pytest.fixture
+def statements(sqlite_db):
+    return sqlite_db.statements
+
+
+@pytest.fixture
+def repo(sqlite_db):
+    return BookRepository(sqlite_db)
+
+
+async def _draft(repo, statements):
+    book = await repo.create(title="O Gato Aventureiro", user_id=1, pages_count=8, style="cartoon", status="draft")
+    statements.clear()
+    return book
+
+
+class TestReturningFastPath:
+
+    @pytest.mark.asyncio
+    async def test_create_is_one_insert_returning(self, repo, statements):
+        """Test that create hydrates the id and server defaults from the INSERT itself."""
+        book = await repo.create(title="O Gato Aventureiro", user_id=1, pages_count=8, style="cartoon", status="draft")
+
+        assert len(statements) == 1
+        assert statements[0].startswith("INSERT") and "RETURNING" in statements[0]
+        assert book.id is not None and book.created_at is not None
+
+    @pytest.mark.asyncio
+    async def test_update_status_is_one_update_returning(self, repo, statements):
+        """Test a status change in one statement, refreshing the loaded instance."""
+        book = await _draft(repo, statements)
+
+        updated = await repo.update_status(book.id, "processing")
+
+        assert updated is book
+        assert book.status == "processing"
+        assert book.updated_at is not None
+        assert len(statements) == 1
+        assert statements[0].startswith("UPDATE") and "RETURNING" in statements[0]
+
+    @pytest.mark.asyncio
+    async def test_invalid_transition_still_raises(self, repo, statements):
+        """Test that the WHERE-guarded transition falls back to the model validator's error."""
+        book = await _draft(repo, statements)
+
+        with pytest.raises(ValidationError, match="draft -> completed"):
+            await repo.update_status(book.id, "completed")
+        assert book.status == "draft"
+
+    @pytest.mark.asyncio
+    async def test_missing_row_returns_none(self, repo, statements):
+        """Test that updating an unknown id returns None."""
+        assert await repo.update_status(999, "processing") is None
+        assert await repo.update(999, title="Outro título") is None
+
+    @pytest.mark.asyncio
+    async def test_column_validators_run_before_the_statement(self, repo, statements):
+        """Test that @validates normalizes values and rejects invalid ones without a round trip."""
+        book = await _draft(repo, statements)
+
+        updated = await repo.update(book.id, title="  Novo título  ")
+        assert updated.title == "Novo título"
+        statements.clear()
+
+        with pytest.raises(ValidationError):
+            await repo.update(book.id, title="x")
+        assert statements == []
@@ -0,0 +1,114 @@
+import importlib.util
+import pytest
+from pathlib import Path
+from unittest.mock import AsyncMock, MagicMock
+from sqlalchemy.dialects.postgresql import asyncpg
+from app.models.book import Book
+from app.repositories.book_repository import BookRepository
+from app.repositories.search import BOOK_SEARCH_VECTOR, like_pattern
+from app.repositories.user_repository import UserRepository
+
+
+def _db(dialect="postgresql"):
+    db = MagicMock()
+    db.bind.dialect.name = dialect
+    result = MagicMock()
+    result.scalars.return_value.all.return_value = []
+    db.execute = AsyncMock(return_value=result)
+    return db
+
+
+def _compiled(db):
+    return db.execute.await_args.args[0].compile(dialect=asyncpg.dialect())
+
+
+def test_query_expression_matches_the_index():
+    """Test that queries use exactly the expression indexed by add_search_indexes."""
+    path = Path(__file__).parents[2] / "alembic" / "versions" / "add_search_indexes.py"
+    spec = importlib.util.spec_from_file_location("add_search_indexes", path)
+    migration = importlib.util.module_from_spec(spec)
+    spec.loader.exec_module(migration)
+
+    assert str(BOOK_SEARCH_VECTOR).replace("books.", "") == migration.SEARCH_VECTOR
+
+
+def test_like_pattern_escapes_wildcards():
+    """Test that user-typed % and _ are matched literally."""
+    assert like_pattern("50%_off") == "%50\\%\\_off%"
+
+
+class TestPostgresSearch:
+
+    @pytest.mark.asyncio
+    async def test_books_use_full_text_and_trigrams(self):
+        """Test that book search matches the tsvector and title trigrams and ranks results."""
+        db = _db()
+
+        await BookRepository(db).search_books("dragão", user_id=7, limit=10)
+
+        compiled = _compiled(db)
+        sql = str(compiled)
+        where, order = sql.split("WHERE", 1)[1].split("ORDER BY")
+        # Same expression as the idx_book_search_vector index, with inline constants
+        assert f"{BOOK_SEARCH_VECTOR} @@ websearch_to_tsquery($1::REGCONFIG, $2::VARCHAR)" in where
+        assert "to_tsvector('portuguese'::regconfig, coalesce(books.title, '')), 'A')" in where
+        assert "<% books.title" in where
+        assert "books.description ILIKE" not in where
+        assert order.startswith(f" ts_rank_cd({BOOK_SEARCH_VECTOR}, websearch_to_tsquery(")
+        assert "word_similarity(" in order
+        assert compiled.params["websearch_to_tsquery_1"] == "portuguese"
+        assert compiled.params["user_id_1"] == 7
+
+    @pytest.mark.asyncio
+    async def test_users_use_trigrams(self):
+        """Test that user search ranks by trigram similarity on name and email."""
+        db = _db()
+
+        await UserRepository(db).search_by_name_or_email("maria", limit=5)
+
+        sql = str(_compiled(db))
+        assert "<% users.full_name" in sql
+        assert "users.email ILIKE" in sql
+        assert "ORDER BY greatest(word_similarity($4::VARCHAR, users.full_name), similarity($5::VARCHAR, users.email)) DESC" in sql
+
+
+class TestFallbackSearch:
+
+    @pytest.mark.asyncio
+    async def test_books_ranked_by_title_before_description(self, sqlite_db):
+        """Test that the LIKE fallback ranks title prefixes, then titles, then descriptions."""
+        for title, description in [
+            ("Viagem ao Mar", "Um dragão aparece no fim"),
+            ("O Dragão Azul", None),
+            ("Dragão de Papel", None),
+            ("O Gato Curioso", "Sem criaturas"),
+        ]:
+            sqlite_db.add(Book(title=title, description=description, user_id=1, pages_count=8, style="cartoon"))
+        sqlite_db.session.flush()
+
+        books = await BookRepository(sqlite_db).search_books("Dragão")
+
+        assert [book.title for book in books] == ["Dragão de Papel", "O Dragão Azul", "Viagem ao Mar"]
+
+    @pytest.mark.asyncio
+    async def test_wildcards_are_literal(self, sqlite_db):
+        """Test that % typed by the user is not treated as a wildcard."""
+        sqlite_db.add(Book(title="Desconto de 50%", user_id=1, pages_count=8, style="cartoon"))
+        sqlite_db.add(Book(title="Desconto de 50 reais", user_id=1, pages_count=8, style="cartoon"))
+        sqlite_db.session.flush()
+
+        books = await BookRepository(sqlite_db).search_books("50%")
+
+        assert [book.title for book in books] == ["Desconto de 50%"]
+
+    @pytest.mark.asyncio
+    async def test_users_without_postgres_skip_trigram_operators(self):
+        """Test that user search falls back to LIKE outside PostgreSQL."""
+        db = _db("sqlite")
+
+        await UserRepository(db).search_by_name_or_email("maria")
+
+        sql = str(_compiled(db))
+        assert "<%" not in sql
+        assert "similarity" not in sql
+        assert "CASE WHEN" in sql.split("ORDER BY")[1]
@@ -0,0 +1,138 @@
+import hashlib
+import io
+import pytest
+from unittest.mock import MagicMock
+from app.services.pdf_service import PDFService
+from app.services.storage.layout_migration import (
+    iter_unsharded_files,
+    link_into_layout,
+    prune_flat,
+    rewrite_urls
+)
+from app.services.storage.local import LocalStorageProvider, shard_name, unshard_name
+
+
+@pytest.fixture
+def public_dir(tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+    return tmp_path / "frontend/public/uploads"
+
+
+class FakeSession:
+    """Sessão falsa: devolve as linhas da coluna consultada e registra os UPDATEs."""
+
+    def __init__(self, rows_by_column, updates):
+        self.rows_by_column = rows_by_column
+        self.updates = updates
+
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, *exc):
+        return False
+
+    async def execute(self, statement):
+        if statement.is_select:
+            column = statement.selected_columns[1]
+            key = f"{column.table.name}.{column.key}"
+            last_id = statement.whereclause.clauses[0].right.value
+            rows = [row for row in self.rows_by_column.get(key, []) if row[0] > last_id]
+            return MagicMock(all=MagicMock(return_value=rows))
+        self.updates.append(statement.compile().params)
+
+    async def commit(self):
+        pass
+
+
+class TestShardedLayout:
+
+    def test_shard_name_round_trip(self):
+        """Test the ab/cd fan-out of plain and content-addressed names."""
+        digest = hashlib.sha256(b"x").hexdigest()
+        plain = shard_name("book_1.pdf")
+        key = hashlib.sha256(b"book_1.pdf").hexdigest()
+
+        assert plain == f"{key[:2]}/{key[2:4]}/book_1.pdf"
+        assert shard_name(f"cas/{digest}.png") == f"cas/{digest[:2]}/{digest[2:4]}/{digest}.png"
+        assert unshard_name(plain) == "book_1.pdf"
+        assert unshard_name("book_1.pdf") is None
+        assert unshard_name("aa/bb/book_1.pdf") is None
+
+    @pytest.mark.asyncio
+    async def test_new_files_are_sharded_and_flat_urls_stay_readable(self, public_dir):
+        """Test that uploads fan out while legacy flat files and URLs keep resolving."""
+        storage = LocalStorageProvider(layout="sharded")
+        url = await storage.upload(io.BytesIO(b"new"), "page.png")
+        (public_dir / "legacy.png").write_bytes(b"old")
+
+        assert url == f"/uploads/{shard_name('page.png')}"
+        assert (public_dir / shard_name("page.png")).read_bytes() == b"new"
+        assert open(storage.local_path("/uploads/legacy.png"), "rb").read() == b"old"
+        # URL salva antes da migração aponta para o arquivo já movido
+        assert open(storage.local_path("/uploads/page.png"), "rb").read() == b"new"
+        assert await storage.exists("legacy.png")
+        assert storage.url_for(url) == url
+
+    @pytest.mark.asyncio
+    async def test_flat_layout_reads_sharded_files(self, public_dir):
+        """Test that switching back to flat still finds files written sharded."""
+        url = await LocalStorageProvider(layout="sharded").upload(io.BytesIO(b"data"), "page.png")
+
+        flat = LocalStorageProvider(layout="flat")
+
+        assert flat.url_for("page.png") == "/uploads/page.png"
+        assert open(flat.local_path(url), "rb").read() == b"data"
+        assert open(flat.local_path("/uploads/page.png"), "rb").read() == b"data"
+
+
+class TestLayoutMigration:
+
+    @pytest.mark.asyncio
+    async def test_link_then_prune_keeps_every_file_readable(self, public_dir):
+        """Test the file phases: both layouts readable in between, flat copy gone at the end."""
+        storage = LocalStorageProvider(layout="sharded")
+        for n in range(5):
+            (public_dir / f"book_{n}.pdf").write_bytes(b"%PDF" + bytes([n]))
+        await storage.upload(io.BytesIO(b"already"), "new.png")
+
+        pending = sorted(iter_unsharded_files(storage))
+        assert pending == [f"book_{n}.pdf" for n in range(5)]
+
+        assert all(link_into_layout(storage, relative) for relative in pending)
+        assert not link_into_layout(storage, pending[0])
+        assert (public_dir / "book_3.pdf").exists()
+        assert open(storage.local_path("/uploads/book_3.pdf"), "rb").read() == b"%PDF\x03"
+
+        assert all(prune_flat(storage, relative) for relative in iter_unsharded_files(storage))
+        assert list(iter_unsharded_files(storage)) == []
+        assert open(storage.local_path("/uploads/book_3.pdf"), "rb").read() == b"%PDF\x03"
+        assert PDFService._local_image_path("/uploads/book_3.pdf", storage) == str(
+            (public_dir / shard_name("book_3.pdf")).resolve()
+        )
+
+    @pytest.mark.asyncio
+    async def test_delete_removes_both_layouts(self, public_dir):
+        """Test that deleting mid-migration removes the flat file and its link."""
+        storage = LocalStorageProvider(layout="sharded")
+        (public_dir / "page.png").write_bytes(b"data")
+        link_into_layout(storage, "page.png")
+
+        assert await storage.delete("/uploads/page.png")
+        assert [path for path in public_dir.rglob("*") if path.is_file()] == []
+
+    @pytest.mark.asyncio
+    async def test_rewrite_urls_in_batches(self, public_dir):
+        """Test that stored URLs are rewritten batch by batch, skipping migrated ones."""
+        storage = LocalStorageProvider(layout="sharded")
+        sharded = f"/uploads/{shard_name('b.png')}"
+        rows = {"pages.image_url": [(1, "/uploads/a.png"), (2, sharded), (3, "/uploads/c.png")]}
+        updates = []
+
+        rewritten = await rewrite_urls(lambda: FakeSession(rows, updates), storage, batch_size=2)
+
+        assert rewritten["pages.image_url"] == 2
+        assert rewritten["books.pdf_file"] == 0
+        assert [update["image_url"] for update in updates] == [
+            f"/uploads/{shard_name('a.png')}",
+            f"/uploads/{shard_name('c.png')}"
+        ]
@@ -0,0 +1,129 @@
+import asyncio
+import pytest
+from types import SimpleNamespace
+from unittest.mock import patch
+from celery.concurrency import get_implementation
+from app.worker import celery_app
+from app.worker.runtime import WorkerRuntime
+
+
+async def _current_loop():
+    return asyncio.get_running_loop()
+
+
+class TestWorkerRuntime:
+
+    @pytest.fixture
+    def runtime(self):
+        runtime = WorkerRuntime()
+        yield runtime
+        runtime.stop()
+
+    def test_reuses_same_loop_across_tasks(self, runtime):
+        """Test that consecutive tasks run on one long-lived loop."""
+        first = runtime.run(_current_loop)
+        second = runtime.run(_current_loop)
+
+        assert first is second
+        assert runtime.is_running
+
+    def test_returns_result_and_propagates_errors(self, runtime):
+        """Test that results and exceptions cross back to the caller."""
+        async def add(a, b=0):
+            return a + b
+
+        async def fail():
+            raise ValueError("boom")
+
+        assert runtime.run(add, 2, b=3) == 5
+        with pytest.raises(ValueError):
+            runtime.run(fail)
+        assert runtime.run(add, 1) == 1
+
+    def test_task_state_survives_between_runs(self, runtime):
+        """Test that background work is not cancelled between tasks."""
+        events = []
+
+        async def schedule():
+            asyncio.get_running_loop().call_later(0.01, events.append, "done")
+
+        async def wait():
+            await asyncio.sleep(0.05)
+
+        runtime.run(schedule)
+        runtime.run(wait)
+
+        assert events == ["done"]
+
+    def test_stop_closes_loop_and_disposes_engine(self, runtime):
+        """Test that shutdown releases the shared resources."""
+        loop = runtime.start()
+
+        with patch("app.core.database.engine") as engine:
+            engine.dispose = _noop
+            runtime.stop()
+
+        assert loop.is_closed()
+        assert not runtime.is_running
+
+    def test_http_session_shared_only_on_runtime_loop(self, runtime):
+        """Test that the shared HTTP session is reused and bound to the runtime loop."""
+        async def get_session():
+            return runtime.get_http_session()
+
+        first = runtime.run(get_session)
+        second = runtime.run(get_session)
+
+        assert first is not None
+        assert first is second
+        assert asyncio.run(get_session()) is None
+
+    def test_ai_service_is_created_once(self, runtime):
+        """Test that the AI client is reused by every task of the process."""
+        with patch("app.services.ai.factory.AIServiceFactory.create_ai_service", return_value=object()) as create:
+            first = runtime.get_ai_service()
+            second = runtime.get_ai_service()
+
+        assert first is second
+        create.assert_called_once()
+
+    def test_fork_resets_inherited_state(self, runtime):
+        """Test that a forked child starts its own loop instead of the parent's."""
+        parent_loop = runtime.start()
+
+        with patch("app.worker.runtime.os.getpid", return_value=-1), \
+                patch("app.core.database.engine") as engine:
+            child_loop = runtime.start()
+            engine.sync_engine.dispose.assert_called_once_with(close=False)
+
+        assert child_loop is not parent_loop
+        for loop in (parent_loop, child_loop):
+            loop.call_soon_threadsafe(loop.stop)
+
+
+async def _noop():
+    return None
+
+
+class TestWorkerSignals:
+
+    @pytest.mark.parametrize("pool, started", [
+        ("prefork", False),
+        ("solo", True),
+        ("threads", True),
+    ])
+    def test_worker_init_starts_loop_only_for_in_process_pools(self, pool, started):
+        """Test that the prefork parent leaves the loop to each forked child."""
+        worker = SimpleNamespace(pool_cls=get_implementation(pool))
+
+        with patch.object(celery_app.worker_runtime, "start") as start:
+            celery_app.worker_init_handler(sender=worker)
+
+        assert start.called is started
+
+    def test_child_process_starts_its_own_loop(self):
+        """Test that every prefork child starts the runtime after the fork."""
+        with patch.object(celery_app.worker_runtime, "start") as start:
+            celery_app.worker_process_init_handler()
+
+        start.assert_called_once()
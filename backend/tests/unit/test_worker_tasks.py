@@ -0,0 +1,605 @@
+import asyncio
+import pytest
+from types import SimpleNamespace
+from unittest.mock import AsyncMock, MagicMock, patch
+from celery.exceptions import Ignore
+from app.worker import tasks
+from app.services.ai.base import AIProvider
+from app.worker.tasks import (
+    _IncrementalPageParser,
+    _PageImagePipeline,
+    _generate_page_images,
+    _parse_story_into_pages,
+    _stream_story_pages,
+    dispatch_book_generation,
+    generate_book_story,
+)
+
+
+class FakeImageProvider:
+    """Provider de IA falso que registra a concorrência máxima observada."""
+
+    def __init__(self, fail_on=None, delay=0.01):
+        self.fail_on = set(fail_on or [])
+        self.delay = delay
+        self.in_flight = 0
+        self.max_in_flight = 0
+
+    async def generate_image(self, description, style, model=None, **kwargs):
+        self.in_flight += 1
+        self.max_in_flight = max(self.max_in_flight, self.in_flight)
+        try:
+            await asyncio.sleep(self.delay)
+            if any(f"page {n}" in description for n in self.fail_on):
+                raise RuntimeError("provider error")
+            return description.encode()
+        finally:
+            self.in_flight -= 1
+
+
+class FakeStorage:
+    async def upload(self, file_data, filename, content_type="image/png"):
+        return f"/uploads/{filename}"
+
+
+def _pages(count):
+    return [{"text": f"page {n}"} for n in range(1, count + 1)]
+
+
+class TestGeneratePageImages:
+
+    @pytest.mark.asyncio
+    async def test_preserves_page_order(self):
+        """Test that each page keeps its own image URL and order."""
+        pages_data = _pages(6)
+
+        generated = await _generate_page_images(
+            FakeImageProvider(), FakeStorage(), 1, "cartoon", pages_data
+        )
+
+        assert generated == 6
+        for idx, page in enumerate(pages_data, start=1):
+            assert f"book_1_page_{idx}_" in page["image_url"]
+            assert page["text"] == f"page {idx}"
+
+    @pytest.mark.asyncio
+    async def test_failure_is_isolated_per_page(self):
+        """Test that a failed page does not affect the others."""
+        pages_data = _pages(5)
+
+        generated = await _generate_page_images(
+            FakeImageProvider(fail_on=[3]), FakeStorage(), 1, "manga", pages_data
+        )
+
+        assert generated == 4
+        assert pages_data[2]["image_url"] is None
+        assert all(p["image_url"] for i, p in enumerate(pages_data) if i != 2)
+
+    @pytest.mark.asyncio
+    async def test_respects_book_concurrency_limit(self):
+        """Test that the per-book limit bounds in-flight requests."""
+        provider = FakeImageProvider()
+
+        await _generate_page_images(
+            provider, FakeStorage(), 1, "classic", _pages(10), max_concurrency=3
+        )
+
+        assert provider.max_in_flight == 3
+
+    @pytest.mark.asyncio
+    async def test_respects_worker_concurrency_limit(self, monkeypatch):
+        """Test that concurrent books share the per-worker limit."""
+        monkeypatch.setattr(tasks.settings, "IMAGE_GENERATION_CONCURRENCY_PER_WORKER", 2)
+        tasks._worker_image_semaphores.clear()
+        provider = FakeImageProvider()
+
+        await asyncio.gather(
+            _generate_page_images(provider, FakeStorage(), 1, "cartoon", _pages(4), max_concurrency=4),
+            _generate_page_images(provider, FakeStorage(), 2, "cartoon", _pages(4), max_concurrency=4),
+        )
+
+        assert provider.max_in_flight == 2
+        tasks._worker_image_semaphores.clear()
+
+    @pytest.mark.asyncio
+    async def test_progress_reported_for_each_page(self):
+        """Test that the callback runs once per page, even when it fails."""
+        on_page_done = AsyncMock(side_effect=RuntimeError("ws down"))
+        pages_data = _pages(5)
+
+        generated = await _generate_page_images(
+            FakeImageProvider(fail_on=[2]), FakeStorage(), 1, "cartoon", pages_data,
+            on_page_done=on_page_done
+        )
+
+        assert generated == 4
+        assert on_page_done.await_count == 5
+        completed_counts = sorted(call.args[1] for call in on_page_done.await_args_list)
+        assert completed_counts == [1, 2, 3, 4, 5]
+
+    @pytest.mark.asyncio
+    async def test_skips_pages_restored_from_checkpoint(self):
+        """Test that pages with a checkpointed image are not generated again."""
+        provider = FakeImageProvider()
+        provider.generate_image = AsyncMock(side_effect=provider.generate_image)
+        pages_data = _pages(5)
+        pages_data[1]["image_url"] = "/uploads/saved.png"
+
+        generated = await _generate_page_images(
+            provider, FakeStorage(), 1, "cartoon", pages_data
+        )
+
+        assert generated == 5
+        assert provider.generate_image.await_count == 4
+        assert pages_data[1]["image_url"] == "/uploads/saved.png"
+
+
+class TestImagePromptRefinement:
+
+    class BatchingProvider(FakeImageProvider):
+        def __init__(self, fail_scene=None, **kwargs):
+            super().__init__(**kwargs)
+            self.batches = []
+            self.fail_scene = fail_scene
+
+        async def generate_text_batch(self, prompts, model=None, return_exceptions=False, **kwargs):
+            self.batches.append(len(prompts))
+            return [
+                RuntimeError("no scene") if self.fail_scene and self.fail_scene in prompt
+                else f"cena {prompt.rsplit(': ', 1)[-1]}"
+                for prompt in prompts
+            ]
+
+    @pytest.mark.asyncio
+    async def test_pipeline_describes_all_pages_in_one_batch(self):
+        """Test that scene prompts for a book go out as a single batch call."""
+        provider = self.BatchingProvider()
+        pages_data = _pages(6)
+
+        await _generate_page_images(provider, FakeStorage(), 1, "cartoon", pages_data)
+
+        assert provider.batches == [6]
+        assert all(page["image_prompt"].endswith(f"cena page {idx}") for idx, page in enumerate(pages_data, start=1))
+
+    @pytest.mark.asyncio
+    async def test_failed_scene_falls_back_to_page_text(self):
+        """Test that a failed description keeps the page-text prompt."""
+        provider = self.BatchingProvider(fail_scene="page 2")
+        pages_data = _pages(3)
+
+        await tasks._refine_image_prompts(provider, pages_data, "manga")
+
+        assert pages_data[0]["image_prompt"].endswith("cena page 1")
+        assert pages_data[1]["image_prompt"] == tasks._build_image_prompt("page 2", "manga")
+
+    @pytest.mark.asyncio
+    async def test_batches_are_capped(self, monkeypatch):
+        """Test that large books are split into IMAGE_PROMPT_BATCH_SIZE batches."""
+        monkeypatch.setattr(tasks.settings, "IMAGE_PROMPT_BATCH_SIZE", 4)
+        provider = self.BatchingProvider()
+        pages_data = _pages(10)
+        pages_data[0]["image_url"] = "/uploads/saved.png"
+
+        await tasks._refine_image_prompts(provider, pages_data, "cartoon")
+
+        assert provider.batches == [4, 4, 1]
+        assert "image_prompt" not in pages_data[0]
+
+    def test_chord_carries_refined_prompts(self):
+        """Test that prompts described in the story step reach the page tasks."""
+        pages = [
+            {"page_number": n, "text": f"Texto {n}", "image_prompt": f"prompt {n}"}
+            for n in range(1, 3)
+        ]
+        story = {"style": "cartoon", "pages": pages, "attempt": 1}
+
+        with patch.object(tasks, "sync_run_async_task", return_value=story), \
+                patch.object(generate_book_story, "replace", return_value=Ignore()) as replace:
+            with pytest.raises(Ignore):
+                generate_book_story.run(book_id=1, user_id=2, attempt=1)
+
+        header = list(replace.call_args.args[0].tasks)
+        assert [sig.kwargs["image_prompt"] for sig in header] == ["prompt 1", "prompt 2"]
+
+
+class TestParseStoryIntoPages:
+
+    def test_uses_page_markers(self):
+        """Test that 'Página N:' markers define the pages."""
+        story = "Página 1: O gato acordou.\n**Página 2:** Ele pulou.\nPage 3 - Fim."
+
+        pages = _parse_story_into_pages(story, 3)
+
+        assert [p["page_number"] for p in pages] == [1, 2, 3]
+        assert [p["text"] for p in pages] == ["O gato acordou.", "Ele pulou.", "Fim."]
+
+    def test_extra_pages_are_merged_into_last(self):
+        """Test that the result always has exactly pages_count pages."""
+        story = "\n".join(f"Página {n}: Texto {n}." for n in range(1, 8))
+
+        pages = _parse_story_into_pages(story, 5)
+
+        assert len(pages) == 5
+        assert pages[-1]["text"] == "Texto 5. Texto 6. Texto 7."
+
+    def test_fallback_without_markers(self):
+        """Test paragraph distribution when the model ignores the format."""
+        story = "Um. Dois. Três. Quatro. Cinco. Seis."
+
+        pages = _parse_story_into_pages(story, 5)
+
+        assert len(pages) == 5
+        assert pages[0]["text"] == "Um. Dois."
+        assert pages[-1]["text"] == "Seis."
+
+    def test_missing_pages_are_padded(self):
+        """Test that short stories still produce all pages."""
+        pages = _parse_story_into_pages("Página 1: Só uma página.", 5)
+
+        assert len(pages) == 5
+        assert pages[1]["text"] == ""
+
+
+class StreamingStoryProvider(FakeImageProvider):
+    """Provider falso que transmite a história em trechos e registra a ordem dos eventos."""
+
+    def __init__(self, chunks, fail_after=None, **kwargs):
+        super().__init__(**kwargs)
+        self.chunks = chunks
+        self.fail_after = fail_after
+        self.events = []
+
+    async def generate_text_stream(self, prompt, model=None, **kwargs):
+        for idx, chunk in enumerate(self.chunks):
+            if self.fail_after is not None and idx == self.fail_after:
+                raise RuntimeError("stream interrupted")
+            await asyncio.sleep(0.02)
+            self.events.append(f"chunk {idx}")
+            yield chunk
+        self.events.append("stream done")
+
+    async def generate_image(self, description, style, model=None, **kwargs):
+        self.events.append(f"image start: {description.split('Cena: ')[-1]}")
+        return await super().generate_image(description, style, model, **kwargs)
+
+
+class TestIncrementalPageParser:
+
+    STORY = (
+        "Era uma vez.\nPágina 1: O gato acordou.\n**Página 2:** Ele pulou.\n\n"
+        "Página 3: Ele dormiu.\nPágina 4: Extra."
+    )
+
+    def _feed_all(self, parser, text, size):
+        emitted = []
+        for start in range(0, len(text), size):
+            emitted.extend(parser.feed(text[start:start + size]))
+        return emitted
+
+    @pytest.mark.parametrize("chunk_size", [1, 3, 7, 1000])
+    def test_matches_full_parse_for_any_chunking(self, chunk_size):
+        """Test that streamed parsing gives the same pages as the batch parser."""
+        parser = _IncrementalPageParser(3)
+
+        emitted = self._feed_all(parser, self.STORY, chunk_size)
+        pages = parser.close()
+
+        assert pages == _parse_story_into_pages(self.STORY, 3)
+        assert emitted == pages[:2]
+        assert all(page is emitted[idx] for idx, page in enumerate(emitted))
+
+    def test_page_emitted_when_next_marker_arrives(self):
+        """Test that page N is released as soon as page N+1 starts."""
+        parser = _IncrementalPageParser(5)
+
+        assert parser.feed("Página 1: O gato ") == []
+        assert parser.feed("acordou.\nPág") == []
+        assert parser.feed("ina 2: Ele") == [{"page_number": 1, "text": "O gato acordou."}]
+
+    def test_last_page_waits_for_end_of_stream(self):
+        """Test that the last page keeps receiving overflow text until close."""
+        parser = _IncrementalPageParser(2)
+
+        emitted = parser.feed("Página 1: Um.\nPágina 2: Dois.\nPágina 3: Três.\n")
+        pages = parser.close()
+
+        assert [page["text"] for page in emitted] == ["Um."]
+        assert pages[-1]["text"] == "Dois. Três."
+
+    def test_nothing_emitted_without_markers(self):
+        """Test that the paragraph fallback only runs at the end."""
+        parser = _IncrementalPageParser(2)
+
+        assert parser.feed("Um. Dois.\n\nTrês. Quatro.") == []
+        assert [page["text"] for page in parser.close()] == ["Um. Dois.", "Três. Quatro."]
+
+
+class TestStreamStoryPages:
+
+    @pytest.mark.asyncio
+    async def test_images_start_before_story_finishes(self, monkeypatch):
+        """Test that page images overlap with the rest of the story stream."""
+        monkeypatch.setattr(tasks.settings, "IMAGE_PROMPT_REFINEMENT", False)
+        provider = StreamingStoryProvider(
+            ["Página 1: Gato.\n", "Página 2: Cão.\n", "Página 3: Rato.\n", "Fim."]
+        )
+        pipeline = _PageImagePipeline(provider, FakeStorage(), 1, "cartoon", 3)
+
+        story_text, pages = await _stream_story_pages(provider, "prompt", 3, pipeline)
+        for page_idx, page in enumerate(pages):
+            pipeline.submit(page_idx, page)
+        generated = await pipeline.wait()
+
+        assert generated == 3
+        assert story_text.endswith("Fim.")
+        assert provider.events.index("image start: Gato.") < provider.events.index("stream done")
+        assert all(page["image_url"] for page in pages)
+
+    @pytest.mark.asyncio
+    async def test_stream_failure_cancels_pending_images(self):
+        """Test that in-flight images are cancelled when the story stream fails."""
+        provider = StreamingStoryProvider(
+            ["Página 1: Gato.\n", "Página 2: Cão.\n", "Página 3: Rato."],
+            fail_after=2,
+            delay=1
+        )
+        pipeline = _PageImagePipeline(provider, FakeStorage(), 1, "cartoon", 3)
+
+        with pytest.raises(RuntimeError):
+            await _stream_story_pages(provider, "prompt", 3, pipeline)
+
+        assert all(task.done() for task in pipeline._tasks)
+
+    @pytest.mark.asyncio
+    async def test_default_stream_yields_full_text(self):
+        """Test that providers without streaming still work through the base API."""
+        class BatchOnlyProvider(AIProvider):
+            async def generate_text(self, prompt, model=None, **kwargs):
+                return "Página 1: Um.\nPágina 2: Dois."
+
+            async def generate_image(self, description, style, model=None, **kwargs):
+                return b""
+
+        chunks = [chunk async for chunk in BatchOnlyProvider().generate_text_stream("prompt")]
+
+        assert chunks == ["Página 1: Um.\nPágina 2: Dois."]
+
+
+class TestBookGenerationCanvas:
+
+    def test_dispatch_uses_canvas_by_default(self, monkeypatch):
+        """Test that the story task starts the workflow in canvas mode."""
+        monkeypatch.setattr(tasks.settings, "BOOK_GENERATION_MODE", "canvas")
+
+        with patch.object(tasks.generate_book_story, "apply_async") as story_async, \
+                patch.object(tasks.generate_book_content, "apply_async") as content_async:
+            dispatch_book_generation(1, 2)
+
+        story_async.assert_called_once_with(kwargs={"book_id": 1, "user_id": 2, "attempt": None})
+        content_async.assert_not_called()
+
+    def test_dispatch_single_mode(self, monkeypatch):
+        """Test that single mode keeps the monolithic task."""
+        monkeypatch.setattr(tasks.settings, "BOOK_GENERATION_MODE", "single")
+
+        with patch.object(tasks.generate_book_content, "apply_async") as content_async:
+            dispatch_book_generation(1, 2, attempt=3)
+
+        content_async.assert_called_once_with(kwargs={"book_id": 1, "user_id": 2, "attempt": 3})
+
+    def test_story_task_replaces_itself_with_page_chord(self):
+        """Test that the story fans out into one image task per page."""
+        story = {
+            "style": "cartoon",
+            "pages": [{"page_number": n, "text": f"Texto {n}"} for n in range(1, 6)],
+            "attempt": 1
+        }
+
+        with patch.object(tasks, "sync_run_async_task", return_value=story), \
+                patch.object(generate_book_story, "replace", return_value=Ignore()) as replace:
+            with pytest.raises(Ignore):
+                generate_book_story.run(book_id=1, user_id=2, attempt=1)
+
+        workflow = replace.call_args.args[0]
+        header = list(workflow.tasks)
+        assert len(header) == 5
+        assert {sig.task for sig in header} == {"app.worker.tasks.generate_book_images"}
+        assert [sig.kwargs["page_number"] for sig in header] == [1, 2, 3, 4, 5]
+        assert workflow.body.task == "app.worker.tasks.finalize_book_generation"
+        assert workflow.body.kwargs == {"book_id": 1, "user_id": 2, "attempt": 1}
+
+    def test_story_task_skips_checkpointed_pages(self):
+        """Test that pages restored from checkpoints get no image task."""
+        pages = [{"page_number": n, "text": f"Texto {n}"} for n in range(1, 6)]
+        pages[0]["image_url"] = "/uploads/p1.png"
+        pages[3]["image_url"] = "/uploads/p4.png"
+        story = {"style": "cartoon", "pages": pages, "attempt": 2}
+
+        with patch.object(tasks, "sync_run_async_task", return_value=story), \
+                patch.object(generate_book_story, "replace", return_value=Ignore()) as replace:
+            with pytest.raises(Ignore):
+                generate_book_story.run(book_id=1, user_id=2, attempt=2)
+
+        header = list(replace.call_args.args[0].tasks)
+        assert [sig.kwargs["page_number"] for sig in header] == [2, 3, 5]
+
+    def test_story_task_finalizes_directly_when_all_images_saved(self):
+        """Test that a fully checkpointed book goes straight to finalization."""
+        pages = [
+            {"page_number": n, "text": f"Texto {n}", "image_url": f"/uploads/p{n}.png"}
+            for n in range(1, 6)
+        ]
+        story = {"style": "cartoon", "pages": pages, "attempt": 2}
+
+        with patch.object(tasks, "sync_run_async_task", return_value=story), \
+                patch.object(generate_book_story, "replace", return_value=Ignore()) as replace:
+            with pytest.raises(Ignore):
+                generate_book_story.run(book_id=1, user_id=2, attempt=2)
+
+        signature = replace.call_args.args[0]
+        assert signature.task == "app.worker.tasks.finalize_book_generation"
+        assert signature.args == ([],)
+
+
+class TestGenerateBookPdfTask:
+
+    @staticmethod
+    def _session_and_repo(book):
+        session = MagicMock()
+        session.commit = AsyncMock()
+        session.__aenter__ = AsyncMock(return_value=session)
+        session.__aexit__ = AsyncMock(return_value=False)
+        repo = MagicMock()
+        repo.get_with_pages = AsyncMock(return_value=book)
+        return session, repo
+
+    @pytest.mark.asyncio
+    @pytest.mark.parametrize("variant, profile, filename, field", [
+        ("print", "print", "book_3.pdf", "pdf_file"),
+        ("preview", "screen", "book_3_preview.pdf", "pdf_preview_file"),
+    ])
+    async def test_renders_and_records_each_variant(self, variant, profile, filename, field):
+        """Test that each PDF variant uses its profile and is stored in its own field."""
+        book = SimpleNamespace(id=3, pages=[], pdf_file=None, pdf_preview_file=None)
+        session, repo = self._session_and_repo(book)
+
+        with patch.object(tasks, "get_async_session", return_value=session), \
+                patch.object(tasks, "BookRepository", return_value=repo), \
+                patch("app.services.pdf_service.PDFService.generate_book_pdf",
+                      AsyncMock(return_value=f"/uploads/{filename}")) as render:
+            path = await tasks._generate_book_pdf_async(3, variant)
+
+        assert path == f"/uploads/{filename}"
+        assert getattr(book, field) == path
+        assert render.await_args.kwargs["profile"] == profile
+        assert render.await_args.kwargs["filename"] == filename
+        session.commit.assert_awaited_once()
+
+    def test_dispatch_queues_preview_ahead_of_print(self, monkeypatch):
+        """Test that the preview is enqueued with a higher priority than the print PDF."""
+        monkeypatch.setattr(tasks.settings, "PDF_PREVIEW_ENABLED", True)
+
+        with patch.object(tasks.generate_book_pdf, "apply_async") as apply_async:
+            results = tasks.dispatch_book_pdfs(3, 7)
+
+        assert set(results) == {"preview", "print"}
+        calls = [(call.kwargs["kwargs"]["variant"], call.kwargs["priority"]) for call in apply_async.call_args_list]
+        assert calls == [
+            ("preview", tasks.settings.PDF_PREVIEW_PRIORITY),
+            ("print", tasks.settings.PDF_PRINT_PRIORITY),
+        ]
+        assert tasks.settings.PDF_PREVIEW_PRIORITY < tasks.settings.PDF_PRINT_PRIORITY
+
+    def test_dispatch_without_preview(self, monkeypatch):
+        """Test that disabling the preview only enqueues the print PDF."""
+        monkeypatch.setattr(tasks.settings, "PDF_PREVIEW_ENABLED", False)
+
+        with patch.object(tasks.generate_book_pdf, "apply_async") as apply_async:
+            results = tasks.dispatch_book_pdfs(3, 7)
+
+        assert list(results) == ["print"]
+        apply_async.assert_called_once()
+
+    def test_finalize_enqueues_pdfs(self):
+        """Test that a completed book gets its PDFs enqueued right away."""
+        with patch.object(tasks, "sync_run_async_task", return_value={"status": "success"}), \
+                patch.object(tasks, "dispatch_book_pdfs") as dispatch:
+            result = tasks.finalize_book_generation.run([], book_id=3, user_id=7, attempt=1)
+
+        assert result == {"status": "success"}
+        dispatch.assert_called_once_with(3, 7)
+
+    def test_pdf_enqueue_failure_does_not_fail_generation(self):
+        """Test that a broker error while enqueueing PDFs keeps the book completed."""
+        with patch.object(tasks, "sync_run_async_task", return_value={"status": "success"}), \
+                patch.object(tasks, "dispatch_book_pdfs", side_effect=ConnectionError("broker down")):
+            assert tasks.finalize_book_generation.run([], book_id=3, user_id=7)["status"] == "success"
+
+
+class TestTaskNotifications:
+
+    def test_hooks_await_websocket_messages(self):
+        """Test that the sync Celery hooks actually deliver the async WebSocket message."""
+        send = AsyncMock()
+        with patch.object(tasks.notification_service, "send_ws_message", send):
+            tasks.generate_book_content.on_success({}, "task-1", (), {"book_id": 3, "user_id": 7})
+            tasks.generate_book_content.on_failure(RuntimeError("x"), "task-1", (), {"book_id": 3, "user_id": 7}, None)
+
+        assert send.await_count == 2
+        assert [call.kwargs["data"]["status"] for call in send.await_args_list] == ["completed", "failed"]
+
+    def test_notification_failure_is_not_raised(self):
+        """Test that a broken WebSocket layer does not break the task hooks."""
+        with patch.object(tasks.notification_service, "send_ws_message", AsyncMock(side_effect=RuntimeError("down"))):
+            tasks.generate_book_content.on_success({}, "task-1", (), {"book_id": 3, "user_id": 7})
+
+    def test_single_mode_passes_task_id_to_coroutine(self):
+        """Test that the single-mode coroutine gets the Celery task id for its notifications."""
+        task = tasks.generate_book_content
+        task.push_request(id="task-9")
+        try:
+            with patch.object(tasks, "sync_run_async_task", return_value={"status": "success"}) as run, \
+                    patch.object(tasks, "_send_ws_message_sync"), \
+                    patch.object(tasks, "_dispatch_book_pdfs_after_generation"):
+                task.run(book_id=3, user_id=7, attempt=1)
+        finally:
+            task.pop_request()
+
+        assert run.call_args.args[0] is tasks._generate_book_content_async
+        assert run.call_args.args[-1] == "task-9"
+
+
+class TestWorkflowRetriesExhausted:
+
+    @pytest.fixture
+    def processing_book(self, sqlite_db, monkeypatch):
+        """A processing book; _mark_book_failed runs for real, other coroutines fail."""
+        from contextlib import asynccontextmanager
+        from app.models.book import Book
+
+        book = Book(title="Livro travado", user_id=7, pages_count=8, style="cartoon", status="processing")
+        sqlite_db.add(book)
+        sqlite_db.session.commit()
+
+        @asynccontextmanager
+        async def session():
+            yield sqlite_db
+
+        def run(fn, *args):
+            if fn is tasks._mark_book_failed:
+                return asyncio.run(fn(*args))
+            raise RuntimeError("provider down")
+
+        monkeypatch.setattr(tasks, "get_async_session", session)
+        monkeypatch.setattr(tasks, "sync_run_async_task", run)
+        return book
+
+    @pytest.mark.parametrize("task, args", [
+        (tasks.generate_book_story, ()),
+        (tasks.finalize_book_generation, ([],)),
+    ])
+    def test_book_is_marked_failed(self, processing_book, sqlite_db, task, args):
+        """Test that a step out of retries leaves the book failed, so it can be resumed."""
+        task.push_request(retries=task.max_retries)
+        try:
+            with pytest.raises(tasks.ExternalServiceError):
+                task.run(*args, book_id=processing_book.id, user_id=7, attempt=1)
+        finally:
+            task.pop_request()
+
+        sqlite_db.session.expire_all()
+        assert sqlite_db.session.get(type(processing_book), processing_book.id).status == "failed"
+
+    def test_retries_while_attempts_remain(self, processing_book):
+        """Test that a step with retries left is retried instead of failing the book."""
+        task = tasks.finalize_book_generation
+        task.push_request(retries=0)
+        try:
+            with patch.object(task, "retry", return_value=tasks.Retry()) as retry:
+                with pytest.raises(tasks.Retry):
+                    task.run([], book_id=processing_book.id, user_id=7, attempt=1)
+        finally:
+            task.pop_request()
+
+        retry.assert_called_once()
+        assert processing_book.status == "processing"